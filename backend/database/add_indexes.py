@@ -237,6 +237,15 @@ def add_indexes():
             except Exception as e:
                 logger.warning(f"Could not create idx_personality_drift_user_timestamp: {e}")
 
+            # Index on user_id + trait_name + timestamp - for per-trait history and rate limits
+            try:
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_personality_drift_user_trait_timestamp ON personality_drift(user_id, trait_name, timestamp)"
+                )
+                created_indexes.append("idx_personality_drift_user_trait_timestamp")
+            except Exception as e:
+                logger.warning(f"Could not create idx_personality_drift_user_trait_timestamp: {e}")
+
             # Commit all changes
             conn.commit()
 
@@ -0,0 +1,162 @@
+"""
+Cache Invalidation
+Engine-keyed caches of database rows, dropped when a committed transaction writes them
+"""
+
+import logging
+import threading
+import weakref
+from typing import Any, Callable, Hashable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("chatbot.database")
+
+
+class EngineCache:
+    """
+    Values cached per database engine and key (thread-safe)
+
+    Engines are held weakly, so separate databases (tests, tools) never
+    mix and a disposed engine takes its values with it. Every
+    invalidation bumps a per-key generation: a loader reads the
+    generation before querying and stores its result only if the
+    generation is unchanged, so a load that races with a commit is not
+    stored.
+    """
+
+    def __init__(self):
+        """Initialize the cache"""
+        # engine -> key -> value
+        self._values = weakref.WeakKeyDictionary()
+        # engine -> key -> generation (bumped on every invalidation)
+        self._generations = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def lookup(self, engine, key: Hashable) -> Tuple[Optional[Any], int]:
+        """
+        Get a cached value and the key's generation
+
+        Args:
+            engine: Database engine
+            key: Cache key
+
+        Returns:
+            (cached value or None, generation to pass to store())
+        """
+        with self._lock:
+            return (
+                self._values.get(engine, {}).get(key),
+                self._generations.get(engine, {}).get(key, 0),
+            )
+
+    def store(self, engine, key: Hashable, value: Any, generation: int) -> bool:
+        """
+        Cache a loaded value unless the key was invalidated since lookup()
+
+        Args:
+            engine: Database engine
+            key: Cache key
+            value: Value to cache
+            generation: Generation returned by lookup() before loading
+
+        Returns:
+            True if the value was stored
+        """
+        with self._lock:
+            if self._generations.get(engine, {}).get(key, 0) != generation:
+                return False
+            self._values.setdefault(engine, {})[key] = value
+            return True
+
+    def invalidate(self, key: Optional[Hashable] = None, engine=None) -> None:
+        """
+        Drop cached values
+
+        Args:
+            key: Key to drop (every key if None)
+            engine: Engine whose values to drop (every engine if None)
+        """
+        with self._lock:
+            if engine is None:
+                engines = set(self._values.keys()) | set(self._generations.keys())
+            else:
+                engines = {engine}
+
+            for each in engines:
+                values = self._values.get(each, {})
+                generations = self._generations.setdefault(each, {})
+                keys = set(values) | set(generations) if key is None else {key}
+                for dropped in keys:
+                    values.pop(dropped, None)
+                    generations[dropped] = generations.get(dropped, 0) + 1
+
+    def values(self) -> List[Any]:
+        """Every cached value, across engines"""
+        with self._lock:
+            return [value for values in self._values.values() for value in values.values()]
+
+
+class CommitInvalidator:
+    """
+    Session hooks that invalidate a cache when a committed transaction writes its rows
+
+    After each flush, collect() picks the cache keys (user IDs, ...) of
+    the written objects and they are kept in Session.info. The commit
+    passes them to invalidate() with the session's engine; a rollback
+    forgets them, since rolled-back writes never reached the database.
+    Loaders use uncommitted() to avoid caching what the session has not
+    committed yet.
+    """
+
+    def __init__(
+        self,
+        pending_key: str,
+        collect: Callable[[Session], Set[Hashable]],
+        invalidate: Callable[[Set[Hashable], Any], None],
+    ):
+        """
+        Register the hooks
+
+        Args:
+            pending_key: Session.info key for the keys written in the transaction
+            collect: Cache keys of the session's new, dirty and deleted objects
+            invalidate: Called with the committed keys and the engine
+        """
+        self.pending_key = pending_key
+        self._collect = collect
+        self._invalidate = invalidate
+        event.listen(Session, "after_flush", self._record_writes)
+        event.listen(Session, "after_commit", self._invalidate_committed)
+        event.listen(Session, "after_rollback", self._discard_rolled_back)
+
+    def uncommitted(self, session: Session, key: Hashable) -> bool:
+        """
+        Whether the session wrote a key it has not committed yet
+
+        Args:
+            session: Database session
+            key: Cache key
+
+        Returns:
+            True if the key was flushed in the open transaction or has unflushed changes
+        """
+        return key in session.info.get(self.pending_key, ()) or key in self._collect(session)
+
+    def _record_writes(self, session: Session, flush_context) -> None:
+        """Remember the keys this flush wrote"""
+        keys = self._collect(session)
+        if keys:
+            session.info.setdefault(self.pending_key, set()).update(keys)
+
+    def _invalidate_committed(self, session: Session) -> None:
+        """Invalidate the keys written by the committed transaction"""
+        keys = session.info.pop(self.pending_key, None)
+        if keys:
+            self._invalidate(keys, session.get_bind())
+            logger.debug(f"Invalidated {self.pending_key} keys {sorted(keys, key=repr)}")
+
+    def _discard_rolled_back(self, session: Session) -> None:
+        """Forget the keys of a rolled-back transaction"""
+        session.info.pop(self.pending_key, None)
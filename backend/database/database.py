@@ -3,34 +3,132 @@ Database configuration and session management
 SQLAlchemy setup for SQLite database
 """
 
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from contextlib import contextmanager
+from typing import Dict, Generator, Iterator, Optional
 import logging
 
 from utils.config import settings
 
 logger = logging.getLogger("chatbot.database")
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False},  # Needed for SQLite
-    echo=settings.DEBUG,  # Log SQL queries in debug mode
-    pool_pre_ping=True,  # Verify connections before using
-)
 
+# SQLite tuning profiles (PRAGMA name -> value), applied to every connection
+SQLITE_PROFILES: Dict[str, Dict[str, object]] = {
+    # SQLite defaults: rollback journal, fsync on every commit
+    "default": {},
+    # WAL so readers don't block on writers, still fsync on every commit
+    "safe": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+    },
+    # WAL with fsync only at checkpoints. A power cut can lose the last few
+    # commits but cannot corrupt the database.
+    "performance": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -16000,  # 16 MB
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def get_sqlite_pragmas(profile: Optional[str] = None) -> Dict[str, object]:
+    """
+    Get the PRAGMA settings for a tuning profile
+
+    Args:
+        profile: Profile name. If None, uses SQLITE_PROFILE plus any
+            individual SQLITE_* overrides from settings.
+
+    Returns:
+        Dictionary of PRAGMA name to value
+    """
+    use_overrides = profile is None
+    profile = profile or settings.SQLITE_PROFILE
+
+    if profile not in SQLITE_PROFILES:
+        logger.warning(f"Unknown SQLite profile '{profile}' - using SQLite defaults")
+        profile = "default"
+
+    pragmas = dict(SQLITE_PROFILES[profile])
+
+    if use_overrides:
+        overrides = {
+            "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+            "journal_mode": settings.SQLITE_JOURNAL_MODE,
+            "synchronous": settings.SQLITE_SYNCHRONOUS,
+            "mmap_size": settings.SQLITE_MMAP_SIZE,
+            "cache_size": settings.SQLITE_CACHE_SIZE,
+            "temp_store": settings.SQLITE_TEMP_STORE,
+        }
+        pragmas.update({name: value for name, value in overrides.items() if value is not None})
 
-# Enable foreign keys for SQLite
-@event.listens_for(engine, "connect")
-def set_sqlite_pragma(dbapi_conn, connection_record):
-    """Enable foreign key constraints in SQLite"""
+    return pragmas
+
+
+def apply_sqlite_pragmas(dbapi_conn, pragmas: Dict[str, object]) -> None:
+    """
+    Enable foreign keys and apply tuning PRAGMAs to a raw SQLite connection
+
+    busy_timeout is set first so switching journal mode waits for locks.
+
+    Args:
+        dbapi_conn: sqlite3 connection
+        pragmas: PRAGMA name to value
+    """
     cursor = dbapi_conn.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
+
+    for name in sorted(pragmas, key=lambda n: n != "busy_timeout"):
+        cursor.execute(f"PRAGMA {name}={pragmas[name]}")
+
     cursor.close()
 
 
+def create_db_engine(url: str, profile: Optional[str] = None, echo: bool = False) -> Engine:
+    """
+    Create a SQLite engine with the tuning profile applied to every connection
+
+    Args:
+        url: Database URL
+        profile: Tuning profile name (defaults to configured SQLITE_PROFILE)
+        echo: Log SQL statements
+
+    Returns:
+        SQLAlchemy engine
+    """
+    db_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},  # Needed for SQLite
+        echo=echo,
+        pool_pre_ping=True,  # Verify connections before using
+    )
+    pragmas = get_sqlite_pragmas(profile)
+
+    @event.listens_for(db_engine, "connect")
+    def set_sqlite_pragma(dbapi_conn, connection_record):
+        """Enable foreign keys and apply the tuning profile"""
+        apply_sqlite_pragmas(dbapi_conn, pragmas)
+
+    return db_engine
+
+
+# Create SQLAlchemy engine
+engine = create_db_engine(
+    settings.DATABASE_URL,
+    echo=settings.DEBUG,  # Log SQL queries in debug mode
+)
+
+logger.debug(f"SQLite profile '{settings.SQLITE_PROFILE}': {get_sqlite_pragmas()}")
+
+
 # Create SessionLocal class for database sessions
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -62,6 +160,72 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+# Session.info key marking a session as inside a unit of work
+UNIT_OF_WORK_KEY = "unit_of_work"
+
+
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[Session]:
+    """
+    Group every write made through a session into one transaction
+
+    Inside the block, services that call commit_or_stage() leave their
+    changes staged in the session instead of committing. The block commits
+    once on success (one write burst, one fsync) and rolls everything back
+    if it raises. Nested blocks join the outer one.
+
+    Usage:
+        with unit_of_work(db):
+            store_message(...)
+            add_friendship_points(...)
+
+    Args:
+        db: Database session
+
+    Yields:
+        The same session
+    """
+    if in_unit_of_work(db):
+        yield db
+        return
+
+    db.info[UNIT_OF_WORK_KEY] = True
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.info.pop(UNIT_OF_WORK_KEY, None)
+
+
+def in_unit_of_work(db: Session) -> bool:
+    """Whether the session is inside a unit_of_work() block"""
+    return db.info.get(UNIT_OF_WORK_KEY) is True
+
+
+def commit_or_stage(db: Session) -> bool:
+    """
+    Commit, unless the session is inside a unit of work
+
+    Services call this where they used to call db.commit(). Only refresh
+    objects when it returns True: refreshing a staged object would discard
+    its pending changes.
+
+    Args:
+        db: Database session
+
+    Returns:
+        True if committed, False if the changes were left staged
+    """
+    if in_unit_of_work(db):
+        return False
+
+    db.commit()
+    return True
+
+
 def init_db() -> None:
     """
     Initialize the database
@@ -81,11 +245,15 @@ def init_db() -> None:
         level_up_event,
         personality_drift,
         parent_preferences,
+        email_outbox,
     )
 
     # Create all tables
     Base.metadata.create_all(bind=engine)
 
+    # Add columns introduced after the tables were first created
+    upgrade_schema()
+
     logger.info(f"Database initialized at {settings.get_database_path()}")
 
     # Create indexes for performance optimization
@@ -99,6 +267,48 @@ def init_db() -> None:
         db.close()
 
 
+def upgrade_schema() -> None:
+    """
+    Add missing nullable columns to existing tables
+
+    create_all() only creates missing tables, so columns added to a model
+    after a user's database was created are appended here with ALTER TABLE.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+
+                if not column.nullable:
+                    logger.warning(
+                        f"Cannot add non-nullable column {table.name}.{column.name} to existing table"
+                    )
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                )
+                logger.info(f"Added column {table.name}.{column.name}")
+
+                if column.index:
+                    conn.execute(
+                        text(
+                            f"CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} "
+                            f"ON {table.name} ({column.name})"
+                        )
+                    )
+
+
 def create_indexes() -> None:
     """
     Create database indexes for performance optimization
@@ -123,12 +333,53 @@ def create_indexes() -> None:
         logger.warning("Application will continue but performance may be affected")
 
 
+def run_maintenance(db_engine: Optional[Engine] = None, checkpoint_mode: str = "PASSIVE") -> Dict:
+    """
+    Checkpoint the WAL and refresh query planner statistics
+
+    PASSIVE checkpoints never block readers or writers; TRUNCATE (used on
+    shutdown) also resets the WAL file to zero bytes.
+
+    Args:
+        db_engine: Engine to maintain (defaults to the app engine)
+        checkpoint_mode: wal_checkpoint mode (PASSIVE, FULL, RESTART, TRUNCATE)
+
+    Returns:
+        Dictionary with journal mode and checkpoint results
+    """
+    db_engine = db_engine or engine
+    result = {}
+
+    with db_engine.connect() as conn:
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        result["journal_mode"] = journal_mode
+
+        if str(journal_mode).lower() == "wal":
+            busy, wal_pages, checkpointed = conn.exec_driver_sql(
+                f"PRAGMA wal_checkpoint({checkpoint_mode})"
+            ).one()
+            result.update({
+                "checkpoint_busy": bool(busy),
+                "wal_pages": wal_pages,
+                "checkpointed_pages": checkpointed,
+            })
+
+        conn.exec_driver_sql("PRAGMA optimize")
+
+    logger.debug(f"Database maintenance complete: {result}")
+    return result
+
+
 def close_db() -> None:
     """
     Close database connection
     Should be called on application shutdown
     """
     logger.info("Closing database connection...")
+    try:
+        run_maintenance(checkpoint_mode="TRUNCATE")
+    except Exception as e:
+        logger.warning(f"Final database maintenance failed: {e}")
     engine.dispose()
     logger.info("Database connection closed")
 
@@ -171,6 +422,7 @@ def reset_database() -> None:
         level_up_event,
         personality_drift,
         parent_preferences,
+        email_outbox,
     )
 
     # Drop all tables
@@ -0,0 +1,77 @@
+"""
+Database Maintenance Scheduler
+Periodically checkpoints the SQLite WAL and runs PRAGMA optimize
+"""
+
+import logging
+import threading
+from typing import Dict, Optional
+
+from database.database import run_maintenance
+from utils.config import settings
+
+logger = logging.getLogger("chatbot.database")
+
+
+class DatabaseMaintenanceScheduler:
+    """
+    Periodic SQLite maintenance
+
+    In WAL mode, committed pages accumulate in the -wal file until a
+    checkpoint copies them into the database. SQLite auto-checkpoints on
+    commit, which puts the cost on a chat turn; a background PASSIVE
+    checkpoint keeps the WAL short without blocking anyone. PRAGMA optimize
+    refreshes statistics for tables whose query plans may have changed.
+    """
+
+    def __init__(self, interval_seconds: Optional[int] = None):
+        """
+        Initialize maintenance scheduler
+
+        Args:
+            interval_seconds: How often to run (defaults to SQLITE_MAINTENANCE_INTERVAL_SECONDS)
+        """
+        self.interval = interval_seconds or settings.SQLITE_MAINTENANCE_INTERVAL_SECONDS
+        self._stop_event = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.last_result: Optional[Dict] = None
+
+    def start(self) -> None:
+        """Start the maintenance scheduler"""
+        if self._running:
+            logger.warning("Database maintenance scheduler already running")
+            return
+
+        self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._maintenance_loop, daemon=True)
+        self._thread.start()
+        logger.info(f"Database maintenance scheduler started (interval: {self.interval}s)")
+
+    def stop(self) -> None:
+        """Stop the maintenance scheduler"""
+        if not self._running:
+            return
+
+        self._running = False
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        logger.info("Database maintenance scheduler stopped")
+
+    def _maintenance_loop(self) -> None:
+        """Background loop that periodically runs maintenance"""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.last_result = run_maintenance()
+
+                if self.last_result.get("checkpoint_busy"):
+                    logger.info("WAL checkpoint incomplete - database busy, will retry next run")
+
+            except Exception as e:
+                logger.error(f"Error in database maintenance: {e}", exc_info=True)
+
+
+# Global maintenance scheduler
+database_maintenance_scheduler = DatabaseMaintenanceScheduler()
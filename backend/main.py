@@ -7,17 +7,25 @@ FastAPI application for local chatbot with personality and memory.
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import logging
 
 from utils.config import settings
 from utils.logging_config import setup_logging
 from database.database import init_db, close_db
+from database.maintenance import database_maintenance_scheduler
 from services.llm_service import llm_service
+from services.model_lifecycle import model_lifecycle
 from services.report_scheduler import report_scheduler
+from services.email_outbox_service import email_outbox_service
+from services.notification_pipeline import notification_pipeline
+from services.summary_queue import summary_queue
+from services.advice_template_index import advice_template_index
+from services.personality_cache import personality_cache
 from utils.cache import cache_cleanup_scheduler
 from utils.memory_profiler import memory_profiler, get_memory_info, force_gc, log_memory
+from utils.metrics import metrics_registry
 
 # Import routes
 from routes import conversation, personality, profile, parent
@@ -77,18 +85,41 @@ async def lifespan(app: FastAPI):
             logger.warning("⚠ LLM model loading failed to start - chatbot functionality will be limited")
             logger.warning("  Download a model with: ./scripts/download_model.sh")
 
+    # Start email outbox sender (delivers queued parent emails in the background)
+    if settings.ENABLE_PARENT_NOTIFICATIONS:
+        email_outbox_service.start()
+        logger.info("✓ Email outbox sender started")
+
+    # Start parent notification pipeline (safety flags are always recorded,
+    # even when email is off, so their notification status is tracked)
+    notification_pipeline.start()
+    logger.info("✓ Notification pipeline started")
+
     # Start report scheduler
     if settings.ENABLE_WEEKLY_REPORTS and settings.ENABLE_PARENT_NOTIFICATIONS:
         logger.info("Starting automated report scheduler...")
         report_scheduler.start()
-        logger.info("✓ Report scheduler started - will check for due reports every hour")
+        logger.info("✓ Report scheduler started - will send reports as they fall due")
     else:
         logger.info("Report scheduler disabled (ENABLE_WEEKLY_REPORTS or ENABLE_PARENT_NOTIFICATIONS is False)")
 
+    # Start background conversation summarizer (runs while chat is idle)
+    summary_queue.start()
+    logger.info("✓ Summary queue started")
+
+    # Start advice template usage flusher (usage counts are written in batches)
+    advice_template_index.start()
+
     # Start cache cleanup scheduler
     cache_cleanup_scheduler.start()
     logger.info("✓ Cache cleanup scheduler started - will clean expired entries every 5 minutes")
 
+    # Start database maintenance (WAL checkpoint + PRAGMA optimize)
+    database_maintenance_scheduler.start()
+
+    # Start model lifecycle (unloads the model when idle or RAM is short)
+    model_lifecycle.start()
+
     # Log final memory state
     log_memory("Startup complete")
 
@@ -106,10 +137,28 @@ async def lifespan(app: FastAPI):
     report_scheduler.stop()
     logger.info("Report scheduler stopped")
 
+    # Stop summary queue (unfinished summaries are backfilled on next start)
+    summary_queue.stop()
+
+    # Stop notification pipeline (pending notifications resume on next start)
+    notification_pipeline.stop()
+
+    # Stop email outbox sender (queued emails are kept for the next run)
+    email_outbox_service.stop()
+
+    # Stop advice template usage flusher (writes the remaining counts)
+    advice_template_index.stop()
+
     # Stop cache cleanup scheduler
     cache_cleanup_scheduler.stop()
     logger.info("Cache cleanup scheduler stopped")
 
+    # Stop database maintenance (close_db runs a final checkpoint)
+    database_maintenance_scheduler.stop()
+
+    # Stop model lifecycle before the final unload
+    model_lifecycle.stop()
+
     # Unload LLM model
     llm_service.unload_model()
 
@@ -175,13 +224,33 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
-    """Health check endpoint with cache statistics"""
+def health_check():
+    """
+    Health check endpoint with cache statistics and inference worker state
+
+    Sync so FastAPI runs it in the threadpool: asking an out-of-process
+    worker for its model info can block for a couple of seconds.
+    """
+    worker = llm_service.get_worker_health()
     return {
-        "status": "healthy",
+        # A started worker that is down (restarting) degrades chat
+        "status": "degraded" if worker and worker["running"] and not worker["alive"] else "healthy",
         "database": "connected",
         "llm": "loaded" if llm_service.is_loaded else "not loaded",
         "model_info": llm_service.get_model_info(),
+        "inference_worker": worker,
+        "model_lifecycle": model_lifecycle.get_stats(),
+    }
+
+
+@app.post("/api/model/warm")
+async def warm_model():
+    """Load and prime the model in the background (called when the app regains focus)"""
+    started = model_lifecycle.warm_up("app focus")
+    return {
+        "success": True,
+        "loaded": llm_service.is_loaded,
+        "warming": started or model_lifecycle.get_stats()["warming"],
     }
 
 
@@ -215,6 +284,41 @@ async def get_memory_info_endpoint():
     }
 
 
+def _set_service_gauges() -> None:
+    """Copy decoding speed and cache hit rates into the metrics registry"""
+    decoding = llm_service.get_model_info()["decoding"] or {}
+    metrics_registry.set_gauge(
+        "chatbot_llm_tokens_per_second", decoding.get("tokens_per_second", 0.0),
+        help_text="Average generation speed since startup",
+    )
+
+    llm_cache = llm_service.get_cache_stats()
+    caches = {
+        "llm_memory": llm_cache,
+        "llm_persistent": llm_cache["persistent"],
+        "personality": personality_cache.get_stats(),
+    }
+    for name, stats in caches.items():
+        if stats is None:
+            continue
+        requests = stats["hits"] + stats["misses"]
+        metrics_registry.set_gauge(
+            "chatbot_cache_hit_ratio", stats["hits"] / requests if requests else 0.0, {"cache": name},
+            help_text="Share of cache lookups that were hits since startup",
+        )
+        metrics_registry.set_gauge(
+            "chatbot_cache_requests", requests, {"cache": name},
+            help_text="Cache lookups since startup",
+        )
+
+
+@app.get("/api/metrics")
+def get_metrics():
+    """Stage latency histograms, tokens/s and cache hit rates in Prometheus text format"""
+    _set_service_gauges()
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/api/memory/gc")
 async def force_garbage_collection():
     """Force garbage collection to free memory"""
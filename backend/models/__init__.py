@@ -9,6 +9,7 @@ from models.conversation import Conversation, Message
 from models.memory import UserProfile
 from models.safety import SafetyFlag, AdviceTemplate
 from models.parent_preferences import ParentNotificationPreferences
+from models.email_outbox import EmailOutbox
 
 __all__ = [
     "User",
@@ -19,4 +20,5 @@ __all__ = [
     "SafetyFlag",
     "AdviceTemplate",
     "ParentNotificationPreferences",
+    "EmailOutbox",
 ]
@@ -0,0 +1,73 @@
+"""
+EmailOutbox model
+Persistent queue of outgoing emails delivered by a background sender
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from datetime import datetime
+from typing import Dict
+
+from database.database import Base
+
+
+class EmailOutbox(Base):
+    """
+    EmailOutbox model - stores emails waiting to be delivered
+
+    Emails are written here in the request path and sent later by the
+    outbox sender, so a slow or unavailable SMTP server never blocks a
+    chat turn. Rows survive restarts, so nothing is lost if the app exits
+    before delivery.
+
+    Status lifecycle:
+        pending -> sending -> sent
+                           -> pending (retry with backoff)
+                           -> failed (max attempts reached)
+
+    Priority:
+        Lower values are sent first. Crisis notifications use priority 0.
+    """
+
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+
+    # Message content
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    html_body = Column(Text, nullable=True)
+    category = Column(String, nullable=True)  # e.g. 'crisis_suicide', 'weekly_report'
+
+    # Delivery state
+    priority = Column(Integer, default=10, nullable=False, index=True)
+    status = Column(String, default="pending", nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    dedup_key = Column(String, nullable=False, index=True)  # sha256 of recipient, subject and body
+
+    # Timing
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
+    sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox(id={self.id}, to='{self.to_email}', status='{self.status}', priority={self.priority})>"
+
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for API responses"""
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "to_email": self.to_email,
+            "subject": self.subject,
+            "category": self.category,
+            "priority": self.priority,
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "next_attempt_at": self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            "sent_at": self.sent_at.isoformat() if self.sent_at else None,
+        }
@@ -5,7 +5,7 @@ Stores parent preferences for safety notifications
 
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 
 from database.database import Base
@@ -34,6 +34,7 @@ class ParentNotificationPreferences(Base):
 
     Summary Settings:
     - summary_frequency: How often to send summary emails (daily, weekly, none)
+    - next_report_at: When the next summary email is due (maintained by the report scheduler)
     - include_content_snippets: Include message snippets in notifications
 
     General Settings:
@@ -69,6 +70,7 @@ class ParentNotificationPreferences(Base):
     summary_frequency = Column(String, default="weekly", nullable=False)  # daily, weekly, none
     summary_day_of_week = Column(Integer, default=0, nullable=True)  # 0=Monday, 6=Sunday (for weekly)
     summary_hour = Column(Integer, default=9, nullable=False)  # Hour to send summary (0-23)
+    next_report_at = Column(DateTime, nullable=True, index=True)  # Next due summary (null = none scheduled)
 
     # Content settings
     include_content_snippets = Column(Boolean, default=True, nullable=False)
@@ -114,6 +116,7 @@ class ParentNotificationPreferences(Base):
                 "frequency": self.summary_frequency,
                 "day_of_week": self.summary_day_of_week,
                 "hour": self.summary_hour,
+                "next_report_at": self.next_report_at.isoformat() if self.next_report_at else None,
             },
             "content_settings": {
                 "include_snippets": self.include_content_snippets,
@@ -181,21 +184,90 @@ class ParentNotificationPreferences(Base):
         Returns:
             True if in quiet hours period
         """
+        return self._is_quiet_hour(datetime.now().hour)
+
+    def _is_quiet_hour(self, hour: int) -> bool:
+        """
+        Check if a given hour falls within quiet hours
+
+        Args:
+            hour: Hour of day (0-23)
+
+        Returns:
+            True if the hour is inside the quiet period
+        """
         if not self.quiet_hours_enabled:
             return False
 
         if self.quiet_hours_start is None or self.quiet_hours_end is None:
             return False
 
-        current_hour = datetime.now().hour
-
         # Handle quiet hours that span midnight
         if self.quiet_hours_start < self.quiet_hours_end:
-            # Normal case: e.g., 22:00 to 08:00
-            return self.quiet_hours_start <= current_hour < self.quiet_hours_end
+            # Normal case: e.g., 13:00 to 15:00
+            return self.quiet_hours_start <= hour < self.quiet_hours_end
         else:
             # Spans midnight: e.g., 22:00 to 08:00
-            return current_hour >= self.quiet_hours_start or current_hour < self.quiet_hours_end
+            return hour >= self.quiet_hours_start or hour < self.quiet_hours_end
+
+    def compute_next_report_at(self, after: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Compute when the next summary report is due
+
+        Uses summary_frequency, summary_day_of_week and summary_hour. A slot
+        that falls inside quiet hours is deferred to the end of the quiet period.
+
+        Args:
+            after: Reference time (defaults to now); the result is strictly later
+
+        Returns:
+            Datetime of the next report, or None if summaries are disabled
+        """
+        if not self.email_notifications_enabled:
+            return None
+
+        if self.summary_frequency not in ("daily", "weekly"):
+            return None
+
+        after = after or datetime.now()
+        slot = after.replace(hour=self.summary_hour, minute=0, second=0, microsecond=0)
+
+        if self.summary_frequency == "weekly":
+            day_of_week = self.summary_day_of_week or 0
+            slot += timedelta(days=(day_of_week - slot.weekday()) % 7)
+            step = timedelta(days=7)
+        else:
+            step = timedelta(days=1)
+
+        # Start one period back so a slot deferred past quiet hours is not skipped
+        slot -= step
+        while True:
+            due = self._defer_past_quiet_hours(slot)
+            if due > after:
+                return due
+            slot += step
+
+    def _defer_past_quiet_hours(self, slot: datetime) -> datetime:
+        """
+        Move a scheduled slot to the end of quiet hours if it falls inside them
+
+        Args:
+            slot: Scheduled report time
+
+        Returns:
+            Original slot, or the first hour after the quiet period
+        """
+        if self.quiet_hours_start == self.quiet_hours_end:
+            # Zero-length (or all-day) quiet period - nothing to defer to
+            return slot
+
+        if not self._is_quiet_hour(slot.hour):
+            return slot
+
+        deferred = slot.replace(hour=self.quiet_hours_end)
+        if deferred <= slot:
+            deferred += timedelta(days=1)
+        return deferred
 
     @classmethod
     def get_or_create_defaults(cls, db, user_id: int) -> "ParentNotificationPreferences":
@@ -232,6 +304,7 @@ class ParentNotificationPreferences(Base):
                 max_snippet_length=100,
                 quiet_hours_enabled=False,
             )
+            prefs.next_report_at = prefs.compute_next_report_at()
             db.add(prefs)
             db.commit()
             db.refresh(prefs)
@@ -59,14 +59,26 @@ class BotPersonality(Base):
     # Relationships
     user = relationship("User", back_populates="personality")
 
+    def _parse_json_list(self, column):
+        """Parse a JSON array column, reusing the last parse while the text is unchanged"""
+        raw = getattr(self, column)
+        parsed_columns = self.__dict__.setdefault("_parsed_json", {})
+        cached = parsed_columns.get(column)
+
+        if cached is None or cached[0] != raw:
+            parsed = []
+            if raw:
+                try:
+                    parsed = json.loads(raw)
+                except json.JSONDecodeError:
+                    parsed = []
+            cached = parsed_columns[column] = (raw, parsed)
+
+        return list(cached[1])
+
     def get_quirks(self):
         """Parse quirks JSON array"""
-        if self.quirks:
-            try:
-                return json.loads(self.quirks)
-            except json.JSONDecodeError:
-                return []
-        return []
+        return self._parse_json_list("quirks")
 
     def set_quirks(self, quirks_list):
         """Set quirks from list"""
@@ -74,12 +86,7 @@ class BotPersonality(Base):
 
     def get_interests(self):
         """Parse interests JSON array"""
-        if self.interests:
-            try:
-                return json.loads(self.interests)
-            except json.JSONDecodeError:
-                return []
-        return []
+        return self._parse_json_list("interests")
 
     def set_interests(self, interests_list):
         """Set interests from list"""
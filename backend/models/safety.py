@@ -10,6 +10,7 @@ from datetime import datetime
 import json
 
 from database.database import Base
+from models.email_outbox import EmailOutbox  # Registers the table referenced by SafetyFlag
 
 
 class SafetyFlag(Base):
@@ -24,9 +25,15 @@ class SafetyFlag(Base):
 
     Used for parent monitoring and system improvements.
 
+    Parent notification status (set when a flag needs a parent notification):
+        pending -> sending -> notified (email queued in the outbox)
+                           -> logged (no parent email / email not configured)
+                           -> pending (retry) -> failed
+
     Relationships:
         - Many-to-one with User
         - Many-to-one with Message (optional)
+        - Many-to-one with EmailOutbox (optional, the notification email)
     """
 
     __tablename__ = "safety_flags"
@@ -45,9 +52,18 @@ class SafetyFlag(Base):
     timestamp = Column(DateTime, default=datetime.now, nullable=False)
     parent_notified = Column(Boolean, default=False, nullable=False)
 
+    # Parent notification pipeline
+    notification_status = Column(String, nullable=True, index=True)  # null = no notification needed
+    notification_category = Column(String, nullable=True)  # e.g. 'crisis_suicide'
+    notification_attempts = Column(Integer, default=0, nullable=True)
+    notification_error = Column(Text, nullable=True)
+    notification_next_attempt_at = Column(DateTime, nullable=True)
+    notification_outbox_id = Column(Integer, ForeignKey("email_outbox.id"), nullable=True)
+
     # Relationships
     user = relationship("User", back_populates="safety_flags")
     message = relationship("Message", back_populates="safety_flags")
+    notification_outbox = relationship(EmailOutbox)
 
     def __repr__(self):
         return f"<SafetyFlag(id={self.id}, type='{self.flag_type}', severity='{self.severity}')>"
@@ -64,6 +80,7 @@ class SafetyFlag(Base):
             "action_taken": self.action_taken,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None,
             "parent_notified": self.parent_notified,
+            "notification_status": self.notification_status,
         }
 
     @classmethod
@@ -3,20 +3,51 @@ Conversation API Routes
 Endpoints for chat conversation management
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from database.database import get_db
 from services.conversation_manager import conversation_manager
 from services.conversation_tracker import conversation_tracker
+from services.inference_scheduler import InferenceCancelled, InferenceLane, InferenceRequest
+from services.model_lifecycle import model_lifecycle
+from utils.config import settings
 
 logger = logging.getLogger("chatbot.routes.conversation")
 
 router = APIRouter()
 
+# How often a pending reply checks whether the client is still connected
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(http_request: Request, inference_request: InferenceRequest):
+    """
+    Cancel an inference request if the client disconnects while the block runs
+
+    Args:
+        http_request: The incoming HTTP request
+        inference_request: Ticket of the generation serving it
+    """
+    async def watch():
+        while not await http_request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+        logger.info("Client disconnected, cancelling reply generation")
+        inference_request.cancel()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield
+    finally:
+        watcher.cancel()
+
 
 # Request/Response models
 class StartConversationResponse(BaseModel):
@@ -65,6 +96,9 @@ async def start_conversation(user_id: int = 1, db: Session = Depends(get_db)):
         Conversation info with greeting message
     """
     try:
+        # Reload the model now if it was unloaded while idle (first reply won't wait as long)
+        model_lifecycle.warm_up("conversation start")
+
         result = conversation_manager.start_conversation(user_id, db)
 
         logger.info(f"Started conversation {result['conversation_id']} for user {user_id}")
@@ -81,24 +115,40 @@ async def start_conversation(user_id: int = 1, db: Session = Depends(get_db)):
 
 
 @router.post("/message", response_model=SendMessageResponse)
-async def send_message(request: SendMessageRequest, db: Session = Depends(get_db)):
+async def send_message(
+    request: SendMessageRequest, http_request: Request, db: Session = Depends(get_db)
+):
     """
     Send a message and get bot's response
 
+    The reply is generated in a worker thread; if the client disconnects
+    (window closed, renderer timeout) the generation is cancelled and the
+    turn is not stored.
+
     Args:
         request: Message request with content, conversation_id, user_id
+        http_request: The HTTP request (watched for disconnects)
         db: Database session
 
     Returns:
         Bot's response message
     """
+    inference_request = InferenceRequest(
+        InferenceLane.INTERACTIVE,
+        affinity=request.user_id,
+        deadline_seconds=settings.MODEL_REPLY_DEADLINE_SECONDS or None,
+    )
+
     try:
-        result = conversation_manager.process_message(
-            user_message=request.content,
-            conversation_id=request.conversation_id,
-            user_id=request.user_id,
-            db=db,
-        )
+        async with cancel_on_disconnect(http_request, inference_request):
+            result = await run_in_threadpool(
+                conversation_manager.process_message,
+                user_message=request.content,
+                conversation_id=request.conversation_id,
+                user_id=request.user_id,
+                db=db,
+                request=inference_request,
+            )
 
         # Get the last message (bot's response) from database
         from models.conversation import Message
@@ -130,6 +180,9 @@ async def send_message(request: SendMessageRequest, db: Session = Depends(get_db
 
     except HTTPException:
         raise
+    except InferenceCancelled:
+        logger.info(f"Reply in conversation {request.conversation_id} cancelled: client disconnected")
+        raise HTTPException(status_code=499, detail="Client closed request")
     except Exception as e:
         logger.error(f"Error processing message: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
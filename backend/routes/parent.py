@@ -27,6 +27,7 @@ from services.safety_flag_service import safety_flag_service
 from services.parent_notification_service import parent_notification_service
 from services.parent_preferences_service import parent_preferences_service
 from services.conversation_summary_service import conversation_summary_service
+from services.summary_queue import summary_queue
 from services.weekly_report_service import weekly_report_service
 from services.report_scheduler import report_scheduler
 from services.auth_service import auth_service
@@ -497,6 +498,10 @@ class NotificationHistoryResponse(BaseModel):
     flag_type: str
     content_snippet: Optional[str]
     action_taken: Optional[str]
+    notification_status: Optional[str] = None  # pending, sending, notified, logged, failed
+    delivery_status: Optional[str] = None  # status of the outbox email
+    attempts: Optional[int] = None
+    error: Optional[str] = None
 
 
 # Endpoints
@@ -1179,7 +1184,7 @@ async def get_notification_history(
         db: Database session
 
     Returns:
-        List of past parent notifications
+        List of past and in-flight parent notifications with delivery status
     """
     try:
         history = parent_notification_service.get_notification_history(
@@ -1194,7 +1199,11 @@ async def get_notification_history(
                 severity=notification["severity"],
                 flag_type=notification["flag_type"],
                 content_snippet=notification["content_snippet"],
-                action_taken=notification["action_taken"]
+                action_taken=notification["action_taken"],
+                notification_status=notification.get("notification_status"),
+                delivery_status=notification.get("delivery_status"),
+                attempts=notification.get("attempts"),
+                error=notification.get("error")
             )
             for notification in history
         ]
@@ -1633,6 +1642,11 @@ async def get_user_conversations(
             Conversation.timestamp.desc()
         ).limit(limit).offset(offset).all()
 
+        # Summaries the parent is about to look at jump the background queue
+        summary_queue.prioritize(
+            conv.id for conv in conversations if not conv.conversation_summary
+        )
+
         # Format response
         result = []
         for conv in conversations:
@@ -1686,6 +1700,9 @@ async def get_conversation_summary(
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
 
+        if not conversation.conversation_summary:
+            summary_queue.prioritize([conversation.id])
+
         # Return existing summary or basic info
         return {
             "conversation_id": conversation.id,
@@ -1772,18 +1789,23 @@ async def generate_conversation_summary(
 async def generate_summaries_batch(
     user_id: int = Query(..., description="Child's user ID"),
     conversation_ids: List[int] = Query(..., description="List of conversation IDs"),
+    regenerate: bool = Query(False, description="Force regenerate summaries that already exist"),
     db: Session = Depends(get_db)
 ):
     """
-    Generate summaries for multiple conversations
+    Queue summaries for multiple conversations
+
+    Summaries are generated in the background when chat is idle. Poll
+    /conversations/summary-jobs/{job_id} for progress.
 
     Args:
         user_id: Child's user ID
         conversation_ids: List of conversation IDs to summarize
+        regenerate: Force regeneration of existing summaries
         db: Database session
 
     Returns:
-        Results for each conversation
+        Job ID and initial progress
     """
     try:
         # Verify user exists
@@ -1803,25 +1825,44 @@ async def generate_summaries_batch(
         if missing_ids:
             logger.warning(f"Some conversations not found or don't belong to user: {missing_ids}")
 
-        # Generate summaries
-        results = conversation_summary_service.generate_batch_summaries(found_ids, db)
+        # Queue summaries
+        job = summary_queue.submit_job(found_ids, force=regenerate)
 
-        logger.info(f"Generated {len(results)} summaries for user {user_id}")
+        logger.info(f"Queued summary job {job['job_id']} ({len(found_ids)} conversations) for user {user_id}")
 
         return {
             "success": True,
-            "processed": len(results),
-            "missing": list(missing_ids),
-            "results": results
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "total": job["total"],
+            "missing": list(missing_ids)
         }
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error generating batch summaries: {e}", exc_info=True)
+        logger.error(f"Error queueing batch summaries: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/conversations/summary-jobs/{job_id}")
+async def get_summary_job(job_id: str):
+    """
+    Get progress of a batch summary job
+
+    Args:
+        job_id: Job ID returned by generate-summaries-batch
+
+    Returns:
+        Job status, counts, and per-conversation results
+    """
+    job = summary_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Summary job not found")
+
+    return job
+
+
 @router.post("/test-notification")
 async def send_test_notification(
     user_id: int = Query(..., description="Child's user ID"),
@@ -2098,21 +2139,20 @@ async def trigger_scheduled_check():
     Manually trigger the scheduled report check
 
     This endpoint is useful for testing the automated report scheduler.
-    It will immediately check all users and send reports to those who are
-    due based on their preferences.
-
-    This bypasses the hourly schedule and runs the check immediately.
+    It will immediately send reports to all users whose next_report_at
+    has passed.
 
     Returns:
-        Success message
+        Success message with sent/skipped/error counts
     """
     try:
         logger.info("Manually triggering scheduled report check")
-        report_scheduler.force_check_now()
+        counts = report_scheduler.force_check_now()
 
         return {
             "success": True,
-            "message": "Scheduled report check triggered. Check logs for results."
+            "message": "Scheduled report check triggered. Check logs for results.",
+            "results": counts,
         }
 
     except Exception as e:
@@ -19,6 +19,8 @@ from services.feature_gates import check_feature_access, get_feature_gate_messag
 from services.personality_drift_calculator import personality_drift_calculator
 from services.trait_adjuster import trait_adjuster
 from services.drift_rate_limiter import drift_rate_limiter
+from services.drift_timeseries import RESOLUTION_RAW, RESOLUTIONS, drift_timeseries
+from services.personality_cache import personality_cache
 
 logger = logging.getLogger("chatbot.routes.personality")
 
@@ -54,9 +56,7 @@ async def get_personality(user_id: int = 1, db: Session = Depends(get_db)):
         Current personality with traits, mood, friendship level
     """
     try:
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             # Initialize personality for new user
@@ -132,9 +132,7 @@ async def get_personality_description(user_id: int = 1, db: Session = Depends(ge
         Personality trait descriptions
     """
     try:
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -184,9 +182,7 @@ async def get_friendship_progress(user_id: int = 1, db: Session = Depends(get_db
         Friendship progress details including current level, points, and progress to next level
     """
     try:
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -339,9 +335,7 @@ async def get_friendship_history(user_id: int = 1, db: Session = Depends(get_db)
         History summary with stats
     """
     try:
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -389,6 +383,53 @@ async def simulate_level_progression(target_level: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/friendship/projection")
+async def project_friendship_progression(
+    user_id: int = 1,
+    days: int = 90,
+    daily_points: Optional[float] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Project friendship levels over the coming days in one call
+
+    Args:
+        user_id: User ID
+        days: Number of days to project (1-365)
+        daily_points: Points per day (estimated from recent activity if omitted)
+        db: Database session
+
+    Returns:
+        Per-day points and levels, and the day each new level is reached
+    """
+    try:
+        if days < 1 or days > 365:
+            raise HTTPException(status_code=400, detail="Days must be between 1 and 365")
+
+        if daily_points is not None and daily_points < 0:
+            raise HTTPException(status_code=400, detail="daily_points cannot be negative")
+
+        personality = personality_cache.get(user_id, db)
+
+        if not personality:
+            raise HTTPException(status_code=404, detail="Personality not found")
+
+        projection = friendship_manager.project_progression(
+            personality, db, days, daily_points
+        )
+
+        return {
+            "success": True,
+            "projection": projection,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error projecting progression: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # Level-up event endpoints
 @router.get("/friendship/level-up-events")
 async def get_level_up_events(
@@ -618,14 +659,13 @@ async def get_feature_summary(user_id: int = 1, db: Session = Depends(get_db)):
         Feature summary with unlocked/locked features
     """
     try:
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
 
-        summary = feature_unlock_manager.get_feature_summary(personality)
+        # Shared per-level summary (serialized as-is, never modified)
+        summary = feature_unlock_manager.get_level_summary(personality.friendship_level)
 
         return {
             "success": True,
@@ -652,9 +692,7 @@ async def get_unlocked_features(user_id: int = 1, db: Session = Depends(get_db))
         List of unlocked features
     """
     try:
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -689,9 +727,7 @@ async def get_locked_features(user_id: int = 1, db: Session = Depends(get_db)):
         List of locked features
     """
     try:
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -727,9 +763,7 @@ async def check_feature(feature_id: str, user_id: int = 1, db: Session = Depends
         Feature unlock status and information
     """
     try:
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -783,9 +817,7 @@ async def check_multiple_features(
         Dictionary of feature statuses
     """
     try:
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -855,9 +887,7 @@ async def get_features_by_category(category: str, user_id: Optional[int] = None,
         friendship_level = None
 
         if user_id:
-            personality = (
-                db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-            )
+            personality = personality_cache.get(user_id, db)
             if personality:
                 friendship_level = personality.friendship_level
 
@@ -972,6 +1002,8 @@ async def get_drift_summary(user_id: int = 1, db: Session = Depends(get_db)):
 async def get_trait_timeline(
     trait_name: str,
     user_id: int = 1,
+    resolution: str = RESOLUTION_RAW,
+    max_points: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
     """
@@ -980,6 +1012,8 @@ async def get_trait_timeline(
     Args:
         trait_name: Trait name (humor, energy, curiosity, formality)
         user_id: User ID (default 1)
+        resolution: raw (one point per drift), day or week
+        max_points: Downsample to at most this many points for charts (LTTB)
         db: Database session
 
     Returns:
@@ -994,14 +1028,22 @@ async def get_trait_timeline(
                 detail=f"Invalid trait name. Must be one of: {', '.join(valid_traits)}"
             )
 
+        if resolution not in RESOLUTIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid resolution. Must be one of: {', '.join(RESOLUTIONS)}"
+            )
+
+        if max_points is not None and max_points < 2:
+            raise HTTPException(status_code=400, detail="max_points must be at least 2")
+
         timeline = personality_drift_calculator.get_trait_timeline(
-            user_id, trait_name, db
+            user_id, trait_name, db, resolution, max_points
         )
+        trait_stats = drift_timeseries.get_trait_stats(user_id, db).get(trait_name, {})
 
         # Get current personality for current value
-        personality = db.query(BotPersonality).filter(
-            BotPersonality.user_id == user_id
-        ).first()
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -1013,8 +1055,10 @@ async def get_trait_timeline(
             "user_id": user_id,
             "trait_name": trait_name,
             "current_value": current_value,
+            "resolution": resolution,
             "timeline": timeline,
-            "total_changes": len(timeline),
+            "point_count": len(timeline),
+            "total_changes": trait_stats.get("drift_count", 0),
         }
 
     except HTTPException:
@@ -1092,9 +1136,7 @@ async def get_drift_stats(user_id: int = 1, db: Session = Depends(get_db)):
         summary = personality_drift_calculator.get_drift_summary(user_id, db)
 
         # Get current personality
-        personality = db.query(BotPersonality).filter(
-            BotPersonality.user_id == user_id
-        ).first()
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -1497,9 +1539,7 @@ async def validate_traits(user_id: int = 1, db: Session = Depends(get_db)):
     """
     try:
         # Get personality
-        personality = db.query(BotPersonality).filter(
-            BotPersonality.user_id == user_id
-        ).first()
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -1556,9 +1596,7 @@ async def get_drift_allowance(
     """
     try:
         # Get personality
-        personality = db.query(BotPersonality).filter(
-            BotPersonality.user_id == user_id
-        ).first()
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -1609,9 +1647,7 @@ async def get_all_allowances(
     """
     try:
         # Get personality
-        personality = db.query(BotPersonality).filter(
-            BotPersonality.user_id == user_id
-        ).first()
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -1659,9 +1695,7 @@ async def get_drift_rate_stats(
     """
     try:
         # Get personality
-        personality = db.query(BotPersonality).filter(
-            BotPersonality.user_id == user_id
-        ).first()
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -1700,9 +1734,7 @@ async def check_cooldown(
     """
     try:
         # Get personality
-        personality = db.query(BotPersonality).filter(
-            BotPersonality.user_id == user_id
-        ).first()
+        personality = personality_cache.get(user_id, db)
 
         if not personality:
             raise HTTPException(status_code=404, detail="Personality not found")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Chat Turn Benchmark
+Compares commits per turn and turn latency with and without the
+turn-scoped unit of work
+
+Runs ConversationManager.process_message against a fresh database file.
+The LLM is bypassed (fallback responses, keyword memory extraction) so
+the timings measure the database work of a turn.
+
+Usage:
+    python scripts/benchmark_chat_turn.py
+    python scripts/benchmark_chat_turn.py --turns 300 --profile safe
+"""
+
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, SQLITE_PROFILES, create_db_engine, unit_of_work
+from models.user import User
+from models.personality import BotPersonality
+from models.conversation import Conversation
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from services.conversation_manager import ConversationManager
+from services.llm_service import llm_service
+from services.memory_manager import memory_manager
+
+# Messages that trigger points, activities and memory upserts
+MESSAGES = [
+    "Thanks! My favorite color is blue",
+    "haha that's funny, I feel happy today",
+    "What should I do about my friend Sam?",
+    "You're awesome, I love talking to you",
+    "My favorite food is pizza",
+]
+
+
+def benchmark_mode(use_unit_of_work: bool, turns: int, warmup: int, profile: str) -> dict:
+    """Run chat turns against a fresh database file"""
+    # services/__init__ shadows the module name with the global instance
+    conversation_manager_module = sys.modules["services.conversation_manager"]
+    conversation_manager_module.unit_of_work = (
+        unit_of_work if use_unit_of_work else (lambda db: nullcontext(db))
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_engine = create_db_engine(f"sqlite:///{tmp_dir}/benchmark.db", profile=profile)
+        Base.metadata.create_all(db_engine)
+        db = sessionmaker(bind=db_engine, autoflush=False)()
+
+        db.add(User(id=1, name="Benchmark", created_at=datetime.now()))
+        db.add(BotPersonality(user_id=1))
+        conversation = Conversation(user_id=1, timestamp=datetime.now(), message_count=0)
+        db.add(conversation)
+        db.commit()
+
+        commits = []
+        event.listen(db_engine, "commit", lambda conn: commits.append(1))
+
+        manager = ConversationManager()
+        for turn in range(warmup):
+            manager.process_message(MESSAGES[turn % len(MESSAGES)], conversation.id, 1, db)
+
+        commits.clear()
+        timings = []
+        for turn in range(turns):
+            start = time.perf_counter()
+            manager.process_message(MESSAGES[turn % len(MESSAGES)], conversation.id, 1, db)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        db.close()
+        db_engine.dispose()
+
+    timings.sort()
+    return {
+        "mode": "unit of work" if use_unit_of_work else "per-service commits",
+        "commits_per_turn": len(commits) / turns,
+        "mean_ms": sum(timings) / len(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat turn database work")
+    parser.add_argument("--turns", type=int, default=200, help="Timed turns per mode")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed warm-up turns")
+    parser.add_argument(
+        "--profile", default="performance", choices=list(SQLITE_PROFILES),
+        help="SQLite tuning profile"
+    )
+    args = parser.parse_args()
+
+    # Bypass the LLM so only database work is timed
+    llm_service.ensure_loaded = lambda timeout=None: False
+    memory_manager.use_llm_extraction = False
+
+    print("=" * 70)
+    print(f"Chat turn benchmark - {args.turns} turns, SQLite profile '{args.profile}'")
+    print("=" * 70)
+    print(f"{'Mode':22} {'Commits/turn':>12} {'Mean':>10} {'p50':>10} {'p95':>10}")
+    print("-" * 68)
+
+    for use_unit_of_work in (False, True):
+        result = benchmark_mode(use_unit_of_work, args.turns, args.warmup, args.profile)
+        print(
+            f"{result['mode']:22} {result['commits_per_turn']:>12.1f} "
+            f"{result['mean_ms']:>8.2f}ms {result['p50_ms']:>8.2f}ms {result['p95_ms']:>8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
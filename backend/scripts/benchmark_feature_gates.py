@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Feature Gate Benchmark
+Measures the per-call overhead of @require_feature and the cost of the
+feature unlock queries
+
+Each gated function is compared against the same function undecorated,
+so the reported overhead is what the gate itself adds. No database is
+needed: the personality is a PersonalitySnapshot.
+
+Usage:
+    python scripts/benchmark_feature_gates.py
+    python scripts/benchmark_feature_gates.py --calls 500000
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from services.feature_gates import require_feature
+from services.feature_unlock_manager import feature_unlock_manager
+from services.personality_cache import PersonalitySnapshot
+
+
+def make_personality(level: int) -> PersonalitySnapshot:
+    """Snapshot of a personality at the given friendship level"""
+    return PersonalitySnapshot(
+        id=1, user_id=1, name="Buddy", humor=0.5, energy=0.6, curiosity=0.5,
+        formality=0.3, friendship_level=level, friendship_points=0,
+        total_conversations=0, mood="happy", quirks=(), interests=(),
+        catchphrase=None, created_at=None, updated_at=None,
+    )
+
+
+def plain(personality, topic, depth=1):
+    return topic
+
+
+@require_feature("advice_mode_unlocked")
+def gated_by_name(personality, topic, depth=1):
+    return topic
+
+
+@require_feature("advice_mode_unlocked")
+def gated_by_scan(context, topic, pers, depth=1):
+    return topic
+
+
+def per_call_ns(statement, calls: int) -> float:
+    """Best-of-5 nanoseconds per call"""
+    return min(timeit.repeat(statement, number=calls, repeat=5)) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark feature gate overhead")
+    parser.add_argument("--calls", type=int, default=200_000, help="Calls per measurement")
+    args = parser.parse_args()
+
+    personality = make_personality(5)
+    calls = args.calls
+
+    baseline = per_call_ns(lambda: plain(personality, "school"), calls)
+    rows = [
+        ("undecorated call", baseline),
+        ("gate, named parameter", per_call_ns(lambda: gated_by_name(personality, "school"), calls)),
+        ("gate, keyword argument",
+         per_call_ns(lambda: gated_by_name(personality=personality, topic="school"), calls)),
+        ("gate, argument scan",
+         per_call_ns(lambda: gated_by_scan(None, "school", personality), calls)),
+    ]
+
+    print("=" * 60)
+    print(f"Feature gate benchmark - {calls} calls per measurement")
+    print("=" * 60)
+    print(f"{'Call':28} {'ns/call':>10} {'Overhead':>12}")
+    print("-" * 52)
+    for label, nanoseconds in rows:
+        print(f"{label:28} {nanoseconds:>10.0f} {nanoseconds - baseline:>10.0f}ns")
+
+    query_calls = max(calls // 20, 1)
+    queries = [
+        ("is_feature_unlocked", lambda: feature_unlock_manager.is_feature_unlocked("inside_jokes", 5)),
+        ("get_unlocked_mask", lambda: feature_unlock_manager.get_unlocked_mask(5)),
+        ("get_unlocked_features", lambda: feature_unlock_manager.get_unlocked_features(5)),
+        ("get_level_summary", lambda: feature_unlock_manager.get_level_summary(5)),
+        ("get_feature_summary (built)", lambda: feature_unlock_manager.get_feature_summary(personality)),
+    ]
+
+    print()
+    print(f"{'Query':28} {'us/call':>10}")
+    print("-" * 40)
+    for label, query in queries:
+        print(f"{label:28} {per_call_ns(query, query_calls) / 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Inference Pool Benchmark
+Measures aggregate generation throughput (tokens/s) for 1-4 concurrent
+chat sessions, with a single model context and with the context pool
+
+Every session sends its own prompt with the response cache disabled, so
+each request really runs on the model. Requires a downloaded model
+(./scripts/download_model.sh).
+
+Usage:
+    python scripts/benchmark_inference_pool.py
+    python scripts/benchmark_inference_pool.py --sessions 4 --tokens 96
+    python scripts/benchmark_inference_pool.py --contexts 2
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+
+from services.inference_scheduler import InferenceLane, InferenceRequest, InferenceScheduler
+from services.llm_service import LLMService
+from utils.config import settings
+
+PROMPTS = [
+    "User: Can you tell me a story about a brave turtle?\n\nAssistant:",
+    "User: Why is the sky blue? Explain it like I'm ten.\n\nAssistant:",
+    "User: What are some fun things to do on a rainy day?\n\nAssistant:",
+    "User: How do volcanoes work?\n\nAssistant:",
+]
+
+
+def load_service(contexts: int) -> LLMService:
+    """Load a service with the given pool size (0 = automatic sizing)"""
+    settings.MODEL_CONTEXTS = contexts
+    service = LLMService()
+    service.scheduler = InferenceScheduler()  # Not shared with the global service
+    service.set_cache_enabled(False)
+    if not service.load_model(blocking=True, use_mmap=settings.MODEL_USE_MMAP):
+        raise SystemExit(f"Could not load model: {service.load_error or service.model_path}")
+    return service
+
+
+def run_sessions(service: LLMService, sessions: int, tokens: int) -> dict:
+    """Generate one reply per session concurrently"""
+    generated = [0] * sessions
+
+    def session(index: int) -> None:
+        text = service.generate(
+            PROMPTS[index % len(PROMPTS)],
+            max_tokens=tokens,
+            temperature=0.7,
+            use_cache=False,
+            request=InferenceRequest(InferenceLane.INTERACTIVE, affinity=index),
+        )
+        generated[index] = len(service.model.tokenize(text.encode("utf-8"), add_bos=False))
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "tokens": sum(generated),
+        "seconds": elapsed,
+        "tokens_per_second": sum(generated) / elapsed if elapsed else 0.0,
+    }
+
+
+def benchmark(label: str, contexts: int, max_sessions: int, tokens: int) -> list:
+    """Throughput for 1..max_sessions concurrent sessions"""
+    service = load_service(contexts)
+    info = service.get_model_info()
+    print(f"\n{label}: {info['contexts']} context(s) x {info['threads_per_context']} threads")
+
+    run_sessions(service, 1, min(tokens, 16))  # Warm up
+    results = []
+    for sessions in range(1, max_sessions + 1):
+        result = run_sessions(service, sessions, tokens)
+        results.append(result)
+        print(f"  {sessions} session(s): {result['tokens']:5d} tokens in "
+              f"{result['seconds']:6.2f}s = {result['tokens_per_second']:6.1f} tok/s")
+
+    service.unload_model()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the model context pool")
+    parser.add_argument("--sessions", type=int, default=4, help="Most concurrent sessions")
+    parser.add_argument("--tokens", type=int, default=64, help="Max tokens per reply")
+    parser.add_argument(
+        "--contexts", type=int, default=0,
+        help="Pool size to compare against one context (0 = automatic sizing)"
+    )
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"Inference pool benchmark - up to {args.sessions} sessions, {args.tokens} tokens each")
+    print("=" * 60)
+
+    single = benchmark("Single context", 1, args.sessions, args.tokens)
+    pooled = benchmark("Context pool", args.contexts, args.sessions, args.tokens)
+
+    print()
+    print(f"{'Sessions':>8} {'single tok/s':>14} {'pool tok/s':>12} {'speedup':>9}")
+    for sessions, (one, pool) in enumerate(zip(single, pooled), start=1):
+        speedup = pool["tokens_per_second"] / one["tokens_per_second"] if one["tokens_per_second"] else 0.0
+        print(f"{sessions:>8} {one['tokens_per_second']:>14.1f} "
+              f"{pool['tokens_per_second']:>12.1f} {speedup:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
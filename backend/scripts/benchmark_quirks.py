@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Quirk Rendering Benchmark
+Times the personality filter stage (ConversationManager._apply_personality_filter)
+with every quirk enabled, against chaining the individual quirk services as
+the filter used to
+
+Usage:
+    python scripts/benchmark_quirks.py
+    python scripts/benchmark_quirks.py --calls 20000
+    python scripts/benchmark_quirks.py --length 4
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from services.conversation_manager import ConversationManager
+from services.emoji_quirk_service import emoji_quirk_service
+from services.fact_quirk_service import fact_quirk_service
+from services.personality_cache import PersonalitySnapshot
+from services.pun_quirk_service import pun_quirk_service
+
+RESPONSES = [
+    "That sounds like a great game! Did you win? I love hearing about your games.",
+    "Homework can be tough. Want to think it through together? I know you can do it!",
+    "Ooh, music is awesome. What song are you listening to? Tell me more!",
+    "I'm sorry you feel sad today. I'm here for you, friend.",
+]
+CONTEXTS = [
+    "I played soccer with my friend at school today",
+    "my math homework is so hard",
+    "I love music and my dog",
+    "I feel sad about the rain",
+]
+
+
+def chained_services(response, personality, context):
+    """The filter as three separate services (before the quirk engine)"""
+    quirks = personality.get_quirks()
+    level_bonus = personality.friendship_level - 1
+    if "shares_facts" in quirks:
+        response = fact_quirk_service.add_fact(
+            response, context=context, probability=min(0.35, 0.20 + level_bonus * 0.02)
+        )
+    if "tells_puns" in quirks:
+        response = pun_quirk_service.add_pun(
+            response, context=context, probability=min(0.40, 0.25 + level_bonus * 0.02)
+        )
+    if "uses_emojis" in quirks:
+        response = emoji_quirk_service.apply_emojis(
+            response, mood=personality.mood, intensity=min(0.7, 0.4 + level_bonus * 0.05)
+        )
+    return response
+
+
+def time_calls(render, responses, calls: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for i in range(calls):
+        render(responses[i % len(responses)], CONTEXTS[i % len(CONTEXTS)], i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the personality filter stage")
+    parser.add_argument("--calls", type=int, default=10000, help="Calls per variant")
+    parser.add_argument("--level", type=int, default=5, help="Friendship level")
+    parser.add_argument(
+        "--length", type=int, default=1,
+        help="Sample replies joined per response (longer replies)"
+    )
+    args = parser.parse_args()
+
+    responses = [
+        " ".join((RESPONSES[i:] + RESPONSES[:i])[:args.length])
+        for i in range(len(RESPONSES))
+    ]
+
+    personality = PersonalitySnapshot(
+        id=1, user_id=1, name="Buddy", humor=0.5, energy=0.6, curiosity=0.5,
+        formality=0.3, friendship_level=args.level, friendship_points=0,
+        total_conversations=0, mood="happy",
+        quirks=("uses_emojis", "tells_puns", "shares_facts"), interests=(),
+        catchphrase="Cool beans!", created_at=None, updated_at=None,
+    )
+    manager = ConversationManager()
+
+    variants = [
+        ("chained services", lambda r, c, i: chained_services(r, personality, c)),
+        ("quirk engine, unseeded",
+         lambda r, c, i: manager._apply_personality_filter(r, personality, c)),
+        ("quirk engine, seeded",
+         lambda r, c, i: manager._apply_personality_filter(r, personality, c, seed=i)),
+    ]
+
+    print("=" * 56)
+    print(f"Personality filter benchmark - {args.calls} calls, level {args.level}, "
+          f"~{sum(map(len, responses)) // len(responses)} chars")
+    print("=" * 56)
+    print(f"{'Variant':28} {'us/call':>10}")
+    print("-" * 40)
+    for label, render in variants:
+        time_calls(render, responses, min(args.calls, 500))  # Warm up
+        print(f"{label:28} {time_calls(render, responses, args.calls):>10.1f}")
+
+    seeded = [
+        manager._apply_personality_filter(responses[0], personality, CONTEXTS[0], seed=42)
+        for _ in range(3)
+    ]
+    print()
+    print(f"Seeded output reproducible: {len(set(seeded)) == 1}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Speculative Decoding Benchmark
+Compares CPU reply latency and tokens/s with prompt-lookup decoding on and
+off, for prompts built by ConversationManager._build_prompt
+
+Replies are greedy (temperature 0), so both modes produce the same text
+and only the speed differs. Requires a downloaded model
+(./scripts/download_model.sh).
+
+Usage:
+    python scripts/benchmark_speculative.py
+    python scripts/benchmark_speculative.py --rounds 5 --tokens 96
+    python scripts/benchmark_speculative.py --draft-tokens 6 --ngram 3
+"""
+
+import sys
+import statistics
+import time
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import json
+
+from models.conversation import Message
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.memory import UserProfile
+from models.personality import BotPersonality
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from services.conversation_manager import ConversationManager
+from services.inference_scheduler import InferenceScheduler
+from services.llm_service import LLMService
+from utils.config import settings
+
+# (recent messages, memories as (category, key, value), user message)
+CHATS = [
+    (
+        [("user", "My dog Biscuit learned a new trick!"), ("assistant", "Wow, what trick did Biscuit learn?")],
+        [("favorite", "favorite_animal", "dogs"), ("person", "pet_biscuit", "Biscuit")],
+        "Biscuit can roll over now! Do you think Biscuit can learn to play dead too?",
+    ),
+    (
+        [("user", "I have a math test on Friday"), ("assistant", "You've got this! What's the test about?")],
+        [("goal", "goal_math", "get an A in math"), ("favorite", "favorite_subject", "science")],
+        "It's about fractions. How do I add fractions with different denominators?",
+    ),
+    (
+        [("user", "Maya and I had a fight at recess"), ("assistant", "I'm sorry. What happened with Maya?")],
+        [("person", "friend_maya", "Maya")],
+        "Maya said I cheated at tag but I didn't cheat. What should I say to Maya tomorrow?",
+    ),
+    (
+        [],
+        [("favorite", "favorite_game", "Minecraft"), ("achievement", "achievement_castle", "built a castle")],
+        "What should I build next in Minecraft after my castle?",
+    ),
+]
+
+
+def build_prompts() -> list:
+    """Representative chat prompts from the conversation manager"""
+    personality = BotPersonality(
+        user_id=1, name="Buddy", humor=0.6, energy=0.7, curiosity=0.8, formality=0.3,
+        mood="happy", friendship_level=4, total_conversations=12,
+        quirks=json.dumps(["uses_emojis", "tells_puns"]),
+        interests=json.dumps(["animals", "space", "games"]),
+    )
+    manager = ConversationManager()
+
+    prompts = []
+    for history, memories, user_message in CHATS:
+        context = {
+            "recent_messages": [Message(role=role, content=content) for role, content in history],
+            "relevant_memories": [
+                UserProfile(user_id=1, category=category, key=key, value=value)
+                for category, key, value in memories
+            ],
+            "advice_request": {},
+        }
+        prompts.append(manager._build_prompt(context, user_message, personality))
+    return prompts
+
+
+def benchmark_mode(mode: str, prompts: list, rounds: int, tokens: int) -> dict:
+    """Load the model with a speculative mode and time greedy replies"""
+    settings.MODEL_SPECULATIVE_DECODING = mode
+    settings.MODEL_CONTEXTS = 1
+    service = LLMService(use_worker=False)
+    service.scheduler = InferenceScheduler()  # Not shared with the global service
+    service.set_cache_enabled(False)
+    if not service.load_model(blocking=True, use_mmap=settings.MODEL_USE_MMAP):
+        raise SystemExit(f"Could not load model: {service.load_error or service.model_path}")
+
+    service.generate(prompts[0], max_tokens=8, temperature=0.0)  # Warm up
+    service._decoding_stats.update(generations=0, tokens=0, seconds=0.0, drafted=0, accepted=0)
+
+    latencies = []
+    replies = []
+    for _ in range(rounds):
+        for prompt in prompts:
+            start = time.perf_counter()
+            replies.append(service.generate(prompt, max_tokens=tokens, temperature=0.0))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    stats = service.get_decoding_stats()
+    service.unload_model()
+    return {
+        "median_ms": statistics.median(latencies),
+        "p95_ms": sorted(latencies)[int(len(latencies) * 0.95) - 1],
+        "tokens_per_second": stats["tokens_per_second"],
+        "acceptance_rate": stats["acceptance_rate"],
+        "replies": replies,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt-lookup speculative decoding")
+    parser.add_argument("--rounds", type=int, default=3, help="Times each prompt is answered")
+    parser.add_argument("--tokens", type=int, default=64, help="Max tokens per reply")
+    parser.add_argument("--draft-tokens", type=int, default=settings.MODEL_DRAFT_TOKENS,
+                        help="Tokens drafted per step")
+    parser.add_argument("--ngram", type=int, default=settings.MODEL_DRAFT_NGRAM_SIZE,
+                        help="Longest prompt n-gram matched")
+    args = parser.parse_args()
+
+    settings.MODEL_DRAFT_TOKENS = args.draft_tokens
+    settings.MODEL_DRAFT_NGRAM_SIZE = args.ngram
+    prompts = build_prompts()
+
+    print("=" * 64)
+    print(f"Speculative decoding benchmark - {len(prompts)} prompts x {args.rounds} rounds, "
+          f"{args.tokens} tokens max")
+    print(f"Prompt lookup: {args.draft_tokens} draft tokens, n-grams up to {args.ngram}")
+    print("=" * 64)
+
+    results = {mode: benchmark_mode(mode, prompts, args.rounds, args.tokens)
+               for mode in ("off", "prompt_lookup")}
+
+    print(f"{'Mode':15} {'median ms':>10} {'p95 ms':>10} {'tok/s':>8} {'accepted':>9}")
+    print("-" * 56)
+    for mode, result in results.items():
+        rate = result["acceptance_rate"]
+        print(f"{mode:15} {result['median_ms']:>10.0f} {result['p95_ms']:>10.0f} "
+              f"{result['tokens_per_second']:>8.1f} {f'{rate:.0%}' if rate is not None else '-':>9}")
+
+    off, lookup = results["off"], results["prompt_lookup"]
+    print()
+    print(f"Median speedup: {off['median_ms'] / lookup['median_ms']:.2f}x")
+    print(f"Same replies: {off['replies'] == lookup['replies']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+SQLite Profile Benchmark
+Compares chat-turn write latency across the SQLite tuning profiles
+
+Each simulated turn performs the same commits as a real chat turn:
+store user message, upsert a memory, award friendship points, store the
+assistant reply and update the conversation message count.
+
+Usage:
+    python scripts/benchmark_sqlite_profiles.py
+    python scripts/benchmark_sqlite_profiles.py --turns 500 --profiles default performance
+"""
+
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, SQLITE_PROFILES, create_db_engine, get_sqlite_pragmas
+from models.user import User
+from models.personality import BotPersonality
+from models.conversation import Conversation, Message
+from models.memory import UserProfile
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+
+
+def run_turn(db, conversation: Conversation, personality: BotPersonality, turn: int) -> None:
+    """Perform the writes of one chat turn, one commit each"""
+    db.add(Message(conversation_id=conversation.id, role="user",
+                   content=f"My favorite color is blue {turn}", timestamp=datetime.now()))
+    db.commit()
+
+    memory = (
+        db.query(UserProfile)
+        .filter(UserProfile.user_id == 1, UserProfile.key == "favorite_color")
+        .first()
+    )
+    if memory:
+        memory.mention_count += 1
+        memory.last_mentioned = datetime.now()
+    else:
+        db.add(UserProfile(user_id=1, category="favorite", key="favorite_color", value="blue"))
+    db.commit()
+
+    personality.friendship_points += 1
+    db.commit()
+
+    db.add(Message(conversation_id=conversation.id, role="assistant",
+                   content=f"Blue is a great color! {turn}", timestamp=datetime.now()))
+    db.commit()
+
+    conversation.message_count = (conversation.message_count or 0) + 2
+    db.commit()
+
+
+def benchmark_profile(profile: str, turns: int, warmup: int) -> dict:
+    """Run turns against a fresh database file using one profile"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_engine = create_db_engine(f"sqlite:///{tmp_dir}/benchmark.db", profile=profile)
+        Base.metadata.create_all(db_engine)
+        db = sessionmaker(bind=db_engine, autoflush=False)()
+
+        db.add(User(id=1, name="Benchmark", created_at=datetime.now()))
+        personality = BotPersonality(user_id=1)
+        conversation = Conversation(user_id=1, timestamp=datetime.now(), message_count=0)
+        db.add_all([personality, conversation])
+        db.commit()
+
+        for turn in range(warmup):
+            run_turn(db, conversation, personality, turn)
+
+        timings = []
+        for turn in range(turns):
+            start = time.perf_counter()
+            run_turn(db, conversation, personality, turn)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        db.close()
+        db_engine.dispose()
+
+    timings.sort()
+    return {
+        "profile": profile,
+        "mean_ms": sum(timings) / len(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "max_ms": timings[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLite tuning profiles")
+    parser.add_argument("--turns", type=int, default=200, help="Timed turns per profile")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed warm-up turns")
+    parser.add_argument(
+        "--profiles", nargs="+", default=list(SQLITE_PROFILES), choices=list(SQLITE_PROFILES)
+    )
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"SQLite profile benchmark - {args.turns} turns, 5 commits per turn")
+    print("=" * 70)
+
+    for profile in args.profiles:
+        print(f"{profile:12} {get_sqlite_pragmas(profile)}")
+    print()
+
+    print(f"{'Profile':12} {'Mean':>10} {'p50':>10} {'p95':>10} {'Max':>10}")
+    print("-" * 56)
+    for profile in args.profiles:
+        result = benchmark_profile(profile, args.turns, args.warmup)
+        print(
+            f"{result['profile']:12} {result['mean_ms']:>8.2f}ms {result['p50_ms']:>8.2f}ms "
+            f"{result['p95_ms']:>8.2f}ms {result['max_ms']:>8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
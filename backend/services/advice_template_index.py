@@ -0,0 +1,439 @@
+"""
+Advice Template Index
+In-process index of the advice templates, with buffered usage counts
+"""
+
+import logging
+import threading
+import weakref
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from database.cache_invalidation import CommitInvalidator, EngineCache
+from models.safety import AdviceTemplate
+from utils.config import settings
+
+logger = logging.getLogger("chatbot.advice_template_index")
+
+# Session.info key flagging that the transaction wrote advice templates
+PENDING_KEY = "advice_template_index_pending"
+
+# Cache key of an engine's category indexes (all templates load together)
+INDEX_KEY = "templates"
+
+
+@dataclass(slots=True, eq=False)
+class AdviceTemplateSnapshot:
+    """
+    Read-only copy of an AdviceTemplate row
+
+    Keywords and context tags are parsed once when the snapshot is taken.
+    Exposes the same read API as AdviceTemplate (attributes,
+    get_keywords(), get_context_tags(), format_advice(), to_dict()), so
+    selection and personalization code can take either. usage_count
+    includes uses not yet flushed to the database and is only changed by
+    the index.
+    """
+
+    id: int
+    category: str
+    subcategory: Optional[str]
+    keywords: Tuple[str, ...]
+    template: str
+    min_friendship_level: int
+    max_friendship_level: Optional[int]
+    min_age: int
+    max_age: int
+    expert_reviewed: bool
+    usage_count: int
+    rating: Optional[int]
+    tone: Optional[str]
+    response_style: Optional[str]
+    context_tags: Tuple[str, ...]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, template: AdviceTemplate, pending_uses: int = 0) -> "AdviceTemplateSnapshot":
+        """Take a snapshot of an AdviceTemplate"""
+        return cls(
+            id=template.id,
+            category=template.category,
+            subcategory=template.subcategory,
+            keywords=tuple(template.get_keywords()),
+            template=template.template,
+            min_friendship_level=template.min_friendship_level,
+            max_friendship_level=template.max_friendship_level,
+            min_age=template.min_age,
+            max_age=template.max_age,
+            expert_reviewed=bool(template.expert_reviewed),
+            usage_count=(template.usage_count or 0) + pending_uses,
+            rating=template.rating,
+            tone=template.tone,
+            response_style=template.response_style,
+            context_tags=tuple(template.get_context_tags()),
+            created_at=template.created_at,
+            updated_at=template.updated_at,
+        )
+
+    def get_keywords(self) -> List[str]:
+        """Keywords as a list"""
+        return list(self.keywords)
+
+    def get_context_tags(self) -> List[str]:
+        """Context tags as a list"""
+        return list(self.context_tags)
+
+    def format_advice(self, **kwargs) -> str:
+        """Format the template with provided variables (as-is if one is missing)"""
+        try:
+            return self.template.format(**kwargs)
+        except KeyError:
+            return self.template
+
+    def is_appropriate_for_age(self, age: int) -> bool:
+        """Check if template is appropriate for given age"""
+        return self.min_age <= age <= self.max_age
+
+    def is_available_at_friendship_level(self, friendship_level: int) -> bool:
+        """Check if template is available at given friendship level"""
+        if self.max_friendship_level:
+            return self.min_friendship_level <= friendship_level <= self.max_friendship_level
+        return self.min_friendship_level <= friendship_level
+
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for API responses (same shape as AdviceTemplate.to_dict)"""
+        return {
+            "id": self.id,
+            "category": self.category,
+            "subcategory": self.subcategory,
+            "keywords": self.get_keywords(),
+            "template": self.template,
+            "min_friendship_level": self.min_friendship_level,
+            "max_friendship_level": self.max_friendship_level,
+            "min_age": self.min_age,
+            "max_age": self.max_age,
+            "expert_reviewed": self.expert_reviewed,
+            "usage_count": self.usage_count,
+            "rating": self.rating,
+            "tone": self.tone,
+            "response_style": self.response_style,
+            "context_tags": self.get_context_tags(),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class _CategoryIndex:
+    """
+    Templates of one category, bucketed by friendship-level and age range
+
+    Every template's min level and max level + 1 split the levels into
+    ranges within which the same templates are available (likewise for
+    ages). A lookup maps the level and age to their ranges with a bisect,
+    and the filtered list is built once per (subcategory, level range,
+    age range, tone) and then reused.
+    """
+
+    def __init__(self, templates: List[AdviceTemplateSnapshot]):
+        """Bucket the templates of a category (in ID order)"""
+        self.templates = templates
+        self.level_bounds = sorted(
+            {t.min_friendship_level for t in templates}
+            | {t.max_friendship_level + 1 for t in templates if t.max_friendship_level}
+        )
+        self.age_bounds = sorted(
+            {t.min_age for t in templates} | {t.max_age + 1 for t in templates}
+        )
+        self._lookups: Dict[Tuple, Tuple[AdviceTemplateSnapshot, ...]] = {}
+
+    def get(
+        self,
+        friendship_level: int,
+        age: Optional[int],
+        subcategory: Optional[str],
+        tone: Optional[str]
+    ) -> Tuple[AdviceTemplateSnapshot, ...]:
+        """Templates available at a level and age, optionally by subcategory and tone"""
+        key = (
+            subcategory or None,
+            bisect_right(self.level_bounds, friendship_level),
+            bisect_right(self.age_bounds, age) if age else None,
+            tone or None,
+        )
+        templates = self._lookups.get(key)
+        if templates is None:
+            templates = tuple(
+                t for t in self.templates
+                if t.is_available_at_friendship_level(friendship_level)
+                and (not subcategory or t.subcategory == subcategory)
+                and (not age or t.is_appropriate_for_age(age))
+                and (not tone or t.tone == tone or t.tone is None)
+            )
+            self._lookups[key] = templates
+        return templates
+
+
+class AdviceTemplateIndex:
+    """
+    Advice Template Index - the advice templates, loaded once per database
+
+    The templates are static seed data, so instead of querying SQLite on
+    every advice request they are loaded once into per-category indexes
+    with keywords and context tags already parsed. A session hook records
+    every AdviceTemplate that is inserted, updated or deleted, and the
+    commit drops the index so the next lookup reloads it.
+
+    Template uses are counted in memory (so most_used selection sees them
+    right away) and written to the database by a background thread every
+    ADVICE_USAGE_FLUSH_SECONDS, in one UPDATE per used template, instead
+    of one commit per advice request. stop() writes the remaining counts.
+    """
+
+    def __init__(self, flush_interval_seconds: Optional[int] = None):
+        """
+        Initialize the index
+
+        Args:
+            flush_interval_seconds: How often to write usage counts
+                (defaults to ADVICE_USAGE_FLUSH_SECONDS)
+        """
+        self.flush_interval = flush_interval_seconds or settings.ADVICE_USAGE_FLUSH_SECONDS
+        # engine -> INDEX_KEY -> category -> _CategoryIndex
+        self._indexes = EngineCache()
+        # engine -> template_id -> uses not yet written
+        self._pending_uses = weakref.WeakKeyDictionary()
+        # engine -> template_id -> uses being written by a flush
+        self._flushing_uses = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.loads = 0
+        self.uses_recorded = 0
+        self.uses_flushed = 0
+
+    def get_templates(
+        self,
+        db: Session,
+        category: str,
+        friendship_level: int = 1,
+        age: Optional[int] = None,
+        subcategory: Optional[str] = None,
+        tone: Optional[str] = None
+    ) -> List[AdviceTemplateSnapshot]:
+        """
+        Get the templates of a category available at a friendship level and age
+
+        Same filtering as AdviceTemplate.get_by_category, plus templates of
+        the given tone or without one when a tone is specified.
+
+        Args:
+            db: Database session
+            category: Advice category
+            friendship_level: Current friendship level
+            age: User's age (optional, filters by age appropriateness)
+            subcategory: Optional subcategory filter
+            tone: Optional tone filter
+
+        Returns:
+            List of AdviceTemplateSnapshot objects in ID order
+        """
+        category_index = self._get_indexes(db).get(category)
+        if category_index is None:
+            return []
+        return list(category_index.get(friendship_level, age, subcategory, tone))
+
+    def record_use(self, template: AdviceTemplateSnapshot, db: Session) -> None:
+        """
+        Count one use of a template (written to the database on the next flush)
+
+        Args:
+            template: Template that was used
+            db: Database session the template was read with
+        """
+        engine = db.get_bind()
+        with self._lock:
+            pending = self._pending_uses.setdefault(engine, {})
+            pending[template.id] = pending.get(template.id, 0) + 1
+            template.usage_count += 1
+            self.uses_recorded += 1
+
+    def flush_usage(self) -> int:
+        """
+        Write buffered usage counts to the database
+
+        Returns:
+            Number of uses written
+        """
+        written = 0
+        with self._flush_lock:
+            with self._lock:
+                batches = [(engine, uses) for engine, uses in self._pending_uses.items() if uses]
+                for engine, uses in batches:
+                    self._pending_uses[engine] = {}
+                    self._flushing_uses[engine] = uses
+
+            for engine, uses in batches:
+                try:
+                    with engine.begin() as connection:
+                        for template_id, count in uses.items():
+                            connection.execute(
+                                update(AdviceTemplate)
+                                .where(AdviceTemplate.id == template_id)
+                                .values(usage_count=AdviceTemplate.usage_count + count)
+                            )
+                    written += sum(uses.values())
+                except Exception as e:
+                    logger.error(f"Failed to write template usage counts: {e}", exc_info=True)
+                    with self._lock:  # Keep them for the next flush
+                        pending = self._pending_uses.setdefault(engine, {})
+                        for template_id, count in uses.items():
+                            pending[template_id] = pending.get(template_id, 0) + count
+                finally:
+                    with self._lock:
+                        self._flushing_uses.pop(engine, None)
+
+        with self._lock:
+            self.uses_flushed += written
+        if written:
+            logger.debug(f"Wrote {written} template uses")
+        return written
+
+    def invalidate(self, engine=None) -> None:
+        """
+        Drop loaded indexes (the next lookup reloads them)
+
+        Args:
+            engine: Engine whose index to drop (all engines if None)
+        """
+        self._indexes.invalidate(INDEX_KEY, engine)
+
+    def start(self) -> None:
+        """Start the background usage flusher"""
+        if self._running:
+            logger.warning("Advice template usage flusher already running")
+            return
+
+        self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+        logger.info(f"Advice template usage flusher started (interval: {self.flush_interval}s)")
+
+    def stop(self) -> None:
+        """Stop the background flusher and write the remaining usage counts"""
+        if self._running:
+            self._running = False
+            self._stop_event.set()
+            if self._thread:
+                self._thread.join(timeout=5)
+        self.flush_usage()
+        logger.info("Advice template usage flusher stopped")
+
+    def get_stats(self) -> Dict:
+        """Get index statistics"""
+        with self._lock:
+            return {
+                "indexed_templates": sum(
+                    len(category_index.templates)
+                    for indexes in self._indexes.values()
+                    for category_index in indexes.values()
+                ),
+                "loads": self.loads,
+                "uses_recorded": self.uses_recorded,
+                "uses_flushed": self.uses_flushed,
+                "uses_pending": sum(
+                    sum(uses.values()) for uses in self._pending_uses.values()
+                ),
+            }
+
+    def _flush_loop(self) -> None:
+        """Background loop that periodically writes usage counts"""
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush_usage()
+            except Exception as e:
+                logger.error(f"Error flushing template usage: {e}", exc_info=True)
+
+    def _get_indexes(self, db: Session) -> Dict[str, _CategoryIndex]:
+        """Get the category indexes for a session's database, loading them if needed"""
+        engine = db.get_bind()
+        indexes, generation = self._indexes.lookup(engine, INDEX_KEY)
+        if indexes is not None:
+            return indexes
+
+        # Serialized with flushes so every use is counted exactly once
+        with self._flush_lock:
+            with self._lock:
+                unwritten = dict(self._flushing_uses.get(engine, {}))
+                for template_id, count in self._pending_uses.get(engine, {}).items():
+                    unwritten[template_id] = unwritten.get(template_id, 0) + count
+
+            by_category: Dict[str, List[AdviceTemplateSnapshot]] = {}
+            for template in db.query(AdviceTemplate).order_by(AdviceTemplate.id).all():
+                by_category.setdefault(template.category, []).append(
+                    AdviceTemplateSnapshot.from_model(template, unwritten.get(template.id, 0))
+                )
+            indexes = {
+                category: _CategoryIndex(templates) for category, templates in by_category.items()
+            }
+
+            # Never cache templates this session has not committed
+            if template_writes.uncommitted(db, INDEX_KEY):
+                return indexes
+
+            with self._lock:
+                self.loads += 1
+            self._indexes.store(engine, INDEX_KEY, indexes, generation)
+
+        logger.info(f"Indexed {sum(len(i.templates) for i in indexes.values())} advice templates")
+        return indexes
+
+
+# Global instance
+advice_template_index = AdviceTemplateIndex()
+
+
+def _written_templates(session: Session) -> Set[str]:
+    """INDEX_KEY if the session inserts, updates or deletes advice templates"""
+    if any(
+        isinstance(obj, AdviceTemplate)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        return {INDEX_KEY}
+    return set()
+
+
+def _invalidate_templates(keys: Set[str], engine) -> None:
+    """Drop the index of a database whose templates a committed transaction changed"""
+    advice_template_index.invalidate(engine)
+
+
+template_writes = CommitInvalidator(PENDING_KEY, _written_templates, _invalidate_templates)
+
+
+# Convenience functions
+def get_indexed_templates(
+    db: Session,
+    category: str,
+    friendship_level: int = 1,
+    age: Optional[int] = None,
+    subcategory: Optional[str] = None,
+    tone: Optional[str] = None
+) -> List[AdviceTemplateSnapshot]:
+    """Get indexed advice templates"""
+    return advice_template_index.get_templates(
+        db, category, friendship_level, age, subcategory, tone
+    )
+
+
+def flush_template_usage() -> int:
+    """Write buffered template usage counts"""
+    return advice_template_index.flush_usage()
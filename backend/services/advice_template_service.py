@@ -13,6 +13,7 @@ import random
 from sqlalchemy.orm import Session
 from models.safety import AdviceTemplate
 from models.personality import BotPersonality
+from services.advice_template_index import AdviceTemplateSnapshot, advice_template_index
 from services.template_personalization_service import template_personalization_service
 
 logger = logging.getLogger("chatbot.advice_template_service")
@@ -30,6 +31,10 @@ class AdviceTemplateService:
     - Track template usage
     - Support for expert-reviewed templates
 
+    Templates are read from the in-memory advice template index rather
+    than queried per request, and usage counts are buffered there and
+    written periodically.
+
     Selection Strategies:
     - random: Random selection from available templates
     - most_used: Select most frequently used template
@@ -52,7 +57,7 @@ class AdviceTemplateService:
         subcategory: Optional[str] = None,
         tone: Optional[str] = None,
         strategy: str = "expert_reviewed"
-    ) -> Optional[AdviceTemplate]:
+    ) -> Optional[AdviceTemplateSnapshot]:
         """
         Get the best advice template for given criteria
 
@@ -66,7 +71,7 @@ class AdviceTemplateService:
             strategy: Selection strategy (random, most_used, expert_reviewed, tone_match)
 
         Returns:
-            Selected AdviceTemplate or None if no templates found
+            Selected AdviceTemplateSnapshot or None if no templates found
         """
         # Get available templates
         templates = self._get_available_templates(
@@ -160,9 +165,8 @@ class AdviceTemplateService:
             # Fall back to basic formatting
             formatted = template.format_advice(**format_kwargs)
 
-        # Increment usage count
-        template.increment_usage()
-        db.commit()
+        # Count the use (written to the database by the index's next flush)
+        advice_template_index.record_use(template, db)
 
         return formatted
 
@@ -173,7 +177,7 @@ class AdviceTemplateService:
         friendship_level: int,
         age: Optional[int] = None,
         limit: int = 3
-    ) -> List[AdviceTemplate]:
+    ) -> List[AdviceTemplateSnapshot]:
         """
         Get multiple advice template options for variety
 
@@ -185,7 +189,7 @@ class AdviceTemplateService:
             limit: Maximum number of templates to return
 
         Returns:
-            List of AdviceTemplate objects
+            List of AdviceTemplateSnapshot objects
         """
         templates = self._get_available_templates(
             db=db,
@@ -220,7 +224,7 @@ class AdviceTemplateService:
         age: Optional[int] = None,
         subcategory: Optional[str] = None,
         tone: Optional[str] = None
-    ) -> List[AdviceTemplate]:
+    ) -> List[AdviceTemplateSnapshot]:
         """
         Get all available templates matching criteria
 
@@ -233,23 +237,17 @@ class AdviceTemplateService:
             tone: Optional tone filter
 
         Returns:
-            List of available AdviceTemplate objects
+            List of available AdviceTemplateSnapshot objects
         """
-        # Get templates by category
-        templates = AdviceTemplate.get_by_category(
+        return advice_template_index.get_templates(
             db=db,
             category=category,
             friendship_level=friendship_level,
             age=age,
-            subcategory=subcategory
+            subcategory=subcategory,
+            tone=tone
         )
 
-        # Additional tone filtering if specified
-        if tone:
-            templates = [t for t in templates if t.tone == tone or t.tone is None]
-
-        return templates
-
     def _select_template(
         self,
         templates: List[AdviceTemplate],
@@ -404,7 +402,7 @@ def get_advice_template(
     subcategory: Optional[str] = None,
     tone: Optional[str] = None,
     strategy: str = "expert_reviewed"
-) -> Optional[AdviceTemplate]:
+) -> Optional[AdviceTemplateSnapshot]:
     """Get advice template"""
     return advice_template_service.get_advice_template(
         db, category, friendship_level, age, subcategory, tone, strategy
@@ -0,0 +1,249 @@
+"""
+Conversation Analyzer Service
+Computes conversation features in one pass for every end-of-conversation consumer
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models.conversation import Message
+
+logger = logging.getLogger("chatbot.conversation_analyzer")
+
+# Keyword categories. Each is counted once per user message that contains
+# any of its keywords as a substring (same rule the drift calculator used).
+KEYWORD_CATEGORIES = {
+    "laughter": ["lol", "haha", "hehe", "funny", "😂", "hilarious"],
+    "thanks": ["thank", "thanks", "thx", "ty", "appreciate"],
+    "feelings": [
+        "feel", "feeling", "sad", "happy", "excited", "worried",
+        "anxious", "scared", "nervous", "proud", "angry", "upset"
+    ],
+    "casual_language": ["yeah", "yep", "nah", "nope", "lol", "omg", "btw", "tbh", "idk"],
+    "formal_language": ["however", "therefore", "furthermore", "consequently", "regarding"],
+    "deep_topics": [
+        "life", "future", "dream", "goal", "worry", "fear",
+        "meaning", "purpose", "philosophy", "death", "love"
+    ],
+    # Casual words used by the personality trait metrics
+    "casual_words": ["yeah", "cool", "awesome", "lol", "nice"],
+}
+
+
+class KeywordMatcher:
+    """
+    One compiled matcher for many keyword categories
+
+    A zero-width lookahead reports the longest keyword starting at every
+    position, so overlapping keywords are all seen in one scan. The
+    keywords are compiled as a trie (shared prefixes factored out), so
+    each position only tries the branches for its first character.
+    Each keyword also carries the categories of every keyword that is a
+    prefix of it, since a shorter prefix match at the same position is
+    hidden by the longer one. The result equals checking
+    `keyword in text` for every keyword.
+
+    When no keyword contains whitespace, every match lies inside one
+    whitespace-separated token, so each distinct token is scanned once
+    and its categories are remembered (words repeat across messages).
+    """
+
+    TOKEN_CACHE_SIZE = 20000  # Cached tokens before the cache is reset
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        """
+        Compile the matcher
+
+        Args:
+            categories: Mapping of category name to keywords (lowercase)
+        """
+        keyword_categories: Dict[str, set] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword_categories.setdefault(keyword, set()).add(category)
+
+        self._categories_for = {
+            keyword: frozenset().union(
+                *(cats for other, cats in keyword_categories.items() if keyword.startswith(other))
+            )
+            for keyword in keyword_categories
+        }
+
+        self._pattern = re.compile(f"(?=({_trie_pattern(keyword_categories)}))")
+        self._by_token = all(
+            keyword.split() == [keyword] for keyword in keyword_categories
+        )
+        self._token_cache: Dict[str, frozenset] = {}
+
+    def categories(self, text: str) -> set:
+        """
+        Get the categories with at least one keyword in the text
+
+        Args:
+            text: Lowercased text
+
+        Returns:
+            Set of matching category names
+        """
+        if not self._by_token:
+            return self._scan(text)
+
+        cache = self._token_cache
+        tokens = text.split()
+        try:
+            return set().union(*[cache[token] for token in tokens])
+        except KeyError:
+            pass
+
+        # Scan the tokens not seen yet. The cache is shared between threads
+        # without a lock, so the result only uses values read or computed here
+        # (another thread may clear the cache at any time).
+        if len(cache) >= self.TOKEN_CACHE_SIZE:
+            cache.clear()
+        found = set()
+        for token in tokens:
+            token_categories = cache.get(token)
+            if token_categories is None:
+                token_categories = cache[token] = frozenset(self._scan(token))
+            found |= token_categories
+        return found
+
+    def _scan(self, text: str) -> set:
+        """Run the compiled pattern over a text"""
+        found = set()
+        for match in self._pattern.finditer(text):
+            found |= self._categories_for[match.group(1)]
+        return found
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """
+    Build a regex matching the longest of the keywords at a position
+
+    Args:
+        keywords: Keywords to match
+
+    Returns:
+        Regex source with common prefixes factored into a trie
+    """
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}  # End of a keyword
+
+    def build(node: Dict) -> str:
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        is_keyword = "" in node
+        if len(branches) == 1 and not is_keyword:
+            return branches[0]
+        # Greedy optional group: try longer keywords before ending here
+        return f"(?:{'|'.join(branches)}){'?' if is_keyword else ''}"
+
+    return build(trie)
+
+
+class ConversationAnalyzer:
+    """
+    Conversation Analyzer - one feature vector per ended conversation
+
+    Streams a conversation's messages once (role, content and flag columns
+    only) and computes every count the end-of-conversation consumers need:
+    personality drift, trait metrics and summary queueing.
+    """
+
+    SHORT_MESSAGE_THRESHOLD = 10  # characters
+    BATCH_SIZE = 200  # rows fetched per round trip
+
+    def __init__(self):
+        """Initialize the analyzer"""
+        self.matcher = KeywordMatcher(KEYWORD_CATEGORIES)
+
+    def analyze(self, conversation_id: int, db: Session) -> Dict:
+        """
+        Analyze a conversation from the database
+
+        Args:
+            conversation_id: Conversation ID
+            db: Database session
+
+        Returns:
+            Feature dictionary (see analyze_messages)
+        """
+        rows = (
+            db.query(Message.role, Message.content, Message.flagged)
+            .filter(Message.conversation_id == conversation_id)
+            .yield_per(self.BATCH_SIZE)
+        )
+        return self.analyze_messages(rows)
+
+    def analyze_messages(self, messages: Iterable[Tuple[str, str, Optional[bool]]]) -> Dict:
+        """
+        Analyze (role, content, flagged) tuples in one pass
+
+        Args:
+            messages: Iterable of (role, content, flagged)
+
+        Returns:
+            Dictionary with message counts, user message length stats,
+            question/short message counts, flagged count and one
+            "<category>_count" per keyword category (user messages only)
+        """
+        features = {
+            "message_count": 0,
+            "user_message_count": 0,
+            "flagged_count": 0,
+            "questions_count": 0,
+            "short_messages_count": 0,
+            "total_user_characters": 0,
+            "avg_message_length": 0,
+        }
+        for category in KEYWORD_CATEGORIES:
+            features[f"{category}_count"] = 0
+
+        for role, content, flagged in messages:
+            features["message_count"] += 1
+            if flagged:
+                features["flagged_count"] += 1
+
+            if role != "user":
+                continue
+
+            content = content or ""
+            features["user_message_count"] += 1
+            features["total_user_characters"] += len(content)
+
+            if "?" in content:
+                features["questions_count"] += 1
+
+            if len(content.strip()) < self.SHORT_MESSAGE_THRESHOLD:
+                features["short_messages_count"] += 1
+
+            for category in self.matcher.categories(content.lower()):
+                features[f"{category}_count"] += 1
+
+        if features["user_message_count"]:
+            features["avg_message_length"] = (
+                features["total_user_characters"] / features["user_message_count"]
+            )
+
+        return features
+
+
+# Global instance
+conversation_analyzer = ConversationAnalyzer()
+
+
+# Convenience function
+def analyze_conversation(conversation_id: int, db: Session) -> Dict:
+    """Analyze a conversation in one pass"""
+    return conversation_analyzer.analyze(conversation_id, db)
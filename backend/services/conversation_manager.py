@@ -5,26 +5,32 @@ Orchestrates the conversation flow and message processing
 
 from typing import Dict, Optional, List
 import logging
+import time
 from datetime import datetime, timedelta
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from database.database import commit_or_stage, unit_of_work
 from models.user import User
 from models.personality import BotPersonality
 from models.conversation import Conversation, Message
+from models.safety import SafetyFlag
 
+from services.inference_scheduler import InferenceCancelled, InferenceLane, InferenceRequest
 from services.llm_service import llm_service
 from services.safety_filter import safety_filter
 from services.memory_manager import memory_manager
 from services.personality_manager import personality_manager
 from services.conversation_tracker import conversation_tracker
+from services.conversation_analyzer import conversation_analyzer
 from services.feature_gates import can_use_catchphrase, apply_feature_modifiers
 from services.personality_drift_calculator import personality_drift_calculator
-from services.emoji_quirk_service import emoji_quirk_service
-from services.pun_quirk_service import pun_quirk_service
-from services.fact_quirk_service import fact_quirk_service
+from services.quirk_engine import quirk_engine, quirk_seed
 from services.advice_category_detector import advice_category_detector
-from services.conversation_summary_service import conversation_summary_service
+from services.summary_queue import summary_queue, PRIORITY_FLAGGED, PRIORITY_NORMAL
+from services.notification_pipeline import notification_pipeline
 from utils.config import settings
+from utils.metrics import record_span, span, trace
 
 logger = logging.getLogger("chatbot.conversation_manager")
 
@@ -45,7 +51,6 @@ class ConversationManager:
 
     def __init__(self):
         self.current_conversation_id: Optional[int] = None
-        self.message_count = 0
         self.conversation_start_time: Optional[datetime] = None
 
     def start_conversation(self, user_id: int, db: Session) -> Dict:
@@ -84,7 +89,6 @@ class ConversationManager:
         db.refresh(conversation)
 
         self.current_conversation_id = conversation.id
-        self.message_count = 0
         self.conversation_start_time = datetime.now()
 
         # Update user's last active
@@ -112,7 +116,12 @@ class ConversationManager:
         }
 
     def process_message(
-        self, user_message: str, conversation_id: int, user_id: int, db: Session
+        self,
+        user_message: str,
+        conversation_id: int,
+        user_id: int,
+        db: Session,
+        request: Optional[InferenceRequest] = None,
     ) -> Dict:
         """
         Process a user message and generate a response
@@ -122,38 +131,80 @@ class ConversationManager:
             conversation_id: Current conversation ID
             user_id: User ID
             db: Database session
+            request: Ticket for the reply generation, cancelled when the client
+                goes away (defaults to one with MODEL_REPLY_DEADLINE_SECONDS)
 
         Returns:
-            Dictionary with response and metadata
+            Dictionary with response and metadata (with per-stage timings
+            under "timings_ms" when DEBUG is on)
+
+        Raises:
+            InferenceCancelled: If the request was cancelled (nothing is stored)
         """
-        # 1. Safety check
-        safety_result = safety_filter.check_message(user_message, user_id=user_id)
+        # Every stage is timed into the stage latency histograms (/api/metrics)
+        with trace() as turn_trace:
+            with span("total"):
+                result = self._process_message(user_message, conversation_id, user_id, db, request)
 
-        if safety_result["severity"] == "critical":
-            # Get personality to update mood
-            personality = (
-                db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
+        if settings.DEBUG:
+            result["metadata"]["timings_ms"] = turn_trace.as_ms()
+        return result
+
+    def _process_message(
+        self,
+        user_message: str,
+        conversation_id: int,
+        user_id: int,
+        db: Session,
+        request: Optional[InferenceRequest],
+    ) -> Dict:
+        """Run the stages of process_message, each in its own span"""
+        if request is None:
+            request = InferenceRequest(
+                InferenceLane.INTERACTIVE,
+                affinity=user_id,
+                deadline_seconds=settings.MODEL_REPLY_DEADLINE_SECONDS or None,
             )
 
-            # Change bot's mood to 'concerned' during crisis
-            if personality:
-                old_mood = personality.mood
-                personality.mood = "concerned"
-                db.commit()
-                logger.info(
-                    f"Bot mood changed from '{old_mood}' to 'concerned' due to crisis "
-                    f"(user {user_id})"
+        # 1. Safety check
+        with span("safety"):
+            safety_result = safety_filter.check_message(user_message, user_id=user_id)
+
+        if safety_result["severity"] == "critical":
+            # Store the message, response, safety flag and mood in a single
+            # transaction. Parent notification is handed to the background
+            # pipeline so a slow email server never delays the crisis resources.
+            with span("crisis_response"), unit_of_work(db):
+                # Get personality to update mood
+                personality = (
+                    db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
                 )
 
-            # Handle crisis with category-specific response
-            response = self._handle_crisis(safety_result, user_id, conversation_id, db)
+                # Change bot's mood to 'concerned' during crisis
+                if personality:
+                    old_mood = personality.mood
+                    personality.mood = "concerned"
+                    logger.info(
+                        f"Bot mood changed from '{old_mood}' to 'concerned' due to crisis "
+                        f"(user {user_id})"
+                    )
+
+                # Pick the category-specific crisis response (no I/O)
+                response = self._handle_crisis(safety_result, user_id, conversation_id, db)
+
+                user_msg = self._store_message(
+                    conversation_id, "user", user_message, db, flagged=True
+                )
+                self._store_message(conversation_id, "assistant", response, db)
+                db.flush()  # Assign the message ID referenced by the safety flag
 
-            # Store the message and response
-            user_msg = self._store_message(conversation_id, "user", user_message, db, flagged=True)
-            bot_msg = self._store_message(conversation_id, "assistant", response, db)
+                flag = safety_filter.log_safety_event(
+                    db, user_id, safety_result, message_id=user_msg.id
+                )
+                if safety_result.get("notify_parent", False):
+                    self._notify_parent_of_crisis(flag, safety_result)
 
-            # Log safety event with message ID
-            safety_filter.log_safety_event(db, user_id, safety_result, message_id=user_msg.id)
+            notification_pipeline.wake()
 
             return {
                 "content": response,
@@ -167,57 +218,89 @@ class ConversationManager:
                 },
             }
 
-        # 2. Store user message
-        user_msg = self._store_message(conversation_id, "user", user_message, db)
-        self.message_count += 1
-
-        # 3. Get personality (needed early for tracking)
-        personality = (
-            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        )
+        # 2-11 run as one unit of work: services stage their writes and the
+        # turn commits once at the end. Nothing is flushed before the LLM
+        # call, so no write lock is held while generating, and if the turn
+        # fails nothing (not even the user message) is stored.
+        with unit_of_work(db):
+            # 2. Store user message. The turn number comes from the database:
+            # a rolled-back (cancelled) turn isn't counted, and concurrent
+            # turns don't share a counter.
+            with span("store"):
+                user_msg = self._store_message(conversation_id, "user", user_message, db)
+                conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+                turn = (conversation.message_count or 0) + 1 if conversation else 1
+
+            with span("tracker"):
+                # 3. Get personality (needed early for tracking)
+                personality = (
+                    db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
+                )
 
-        # 4. Track message and award points for activities
-        message_tracking = conversation_tracker.on_message_sent(
-            user_id, personality, user_message, db
-        )
+                # 4. Track message and award points for activities
+                message_tracking = conversation_tracker.on_message_sent(
+                    user_id, personality, user_message, db
+                )
 
-        # 5. Extract and store memories
-        memory_manager.extract_and_store_memories(user_message, user_id, db)
+            # 5. Extract and store memories
+            with span("memory_extraction"):
+                memory_manager.extract_and_store_memories(user_message, user_id, db)
 
-        # 6. Build context
-        context = self._build_context(user_message, user_id, personality, db)
+            # 6. Build context
+            with span("context"):
+                context = self._build_context(user_message, user_id, personality, db)
 
-        # 7. Generate response
-        # Try to ensure model is loaded (lazy loading)
-        try:
-            if llm_service.ensure_loaded(timeout=60.0):
-                prompt = self._build_prompt(context, user_message, personality)
-                raw_response = llm_service.generate(prompt, max_tokens=300, temperature=0.7)
-            else:
-                logger.warning("LLM model not available, using fallback response")
+            # 7. Generate response (llm_service records the queue, prompt eval
+            # and generation stages inside this span)
+            # Try to ensure model is loaded (lazy loading)
+            llm_start = time.perf_counter()
+            try:
+                if llm_service.ensure_loaded(timeout=60.0):
+                    prompt = self._build_prompt(context, user_message, personality)
+                    # Same profile, same context: llama.cpp reuses the shared prompt prefix
+                    raw_response = llm_service.generate(
+                        prompt, max_tokens=300, temperature=0.7, request=request,
+                    )
+                else:
+                    logger.warning("LLM model not available, using fallback response")
+                    raw_response = self._fallback_response(context)
+            except InferenceCancelled:
+                if request.cancelled:
+                    raise  # Nobody is waiting for the reply: roll the turn back
+                logger.warning("Reply deadline passed before a sentence was generated, using fallback response")
                 raw_response = self._fallback_response(context)
-        except Exception as e:
-            logger.error(f"Error loading/generating from LLM: {e}")
-            raw_response = self._fallback_response(context)
-
-        # 8. Apply personality to response
-        final_response = self._apply_personality_filter(raw_response, personality, user_message)
-
-        # 9. Safety check on response (optional)
-        response_safety = safety_filter.check_message(final_response)
-        if not response_safety["safe"]:
-            final_response = (
-                "Hmm, I'm not sure how to respond to that. Want to talk about something else?"
-            )
+            except Exception as e:
+                logger.error(f"Error loading/generating from LLM: {e}")
+                raw_response = self._fallback_response(context)
+            finally:
+                record_span("llm", time.perf_counter() - llm_start)
+
+            # 8. Apply personality to response
+            with span("personality_filter"):
+                final_response = self._apply_personality_filter(
+                    raw_response, personality, user_message,
+                    seed=quirk_seed(conversation_id, turn)
+                )
 
-        # 10. Store assistant response
-        self._store_message(conversation_id, "assistant", final_response, db)
+            # 9. Safety check on response (optional)
+            with span("response_safety"):
+                response_safety = safety_filter.check_message(final_response)
+            if not response_safety["safe"]:
+                final_response = (
+                    "Hmm, I'm not sure how to respond to that. Want to talk about something else?"
+                )
 
-        # 11. Update conversation count
-        conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
-        if conversation:
-            conversation.message_count = self.message_count
-            db.commit()
+            # 10. Store assistant response (timed with the commit below)
+            commit_start = time.perf_counter()
+            self._store_message(conversation_id, "assistant", final_response, db)
+
+            # 11. Update conversation count (in SQL, so concurrent turns both count)
+            db.query(Conversation).filter(Conversation.id == conversation_id).update(
+                {Conversation.message_count: func.coalesce(Conversation.message_count, 0) + 1},
+                synchronize_session=False,
+            )
+
+        record_span("commit", time.perf_counter() - commit_start)
 
         return {
             "content": final_response,
@@ -248,32 +331,25 @@ class ConversationManager:
             duration = (datetime.now() - self.conversation_start_time).seconds
             conversation.duration_seconds = duration
 
-        conversation.message_count = self.message_count
 
-        # Generate conversation summary using LLM (if enabled and messages exist)
-        if settings.AUTO_GENERATE_SUMMARIES and conversation.messages:
+        # Scan the messages once; every step below reads these features
+        features = conversation_analyzer.analyze(conversation_id, db)
+
+        # Queue LLM summary (if enabled and messages exist); the summary queue
+        # generates it in the background once chat is idle
+        if settings.AUTO_GENERATE_SUMMARIES and features["message_count"]:
             try:
-                logger.info(f"Generating LLM summary for conversation {conversation_id}")
-                summary_data = conversation_summary_service.generate_summary(
-                    conversation_id, db
-                )
-                logger.info(
-                    f"Summary generated - Topics: {summary_data.get('topics', [])}, "
-                    f"Mood: {summary_data.get('mood', 'unknown')}"
+                flagged = features["flagged_count"] > 0
+                summary_queue.enqueue(
+                    conversation_id,
+                    priority=PRIORITY_FLAGGED if flagged else PRIORITY_NORMAL,
+                    timestamp=conversation.timestamp,
+                    force=True,
                 )
+                logger.info(f"Queued LLM summary for conversation {conversation_id}")
             except Exception as e:
-                # Don't block conversation end if summary fails
-                logger.error(f"Failed to generate summary for conversation {conversation_id}: {e}")
-                # Fallback to simple summary
-                messages = (
-                    db.query(Message)
-                    .filter(Message.conversation_id == conversation_id, Message.role == "user")
-                    .all()
-                )
-                if messages:
-                    all_text = " ".join([m.content for m in messages])
-                    keywords = memory_manager.extract_keywords(all_text)
-                    conversation.conversation_summary = f"Discussed: {', '.join(keywords[:5])}"
+                # Don't block conversation end if queueing fails
+                logger.error(f"Failed to queue summary for conversation {conversation_id}: {e}")
 
         # Update personality
         personality = (
@@ -285,18 +361,18 @@ class ConversationManager:
         if personality:
             # Track conversation end (awards points based on quality)
             end_info = conversation_tracker.on_conversation_end(
-                conversation_id, personality, db
+                conversation_id, personality, db, conversation
             )
 
             # Calculate conversation metrics
-            metrics = self._calculate_conversation_metrics(conversation_id, db)
+            metrics = self._calculate_conversation_metrics(conversation_id, db, features)
 
             # Update traits based on conversation
             personality_manager.update_personality_traits(personality, metrics, db)
 
             # Calculate and apply personality drift based on conversation patterns
             drift_events = personality_drift_calculator.calculate_drift_after_conversation(
-                personality, conversation, db
+                personality, conversation, db, features
             )
 
             logger.info(
@@ -310,12 +386,11 @@ class ConversationManager:
 
         logger.info(
             f"Ended conversation {conversation_id}: "
-            f"{self.message_count} messages, {conversation.duration_seconds}s"
+            f"{conversation.message_count} messages, {conversation.duration_seconds}s"
         )
 
         # Reset state
         self.current_conversation_id = None
-        self.message_count = 0
         self.conversation_start_time = None
 
     def _generate_greeting(
@@ -491,52 +566,42 @@ INSTRUCTIONS:
         return prompt
 
     def _apply_personality_filter(
-        self, response: str, personality: BotPersonality, context: str = ""
+        self,
+        response: str,
+        personality: BotPersonality,
+        context: str = "",
+        seed: Optional[int] = None
     ) -> str:
-        """Apply personality quirks to response"""
-        import random
-
-        quirks = personality.get_quirks()
-
-        # Apply shares_facts quirk
-        if "shares_facts" in quirks:
-            # Probability increases slightly with friendship level
-            base_probability = 0.20
-            level_bonus = (personality.friendship_level - 1) * 0.02
-            probability = min(0.35, base_probability + level_bonus)
-
-            response = fact_quirk_service.add_fact(
-                response, context=context, probability=probability
-            )
-
-        # Apply tells_puns quirk
-        if "tells_puns" in quirks:
-            # Probability increases slightly with friendship level
-            base_probability = 0.25
-            level_bonus = (personality.friendship_level - 1) * 0.02
-            probability = min(0.40, base_probability + level_bonus)
-
-            response = pun_quirk_service.add_pun(
-                response, context=context, probability=probability
-            )
+        """
+        Apply personality quirks to response
 
-        # Apply uses_emojis quirk with enhanced emoji service
-        if "uses_emojis" in quirks:
-            # Intensity varies by friendship level
-            # Higher friendship = more emojis
-            base_intensity = 0.4
-            level_bonus = (personality.friendship_level - 1) * 0.05
-            intensity = min(0.7, base_intensity + level_bonus)
+        Args:
+            response: Raw LLM response
+            personality: BotPersonality object
+            context: User message (picks contextual puns and facts)
+            seed: Per-request seed; the same seed and inputs give the same
+                result (global random module if None)
 
-            response = emoji_quirk_service.apply_emojis(
-                response, mood=personality.mood, intensity=intensity
-            )
+        Returns:
+            Response with quirks and catchphrase applied
+        """
+        rng = quirk_engine.make_rng(seed)
+
+        # Facts, puns and emojis (frequency grows with friendship level)
+        response = quirk_engine.apply(
+            response,
+            personality.get_quirks(),
+            mood=personality.mood,
+            friendship_level=personality.friendship_level,
+            context=context,
+            rng=rng,
+        )
 
         # Add catchphrase occasionally (if feature unlocked)
         if (
             can_use_catchphrase(personality)
             and personality.catchphrase
-            and random.random() < 0.1
+            and rng.random() < 0.1
         ):
             response += f" {personality.catchphrase}"
 
@@ -560,6 +625,9 @@ INSTRUCTIONS:
         """
         Handle crisis situation with category-specific response
 
+        Only selects the response text; the caller persists the messages and
+        hands parent notification to the background pipeline.
+
         Args:
             safety_result: Result from safety_filter.check_message()
             user_id: User ID
@@ -581,15 +649,6 @@ INSTRUCTIONS:
             else:
                 response = safety_filter.get_inappropriate_decline()
 
-        # Trigger parent notification if needed
-        if safety_result.get("notify_parent", False):
-            self._notify_parent_of_crisis(
-                user_id=user_id,
-                conversation_id=conversation_id,
-                safety_result=safety_result,
-                db=db
-            )
-
         logger.warning(
             f"Crisis detected for user {user_id}: "
             f"flags={safety_result['flags']}, severity={safety_result['severity']}"
@@ -597,35 +656,21 @@ INSTRUCTIONS:
 
         return response
 
-    def _notify_parent_of_crisis(
-        self,
-        user_id: int,
-        conversation_id: int,
-        safety_result: Dict,
-        db: Session
-    ) -> None:
+    def _notify_parent_of_crisis(self, flag: SafetyFlag, safety_result: Dict) -> None:
         """
-        Notify parent about crisis event
+        Queue a parent notification for a crisis flag
+
+        The flag is marked pending in the current transaction; the
+        notification pipeline delivers it after the turn commits.
 
         Args:
-            user_id: User ID
-            conversation_id: Conversation ID
+            flag: SafetyFlag logged for the crisis message
             safety_result: Safety check result
-            db: Database session
         """
-        # Import here to avoid circular dependency
-        from services.parent_notification_service import parent_notification_service
-
-        # Send parent notification
-        parent_notification_service.notify_crisis_event(
-            user_id=user_id,
-            conversation_id=conversation_id,
-            safety_result=safety_result,
-            db=db
-        )
+        notification_pipeline.enqueue(flag, safety_result)
 
         logger.info(
-            f"Parent notification triggered for user {user_id}: "
+            f"Parent notification queued for user {flag.user_id}: "
             f"severity={safety_result['severity']}, flags={safety_result['flags']}"
         )
 
@@ -637,7 +682,7 @@ INSTRUCTIONS:
         db: Session,
         flagged: bool = False,
     ) -> Message:
-        """Store a message in the database"""
+        """Store a message in the database (staged inside a unit of work)"""
         message = Message(
             conversation_id=conversation_id,
             role=role,
@@ -646,8 +691,8 @@ INSTRUCTIONS:
             flagged=flagged,
         )
         db.add(message)
-        db.commit()
-        db.refresh(message)
+        if commit_or_stage(db):
+            db.refresh(message)
         return message
 
     def _detect_user_mood(self, message: str) -> str:
@@ -665,15 +710,14 @@ INSTRUCTIONS:
         else:
             return "neutral"
 
-    def _calculate_conversation_metrics(self, conversation_id: int, db: Session) -> Dict:
+    def _calculate_conversation_metrics(
+        self, conversation_id: int, db: Session, features: Optional[Dict] = None
+    ) -> Dict:
         """Calculate metrics about the conversation"""
-        messages = (
-            db.query(Message).filter(Message.conversation_id == conversation_id).all()
-        )
-
-        user_messages = [m for m in messages if m.role == "user"]
+        if features is None:
+            features = conversation_analyzer.analyze(conversation_id, db)
 
-        if not user_messages:
+        if not features["user_message_count"]:
             return {
                 "message_count": 0,
                 "avg_message_length": 0,
@@ -682,22 +726,12 @@ INSTRUCTIONS:
                 "casual_language_detected": False,
             }
 
-        avg_length = sum(len(m.content) for m in user_messages) / len(user_messages)
-        question_count = sum(1 for m in user_messages if "?" in m.content)
-        question_ratio = question_count / len(user_messages)
-
-        # Check for casual language
-        all_text = " ".join(m.content.lower() for m in user_messages)
-        casual = any(
-            word in all_text for word in ["yeah", "cool", "awesome", "lol", "nice"]
-        )
-
         return {
-            "message_count": len(messages),
-            "avg_message_length": avg_length,
-            "user_question_ratio": question_ratio,
+            "message_count": features["message_count"],
+            "avg_message_length": features["avg_message_length"],
+            "user_question_ratio": features["questions_count"] / features["user_message_count"],
             "positive_joke_response": False,  # Would need more sophisticated detection
-            "casual_language_detected": casual,
+            "casual_language_detected": features["casual_words_count"] > 0,
         }
 
 
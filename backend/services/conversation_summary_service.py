@@ -6,13 +6,18 @@ Generates summaries of conversations using LLM for parent review
 from typing import Optional, Dict, List
 from datetime import datetime
 from sqlalchemy.orm import Session
+import json
 import logging
 
 from models.conversation import Conversation, Message
+from services.inference_scheduler import InferenceLane
+from services.json_grammars import SUMMARY_GRAMMAR
 from services.llm_service import llm_service
 
 logger = logging.getLogger("chatbot.conversation_summary")
 
+VALID_MOODS = ["positive", "neutral", "frustrated", "confused", "engaged", "discouraged"]
+
 
 class ConversationSummaryService:
     """
@@ -64,8 +69,13 @@ class ConversationSummaryService:
         # Build conversation text
         conversation_text = self._build_conversation_text(conversation.messages)
 
-        # Generate summary using LLM
-        summary_data = self._generate_llm_summary(conversation_text)
+        # Generate summary using LLM (flagged conversations ahead of other summaries)
+        lane = (
+            InferenceLane.CRISIS
+            if any(msg.flagged for msg in conversation.messages)
+            else InferenceLane.BACKGROUND
+        )
+        summary_data = self._generate_llm_summary(conversation_text, lane=lane)
 
         # Update conversation record
         conversation.conversation_summary = summary_data["summary"]
@@ -157,12 +167,17 @@ class ConversationSummaryService:
 
         return "\n\n".join(lines)
 
-    def _generate_llm_summary(self, conversation_text: str) -> Dict[str, any]:
+    def _generate_llm_summary(
+        self,
+        conversation_text: str,
+        lane: InferenceLane = InferenceLane.BACKGROUND,
+    ) -> Dict[str, any]:
         """
         Use LLM to generate conversation summary
 
         Args:
             conversation_text: Formatted conversation text
+            lane: Scheduler priority lane for the LLM call
 
         Returns:
             Dictionary with summary, topics, mood, etc.
@@ -176,18 +191,20 @@ class ConversationSummaryService:
         prompt = self._build_summary_prompt(conversation_text)
 
         try:
-            # Generate summary with LLM
-            response = self.llm.generate(
-                prompt=prompt,
+            # Generate summary with LLM (the grammar only allows the summary JSON object)
+            data = self.llm.generate_json(
+                prompt,
+                SUMMARY_GRAMMAR,
+                task="conversation_summary",
                 max_tokens=400,
                 temperature=0.3,  # Lower temperature for more factual summaries
-                stop=["\n\n---", "END_SUMMARY"]
+                lane=lane,
             )
 
-            # Parse LLM response
-            summary_data = self._parse_llm_response(response, conversation_text)
+            if not isinstance(data, dict):
+                return self._fallback_summary(conversation_text)
 
-            return summary_data
+            return self._summary_from_data(data, conversation_text)
 
         except Exception as e:
             logger.error(f"LLM summary generation failed: {e}")
@@ -208,19 +225,15 @@ class ConversationSummaryService:
 CONVERSATION:
 {conversation_text}
 
-Please provide a concise summary following this format:
-
-SUMMARY: [2-3 sentences describing what was discussed]
-
-TOPICS: [Comma-separated list of main topics, e.g., "opening strategies, pawn structure, endgame tactics"]
-
-MOOD: [One word: positive, neutral, frustrated, confused, engaged, or discouraged]
-
-KEY_MOMENTS: [1-2 notable exchanges or learning moments]
+Please provide a concise summary as a JSON object with these fields:
 
-SAFETY_CONCERNS: [Any concerning content, or "None"]
+"summary": 2-3 sentences describing what was discussed
+"topics": list of main topics, e.g. ["opening strategies", "pawn structure", "endgame tactics"]
+"mood": one word: positive, neutral, frustrated, confused, engaged, or discouraged
+"key_moments": list of 1-2 notable exchanges or learning moments
+"safety_concerns": list of any concerning content, or [] if none
 
-Now provide the summary:"""
+Now provide the summary JSON:"""
 
         return prompt
 
@@ -228,6 +241,9 @@ Now provide the summary:"""
         """
         Parse structured data from LLM summary response
 
+        Accepts the summary JSON object or the older SUMMARY:/TOPICS:/MOOD:
+        text sections.
+
         Args:
             llm_response: Raw LLM output
             original_text: Original conversation for fallback
@@ -235,6 +251,13 @@ Now provide the summary:"""
         Returns:
             Structured summary dictionary
         """
+        try:
+            data = json.loads(llm_response)
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, dict):
+            return self._summary_from_data(data, original_text)
+
         lines = llm_response.strip().split('\n')
 
         summary = ""
@@ -282,7 +305,7 @@ Now provide the summary:"""
             summary = self._extract_simple_summary(original_text)
         if not topics:
             topics = ["chess", "learning"]
-        if mood not in ["positive", "neutral", "frustrated", "confused", "engaged", "discouraged"]:
+        if mood not in VALID_MOODS:
             mood = "neutral"
 
         return {
@@ -293,6 +316,34 @@ Now provide the summary:"""
             "safety_concerns": safety_concerns
         }
 
+    def _summary_from_data(self, data: Dict[str, any], original_text: str) -> Dict[str, any]:
+        """
+        Build the summary dictionary from the LLM's summary JSON
+
+        Args:
+            data: Parsed summary object
+            original_text: Original conversation for fallback
+
+        Returns:
+            Structured summary dictionary
+        """
+        def text_list(field: str) -> List[str]:
+            values = data.get(field)
+            if not isinstance(values, list):
+                return []
+            return [str(v).strip() for v in values if str(v).strip() and str(v).strip().lower() != "none"]
+
+        summary = str(data.get("summary") or "").strip()
+        mood = str(data.get("mood") or "").strip().lower()
+
+        return {
+            "summary": summary or self._extract_simple_summary(original_text),
+            "topics": text_list("topics") or ["chess", "learning"],
+            "mood": mood if mood in VALID_MOODS else "neutral",
+            "key_moments": text_list("key_moments"),
+            "safety_concerns": text_list("safety_concerns"),
+        }
+
     def _fallback_summary(self, conversation_text: str) -> Dict[str, any]:
         """
         Generate basic summary without LLM (fallback)
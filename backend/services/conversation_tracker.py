@@ -8,7 +8,7 @@ import logging
 from datetime import datetime, timedelta
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, case, func
 from models.personality import BotPersonality
 from models.conversation import Conversation, Message
 from services.friendship_progression import add_friendship_points
@@ -216,7 +216,8 @@ class ConversationTracker:
         self,
         conversation_id: int,
         personality: BotPersonality,
-        db: Session
+        db: Session,
+        conversation: Optional[Conversation] = None
     ) -> Dict:
         """
         Handle conversation end event
@@ -226,6 +227,7 @@ class ConversationTracker:
             conversation_id: Conversation ID
             personality: BotPersonality object
             db: Database session
+            conversation: Optional already-loaded Conversation (looked up if omitted)
 
         Returns:
             Dictionary with points awarded and metrics
@@ -237,9 +239,10 @@ class ConversationTracker:
         }
 
         # Get conversation
-        conversation = db.query(Conversation).filter(
-            Conversation.id == conversation_id
-        ).first()
+        if conversation is None:
+            conversation = db.query(Conversation).filter(
+                Conversation.id == conversation_id
+            ).first()
 
         if not conversation:
             logger.warning(f"Conversation {conversation_id} not found")
@@ -478,6 +481,56 @@ class ConversationTracker:
             ),
         }
 
+    def get_recent_activity_rates(
+        self,
+        user_id: int,
+        db: Session,
+        window_days: int = 14
+    ) -> Dict:
+        """
+        Get a user's recent activity rates in one query
+
+        Used to project friendship progression from how the user has
+        actually been chatting lately.
+
+        Args:
+            user_id: User ID
+            db: Database session
+            window_days: How many recent days to average over
+
+        Returns:
+            Dictionary with per-day and per-conversation rates
+        """
+        since = datetime.now() - timedelta(days=window_days)
+        message_count = func.coalesce(Conversation.message_count, 0)
+
+        conversations, messages, active_days, long_count, quality_count = (
+            db.query(
+                func.count(Conversation.id),
+                func.coalesce(func.sum(message_count), 0),
+                func.count(func.distinct(func.date(Conversation.timestamp))),
+                func.coalesce(func.sum(case(
+                    (and_(message_count >= 10, message_count < 20), 1), else_=0
+                )), 0),
+                func.coalesce(func.sum(case((message_count >= 20, 1), else_=0)), 0),
+            )
+            .filter(
+                Conversation.user_id == user_id,
+                Conversation.timestamp >= since
+            )
+            .one()
+        )
+
+        return {
+            "window_days": window_days,
+            "conversations": conversations,
+            "conversations_per_day": conversations / window_days,
+            "messages_per_conversation": messages / conversations if conversations else 0.0,
+            "active_day_ratio": min(active_days / window_days, 1.0),
+            "long_conversation_ratio": long_count / conversations if conversations else 0.0,
+            "quality_conversation_ratio": quality_count / conversations if conversations else 0.0,
+        }
+
     def get_recent_conversations(
         self,
         user_id: int,
@@ -7,8 +7,8 @@ from typing import Dict, List, Tuple, Optional
 import logging
 from datetime import datetime, timedelta
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import case, func, select
 from models.personality import BotPersonality
 from models.personality_drift import PersonalityDrift
 
@@ -37,10 +37,108 @@ class DriftRateLimiter:
     COOLDOWN_AFTER_LARGE_DRIFT = timedelta(hours=6)  # Wait 6 hours after large drift
     LARGE_DRIFT_THRESHOLD = 0.04  # Drifts >= this are considered "large"
 
+    # Time periods (days) covered by a drift snapshot
+    LIMIT_PERIODS = (1, 7, 30)
+
+    TRAITS = ["humor", "energy", "curiosity", "formality"]
+
     def __init__(self):
         """Initialize the rate limiter"""
         pass
 
+    def get_drift_snapshot(
+        self,
+        user_id: int,
+        db: Session,
+        trait_names: Optional[List[str]] = None
+    ) -> Dict[str, Dict]:
+        """
+        Load everything the rate limits need for a user in one query
+
+        Returns per-trait absolute drift totals for each of LIMIT_PERIODS
+        (SUM with CASE on the timestamp) plus the most recent large drift.
+        All limits can then be evaluated in memory.
+
+        Args:
+            user_id: User ID
+            db: Database session
+            trait_names: Traits to include (defaults to all traits)
+
+        Returns:
+            Dictionary mapping trait name to
+            {"taken_at", "totals": {period_days: total}, "last_large_drift": (timestamp, amount) or None}
+        """
+        trait_names = trait_names or self.TRAITS
+        now = datetime.now()
+        since = now - timedelta(days=max(self.LIMIT_PERIODS))
+        abs_change = func.abs(PersonalityDrift.change_amount)
+
+        # Change amount of the latest large drift in the same trait group
+        latest = aliased(PersonalityDrift)
+        last_large_amount = (
+            select(latest.change_amount)
+            .where(
+                latest.user_id == user_id,
+                latest.trait_name == PersonalityDrift.trait_name,
+                latest.timestamp >= since,
+                func.abs(latest.change_amount) >= self.LARGE_DRIFT_THRESHOLD,
+            )
+            .order_by(latest.timestamp.desc())
+            .limit(1)
+            .correlate(PersonalityDrift)
+            .scalar_subquery()
+        )
+
+        period_totals = [
+            func.sum(
+                case(
+                    (PersonalityDrift.timestamp >= now - timedelta(days=period_days), abs_change),
+                    else_=0.0,
+                )
+            )
+            for period_days in self.LIMIT_PERIODS
+        ]
+
+        rows = (
+            db.query(
+                PersonalityDrift.trait_name,
+                func.max(
+                    case(
+                        (abs_change >= self.LARGE_DRIFT_THRESHOLD, PersonalityDrift.timestamp),
+                        else_=None,
+                    )
+                ),
+                last_large_amount,
+                *period_totals,
+            )
+            .filter(
+                PersonalityDrift.user_id == user_id,
+                PersonalityDrift.trait_name.in_(trait_names),
+                PersonalityDrift.timestamp >= since,
+            )
+            .group_by(PersonalityDrift.trait_name)
+            .all()
+        )
+
+        snapshot = {
+            trait: {
+                "taken_at": now,
+                "totals": {period_days: 0.0 for period_days in self.LIMIT_PERIODS},
+                "last_large_drift": None,
+            }
+            for trait in trait_names
+        }
+
+        for trait, last_large_at, last_large_change, *totals in rows:
+            snapshot[trait]["totals"] = {
+                period_days: float(total or 0.0)
+                for period_days, total in zip(self.LIMIT_PERIODS, totals)
+            }
+            if last_large_at is not None:
+                snapshot[trait]["last_large_drift"] = (last_large_at, last_large_change)
+
+        return snapshot
+
     def check_conversation_limit(
         self,
         personality: BotPersonality,
@@ -105,17 +203,6 @@ class DriftRateLimiter:
         Returns:
             Tuple of (allowed, capped_drift, message)
         """
-        # Get drift limit for period
-        if period_days == 1:
-            max_drift = self.MAX_DRIFT_PER_DAY
-        elif period_days == 7:
-            max_drift = self.MAX_DRIFT_PER_WEEK
-        elif period_days == 30:
-            max_drift = self.MAX_DRIFT_PER_MONTH
-        else:
-            # Custom period - scale monthly limit
-            max_drift = self.MAX_DRIFT_PER_MONTH * (period_days / 30.0)
-
         # Calculate total drift in period
         period_start = datetime.now() - timedelta(days=period_days)
 
@@ -123,6 +210,43 @@ class DriftRateLimiter:
             personality.user_id, trait_name, period_start, db
         )
 
+        return self._evaluate_period_limit(
+            trait_name, requested_drift, total_drift, period_days
+        )
+
+    def _get_period_limit(self, period_days: int) -> float:
+        """Get the maximum drift allowed in a time period"""
+        if period_days == 1:
+            return self.MAX_DRIFT_PER_DAY
+        elif period_days == 7:
+            return self.MAX_DRIFT_PER_WEEK
+        elif period_days == 30:
+            return self.MAX_DRIFT_PER_MONTH
+
+        # Custom period - scale monthly limit
+        return self.MAX_DRIFT_PER_MONTH * (period_days / 30.0)
+
+    def _evaluate_period_limit(
+        self,
+        trait_name: str,
+        requested_drift: float,
+        total_drift: float,
+        period_days: int
+    ) -> Tuple[bool, float, str]:
+        """
+        Check requested drift against drift already used in a period
+
+        Args:
+            trait_name: Name of trait
+            requested_drift: Requested drift amount
+            total_drift: Absolute drift already applied in the period
+            period_days: Number of days in the period
+
+        Returns:
+            Tuple of (allowed, capped_drift, message)
+        """
+        max_drift = self._get_period_limit(period_days)
+
         # Check if adding requested drift would exceed limit
         potential_total = total_drift + abs(requested_drift)
 
@@ -175,35 +299,40 @@ class DriftRateLimiter:
         Returns:
             Tuple of (in_cooldown, cooldown_until, message)
         """
-        # Get most recent large drift for this trait
-        cutoff_time = datetime.now() - self.COOLDOWN_AFTER_LARGE_DRIFT
+        snapshot = self.get_drift_snapshot(personality.user_id, db, [trait_name])
+        return self._evaluate_cooldown(trait_name, snapshot[trait_name])
 
-        recent_large_drift = (
-            db.query(PersonalityDrift)
-            .filter(
-                PersonalityDrift.user_id == personality.user_id,
-                PersonalityDrift.trait_name == trait_name,
-                PersonalityDrift.timestamp >= cutoff_time,
-                func.abs(PersonalityDrift.change_amount) >= self.LARGE_DRIFT_THRESHOLD
-            )
-            .order_by(PersonalityDrift.timestamp.desc())
-            .first()
-        )
+    def _evaluate_cooldown(
+        self,
+        trait_name: str,
+        trait_snapshot: Dict
+    ) -> Tuple[bool, Optional[datetime], str]:
+        """
+        Check cooldown from a trait's drift snapshot
 
-        if not recent_large_drift:
+        Args:
+            trait_name: Name of trait
+            trait_snapshot: Entry from get_drift_snapshot()
+
+        Returns:
+            Tuple of (in_cooldown, cooldown_until, message)
+        """
+        if not trait_snapshot["last_large_drift"]:
             return False, None, "No cooldown active"
 
+        last_large_at, last_large_change = trait_snapshot["last_large_drift"]
+
         # Calculate when cooldown ends
-        cooldown_until = recent_large_drift.timestamp + self.COOLDOWN_AFTER_LARGE_DRIFT
-        time_remaining = cooldown_until - datetime.now()
+        cooldown_until = last_large_at + self.COOLDOWN_AFTER_LARGE_DRIFT
+        time_remaining = cooldown_until - trait_snapshot["taken_at"]
 
         if time_remaining.total_seconds() <= 0:
             return False, None, "Cooldown expired"
 
         message = (
             f"Trait {trait_name} in cooldown for {time_remaining.total_seconds() / 3600:.1f} more hours "
-            f"after large drift of {recent_large_drift.change_amount:+.3f} at "
-            f"{recent_large_drift.timestamp.strftime('%Y-%m-%d %H:%M')}"
+            f"after large drift of {last_large_change:+.3f} at "
+            f"{last_large_at.strftime('%Y-%m-%d %H:%M')}"
         )
 
         logger.info(message)
@@ -217,11 +346,15 @@ class DriftRateLimiter:
         requested_drift: float,
         db: Session,
         conversation_id: Optional[int] = None,
-        enforce_cooldown: bool = True
+        enforce_cooldown: bool = True,
+        snapshot: Optional[Dict] = None
     ) -> Tuple[float, List[str]]:
         """
         Apply all rate limits to requested drift
 
+        Limits are evaluated in memory from a drift snapshot, so this costs
+        at most one query.
+
         Args:
             personality: BotPersonality object
             trait_name: Name of trait
@@ -229,6 +362,7 @@ class DriftRateLimiter:
             db: Database session
             conversation_id: Optional conversation ID
             enforce_cooldown: Whether to enforce cooldown (default True)
+            snapshot: This trait's entry from get_drift_snapshot() (loaded if omitted)
 
         Returns:
             Tuple of (final_drift, limit_messages)
@@ -236,11 +370,12 @@ class DriftRateLimiter:
         messages = []
         final_drift = requested_drift
 
+        if snapshot is None:
+            snapshot = self.get_drift_snapshot(personality.user_id, db, [trait_name])[trait_name]
+
         # Check cooldown first (if enforcing)
         if enforce_cooldown:
-            in_cooldown, cooldown_until, msg = self.check_cooldown(
-                personality, trait_name, db
-            )
+            in_cooldown, cooldown_until, msg = self._evaluate_cooldown(trait_name, snapshot)
 
             if in_cooldown:
                 messages.append(msg)
@@ -256,32 +391,15 @@ class DriftRateLimiter:
             final_drift = capped
             messages.append(msg)
 
-        # Check daily limit
-        allowed, capped, msg = self.check_time_period_limit(
-            personality, trait_name, final_drift, db, period_days=1
-        )
-
-        if not allowed:
-            final_drift = capped
-            messages.append(msg)
-
-        # Check weekly limit
-        allowed, capped, msg = self.check_time_period_limit(
-            personality, trait_name, final_drift, db, period_days=7
-        )
-
-        if not allowed:
-            final_drift = capped
-            messages.append(msg)
-
-        # Check monthly limit
-        allowed, capped, msg = self.check_time_period_limit(
-            personality, trait_name, final_drift, db, period_days=30
-        )
+        # Check daily, weekly and monthly limits
+        for period_days in self.LIMIT_PERIODS:
+            allowed, capped, msg = self._evaluate_period_limit(
+                trait_name, final_drift, snapshot["totals"][period_days], period_days
+            )
 
-        if not allowed:
-            final_drift = capped
-            messages.append(msg)
+            if not allowed:
+                final_drift = capped
+                messages.append(msg)
 
         # Log final result
         if abs(final_drift) < abs(requested_drift):
@@ -297,7 +415,8 @@ class DriftRateLimiter:
         personality: BotPersonality,
         trait_name: str,
         db: Session,
-        period_days: int = 30
+        period_days: int = 30,
+        snapshot: Optional[Dict] = None
     ) -> Dict:
         """
         Get how much drift is still allowed for a trait
@@ -307,25 +426,21 @@ class DriftRateLimiter:
             trait_name: Name of trait
             db: Database session
             period_days: Time period to check
+            snapshot: Optional trait entry from get_drift_snapshot()
 
         Returns:
             Dictionary with allowance information
         """
-        # Get limit for period
-        if period_days == 1:
-            max_drift = self.MAX_DRIFT_PER_DAY
-        elif period_days == 7:
-            max_drift = self.MAX_DRIFT_PER_WEEK
-        elif period_days == 30:
-            max_drift = self.MAX_DRIFT_PER_MONTH
-        else:
-            max_drift = self.MAX_DRIFT_PER_MONTH * (period_days / 30.0)
+        max_drift = self._get_period_limit(period_days)
 
         # Calculate used drift
-        period_start = datetime.now() - timedelta(days=period_days)
-        total_drift = self._calculate_total_drift(
-            personality.user_id, trait_name, period_start, db
-        )
+        if snapshot is not None and period_days in snapshot["totals"]:
+            total_drift = snapshot["totals"][period_days]
+        else:
+            period_start = datetime.now() - timedelta(days=period_days)
+            total_drift = self._calculate_total_drift(
+                personality.user_id, trait_name, period_start, db
+            )
 
         remaining = max_drift - total_drift
 
@@ -342,7 +457,8 @@ class DriftRateLimiter:
         self,
         personality: BotPersonality,
         trait_name: str,
-        db: Session
+        db: Session,
+        snapshot: Optional[Dict] = None
     ) -> Dict:
         """
         Get drift allowances for all time periods
@@ -351,15 +467,19 @@ class DriftRateLimiter:
             personality: BotPersonality object
             trait_name: Name of trait
             db: Database session
+            snapshot: Optional trait entry from get_drift_snapshot()
 
         Returns:
             Dictionary with all allowances
         """
+        if snapshot is None:
+            snapshot = self.get_drift_snapshot(personality.user_id, db, [trait_name])[trait_name]
+
         return {
             "trait_name": trait_name,
-            "daily": self.get_drift_allowance(personality, trait_name, db, 1),
-            "weekly": self.get_drift_allowance(personality, trait_name, db, 7),
-            "monthly": self.get_drift_allowance(personality, trait_name, db, 30),
+            "daily": self.get_drift_allowance(personality, trait_name, db, 1, snapshot),
+            "weekly": self.get_drift_allowance(personality, trait_name, db, 7, snapshot),
+            "monthly": self.get_drift_allowance(personality, trait_name, db, 30, snapshot),
             "per_conversation_limit": self.MAX_DRIFT_PER_CONVERSATION,
         }
 
@@ -382,20 +502,17 @@ class DriftRateLimiter:
         Returns:
             Total absolute drift
         """
-        drifts = (
-            db.query(PersonalityDrift)
+        total = (
+            db.query(func.sum(func.abs(PersonalityDrift.change_amount)))
             .filter(
                 PersonalityDrift.user_id == user_id,
                 PersonalityDrift.trait_name == trait_name,
                 PersonalityDrift.timestamp >= since
             )
-            .all()
+            .scalar()
         )
 
-        # Sum absolute values of drift
-        total = sum(abs(drift.change_amount) for drift in drifts)
-
-        return total
+        return float(total or 0.0)
 
     def get_drift_rate_stats(
         self,
@@ -412,20 +529,20 @@ class DriftRateLimiter:
         Returns:
             Dictionary with drift rate stats
         """
-        traits = ["humor", "energy", "curiosity", "formality"]
+        snapshot = self.get_drift_snapshot(personality.user_id, db)
 
         stats = {
             "user_id": personality.user_id,
             "traits": {},
         }
 
-        for trait in traits:
+        for trait in self.TRAITS:
             # Get allowances for all periods
-            allowances = self.get_all_allowances(personality, trait, db)
+            allowances = self.get_all_allowances(personality, trait, db, snapshot[trait])
 
             # Check cooldown
-            in_cooldown, cooldown_until, cooldown_msg = self.check_cooldown(
-                personality, trait, db
+            in_cooldown, cooldown_until, cooldown_msg = self._evaluate_cooldown(
+                trait, snapshot[trait]
             )
 
             stats["traits"][trait] = {
@@ -0,0 +1,408 @@
+"""
+Drift Time Series Service
+Compact per-trait value history with server-side downsampling for charts
+"""
+
+import logging
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from database.cache_invalidation import CommitInvalidator, EngineCache
+from models.personality_drift import PersonalityDrift
+from models.user import User
+
+logger = logging.getLogger("chatbot.drift_timeseries")
+
+# Session.info key for the users whose drift rows a transaction changed or deleted
+PENDING_KEY = "drift_timeseries_pending"
+
+# Supported timeline resolutions
+RESOLUTION_RAW = "raw"
+RESOLUTION_DAY = "day"
+RESOLUTION_WEEK = "week"
+RESOLUTIONS = (RESOLUTION_RAW, RESOLUTION_DAY, RESOLUTION_WEEK)
+
+
+class TraitSeries:
+    """
+    Drift history of one trait, stored as parallel typed arrays
+
+    values holds the trait value after each drift (the cumulative
+    snapshot), so a chart never has to replay change amounts.
+    Points are kept in timestamp order.
+    """
+
+    __slots__ = ("ids", "timestamps", "values", "changes", "triggers", "origin")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.timestamps = array("d")  # POSIX seconds
+        self.values = array("d")
+        self.changes = array("d")
+        self.triggers: List[str] = []
+        self.origin: Optional[float] = None  # Value before the first drift
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(
+        self,
+        drift_id: int,
+        timestamp: datetime,
+        old_value: float,
+        new_value: float,
+        change: float,
+        trigger: str
+    ) -> None:
+        """Append a drift, keeping points in timestamp order"""
+        ts = timestamp.timestamp()
+
+        if self.timestamps and ts < self.timestamps[-1]:
+            # Back-dated drift (imports, tests) - rebuild in order
+            rows = sorted(
+                list(zip(self.timestamps, self.ids, self.values, self.changes, self.triggers))
+                + [(ts, drift_id, new_value, change, trigger)]
+            )
+            first_ts = rows[0][0]
+            if first_ts == ts:
+                self.origin = old_value
+            self.timestamps = array("d", (row[0] for row in rows))
+            self.ids = array("q", (row[1] for row in rows))
+            self.values = array("d", (row[2] for row in rows))
+            self.changes = array("d", (row[3] for row in rows))
+            self.triggers = [row[4] for row in rows]
+            return
+
+        if not self.ids:
+            self.origin = old_value
+
+        self.ids.append(drift_id)
+        self.timestamps.append(ts)
+        self.values.append(new_value)
+        self.changes.append(change)
+        self.triggers.append(trigger)
+
+
+def bucket_points(
+    timestamps: Sequence[float],
+    values: Sequence[float],
+    changes: Sequence[float],
+    resolution: str
+) -> List[Dict]:
+    """
+    Downsample a series into calendar buckets
+
+    Each bucket reports the value at its close (what a line chart plots)
+    plus open/min/max and the summed change.
+
+    Args:
+        timestamps: POSIX timestamps in ascending order
+        values: Trait value after each drift
+        changes: Change amount of each drift
+        resolution: "day" or "week" (weeks start on Monday)
+
+    Returns:
+        List of bucket dictionaries in time order
+    """
+    buckets: List[Dict] = []
+    current_start = None
+
+    for ts, value, change in zip(timestamps, values, changes):
+        moment = datetime.fromtimestamp(ts)
+        start = datetime(moment.year, moment.month, moment.day)
+        if resolution == RESOLUTION_WEEK:
+            start -= timedelta(days=start.weekday())
+
+        if start != current_start:
+            current_start = start
+            buckets.append({
+                "timestamp": start.isoformat(),
+                "value": value,
+                "open": value,
+                "min": value,
+                "max": value,
+                "change": 0.0,
+                "count": 0,
+            })
+
+        bucket = buckets[-1]
+        bucket["value"] = value
+        bucket["min"] = min(bucket["min"], value)
+        bucket["max"] = max(bucket["max"], value)
+        bucket["change"] += change
+        bucket["count"] += 1
+
+    for bucket in buckets:
+        bucket["change"] = round(bucket["change"], 4)
+
+    return buckets
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Pick points to keep with Largest-Triangle-Three-Buckets
+
+    LTTB keeps the first and last points and, from each of threshold - 2
+    equal buckets in between, the point forming the largest triangle with
+    the previously kept point and the next bucket's average. Peaks and
+    dips survive, unlike with plain striding.
+
+    Args:
+        xs: X values in ascending order
+        ys: Y values
+        threshold: Maximum number of points to keep
+
+    Returns:
+        Sorted indices of the points to keep
+    """
+    n = len(xs)
+    if threshold >= n or threshold <= 0:
+        return list(range(n))
+    if threshold <= 2:
+        return [0, n - 1][:threshold]
+
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        # Point in this bucket with the largest triangle
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
+
+
+class DriftTimeSeriesStore:
+    """
+    Drift Time Series Store - in-memory per-user trait histories
+
+    Loads narrow (id, trait, timestamp, value) columns instead of full
+    PersonalityDrift rows, and only the rows added since the last read
+    (id > last seen id), so repeat reads cost one indexed query returning
+    nothing. Trait histories are compact typed arrays. Histories are
+    kept per database engine, so separate databases never mix, and a
+    user's history is dropped when a committed transaction changes or
+    deletes their drift rows (or the user). The database is queried
+    without holding the store lock.
+
+    Features:
+    - Per-trait cumulative value series
+    - Daily/weekly bucketing and LTTB downsampling for charts
+    - Per-trait statistics without loading ORM objects
+    """
+
+    def __init__(self):
+        """Initialize the time series store"""
+        # engine -> user_id -> {"last_id": int, "traits": {trait_name: TraitSeries}}
+        self._users = EngineCache()
+        # Guards the histories' contents
+        self._lock = threading.Lock()
+
+    def _refresh(self, user_id: int, db: Session) -> Dict[str, TraitSeries]:
+        """
+        Append drifts recorded since the last read
+
+        Call without the lock, and read the returned series under it.
+        """
+        engine = db.get_bind()
+        while True:
+            user, generation = self._users.lookup(engine, user_id)
+            if user is None:
+                user = {"last_id": 0, "traits": {}}
+                if not self._users.store(engine, user_id, user, generation):
+                    continue  # Invalidated meanwhile
+            with self._lock:
+                last_id = user["last_id"]
+
+            rows = (
+                db.query(
+                    PersonalityDrift.id,
+                    PersonalityDrift.trait_name,
+                    PersonalityDrift.timestamp,
+                    PersonalityDrift.old_value,
+                    PersonalityDrift.new_value,
+                    PersonalityDrift.change_amount,
+                    PersonalityDrift.trigger_type,
+                )
+                .filter(PersonalityDrift.user_id == user_id, PersonalityDrift.id > last_id)
+                .order_by(PersonalityDrift.id.asc())
+                .all()
+            )
+
+            with self._lock:
+                if self._users.lookup(engine, user_id)[0] is not user:
+                    continue  # Invalidated (or replaced) during the query - read again from scratch
+
+                series = user["traits"]
+                for drift_id, trait, timestamp, old_value, new_value, change, trigger in rows:
+                    if drift_id <= user["last_id"]:
+                        continue  # Appended by a concurrent refresh
+                    if trait not in series:
+                        series[trait] = TraitSeries()
+                    series[trait].append(drift_id, timestamp, old_value, new_value, change, trigger)
+                    user["last_id"] = drift_id
+                return series
+
+    def get_trait_series(
+        self,
+        user_id: int,
+        trait_name: str,
+        db: Session
+    ) -> Tuple[List[int], List[float], List[float], List[float], List[str]]:
+        """
+        Get a copy of one trait's history
+
+        Returns:
+            Tuple of (ids, timestamps, values, changes, triggers)
+        """
+        series = self._refresh(user_id, db)
+        with self._lock:
+            trait_series = series.get(trait_name)
+            if not trait_series:
+                return [], [], [], [], []
+            return (
+                list(trait_series.ids),
+                list(trait_series.timestamps),
+                list(trait_series.values),
+                list(trait_series.changes),
+                list(trait_series.triggers),
+            )
+
+    def get_trait_stats(self, user_id: int, db: Session) -> Dict[str, Dict]:
+        """
+        Get per-trait drift statistics
+
+        Returns:
+            Dictionary mapping trait name to count, total change and
+            original/current value
+        """
+        series = self._refresh(user_id, db)
+        with self._lock:
+            return {
+                trait: {
+                    "drift_count": len(trait_series),
+                    "total_change": sum(trait_series.changes),
+                    "current_value": trait_series.values[-1],
+                    "original_value": trait_series.origin,
+                    "first_drift_at": datetime.fromtimestamp(trait_series.timestamps[0]),
+                    "last_drift_at": datetime.fromtimestamp(trait_series.timestamps[-1]),
+                }
+                for trait, trait_series in series.items()
+                if len(trait_series)
+            }
+
+    def get_timeline(
+        self,
+        user_id: int,
+        trait_name: str,
+        db: Session,
+        resolution: str = RESOLUTION_RAW,
+        max_points: Optional[int] = None
+    ) -> Tuple[List[Dict], int]:
+        """
+        Get a chart-ready timeline for a trait
+
+        Args:
+            user_id: User ID
+            trait_name: Trait name
+            db: Database session
+            resolution: "raw" (one point per drift), "day" or "week"
+            max_points: Reduce to at most this many points with LTTB
+
+        Returns:
+            Tuple of (points, total drift count). Raw points carry the
+            drift id so callers can attach details for the kept points only.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(
+                f"Invalid resolution: {resolution}. Must be one of: {', '.join(RESOLUTIONS)}"
+            )
+
+        ids, timestamps, values, changes, triggers = self.get_trait_series(
+            user_id, trait_name, db
+        )
+
+        if resolution == RESOLUTION_RAW:
+            points = [
+                {
+                    "id": drift_id,
+                    "timestamp": datetime.fromtimestamp(ts).isoformat(),
+                    "value": value,
+                    "change": change,
+                    "trigger": trigger,
+                }
+                for drift_id, ts, value, change, trigger
+                in zip(ids, timestamps, values, changes, triggers)
+            ]
+            xs = timestamps
+        else:
+            points = bucket_points(timestamps, values, changes, resolution)
+            xs = [datetime.fromisoformat(point["timestamp"]).timestamp() for point in points]
+
+        if max_points and len(points) > max_points:
+            keep = lttb_indices(xs, [point["value"] for point in points], max_points)
+            points = [points[i] for i in keep]
+
+        return points, len(ids)
+
+    def invalidate(self, user_id: Optional[int] = None, engine=None) -> None:
+        """
+        Forget cached history (done automatically when drift rows are changed or deleted)
+
+        Args:
+            user_id: User to forget (all users if None)
+            engine: Database engine to forget it for (every engine if None)
+        """
+        with self._lock:
+            self._users.invalidate(user_id, engine)
+
+
+# Global instance
+drift_timeseries = DriftTimeSeriesStore()
+
+
+def _changed_drifts(session: Session) -> Set[int]:
+    """Users whose drift rows the session updates or deletes, or who are deleted (new rows are appended)"""
+    user_ids = {
+        obj.user_id
+        for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, PersonalityDrift)
+    }
+    user_ids.update(obj.id for obj in session.deleted if isinstance(obj, User))
+    user_ids.discard(None)
+    return user_ids
+
+
+def _invalidate_drifts(user_ids: Set[int], engine) -> None:
+    """Drop the histories of users whose drift rows a committed transaction changed"""
+    for user_id in user_ids:
+        drift_timeseries.invalidate(user_id, engine)
+
+
+drift_writes = CommitInvalidator(PENDING_KEY, _changed_drifts, _invalidate_drifts)
@@ -0,0 +1,445 @@
+"""
+Email Outbox Service
+Persistent outbox with a background sender for parent emails
+"""
+
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal
+from models.email_outbox import EmailOutbox
+from services.email_service import email_service
+from utils.config import settings
+
+logger = logging.getLogger("chatbot.email_outbox")
+
+# Priority lanes (lower is sent first)
+PRIORITY_CRISIS = 0
+PRIORITY_ALERT = 5
+PRIORITY_NORMAL = 10
+
+
+class EmailOutboxService:
+    """
+    Email Outbox Service - queues emails and delivers them in the background
+
+    Features:
+    - Persistent outbox table, so queued emails survive restarts
+    - Background sender that reuses one SMTP connection per batch
+    - Priority lanes; crisis notifications wake the sender immediately
+    - Retry with exponential backoff, then marked failed
+    - Deduplication of identical emails within a time window
+
+    Usage:
+        result = email_outbox_service.deliver(
+            db, to_email="parent@example.com", subject="Alert", body="...",
+            priority=PRIORITY_CRISIS
+        )
+    """
+
+    # Backoff between retries: base * 2^(attempts - 1), capped
+    RETRY_BASE_SECONDS = 30
+    RETRY_MAX_SECONDS = 3600
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        """
+        Initialize EmailOutboxService
+
+        Args:
+            session_factory: Callable returning a new database session
+        """
+        self.session_factory = session_factory
+        self.enabled = settings.EMAIL_OUTBOX_ENABLED
+        self.batch_size = settings.EMAIL_OUTBOX_BATCH_SIZE
+        self.poll_seconds = settings.EMAIL_OUTBOX_POLL_SECONDS
+        self.max_attempts = settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        self.dedup_window = timedelta(seconds=settings.EMAIL_OUTBOX_DEDUP_WINDOW_SECONDS)
+
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Session statistics
+        self.stats = {
+            "queued": 0,
+            "deduplicated": 0,
+            "sent": 0,
+            "retried": 0,
+            "failed": 0,
+            "batches": 0,
+        }
+
+        logger.info(f"EmailOutboxService initialized - Enabled: {self.enabled}")
+
+    @staticmethod
+    def make_dedup_key(to_email: str, subject: str, body: str) -> str:
+        """Hash recipient, subject and body to detect identical emails"""
+        content = f"{to_email.lower()}\n{subject}\n{body}"
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def enqueue(
+        self,
+        db: Session,
+        to_email: str,
+        subject: str,
+        body: str,
+        html_body: Optional[str] = None,
+        priority: int = PRIORITY_NORMAL,
+        user_id: Optional[int] = None,
+        category: Optional[str] = None,
+    ) -> EmailOutbox:
+        """
+        Add an email to the outbox
+
+        An identical email (same recipient, subject and body) that is
+        pending or was sent within the dedup window is returned instead of
+        queueing a duplicate.
+
+        Args:
+            db: Database session
+            to_email: Recipient email address
+            subject: Email subject line
+            body: Plain text body
+            html_body: Optional HTML body
+            priority: Delivery priority (PRIORITY_CRISIS is sent first)
+            user_id: Child's user ID, if the email concerns a user
+            category: Notification category for history and debugging
+
+        Returns:
+            EmailOutbox row (new or existing duplicate)
+        """
+        dedup_key = self.make_dedup_key(to_email, subject, body)
+
+        existing = (
+            db.query(EmailOutbox)
+            .filter(
+                EmailOutbox.dedup_key == dedup_key,
+                EmailOutbox.status.in_(["pending", "sending", "sent"]),
+                EmailOutbox.created_at >= datetime.now() - self.dedup_window,
+            )
+            .first()
+        )
+
+        if existing:
+            self.stats["deduplicated"] += 1
+            logger.info(f"Skipped duplicate email to {to_email} (outbox id {existing.id})")
+            return existing
+
+        entry = EmailOutbox(
+            user_id=user_id,
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            html_body=html_body,
+            category=category,
+            priority=priority,
+            status="pending",
+            dedup_key=dedup_key,
+            next_attempt_at=datetime.now(),
+        )
+        db.add(entry)
+        db.commit()
+        db.refresh(entry)
+
+        self.stats["queued"] += 1
+        logger.info(f"Queued email {entry.id} to {to_email} (priority {priority})")
+
+        if priority <= PRIORITY_ALERT:
+            # Priority lane - don't wait for the next poll
+            self._wakeup.set()
+
+        return entry
+
+    def deliver(
+        self,
+        db: Session,
+        to_email: str,
+        subject: str,
+        body: str,
+        html_body: Optional[str] = None,
+        priority: int = PRIORITY_NORMAL,
+        user_id: Optional[int] = None,
+        category: Optional[str] = None,
+    ) -> Dict:
+        """
+        Queue an email for background delivery, or send inline if the outbox is off
+
+        Returns a result in the same shape as EmailService.send_email. A queued
+        email counts as sent; "queued" and "outbox_id" identify the outbox row.
+
+        Args:
+            db: Database session
+            to_email: Recipient email address
+            subject: Email subject line
+            body: Plain text body
+            html_body: Optional HTML body
+            priority: Delivery priority
+            user_id: Child's user ID
+            category: Notification category
+
+        Returns:
+            Dictionary with send result
+        """
+        if not self.enabled:
+            return email_service.send_email(
+                to_email=to_email, subject=subject, body=body, html_body=html_body
+            )
+
+        # Fail fast instead of queueing emails that can never be sent
+        not_ready = email_service.check_ready(to_email, subject)
+        if not_ready:
+            return not_ready
+
+        entry = self.enqueue(
+            db,
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            html_body=html_body,
+            priority=priority,
+            user_id=user_id,
+            category=category,
+        )
+
+        return {
+            "success": True,
+            "sent": True,
+            "queued": True,
+            "outbox_id": entry.id,
+            "status": entry.status,
+            "to_email": to_email,
+            "subject": subject,
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    def process_batch(self, db: Session) -> int:
+        """
+        Send one batch of due emails, highest priority first
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of emails attempted
+        """
+        now = datetime.now()
+        entries = (
+            db.query(EmailOutbox)
+            .filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.priority.asc(), EmailOutbox.created_at.asc())
+            .limit(self.batch_size)
+            .all()
+        )
+
+        if not entries:
+            return 0
+
+        for entry in entries:
+            entry.status = "sending"
+            entry.attempts += 1
+        db.commit()
+
+        try:
+            results = email_service.send_batch([
+                {
+                    "to_email": entry.to_email,
+                    "subject": entry.subject,
+                    "body": entry.body,
+                    "html_body": entry.html_body,
+                }
+                for entry in entries
+            ])
+
+            for entry, result in zip(entries, results):
+                if result.get("sent"):
+                    entry.status = "sent"
+                    entry.sent_at = datetime.now()
+                    entry.last_error = None
+                    self.stats["sent"] += 1
+                else:
+                    self._record_failure(entry, result.get("details") or result.get("error"))
+
+            db.commit()
+
+        except Exception as e:
+            # Don't leave the rows in 'sending' (deduplicated against, and
+            # only requeued at the next start): retry them with backoff
+            logger.error(f"Error sending email batch: {e}", exc_info=True)
+            db.rollback()
+            for entry in entries:
+                if entry.status == "sending":
+                    self._record_failure(entry, f"{type(e).__name__}: {e}")
+            db.commit()
+
+        self.stats["batches"] += 1
+
+        return len(entries)
+
+    def _record_failure(self, entry: EmailOutbox, error: Optional[str]) -> None:
+        """Schedule a retry with backoff, or mark the email failed after max_attempts"""
+        entry.last_error = error
+        if entry.attempts >= self.max_attempts:
+            entry.status = "failed"
+            self.stats["failed"] += 1
+            logger.error(
+                f"Email {entry.id} to {entry.to_email} failed after "
+                f"{entry.attempts} attempts: {entry.last_error}"
+            )
+        else:
+            entry.status = "pending"
+            entry.next_attempt_at = datetime.now() + self._retry_delay(entry.attempts)
+            self.stats["retried"] += 1
+
+    def process_pending(self) -> int:
+        """
+        Send batches until no due emails remain
+
+        Returns:
+            Number of emails attempted
+        """
+        db = self.session_factory()
+        total = 0
+
+        try:
+            while True:
+                attempted = self.process_batch(db)
+                total += attempted
+                if attempted < self.batch_size:
+                    break
+        except Exception as e:
+            logger.error(f"Error processing email outbox: {e}", exc_info=True)
+            db.rollback()
+        finally:
+            db.close()
+
+        return total
+
+    def _retry_delay(self, attempts: int) -> timedelta:
+        """Exponential backoff delay after a failed attempt"""
+        seconds = self.RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        return timedelta(seconds=min(seconds, self.RETRY_MAX_SECONDS))
+
+    def recover_interrupted(self) -> int:
+        """
+        Return emails left in 'sending' by a previous run to the queue
+
+        Delivery is at-least-once: an email interrupted mid-send may be
+        sent again.
+
+        Returns:
+            Number of emails requeued
+        """
+        db = self.session_factory()
+
+        try:
+            count = (
+                db.query(EmailOutbox)
+                .filter(EmailOutbox.status == "sending")
+                .update({"status": "pending"}, synchronize_session=False)
+            )
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    def get_entries(
+        self, db: Session, user_id: int, limit: int = 20
+    ) -> List[EmailOutbox]:
+        """
+        Get recent outbox entries for a user
+
+        Args:
+            db: Database session
+            user_id: User ID
+            limit: Maximum number of entries
+
+        Returns:
+            List of EmailOutbox rows, newest first
+        """
+        return (
+            db.query(EmailOutbox)
+            .filter(EmailOutbox.user_id == user_id)
+            .order_by(EmailOutbox.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+
+    def get_stats(self) -> Dict:
+        """Get outbox statistics for this session"""
+        return {
+            "enabled": self.enabled,
+            "running": self._running,
+            **self.stats,
+        }
+
+    def start(self):
+        """Start the background sender"""
+        if not self.enabled:
+            logger.info("Email outbox disabled - emails are sent inline")
+            return
+
+        if self._running:
+            logger.warning("Email outbox sender already running")
+            return
+
+        requeued = self.recover_interrupted()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted emails")
+
+        self._running = True
+        self._wakeup.set()  # Deliver anything left from the previous run
+        self._thread = threading.Thread(target=self._sender_loop, daemon=True)
+        self._thread.start()
+        logger.info(f"Email outbox sender started (poll interval: {self.poll_seconds}s)")
+
+    def stop(self):
+        """Stop the background sender"""
+        if not self._running:
+            return
+
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        logger.info("Email outbox sender stopped")
+
+    def _sender_loop(self):
+        """Background loop: send due emails, then wait for a wakeup or the poll interval"""
+        while self._running:
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+
+            if not self._running:
+                break
+
+            self.process_pending()
+
+
+# Global instance
+email_outbox_service = EmailOutboxService()
+
+
+# Convenience functions
+def deliver(
+    db: Session,
+    to_email: str,
+    subject: str,
+    body: str,
+    html_body: Optional[str] = None,
+    priority: int = PRIORITY_NORMAL,
+    user_id: Optional[int] = None,
+    category: Optional[str] = None,
+) -> Dict:
+    """Queue an email for background delivery"""
+    return email_outbox_service.deliver(
+        db, to_email, subject, body, html_body, priority, user_id, category
+    )
+
+
+def get_stats() -> Dict:
+    """Get outbox statistics"""
+    return email_outbox_service.get_stats()
@@ -23,7 +23,8 @@ class EmailService:
     - SMTP email sending with TLS support
     - HTML and plain text email support
     - Email template formatting
-    - Connection pooling and error handling
+    - Batched sending over one authenticated connection
+    - Error handling
     - Configurable SMTP settings from environment
 
     Usage:
@@ -65,24 +66,16 @@ class EmailService:
             self.smtp_from_email
         ])
 
-    def send_email(
-        self,
-        to_email: str,
-        subject: str,
-        body: str,
-        html_body: Optional[str] = None
-    ) -> Dict:
+    def check_ready(self, to_email: str, subject: str) -> Optional[Dict]:
         """
-        Send an email notification
+        Check that email can be sent right now
 
         Args:
-            to_email: Recipient email address
-            subject: Email subject line
-            body: Plain text email body
-            html_body: Optional HTML email body
+            to_email: Recipient email address (for logging)
+            subject: Email subject line (for logging)
 
         Returns:
-            Dictionary with send result
+            Failed send result if email is disabled or unconfigured, None if ready
         """
         # Check if email notifications are enabled
         if not self.enabled:
@@ -104,22 +97,163 @@ class EmailService:
                 "sent": False
             }
 
+        return None
+
+    def _build_message(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        html_body: Optional[str] = None
+    ) -> MIMEMultipart:
+        """Build a MIME message with plain text and optional HTML parts"""
+        message = MIMEMultipart("alternative")
+        message["Subject"] = subject
+        message["From"] = self.smtp_from_email
+        message["To"] = to_email
+        message["Date"] = datetime.now().strftime("%a, %d %b %Y %H:%M:%S %z")
+
+        # Attach plain text body
+        message.attach(MIMEText(body, "plain"))
+
+        # Attach HTML body if provided
+        if html_body:
+            message.attach(MIMEText(html_body, "html"))
+
+        return message
+
+    def _connect(self) -> smtplib.SMTP:
+        """Open an authenticated SMTP connection"""
+        logger.info(f"Connecting to SMTP server {self.smtp_host}:{self.smtp_port}")
+
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port)
+        try:
+            if self.smtp_use_tls:
+                server.starttls()
+                logger.debug("TLS started")
+
+            server.login(self.smtp_username, self.smtp_password)
+            logger.debug("SMTP login successful")
+        except Exception:
+            server.close()
+            raise
+
+        return server
+
+    def send_batch(self, emails: List[Dict]) -> List[Dict]:
+        """
+        Send several emails over a single authenticated SMTP connection
+
+        The connection is re-opened once if the server drops it mid-batch.
+
+        Args:
+            emails: List of dicts with to_email, subject, body and optional html_body
+
+        Returns:
+            List of send results in the same order as emails
+        """
+        if not emails:
+            return []
+
+        not_ready = self.check_ready(f"{len(emails)} recipients", "batch")
+        if not_ready:
+            return [dict(not_ready) for _ in emails]
+
+        results = []
+        server = None
+
         try:
-            # Create message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = subject
-            message["From"] = self.smtp_from_email
-            message["To"] = to_email
-            message["Date"] = datetime.now().strftime("%a, %d %b %Y %H:%M:%S %z")
-
-            # Attach plain text body
-            text_part = MIMEText(body, "plain")
-            message.attach(text_part)
-
-            # Attach HTML body if provided
-            if html_body:
-                html_part = MIMEText(html_body, "html")
-                message.attach(html_part)
+            for email in emails:
+                message = self._build_message(
+                    email["to_email"], email["subject"], email["body"], email.get("html_body")
+                )
+
+                for attempt in range(2):
+                    if server is None:
+                        try:
+                            server = self._connect()
+                        except (smtplib.SMTPException, OSError) as e:
+                            logger.error(f"Could not connect to SMTP server: {e}")
+                            error = (
+                                "SMTP authentication failed"
+                                if isinstance(e, smtplib.SMTPAuthenticationError)
+                                else "SMTP connection failed"
+                            )
+                            # No point trying the rest of the batch
+                            results.extend(
+                                {"success": False, "error": error, "sent": False, "details": str(e)}
+                                for _ in emails[len(results):]
+                            )
+                            return results
+
+                    try:
+                        server.send_message(message)
+                        results.append({
+                            "success": True,
+                            "sent": True,
+                            "to_email": email["to_email"],
+                            "subject": email["subject"],
+                            "timestamp": datetime.now().isoformat()
+                        })
+                        break
+
+                    except smtplib.SMTPServerDisconnected as e:
+                        server = None
+                        if attempt == 1:
+                            results.append({
+                                "success": False,
+                                "error": "SMTP server disconnected",
+                                "sent": False,
+                                "details": str(e)
+                            })
+
+                    except (smtplib.SMTPException, OSError) as e:
+                        logger.error(f"SMTP error while sending email: {e}")
+                        results.append({
+                            "success": False,
+                            "error": "SMTP error",
+                            "sent": False,
+                            "details": str(e)
+                        })
+                        break
+
+        finally:
+            if server is not None:
+                try:
+                    server.quit()
+                except Exception:
+                    server.close()
+
+        sent = sum(1 for r in results if r["sent"])
+        logger.info(f"Email batch complete - Sent: {sent}/{len(emails)}")
+        return results
+
+    def send_email(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        html_body: Optional[str] = None
+    ) -> Dict:
+        """
+        Send an email notification
+
+        Args:
+            to_email: Recipient email address
+            subject: Email subject line
+            body: Plain text email body
+            html_body: Optional HTML email body
+
+        Returns:
+            Dictionary with send result
+        """
+        # Check if email notifications are enabled and configured
+        not_ready = self.check_ready(to_email, subject)
+        if not_ready:
+            return not_ready
+
+        try:
+            message = self._build_message(to_email, subject, body, html_body)
 
             # Connect to SMTP server and send
             logger.info(f"Connecting to SMTP server {self.smtp_host}:{self.smtp_port}")
@@ -599,3 +733,8 @@ def send_bulk_safety_summary(
 def is_configured() -> bool:
     """Check if email service is configured"""
     return email_service.is_configured()
+
+
+def send_batch(emails: List[Dict]) -> List[Dict]:
+    """Send several emails over one SMTP connection"""
+    return email_service.send_batch(emails)
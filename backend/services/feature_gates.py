@@ -5,14 +5,19 @@ Decorators and utilities for feature gating based on friendship level
 
 from typing import Callable, Optional
 from functools import wraps
+import inspect
 import logging
 
 from sqlalchemy.orm import Session
 from models.personality import BotPersonality
+from services.personality_cache import PersonalitySnapshot
 from services.feature_unlock_manager import feature_unlock_manager
 
 logger = logging.getLogger("chatbot.feature_gates")
 
+# Objects the gate accepts as the personality to check
+PERSONALITY_TYPES = (BotPersonality, PersonalitySnapshot)
+
 
 class FeatureNotUnlockedException(Exception):
     """Exception raised when attempting to use locked feature"""
@@ -41,16 +46,28 @@ def require_feature(feature_id: str):
     """
 
     def decorator(func: Callable) -> Callable:
+        personality_index = _find_personality_parameter(func)
+        # The catalog is compiled at import, so the unlock level is fixed
+        required_level = feature_unlock_manager.get_required_level(feature_id)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Try to find personality in args/kwargs
             personality = None
 
-            # Check args for BotPersonality
-            for arg in args:
-                if isinstance(arg, BotPersonality):
-                    personality = arg
-                    break
+            # Usual case: the parameter named/annotated as the personality
+            if (
+                personality_index is not None
+                and personality_index < len(args)
+                and isinstance(args[personality_index], PERSONALITY_TYPES)
+            ):
+                personality = args[personality_index]
+            else:
+                # Check args for BotPersonality (or a cached snapshot)
+                for arg in args:
+                    if isinstance(arg, PERSONALITY_TYPES):
+                        personality = arg
+                        break
 
             # Check kwargs
             if personality is None and "personality" in kwargs:
@@ -64,14 +81,14 @@ def require_feature(feature_id: str):
                 return func(*args, **kwargs)
 
             # Check if feature is unlocked
-            if not feature_unlock_manager.is_feature_unlocked(
-                feature_id, personality.friendship_level
-            ):
-                feature_info = feature_unlock_manager.get_feature_info(feature_id)
-                required_level = feature_info["level"] if feature_info else 1
+            friendship_level = personality.friendship_level
+            if required_level is None:
+                logger.warning(f"Unknown feature: {feature_id}")
+                raise FeatureNotUnlockedException(feature_id, 1, friendship_level)
 
+            if friendship_level < required_level:
                 raise FeatureNotUnlockedException(
-                    feature_id, required_level, personality.friendship_level
+                    feature_id, required_level, friendship_level
                 )
 
             return func(*args, **kwargs)
@@ -81,6 +98,38 @@ def require_feature(feature_id: str):
     return decorator
 
 
+def _find_personality_parameter(func: Callable) -> Optional[int]:
+    """
+    Find the positional index of a function's personality parameter
+
+    Looks for a parameter annotated as BotPersonality/PersonalitySnapshot,
+    then one named "personality", so the gate can check that argument
+    directly instead of scanning every argument on each call.
+
+    Args:
+        func: Decorated function
+
+    Returns:
+        Positional index, or None if there is no such parameter
+    """
+    try:
+        parameters = list(inspect.signature(func).parameters.values())
+    except (TypeError, ValueError):
+        return None
+
+    positional = [
+        p for p in parameters
+        if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+    ]
+    for index, parameter in enumerate(positional):
+        if parameter.annotation in PERSONALITY_TYPES:
+            return index
+    for index, parameter in enumerate(positional):
+        if parameter.name == "personality":
+            return index
+    return None
+
+
 def check_feature_access(
     personality: BotPersonality, feature_id: str, raise_exception: bool = False
 ) -> bool:
@@ -21,6 +21,12 @@ class FeatureUnlockManager:
     - Feature availability checks
     - Feature metadata and descriptions
     - Progressive feature unlocking
+
+    The catalog is compiled once into bitsets: every feature gets a bit in
+    (level, name) order, and there is one mask per level (features
+    unlocked at or below it), one per exact level and one per category.
+    "What is unlocked at level N" is a mask lookup, and feature lists are
+    read off the mask already in display order.
     """
 
     def __init__(self):
@@ -234,6 +240,75 @@ class FeatureUnlockManager:
             "meta": "Meta Features",
         }
 
+        self._compile_index()
+
+    def _compile_index(self) -> None:
+        """Compile the feature catalog into per-level and per-category bitsets"""
+        ordered = sorted(
+            self.feature_definitions.items(),
+            key=lambda item: (item[1]["level"], item[1]["name"])
+        )
+
+        # Bit i is the i-th feature in (level, name) order
+        self._features = [dict(data, id=feature_id) for feature_id, data in ordered]
+        self._feature_bits = {
+            feature_id: 1 << index for index, (feature_id, _) in enumerate(ordered)
+        }
+        self.max_level = max(data["level"] for data in self.feature_definitions.values())
+        self._all_mask = (1 << len(ordered)) - 1
+
+        # Masks indexed by level 0..max_level
+        self._level_masks = [0] * (self.max_level + 1)
+        self._category_masks: Dict[str, int] = {}
+        for feature_id, data in ordered:
+            bit = self._feature_bits[feature_id]
+            self._level_masks[data["level"]] |= bit
+            self._category_masks[data["category"]] = (
+                self._category_masks.get(data["category"], 0) | bit
+            )
+
+        self._unlocked_masks = []
+        mask = 0
+        for level_mask in self._level_masks:
+            mask |= level_mask
+            self._unlocked_masks.append(mask)
+
+        # Summaries depend only on level, so each is built once
+        self._summary_cache: Dict[int, Dict] = {}
+
+    def get_unlocked_mask(self, friendship_level: int) -> int:
+        """
+        Get the bitset of features unlocked at a level
+
+        Args:
+            friendship_level: Friendship level (clamped to the catalog range)
+
+        Returns:
+            Bitmask over features in (level, name) order
+        """
+        if friendship_level < 0:
+            return 0
+        if friendship_level >= self.max_level:
+            return self._all_mask
+        return self._unlocked_masks[friendship_level]
+
+    def get_required_level(self, feature_id: str) -> Optional[int]:
+        """Get the level a feature unlocks at (None if unknown)"""
+        data = self.feature_definitions.get(feature_id)
+        return data["level"] if data else None
+
+    def _features_in(self, mask: int, locked: bool = False) -> List[Dict]:
+        """Copy the features whose bits are set, in (level, name) order"""
+        features = []
+        while mask:
+            lowest = mask & -mask
+            feature_info = self._features[lowest.bit_length() - 1].copy()
+            if locked:
+                feature_info["unlock_at_level"] = feature_info["level"]
+            features.append(feature_info)
+            mask ^= lowest
+        return features
+
     def is_feature_unlocked(
         self,
         feature_id: str,
@@ -249,12 +324,12 @@ class FeatureUnlockManager:
         Returns:
             True if feature is unlocked
         """
-        if feature_id not in self.feature_definitions:
+        bit = self._feature_bits.get(feature_id)
+        if bit is None:
             logger.warning(f"Unknown feature: {feature_id}")
             return False
 
-        required_level = self.feature_definitions[feature_id]["level"]
-        return friendship_level >= required_level
+        return bool(self.get_unlocked_mask(friendship_level) & bit)
 
     def get_unlocked_features(
         self,
@@ -269,18 +344,8 @@ class FeatureUnlockManager:
         Returns:
             List of unlocked feature dictionaries
         """
-        unlocked = []
-
-        for feature_id, feature_data in self.feature_definitions.items():
-            if feature_data["level"] <= friendship_level:
-                feature_info = feature_data.copy()
-                feature_info["id"] = feature_id
-                unlocked.append(feature_info)
-
-        # Sort by level, then by name
-        unlocked.sort(key=lambda x: (x["level"], x["name"]))
-
-        return unlocked
+        # Sorted by level, then by name
+        return self._features_in(self.get_unlocked_mask(friendship_level))
 
     def get_locked_features(
         self,
@@ -295,19 +360,9 @@ class FeatureUnlockManager:
         Returns:
             List of locked feature dictionaries
         """
-        locked = []
-
-        for feature_id, feature_data in self.feature_definitions.items():
-            if feature_data["level"] > friendship_level:
-                feature_info = feature_data.copy()
-                feature_info["id"] = feature_id
-                feature_info["unlock_at_level"] = feature_data["level"]
-                locked.append(feature_info)
-
-        # Sort by unlock level, then by name
-        locked.sort(key=lambda x: (x["level"], x["name"]))
-
-        return locked
+        # Sorted by unlock level, then by name
+        locked_mask = self._all_mask & ~self.get_unlocked_mask(friendship_level)
+        return self._features_in(locked_mask, locked=True)
 
     def get_features_by_level(
         self,
@@ -322,17 +377,11 @@ class FeatureUnlockManager:
         Returns:
             List of features unlocking at that level
         """
-        features = []
+        if level < 0 or level > self.max_level:
+            return []
 
-        for feature_id, feature_data in self.feature_definitions.items():
-            if feature_data["level"] == level:
-                feature_info = feature_data.copy()
-                feature_info["id"] = feature_id
-                features.append(feature_info)
-
-        features.sort(key=lambda x: x["name"])
-
-        return features
+        # Sorted by name
+        return self._features_in(self._level_masks[level])
 
     def get_features_by_category(
         self,
@@ -349,22 +398,14 @@ class FeatureUnlockManager:
         Returns:
             List of features in category
         """
-        features = []
-
-        for feature_id, feature_data in self.feature_definitions.items():
-            if feature_data["category"] == category:
-                # Apply level filter if provided
-                if friendship_level is not None:
-                    if feature_data["level"] > friendship_level:
-                        continue
+        mask = self._category_masks.get(category, 0)
 
-                feature_info = feature_data.copy()
-                feature_info["id"] = feature_id
-                features.append(feature_info)
+        # Apply level filter if provided
+        if friendship_level is not None:
+            mask &= self.get_unlocked_mask(friendship_level)
 
-        features.sort(key=lambda x: (x["level"], x["name"]))
-
-        return features
+        # Sorted by level, then by name
+        return self._features_in(mask)
 
     def get_feature_info(
         self,
@@ -404,15 +445,39 @@ class FeatureUnlockManager:
         Returns:
             Dictionary with feature summary
         """
-        unlocked = self.get_unlocked_features(personality.friendship_level)
-        locked = self.get_locked_features(personality.friendship_level)
+        return self._build_summary(personality.friendship_level)
+
+    def get_level_summary(self, friendship_level: int) -> Dict:
+        """
+        Get the feature summary for a level, built once per level
+
+        The returned dictionary is shared between callers and must not
+        be modified (get_feature_summary builds a private one).
+
+        Args:
+            friendship_level: Friendship level
+
+        Returns:
+            Dictionary with feature summary
+        """
+        summary = self._summary_cache.get(friendship_level)
+        if summary is None:
+            summary = self._build_summary(friendship_level)
+            if 0 <= friendship_level <= self.max_level:
+                self._summary_cache[friendship_level] = summary
+        return summary
+
+    def _build_summary(self, friendship_level: int) -> Dict:
+        """Build the feature summary for a level"""
+        unlocked = self.get_unlocked_features(friendship_level)
+        locked = self.get_locked_features(friendship_level)
 
         # Get features by category (unlocked only)
         by_category = {}
         for category_id in self.categories:
             features = self.get_features_by_category(
                 category_id,
-                personality.friendship_level
+                friendship_level
             )
             if features:
                 by_category[category_id] = {
@@ -422,13 +487,13 @@ class FeatureUnlockManager:
                 }
 
         # Get next unlockable features
-        next_level = personality.friendship_level + 1
+        next_level = friendship_level + 1
         next_features = []
-        if next_level <= 10:
+        if next_level <= self.max_level:
             next_features = self.get_features_by_level(next_level)
 
         return {
-            "current_level": personality.friendship_level,
+            "current_level": friendship_level,
             "total_features": len(self.feature_definitions),
             "unlocked_count": len(unlocked),
             "locked_count": len(locked),
@@ -467,12 +532,15 @@ class FeatureUnlockManager:
             Dictionary mapping feature_id -> is_unlocked
         """
         results = {}
+        unlocked_mask = self.get_unlocked_mask(friendship_level)
 
         for feature_id in feature_ids:
-            results[feature_id] = self.is_feature_unlocked(
-                feature_id,
-                friendship_level
-            )
+            bit = self._feature_bits.get(feature_id)
+            if bit is None:
+                logger.warning(f"Unknown feature: {feature_id}")
+                results[feature_id] = False
+            else:
+                results[feature_id] = bool(unlocked_mask & bit)
 
         return results
 
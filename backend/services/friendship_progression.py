@@ -3,11 +3,14 @@ Friendship Progression Service
 Manages friendship level progression based on multiple factors
 """
 
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
+import bisect
 import logging
 from datetime import datetime, timedelta
+from itertools import accumulate
 
 from sqlalchemy.orm import Session
+from database.database import commit_or_stage
 from models.personality import BotPersonality
 
 logger = logging.getLogger("chatbot.friendship_progression")
@@ -24,6 +27,12 @@ def _get_level_up_handler():
     return _level_up_handler_cache
 
 
+def _get_conversation_tracker():
+    """Lazy import of the conversation tracker (it imports this module)"""
+    from services.conversation_tracker import conversation_tracker
+    return conversation_tracker
+
+
 class FriendshipProgressionManager:
     """
     Friendship Progression Manager - handles friendship level progression
@@ -164,6 +173,10 @@ class FriendshipProgressionManager:
             "month_active": 500,                  # Active for a month
         }
 
+        # Threshold table: sorted level minimums for bisect lookups
+        self._level_thresholds = [info["min_points"] for info in self.friendship_levels]
+        self._levels_by_number = {info["level"]: info for info in self.friendship_levels}
+
     def get_level_info(self, level: int) -> Dict:
         """
         Get information about a friendship level
@@ -174,12 +187,8 @@ class FriendshipProgressionManager:
         Returns:
             Dictionary with level information
         """
-        for level_info in self.friendship_levels:
-            if level_info["level"] == level:
-                return level_info
-
         # Default to max level if not found
-        return self.friendship_levels[-1]
+        return self._levels_by_number.get(level, self.friendship_levels[-1])
 
     def get_level_from_points(self, points: int) -> int:
         """
@@ -191,11 +200,11 @@ class FriendshipProgressionManager:
         Returns:
             Friendship level (1-10)
         """
-        for level_info in reversed(self.friendship_levels):
-            if points >= level_info["min_points"]:
-                return level_info["level"]
+        index = bisect.bisect_right(self._level_thresholds, points)
+        if index == 0:
+            return 1  # Minimum level
 
-        return 1  # Minimum level
+        return self.friendship_levels[index - 1]["level"]
 
     def get_points_to_next_level(self, current_points: int) -> Tuple[int, int]:
         """
@@ -271,9 +280,9 @@ class FriendshipProgressionManager:
                 f"(points: {old_points} -> {personality.friendship_points})"
             )
 
-        # Commit changes
-        db.commit()
-        db.refresh(personality)
+        # Commit changes (staged until the end of a chat turn's unit of work)
+        if commit_or_stage(db):
+            db.refresh(personality)
 
         # Build event info
         event_info = {
@@ -431,6 +440,129 @@ class FriendshipProgressionManager:
             "level_info": level_info,
         }
 
+    def estimate_daily_points(self, activity_rates: Dict) -> float:
+        """
+        Estimate points earned per day from activity rates
+
+        Uses the point_rewards table for the activities every conversation
+        earns: daily check-in, messages, completion and long/quality
+        bonuses. Streak, sharing and milestone rewards depend on what is
+        said, so they are left out and the estimate errs low.
+
+        Args:
+            activity_rates: Rates from ConversationTracker.get_recent_activity_rates
+
+        Returns:
+            Estimated friendship points per day
+        """
+        rewards = self.point_rewards
+
+        points_per_conversation = (
+            rewards["conversation_completed"]
+            + activity_rates["messages_per_conversation"] * rewards["message_sent"]
+            + activity_rates["long_conversation_ratio"] * rewards["long_conversation"]
+            + activity_rates["quality_conversation_ratio"] * rewards["quality_conversation"]
+        )
+
+        return (
+            activity_rates["active_day_ratio"] * rewards["daily_checkin"]
+            + activity_rates["conversations_per_day"] * points_per_conversation
+        )
+
+    def project_level_timeline(
+        self,
+        current_points: int,
+        schedule: Sequence[float]
+    ) -> Dict:
+        """
+        Project levels for a points schedule in one call
+
+        Cumulative points are built once; since they only grow, the day
+        each level is reached is a bisect per level threshold rather than
+        a level lookup per day.
+
+        Args:
+            current_points: Starting friendship points
+            schedule: Points earned on each future day (non-negative)
+
+        Returns:
+            Dictionary with per-day points and levels and the day each
+            new level is reached
+        """
+        if any(points < 0 for points in schedule):
+            raise ValueError("Points schedule cannot contain negative values")
+
+        cumulative = list(accumulate(schedule, initial=current_points))[1:]
+        start_level = self.get_level_from_points(current_points)
+
+        milestones = []
+        levels = [start_level] * len(cumulative)
+        today = datetime.now().date()
+
+        for level_info in self.friendship_levels[start_level:]:
+            index = bisect.bisect_left(cumulative, level_info["min_points"])
+            if index == len(cumulative):
+                break
+
+            levels[index:] = [level_info["level"]] * (len(cumulative) - index)
+            milestones.append({
+                "level": level_info["level"],
+                "name": level_info["name"],
+                "min_points": level_info["min_points"],
+                "day": index + 1,
+                "date": (today + timedelta(days=index + 1)).isoformat(),
+            })
+
+        return {
+            "start_points": current_points,
+            "start_level": start_level,
+            "days": len(cumulative),
+            "final_points": round(cumulative[-1]) if cumulative else current_points,
+            "final_level": levels[-1] if levels else start_level,
+            "points": [round(points) for points in cumulative],
+            "levels": levels,
+            "milestones": milestones,
+        }
+
+    def project_progression(
+        self,
+        personality: BotPersonality,
+        db: Session,
+        days: int = 90,
+        daily_points: Optional[float] = None,
+        window_days: int = 14
+    ) -> Dict:
+        """
+        Project a user's friendship levels over the coming days
+
+        Args:
+            personality: BotPersonality object (or snapshot)
+            db: Database session
+            days: Number of days to project
+            daily_points: Points per day (estimated from recent activity if None)
+            window_days: Recent days used to estimate activity rates
+
+        Returns:
+            Projection (see project_level_timeline) plus the activity
+            rates and daily points it was based on
+        """
+        activity_rates = _get_conversation_tracker().get_recent_activity_rates(
+            personality.user_id, db, window_days
+        )
+        if daily_points is None:
+            daily_points = self.estimate_daily_points(activity_rates)
+
+        projection = self.project_level_timeline(
+            personality.friendship_points, [daily_points] * days
+        )
+        projection["daily_points"] = round(daily_points, 1)
+        projection["activity_rates"] = {
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in activity_rates.items()
+        }
+
+        return projection
+
 
 # Global instance
 friendship_manager = FriendshipProgressionManager()
@@ -457,3 +589,13 @@ def get_friendship_progress(personality: BotPersonality) -> Dict:
 def get_level_info(level: int) -> Dict:
     """Get information about a friendship level"""
     return friendship_manager.get_level_info(level)
+
+
+def project_progression(
+    personality: BotPersonality,
+    db: Session,
+    days: int = 90,
+    daily_points: Optional[float] = None
+) -> Dict:
+    """Project friendship levels from recent activity"""
+    return friendship_manager.project_progression(personality, db, days, daily_points)
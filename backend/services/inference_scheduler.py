@@ -0,0 +1,282 @@
+"""
+Inference Scheduler
+Hands out the loaded model contexts with priority lanes
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Any, Deque, Dict, Hashable, List, Optional
+
+logger = logging.getLogger("chatbot.inference_scheduler")
+
+
+class InferenceLane(IntEnum):
+    """
+    Priority lanes for model access
+
+    Lower numbers = served first
+    """
+    INTERACTIVE = 0  # The child's chat reply
+    CRISIS = 1       # Work on safety-flagged conversations
+    EXTRACTION = 2   # Memory extraction from chat messages
+    BACKGROUND = 3   # Conversation summaries and reports
+
+
+class InferenceCancelled(Exception):
+    """Raised when an inference request is cancelled before or during generation"""
+
+
+class InferenceRequest:
+    """
+    Cancellable ticket for one inference request
+
+    Cancelling a waiting request removes it from its lane; cancelling a
+    running request is checked by the model between tokens. A request with
+    a deadline stops generating once its wall-clock time (waiting included)
+    is used up, and keeps the reply generated so far.
+    """
+
+    def __init__(
+        self,
+        lane: InferenceLane = InferenceLane.INTERACTIVE,
+        affinity: Optional[Hashable] = None,
+        deadline_seconds: Optional[float] = None,
+    ):
+        """
+        Initialize InferenceRequest
+
+        Args:
+            lane: Priority lane the request is queued in
+            affinity: Key (e.g. user ID) whose requests should reuse the same
+                context, so llama.cpp can keep their shared prompt prefix
+            deadline_seconds: Wall-clock seconds the request may take (None = no limit)
+        """
+        self.lane = InferenceLane(lane)
+        self.affinity = affinity
+        self.cancelled = False
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+        self.context: Optional[int] = None  # Index of the context while the request holds one
+        self._scheduler: Optional["InferenceScheduler"] = None
+
+    @property
+    def expired(self) -> bool:
+        """Whether the request's deadline has passed"""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def should_stop(self) -> bool:
+        """Whether generation for this request should stop (cancelled or past its deadline)"""
+        return self.cancelled or self.expired
+
+    def remaining_seconds(self) -> Optional[float]:
+        """Seconds left before the deadline (None without one)"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def cancel(self) -> None:
+        """Cancel the request (no-op once it has finished)"""
+        self.cancelled = True
+        scheduler = self._scheduler
+        if scheduler is not None:
+            scheduler._wake()
+
+
+class InferenceScheduler:
+    """
+    Inference Scheduler - one user per model context, highest lane first
+
+    llama.cpp contexts are not re-entrant, so every generation holds one
+    context for its whole duration. Waiters queue per lane (first come,
+    first served within a lane); whenever a context is free it goes to the
+    oldest waiter of the highest-priority lane. A running generation is
+    never interrupted, but a chat reply queued behind a summary runs as
+    soon as a context frees up, ahead of any other queued background work.
+
+    With several contexts, a request goes to the free context last used by
+    its affinity key, otherwise to the least recently used free context,
+    so each profile tends to keep its own warm context.
+
+    A slot is not re-entrant: code holding one must not request another.
+
+    Usage:
+        with inference_scheduler.slot(InferenceLane.EXTRACTION) as request:
+            contexts[request.context](prompt)
+    """
+
+    def __init__(self, capacity: int = 1):
+        """
+        Initialize InferenceScheduler
+
+        Args:
+            capacity: Number of model contexts
+        """
+        self._condition = threading.Condition()
+        self._queues: Dict[InferenceLane, Deque[int]] = {lane: deque() for lane in InferenceLane}
+        self._tickets = itertools.count()
+        self._capacity = capacity
+        self._free: List[int] = list(range(capacity))  # Least recently used first
+        self._active: Dict[int, InferenceLane] = {}  # Context -> lane of its request
+        self._affinity: Dict[int, Hashable] = {}  # Context -> affinity of its last request
+
+        self._stats = {
+            lane: {"served": 0, "cancelled": 0, "max_queued": 0, "wait_seconds": 0.0}
+            for lane in InferenceLane
+        }
+
+    @contextmanager
+    def slot(
+        self,
+        lane: InferenceLane = InferenceLane.INTERACTIVE,
+        request: Optional[InferenceRequest] = None,
+    ):
+        """
+        Hold a model context for the duration of the block
+
+        Args:
+            lane: Priority lane to queue in (ignored if request is given)
+            request: Ticket that can cancel the wait
+
+        Yields:
+            The request holding the slot (its context attribute is the
+            index of the context to use)
+
+        Raises:
+            InferenceCancelled: If the request is cancelled while waiting
+        """
+        if request is None:
+            request = InferenceRequest(lane)
+
+        self._acquire(request)
+        try:
+            yield request
+        finally:
+            with self._condition:
+                context = request.context
+                del self._active[context]
+                if context < self._capacity:
+                    self._free.append(context)
+                request.context = None
+                request._scheduler = None
+                self._condition.notify_all()
+
+    def _acquire(self, request: InferenceRequest) -> None:
+        """Wait in the request's lane until it is first in line and a context is free"""
+        lane = request.lane
+        stats = self._stats[lane]
+        queue = self._queues[lane]
+        ticket = next(self._tickets)
+        queued_at = time.monotonic()
+
+        with self._condition:
+            request._scheduler = self
+            queue.append(ticket)
+            stats["max_queued"] = max(stats["max_queued"], len(queue))
+
+            try:
+                while not request.cancelled and not (
+                    self._free and queue[0] == ticket and self._is_next(lane)
+                ):
+                    self._condition.wait()
+            finally:
+                queue.remove(ticket)
+
+            if request.cancelled:
+                request._scheduler = None
+                stats["cancelled"] += 1
+                self._condition.notify_all()  # The next waiter may now be first in line
+                raise InferenceCancelled(f"{lane.name.lower()} inference request cancelled")
+
+            context = self._pick_context(request.affinity)
+            self._free.remove(context)
+            self._active[context] = lane
+            if request.affinity is not None:
+                self._affinity[context] = request.affinity
+            request.context = context
+            stats["served"] += 1
+            stats["wait_seconds"] += time.monotonic() - queued_at
+
+            if self._free:
+                self._condition.notify_all()  # The next waiter may take another context
+
+    def _pick_context(self, affinity: Optional[Hashable]) -> int:
+        """Free context last used by the affinity key, else the least recently used"""
+        if affinity is not None:
+            for context in self._free:
+                if self._affinity.get(context) == affinity:
+                    return context
+        return self._free[0]
+
+    def _is_next(self, lane: InferenceLane) -> bool:
+        """Whether no higher-priority lane has waiters (caller holds the condition)"""
+        return not any(self._queues[higher] for higher in InferenceLane if higher < lane)
+
+    def _wake(self) -> None:
+        """Wake waiters so cancelled requests leave their lane"""
+        with self._condition:
+            self._condition.notify_all()
+
+    def resize(self, capacity: int) -> None:
+        """
+        Change the number of contexts (e.g. after the model is loaded)
+
+        Contexts in use keep running; ones beyond the new capacity are
+        retired when released.
+
+        Args:
+            capacity: New number of model contexts
+        """
+        with self._condition:
+            self._capacity = capacity
+            self._free = [context for context in range(capacity) if context not in self._active]
+            self._affinity = {
+                context: key for context, key in self._affinity.items() if context < capacity
+            }
+            self._condition.notify_all()
+
+    @property
+    def capacity(self) -> int:
+        """Number of model contexts"""
+        return self._capacity
+
+    @property
+    def busy(self) -> int:
+        """Number of contexts running a request"""
+        return len(self._active)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get per-lane queue statistics
+
+        Returns:
+            Dictionary with context usage, the lanes of running requests
+            and, per lane, queue depth, peak depth, requests
+            served/cancelled and average wait
+        """
+        with self._condition:
+            lanes = {}
+            for lane in InferenceLane:
+                stats = self._stats[lane]
+                served = stats["served"]
+                lanes[lane.name.lower()] = {
+                    "queued": len(self._queues[lane]),
+                    "max_queued": stats["max_queued"],
+                    "served": served,
+                    "cancelled": stats["cancelled"],
+                    "avg_wait_ms": round(stats["wait_seconds"] / served * 1000, 2) if served else 0.0,
+                }
+            return {
+                "contexts": self._capacity,
+                "busy": len(self._active),
+                "active_lanes": [lane.name.lower() for lane in sorted(self._active.values())],
+                "lanes": lanes,
+            }
+
+
+# Global instance
+inference_scheduler = InferenceScheduler()
@@ -0,0 +1,502 @@
+"""
+Inference Worker
+Runs the model in a supervised child process and streams tokens back over a pipe
+"""
+
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from services.inference_scheduler import InferenceCancelled, InferenceLane, InferenceRequest
+from utils.metrics import record_span, trace
+
+logger = logging.getLogger("chatbot.inference_worker")
+
+# How often a waiting caller checks whether its request was cancelled
+CANCEL_POLL_SECONDS = 0.1
+
+
+def _local_service():
+    """In-process LLM service for the worker (response caching stays in the API process)"""
+    from services.llm_service import LLMService
+
+    service = LLMService(use_worker=False)
+    service.set_cache_enabled(False)
+    return service
+
+
+def _worker_main(conn, use_mmap: bool, service_factory: Callable) -> None:
+    """
+    Worker process entry point: load the model, then serve request frames
+
+    Every request runs in its own thread; the service's inference scheduler
+    decides which of them use the model contexts. Replies are frames of
+    {"id", "type": "token" | "done" | "cancelled" | "error", ...}; "done"
+    frames carry the request's latency spans for the API process's metrics.
+    """
+    service = service_factory()
+    if not service.is_loaded:
+        service.load_model(blocking=True, use_mmap=use_mmap)
+
+    send_lock = threading.Lock()
+    requests: Dict[int, InferenceRequest] = {}
+
+    def send(frame: Dict[str, Any]) -> None:
+        with send_lock:
+            conn.send(frame)
+
+    def run(frame: Dict[str, Any], request: InferenceRequest) -> None:
+        request_id = frame["id"]
+        op = frame["op"]
+        try:
+            with trace() as request_trace:
+                if op == "stream":
+                    for token in service._stream_local(frame["prompt"], request=request, **frame["kwargs"]):
+                        send({"id": request_id, "type": "token", "text": token})
+                        if request.cancelled:
+                            break
+                    result = None
+                elif op == "generate":
+                    result = service._generate_local(frame["prompt"], request=request, **frame["kwargs"])
+                elif op == "embed":
+                    result = service.get_embedding(frame["text"], lane=request.lane)
+                elif op == "tokenize":
+                    result = service.count_tokens(frame["text"])
+                elif op == "info":
+                    result = service.get_model_info()
+                else:
+                    raise ValueError(f"Unknown inference worker op: {op}")
+
+            if request.cancelled:
+                send({"id": request_id, "type": "cancelled"})
+            else:
+                send({"id": request_id, "type": "done", "result": result, "spans": request_trace.spans})
+        except InferenceCancelled:
+            send({"id": request_id, "type": "cancelled"})
+        except Exception as e:
+            send({"id": request_id, "type": "error", "error": f"{type(e).__name__}: {e}"})
+        finally:
+            requests.pop(request_id, None)
+
+    send({"type": "status", "loaded": service.is_loaded, "error": service.load_error})
+
+    while True:
+        try:
+            frame = conn.recv()
+        except (EOFError, OSError):
+            break  # The API process went away
+
+        op = frame["op"]
+        if op == "shutdown":
+            break
+        if op == "cancel":
+            request = requests.get(frame["id"])
+            if request is not None:
+                request.cancel()
+            continue
+
+        request = InferenceRequest(InferenceLane(frame["lane"]), frame.get("affinity"), frame.get("deadline"))
+        requests[frame["id"]] = request
+        threading.Thread(target=run, args=(frame, request), daemon=True).start()
+
+    service.unload_model()
+
+
+class InferenceWorker:
+    """
+    Inference Worker - client for the model running in a child process
+
+    Keeps the model's memory and CPU-bound inference out of the API
+    process, and a model crash only takes down the worker. A supervisor
+    thread starts the worker, routes reply frames to their callers and
+    restarts the worker (with backoff) when it exits unexpectedly;
+    requests in flight at the time fail with RuntimeError.
+
+    Usage:
+        worker = InferenceWorker()
+        worker.start()
+        worker.wait_until_loaded(60)
+        text = worker.generate(prompt, max_tokens=300)
+    """
+
+    RESTART_BACKOFF_SECONDS = 1.0
+    MAX_RESTART_BACKOFF_SECONDS = 30.0
+
+    def __init__(
+        self,
+        use_mmap: bool = True,
+        service_factory: Callable = _local_service,
+        on_status: Optional[Callable[[bool, Optional[str]], None]] = None,
+    ):
+        """
+        Initialize InferenceWorker
+
+        Args:
+            use_mmap: Memory-map the model file in the worker
+            service_factory: Picklable callable returning the LLMService the
+                worker runs
+            on_status: Called with (loaded, load_error) whenever the worker
+                reports its model state or exits
+        """
+        self.use_mmap = use_mmap
+        self.service_factory = service_factory
+        self.on_status = on_status
+
+        self._mp = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()  # Guards the connection and pending requests
+        self._conn = None
+        self._process = None
+        self._pending: Dict[int, queue.Queue] = {}
+        self._ids = itertools.count(1)
+        self._ready = threading.Event()  # Set once the worker reported its model state
+        self._stop_event = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.is_loaded = False
+        self.load_error: Optional[str] = None
+        self.restarts = 0
+        self.last_exit_code: Optional[int] = None
+        self._started_at: Optional[float] = None
+
+    def start(self) -> None:
+        """Start the worker process and its supervisor (no-op if running)"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._stop_event.clear()
+            self._ready.clear()  # A stopped worker left it set; wait for the new one
+
+        self._thread = threading.Thread(target=self._supervise, daemon=True, name="inference-worker")
+        self._thread.start()
+        logger.info("Inference worker started")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stop the worker process
+
+        Args:
+            timeout: Seconds to wait for the worker to exit before killing it
+        """
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._stop_event.set()
+            conn = self._conn
+            process = self._process
+
+        if conn is not None:
+            try:
+                with self._lock:
+                    conn.send({"op": "shutdown"})
+            except (OSError, ValueError):
+                pass
+        if process is not None:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        if self._thread:
+            self._thread.join(timeout)
+        logger.info("Inference worker stopped")
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the worker is supervised (it may be restarting)"""
+        return self._running
+
+    def wait_until_loaded(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the worker to report its model state
+
+        Args:
+            timeout: Maximum seconds to wait (None = wait forever)
+
+        Returns:
+            bool: True if the worker's model is loaded
+        """
+        self._ready.wait(timeout)
+        return self.is_loaded
+
+    def _supervise(self) -> None:
+        """Run the worker, and restart it whenever it exits unexpectedly"""
+        backoff = self.RESTART_BACKOFF_SECONDS
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self._spawn()
+                self._read_frames()
+            except Exception as e:
+                logger.error(f"Inference worker failed: {e}", exc_info=True)
+            self._on_exit()
+
+            if self._stop_event.is_set():
+                break
+
+            # A worker that ran for a while starts over with a short backoff
+            if time.monotonic() - started > self.MAX_RESTART_BACKOFF_SECONDS:
+                backoff = self.RESTART_BACKOFF_SECONDS
+            logger.warning(
+                f"Inference worker exited (code {self.last_exit_code}); "
+                f"restarting in {backoff:.0f}s"
+            )
+            if self._stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.MAX_RESTART_BACKOFF_SECONDS)
+            self.restarts += 1
+
+    def _spawn(self) -> None:
+        """Start a worker process connected by a pipe"""
+        parent_conn, child_conn = self._mp.Pipe()
+        process = self._mp.Process(
+            target=_worker_main,
+            args=(child_conn, self.use_mmap, self.service_factory),
+            daemon=True,
+            name="inference-worker",
+        )
+        process.start()
+        child_conn.close()
+
+        with self._lock:
+            self._conn = parent_conn
+            self._process = process
+        self._ready.clear()
+        self._started_at = time.monotonic()
+        logger.info(f"Inference worker process {process.pid} starting")
+
+    def _read_frames(self) -> None:
+        """Route reply frames to their callers until the worker exits"""
+        conn = self._conn
+        while True:
+            try:
+                frame = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            if frame.get("type") == "status":
+                self._set_status(frame["loaded"], frame["error"])
+                self._ready.set()
+                continue
+
+            with self._lock:
+                frames = self._pending.get(frame["id"])
+            if frames is not None:
+                frames.put(frame)
+
+    def _on_exit(self) -> None:
+        """Clean up after the worker exited and fail the requests it was running"""
+        with self._lock:
+            conn, self._conn = self._conn, None
+            process, self._process = self._process, None
+            pending = list(self._pending.values())
+            self._pending.clear()
+
+        if conn is not None:
+            conn.close()
+        if process is not None:
+            process.join(5)
+            self.last_exit_code = process.exitcode
+
+        stopping = self._stop_event.is_set()
+        self._set_status(False, self.load_error if stopping else "Inference worker exited")
+
+        # Callers wait for a restarted worker, unless this one died while
+        # loading (likely to happen again) or it is being stopped
+        if self._ready.is_set() and not stopping:
+            self._ready.clear()
+        else:
+            self._ready.set()
+        for frames in pending:
+            frames.put({"type": "error", "error": "Inference worker exited"})
+
+    def _set_status(self, loaded: bool, error: Optional[str]) -> None:
+        """Record the worker's model state"""
+        self.is_loaded = loaded
+        self.load_error = error
+        if self.on_status is not None:
+            self.on_status(loaded, error)
+
+    def _send(self, frame: Dict[str, Any]) -> None:
+        """Send a frame to the worker"""
+        with self._lock:
+            if self._conn is None:
+                raise RuntimeError("Inference worker is not running")
+            try:
+                self._conn.send(frame)
+            except (OSError, ValueError) as e:
+                raise RuntimeError(f"Inference worker is not reachable: {e}")
+
+    def _request(
+        self,
+        op: str,
+        request: Optional[InferenceRequest],
+        lane: InferenceLane,
+        timeout: Optional[float] = None,
+        **frame,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Send a request and yield its reply frames
+
+        The last frame is the one that isn't a token. If the request is
+        cancelled, or the caller stops reading early, the worker is told
+        to cancel it.
+        """
+        if request is not None:
+            if request.cancelled:
+                raise InferenceCancelled("Inference request cancelled")
+            lane = request.lane
+        request_id = next(self._ids)
+        frames: queue.Queue = queue.Queue()
+        with self._lock:
+            self._pending[request_id] = frames
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        finished = cancel_sent = False
+        try:
+            self._send({
+                "op": op,
+                "id": request_id,
+                "lane": int(lane),
+                "affinity": request.affinity if request is not None else None,
+                "deadline": request.remaining_seconds() if request is not None else None,
+                **frame,
+            })
+            while True:
+                if request is not None and request.cancelled and not cancel_sent:
+                    self._send({"op": "cancel", "id": request_id})
+                    cancel_sent = True
+                try:
+                    reply = frames.get(timeout=CANCEL_POLL_SECONDS)
+                except queue.Empty:
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise TimeoutError(f"Inference worker did not answer {op} in {timeout}s")
+                    continue
+
+                finished = reply["type"] != "token"
+                yield reply
+                if finished:
+                    return
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            if not finished and not cancel_sent:
+                try:
+                    self._send({"op": "cancel", "id": request_id})
+                except RuntimeError:
+                    pass
+
+    @staticmethod
+    def _result(frame: Dict[str, Any]) -> Any:
+        """Result of a final frame (recording the worker's spans), or the error it reports"""
+        if frame["type"] == "done":
+            for stage, seconds in frame.get("spans", {}).items():
+                record_span(stage, seconds)
+            return frame["result"]
+        if frame["type"] == "cancelled":
+            raise InferenceCancelled("Inference request cancelled")
+        raise RuntimeError(frame["error"])
+
+    def generate(
+        self,
+        prompt: str,
+        lane: InferenceLane = InferenceLane.INTERACTIVE,
+        request: Optional[InferenceRequest] = None,
+        **kwargs,
+    ) -> str:
+        """
+        Generate a response in the worker
+
+        Args:
+            prompt: The full prompt to send to the model
+            lane: Scheduler priority lane (ignored if request is given)
+            request: Ticket that can cancel the request
+            **kwargs: max_tokens, temperature, stop and grammar
+
+        Returns:
+            Generated text response
+
+        Raises:
+            InferenceCancelled: If the request was cancelled
+            RuntimeError: If the worker failed or exited
+        """
+        for frame in self._request("generate", request, lane, prompt=prompt, kwargs=kwargs):
+            return self._result(frame)
+
+    def generate_stream(
+        self,
+        prompt: str,
+        lane: InferenceLane = InferenceLane.INTERACTIVE,
+        request: Optional[InferenceRequest] = None,
+        **kwargs,
+    ) -> Iterator[str]:
+        """
+        Stream a response from the worker token by token
+
+        Args:
+            prompt: The full prompt to send to the model
+            lane: Scheduler priority lane (ignored if request is given)
+            request: Ticket that can cancel the stream
+            **kwargs: max_tokens, temperature and stop
+
+        Yields:
+            Generated text tokens
+        """
+        for frame in self._request("stream", request, lane, prompt=prompt, kwargs=kwargs):
+            if frame["type"] == "token":
+                yield frame["text"]
+            elif frame["type"] != "cancelled":
+                self._result(frame)
+
+    def get_embedding(self, text: str, lane: InferenceLane = InferenceLane.BACKGROUND) -> list:
+        """Get an embedding vector from the worker"""
+        for frame in self._request("embed", None, lane, text=text):
+            return self._result(frame)
+
+    def count_tokens(self, text: str) -> int:
+        """Count model tokens in the worker"""
+        for frame in self._request("tokenize", None, InferenceLane.INTERACTIVE, text=text):
+            return self._result(frame)
+
+    def get_model_info(self, timeout: float = 2.0) -> Optional[Dict[str, Any]]:
+        """
+        Get the worker's model information
+
+        Args:
+            timeout: Maximum seconds to wait for the answer
+
+        Returns:
+            The worker's LLMService.get_model_info(), or None if unavailable
+        """
+        try:
+            for frame in self._request("info", None, InferenceLane.INTERACTIVE, timeout=timeout):
+                return self._result(frame)
+        except (RuntimeError, TimeoutError) as e:
+            logger.debug(f"Inference worker info unavailable: {e}")
+            return None
+
+    def get_health(self) -> Dict[str, Any]:
+        """
+        Get worker health for the health endpoint
+
+        Returns:
+            Dictionary with process state, model state, restarts and
+            requests in flight
+        """
+        process = self._process
+        alive = process is not None and process.is_alive()
+        return {
+            "running": self._running,
+            "alive": alive,
+            "pid": process.pid if alive else None,
+            "loaded": self.is_loaded,
+            "load_error": self.load_error,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+            "pending_requests": len(self._pending),
+            "uptime_seconds": round(time.monotonic() - self._started_at, 1) if alive else None,
+        }
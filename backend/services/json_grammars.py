@@ -0,0 +1,29 @@
+"""
+JSON Grammars
+GBNF grammars that constrain LLM output to the JSON shapes the services parse
+
+With a grammar the model can only emit valid JSON of the expected shape,
+and generation ends as soon as the top-level value closes.
+"""
+
+# Strings and whitespace (adapted from llama.cpp's grammars/json.gbnf;
+# whitespace is bounded so the model can't pad the output)
+_COMMON_RULES = r"""
+string ::= "\"" ( [^"\\\x7F\x00-\x1F] | "\\" ( ["\\/bfnrt] | "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] ) )* "\""
+strings ::= "[" ws ( string ( "," ws string )* )? ws "]"
+ws ::= | " " | "\n" | "\n  " | "\n    "
+"""
+
+# MemoryExtractionPrompt: array of {category, key, value, confidence}
+MEMORY_EXTRACTION_GRAMMAR = r"""
+root ::= "[" ws ( memory ( "," ws memory )* )? ws "]"
+memory ::= "{" ws "\"category\":" ws category "," ws "\"key\":" ws string "," ws "\"value\":" ws string "," ws "\"confidence\":" ws confidence ws "}"
+category ::= "\"favorite\"" | "\"dislike\"" | "\"person\"" | "\"goal\"" | "\"achievement\"" | "\"basic\""
+confidence ::= "0" ( "." [0-9] [0-9]? )? | "1" ( "." "0" "0"? )?
+""" + _COMMON_RULES
+
+# ConversationSummaryService: {summary, topics, mood, key_moments, safety_concerns}
+SUMMARY_GRAMMAR = r"""
+root ::= "{" ws "\"summary\":" ws string "," ws "\"topics\":" ws strings "," ws "\"mood\":" ws mood "," ws "\"key_moments\":" ws strings "," ws "\"safety_concerns\":" ws strings ws "}"
+mood ::= "\"positive\"" | "\"neutral\"" | "\"frustrated\"" | "\"confused\"" | "\"engaged\"" | "\"discouraged\""
+""" + _COMMON_RULES
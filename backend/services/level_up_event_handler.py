@@ -8,6 +8,7 @@ import logging
 from datetime import datetime
 
 from sqlalchemy.orm import Session
+from database.database import commit_or_stage
 from models.personality import BotPersonality
 from models.level_up_event import LevelUpEvent
 from services.friendship_progression import friendship_manager
@@ -104,8 +105,8 @@ class LevelUpEventHandler:
         event.set_rewards(rewards)
 
         db.add(event)
-        db.commit()
-        db.refresh(event)
+        if commit_or_stage(db):
+            db.refresh(event)
 
         logger.info(
             f"Created level-up event for user {user_id}: "
@@ -6,16 +6,191 @@ Includes response caching for improved performance
 
 from typing import Optional, Dict, Any, Iterator
 import logging
+import os
 from pathlib import Path
 import threading
 import time
 import hashlib
+import json
+import re
+from contextlib import contextmanager
+
+import psutil
 
 from utils.config import settings
-from utils.cache import TTLCache, generate_cache_key, cache_cleanup_scheduler
+from utils.cache import TTLCache, PersistentCache, generate_cache_key, cache_cleanup_scheduler
+from utils.memory_profiler import memory_profiler
+from utils.metrics import record_span
+from services.inference_scheduler import (
+    InferenceCancelled,
+    InferenceLane,
+    InferenceRequest,
+    inference_scheduler,
+)
+from services.inference_worker import InferenceWorker
 
 logger = logging.getLogger("chatbot.llm_service")
 
+# KV cache bytes per token when the model metadata can't be read
+# (f16 K and V for a Llama 3.2 3B: 2 * 28 layers * 1024 KV dims * 2 bytes)
+DEFAULT_KV_BYTES_PER_TOKEN = 2 * 28 * 1024 * 2
+
+# Compute buffers and scratch space on top of the KV cache
+CONTEXT_OVERHEAD = 1.5
+
+# Speculative decoding modes (MODEL_SPECULATIVE_DECODING)
+SPECULATIVE_MODES = ("off", "prompt_lookup")
+
+# End of a sentence: terminal punctuation, closing quotes/brackets, then a space or the end
+SENTENCE_END = re.compile(r"[.!?\u2026][\"')\]\u201d\u2019]*(?=\s|$)")
+
+
+def truncate_at_sentence(text: str) -> str:
+    """
+    Cut a reply that was stopped early after its last complete sentence
+
+    Args:
+        text: Generated text
+
+    Returns:
+        Text up to the last sentence end, or the text with an ellipsis if
+        it has no complete sentence
+    """
+    ends = [match.end() for match in SENTENCE_END.finditer(text)]
+    if ends:
+        return text[:ends[-1]].strip()
+
+    text = text.rstrip(" ,;:-")
+    return f"{text}..." if text else text
+
+
+class DraftCounter:
+    """
+    Counts the tokens a draft model proposes
+
+    llama-cpp-python calls the draft model once per decoding step and
+    doesn't report how many drafted tokens it accepted. Each step yields
+    one sampled token plus the accepted drafts, so a generation of N
+    tokens in S steps accepted about N - S of them.
+    """
+
+    def __init__(self, draft_model):
+        """
+        Initialize DraftCounter
+
+        Args:
+            draft_model: llama_cpp LlamaDraftModel to wrap
+        """
+        self.draft_model = draft_model
+        self.calls = 0
+        self.drafted = 0
+
+    def __call__(self, input_ids, **kwargs):
+        """Draft tokens for the next step"""
+        tokens = self.draft_model(input_ids, **kwargs)
+        self.calls += 1
+        self.drafted += len(tokens)
+        return tokens
+
+
+# Bytes read from each of the start, middle and end of the model file for its fingerprint
+FINGERPRINT_SAMPLE_BYTES = 1024 * 1024
+
+
+def model_fingerprint(path: Path) -> str:
+    """
+    Fingerprint a model file for cache keys
+
+    Hashes the file size and samples from its start (GGUF header and
+    metadata), middle and end, so it takes milliseconds instead of reading
+    gigabytes, yet differs for any other model or quantization.
+
+    Args:
+        path: Model file
+
+    Returns:
+        Hex digest, or "missing" if the file can't be read
+    """
+    try:
+        size = path.stat().st_size
+        digest = hashlib.sha256(str(size).encode())
+        with open(path, "rb") as f:
+            for offset in (0, max(size // 2 - FINGERPRINT_SAMPLE_BYTES // 2, 0), max(size - FINGERPRINT_SAMPLE_BYTES, 0)):
+                f.seek(offset)
+                digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        return digest.hexdigest()[:16]
+    except OSError:
+        return "missing"
+
+
+def estimate_context_mb(n_ctx: int, metadata: Optional[Dict[str, str]] = None) -> float:
+    """
+    Estimate the memory of one model context
+
+    Args:
+        n_ctx: Context length in tokens
+        metadata: GGUF metadata of the model (a Llama 3.2 3B is assumed if
+            missing or incomplete)
+
+    Returns:
+        Megabytes for the f16 KV cache plus compute buffers
+    """
+    try:
+        arch = metadata["general.architecture"]
+        layers = int(metadata[f"{arch}.block_count"])
+        embedding = int(metadata[f"{arch}.embedding_length"])
+        heads = int(metadata[f"{arch}.attention.head_count"])
+        kv_heads = int(metadata.get(f"{arch}.attention.head_count_kv", heads))
+        bytes_per_token = 2 * layers * (embedding * kv_heads // heads) * 2
+    except (TypeError, KeyError, ValueError, ZeroDivisionError):
+        bytes_per_token = DEFAULT_KV_BYTES_PER_TOKEN
+
+    return n_ctx * bytes_per_token * CONTEXT_OVERHEAD / (1024 * 1024)
+
+
+def plan_context_pool(
+    weights_mb: float,
+    context_mb: float,
+    cpu_cores: Optional[int] = None,
+    available_mb: Optional[float] = None,
+    gpu_offload: bool = False,
+) -> Dict[str, int]:
+    """
+    Size the model context pool from CPU cores and free RAM
+
+    MODEL_CONTEXTS overrides the sizing. Otherwise each context needs
+    MODEL_MIN_THREADS_PER_CONTEXT cores and its memory must fit next to
+    the weights and MODEL_RAM_RESERVE_MB. With GPU offload only one
+    context is used, since VRAM isn't measured.
+
+    Args:
+        weights_mb: Size of the model weights
+        context_mb: Memory of each context (plus the weights if they are
+            not memory-mapped, since every context then loads its own copy)
+        cpu_cores: Physical CPU cores (detected if None)
+        available_mb: Available system RAM (from the memory profiler if None)
+        gpu_offload: Whether layers are offloaded to a GPU
+
+    Returns:
+        Dictionary with contexts and threads_per_context
+    """
+    if cpu_cores is None:
+        cpu_cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+
+    if settings.MODEL_CONTEXTS > 0:
+        contexts = settings.MODEL_CONTEXTS
+    elif gpu_offload:
+        contexts = 1
+    else:
+        if available_mb is None:
+            available_mb = memory_profiler.get_memory_info()["system_available_mb"]
+        spare_mb = available_mb - settings.MODEL_RAM_RESERVE_MB - weights_mb - context_mb
+        by_ram = 1 + int(spare_mb // max(context_mb, 1))
+        by_cpu = cpu_cores // max(settings.MODEL_MIN_THREADS_PER_CONTEXT, 1)
+        contexts = max(1, min(by_cpu, by_ram, settings.MODEL_MAX_CONTEXTS))
+
+    return {"contexts": contexts, "threads_per_context": max(1, cpu_cores // contexts)}
+
 
 class LLMService:
     """
@@ -24,10 +199,28 @@ class LLMService:
     Uses llama-cpp-python to run GGUF format models locally.
     Provides a clean interface for generating responses with personality.
     Optimized for fast loading with mmap and background initialization.
+
+    The weights are memory-mapped once and shared by a pool of independent
+    contexts (sized from CPU cores and RAM), so chats from different
+    profiles can generate in parallel. All model calls go through the
+    inference scheduler, which hands each request a free context and
+    serves the child's chat before background work.
+
+    With MODEL_OUT_OF_PROCESS the model runs in a supervised worker
+    process instead, and this service is a thin client with the same API
+    (the response cache stays here).
     """
 
-    def __init__(self):
-        self.model = None
+    def __init__(self, use_worker: Optional[bool] = None):
+        """
+        Initialize LLMService
+
+        Args:
+            use_worker: Run the model in a worker process (defaults to
+                MODEL_OUT_OF_PROCESS)
+        """
+        self.contexts = []  # Llama instances sharing the mmap'd weights
+        self.threads_per_context = None
         self.model_path = settings.get_model_path()
         self.is_loaded = False
         self.is_loading = False
@@ -44,6 +237,29 @@ class LLMService:
         self._load_lock = threading.Lock()
         self._loading_thread = None
 
+        # Generation activity (used by background work to find idle time)
+        self._activity_lock = threading.Lock()
+        self._active_generations = 0
+        self.last_generation_end = 0.0  # time.monotonic() of the last finished generation
+        self.loaded_at = 0.0  # time.monotonic() of the last finished load
+
+        # One model call per context, highest-priority lane first
+        self.scheduler = inference_scheduler
+
+        # Decoding speed and speculative draft acceptance (under _activity_lock)
+        self.speculative_mode = settings.MODEL_SPECULATIVE_DECODING
+        self._decoding_stats = {
+            "generations": 0, "tokens": 0, "seconds": 0.0, "drafted": 0, "accepted": 0
+        }
+
+        # Grammar-constrained JSON: compiled grammars per (context, grammar)
+        # and per-task parse success and tokens (under _activity_lock)
+        self._grammars = {}
+        self._structured_stats = {}
+
+        # Generations stopped before they finished (under _activity_lock)
+        self._stop_stats = {"cancelled": 0, "deadline_truncated": 0, "token_truncated": 0}
+
         # Response cache - configurable via settings
         # Only caches identical prompts with same parameters
         cache_ttl = getattr(settings, 'CACHE_TTL_SECONDS', 3600)
@@ -54,6 +270,24 @@ class LLMService:
         # Register cache for periodic cleanup
         cache_cleanup_scheduler.register_cache(self._response_cache)
 
+        # Persistent tier for near-deterministic replies (extraction, summaries),
+        # so they are served warm after a restart. Keys include the model's
+        # fingerprint, so replies from another model file are never served.
+        self._persistent_cache = None
+        if getattr(settings, 'ENABLE_PERSISTENT_CACHE', False):
+            self._persistent_cache = PersistentCache(
+                settings.PERSISTENT_CACHE_PATH,
+                default_ttl=settings.PERSISTENT_CACHE_TTL_SECONDS,
+                max_mb=settings.PERSISTENT_CACHE_MAX_MB,
+            )
+            cache_cleanup_scheduler.register_cache(self._persistent_cache)
+        self._model_fingerprint = None  # (path, size, mtime, fingerprint)
+
+        # Out-of-process model (None = the model is loaded in this process)
+        if use_worker is None:
+            use_worker = settings.MODEL_OUT_OF_PROCESS
+        self.worker = InferenceWorker(on_status=self._on_worker_status) if use_worker else None
+
     def load_model(self, blocking: bool = True, use_mmap: bool = True) -> bool:
         """
         Load the LLM model into memory with optimizations
@@ -70,6 +304,9 @@ class LLMService:
                 logger.warning("Model already loaded")
                 return True
 
+            if self.worker is not None:
+                return self._start_worker(blocking, use_mmap)
+
             if self.is_loading:
                 logger.warning("Model is already loading")
                 return blocking and self._wait_for_load()
@@ -106,21 +343,50 @@ class LLMService:
             # Load model with optimizations
             logger.info("Optimization: Using memory-mapped files for faster loading" if use_mmap else "Optimization: Disabled mmap")
 
-            self.model = Llama(
-                model_path=str(self.model_path),
-                n_ctx=self.context_length,
-                n_gpu_layers=self.n_gpu_layers,
-                verbose=False,  # Reduce llama.cpp logging
-                use_mmap=use_mmap,  # Memory-mapped files for faster loading
-                use_mlock=False,  # Don't lock memory (can cause issues on some systems)
-                n_threads=None,  # Auto-detect optimal thread count
+            # Size the context pool (threads are split between the contexts)
+            weights_mb = self.model_path.stat().st_size / (1024 * 1024)
+            context_mb = estimate_context_mb(self.context_length, self._read_metadata(Llama))
+            pool = plan_context_pool(
+                weights_mb,
+                context_mb if use_mmap else context_mb + weights_mb,
+                gpu_offload=self.n_gpu_layers != 0,
             )
+            self.threads_per_context = pool["threads_per_context"]
+
+            contexts = []
+            for _ in range(pool["contexts"]):
+                try:
+                    contexts.append(Llama(
+                        model_path=str(self.model_path),
+                        n_ctx=self.context_length,
+                        n_gpu_layers=self.n_gpu_layers,
+                        verbose=False,  # Reduce llama.cpp logging
+                        use_mmap=use_mmap,  # Memory-mapped files; weights shared by every context
+                        use_mlock=False,  # Don't lock memory (can cause issues on some systems)
+                        n_threads=self.threads_per_context,
+                        draft_model=self._make_draft_model(),  # One per context (holds counters)
+                    ))
+                except Exception as e:
+                    if not contexts:
+                        raise
+                    logger.warning(f"Stopped at {len(contexts)} model contexts: {e}")
+                    break
+
+            self.contexts = contexts
+            self._grammars.clear()
+            self.scheduler.resize(len(contexts))
 
             load_time = time.time() - self.load_start_time
+            self.loaded_at = time.monotonic()
             self.is_loaded = True
             self.is_loading = False
             logger.info(f"✓ Model loaded successfully in {load_time:.2f}s")
             logger.info(f"  Context length: {self.context_length}")
+            logger.info(
+                f"  Contexts: {len(contexts)} x {self.threads_per_context} threads "
+                f"(~{context_mb:.0f} MB each)"
+            )
+            logger.info(f"  Speculative decoding: {self.speculative_mode}")
             logger.info(f"  GPU layers: {self.n_gpu_layers}")
             logger.info(f"  Memory-mapped: {use_mmap}")
 
@@ -139,6 +405,89 @@ class LLMService:
             self.load_error = str(e)
             return False
 
+    def _start_worker(self, blocking: bool, use_mmap: bool) -> bool:
+        """
+        Start the worker process, which loads the model
+
+        Args:
+            blocking: If True, wait until the worker reports its model state
+            use_mmap: Use memory-mapped files in the worker
+
+        Returns:
+            bool: True if loaded (blocking) or started (non-blocking)
+        """
+        if not self.worker.is_running:
+            logger.info(f"Loading LLM model in worker process from: {self.model_path}")
+            self.load_start_time = time.time()
+            self.is_loading = True
+            self.worker.use_mmap = use_mmap
+            self.worker.start()
+
+        return self.worker.wait_until_loaded() if blocking else True
+
+    def _on_worker_status(self, loaded: bool, error: Optional[str]) -> None:
+        """Mirror the worker's model state (called on load, crash and stop)"""
+        if loaded:
+            self.loaded_at = time.monotonic()
+        self.is_loaded = loaded
+        self.is_loading = False
+        self.load_error = error
+
+    def _make_draft_model(self) -> Optional[DraftCounter]:
+        """
+        Create the draft model for speculative decoding
+
+        Prompt lookup drafts the tokens that followed the latest n-gram the
+        last time it appeared in the prompt. Chat replies often repeat names,
+        favorites and the question itself, so those drafts are accepted often.
+
+        Returns:
+            Counted draft model, or None if speculative decoding is off or
+            unsupported by the installed llama-cpp-python
+        """
+        if self.speculative_mode == "off":
+            return None
+
+        if self.speculative_mode != "prompt_lookup":
+            logger.warning(
+                f"Unknown MODEL_SPECULATIVE_DECODING '{self.speculative_mode}' "
+                f"(expected one of {SPECULATIVE_MODES}); decoding normally"
+            )
+            self.speculative_mode = "off"
+            return None
+
+        try:
+            from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+        except ImportError:
+            logger.warning(
+                "Installed llama-cpp-python has no speculative decoding "
+                "(llama_speculative); decoding normally"
+            )
+            self.speculative_mode = "off"
+            return None
+
+        return DraftCounter(LlamaPromptLookupDecoding(
+            max_ngram_size=settings.MODEL_DRAFT_NGRAM_SIZE,
+            num_pred_tokens=settings.MODEL_DRAFT_TOKENS,
+        ))
+
+    def _read_metadata(self, llama_class) -> Optional[Dict[str, str]]:
+        """
+        Read the GGUF metadata without loading the weights
+
+        Args:
+            llama_class: The llama_cpp.Llama class
+
+        Returns:
+            Metadata dictionary, or None if it couldn't be read
+        """
+        try:
+            probe = llama_class(model_path=str(self.model_path), vocab_only=True, verbose=False)
+            return dict(probe.metadata)
+        except Exception as e:
+            logger.debug(f"Could not read model metadata: {e}")
+            return None
+
     def _load_model_async(self, use_mmap: bool = True) -> bool:
         """
         Asynchronous model loading (loads in background thread)
@@ -198,6 +547,10 @@ class LLMService:
         if self.is_loaded:
             return True
 
+        if self.worker is not None:
+            self.load_model(blocking=False)  # Starts the worker unless it is running (or restarting)
+            return self.worker.wait_until_loaded(timeout)
+
         if self.is_loading:
             logger.info("Waiting for model to finish loading...")
             return self._wait_for_load(timeout)
@@ -205,14 +558,68 @@ class LLMService:
         logger.info("Model not loaded, loading now...")
         return self.load_model(blocking=True)
 
+    @property
+    def model(self):
+        """First model context (None if not loaded)"""
+        return self.contexts[0] if self.contexts else None
+
+    @model.setter
+    def model(self, value) -> None:
+        """Replace the pool with a single context"""
+        self.contexts = [value] if value is not None else []
+
+    def _require_model(self) -> None:
+        """
+        Load the model if it is not loaded (it may have been unloaded while idle)
+
+        Raises:
+            RuntimeError: If model cannot be loaded
+        """
+        if not self.is_loaded:
+            logger.info("Model not loaded, attempting lazy load...")
+            if not self.ensure_loaded():
+                raise RuntimeError(f"Model could not be loaded: {self.load_error or 'Unknown error'}")
+
+        if self.worker is None and self.model is None:
+            raise RuntimeError("Model not loaded. Call load_model() first.")
+
+    def unload_if_idle(self, min_idle_seconds: float) -> bool:
+        """
+        Unload the model if no generation has run for a while
+
+        Idle time counts from the last generation or, if none ran since,
+        from when the model finished loading. Holds the activity lock while
+        unloading, so a generation either finishes first or starts after
+        the unload and lazily reloads.
+
+        Args:
+            min_idle_seconds: Seconds since the last generation ended (or the load)
+
+        Returns:
+            bool: True if the model was unloaded
+        """
+        with self._activity_lock:
+            if not self.is_loaded or self._active_generations or self.scheduler.busy:
+                return False
+            if time.monotonic() - max(self.last_generation_end, self.loaded_at) < min_idle_seconds:
+                return False
+
+            self.unload_model()
+            return True
+
     def unload_model(self) -> None:
         """
         Unload the model from memory
         Useful for cleanup on shutdown
         """
+        if self.worker is not None:
+            self.worker.stop()
+            return
+
         if self.model is not None:
             logger.info("Unloading LLM model...")
-            self.model = None
+            self.contexts = []
+            self._grammars.clear()
             self.is_loaded = False
             logger.info("✓ Model unloaded")
 
@@ -224,6 +631,9 @@ class LLMService:
         stop: Optional[list] = None,
         stream: bool = False,
         use_cache: bool = True,
+        lane: InferenceLane = InferenceLane.INTERACTIVE,
+        request: Optional[InferenceRequest] = None,
+        grammar: Optional[str] = None,
     ) -> str:
         """
         Generate a response from the LLM with optional caching
@@ -235,21 +645,19 @@ class LLMService:
             stop: List of stop sequences
             stream: Whether to stream the response (not implemented yet)
             use_cache: Whether to use response cache (default: True)
+            lane: Scheduler priority lane (ignored if request is given)
+            request: Ticket that can cancel the request while it waits or runs
+            grammar: GBNF grammar the output must follow (see services/json_grammars.py)
 
         Returns:
             Generated text response
 
         Raises:
             RuntimeError: If model is not loaded or cannot be loaded
+            InferenceCancelled: If the request was cancelled
         """
         # Ensure model is loaded (lazy loading)
-        if not self.is_loaded:
-            logger.info("Model not loaded, attempting lazy load...")
-            if not self.ensure_loaded():
-                raise RuntimeError(f"Model could not be loaded: {self.load_error or 'Unknown error'}")
-
-        if self.model is None:
-            raise RuntimeError("Model not loaded. Call load_model() first.")
+        self._require_model()
 
         # Use defaults from settings if not provided
         if max_tokens is None:
@@ -263,9 +671,14 @@ class LLMService:
 
         # Check cache if enabled
         if self._cache_enabled and use_cache:
-            cache_key = self._generate_cache_key(prompt, max_tokens, temperature, stop)
+            cache_key = self._generate_cache_key(prompt, max_tokens, temperature, stop, grammar)
             cached_response = self._response_cache.get(cache_key)
 
+            if cached_response is None and self._persists(temperature):
+                cached_response = self._persistent_cache.get(cache_key)
+                if cached_response is not None:
+                    self._response_cache.set(cache_key, cached_response)
+
             if cached_response is not None:
                 logger.debug(f"Cache HIT for prompt: {prompt[:50]}...")
                 return cached_response
@@ -273,39 +686,393 @@ class LLMService:
         try:
             logger.debug(f"Generating response (max_tokens={max_tokens}, temp={temperature})")
 
-            # Generate response
-            response = self.model(
+            # Generate response (in the worker process, if there is one)
+            with self._track_generation():
+                self._require_model()  # Reload if it was unloaded since the check above
+                if self.worker is not None:
+                    text = self.worker.generate(
+                        prompt, lane=lane, request=request,
+                        max_tokens=max_tokens, temperature=temperature, stop=stop, grammar=grammar,
+                    )
+                else:
+                    text = self._generate_local(prompt, max_tokens, temperature, stop, lane, request, grammar)
+
+            logger.debug(f"Generated {len(text)} characters")
+
+            # Cache the response if caching is enabled (not if a deadline cut it short)
+            if self._cache_enabled and use_cache and not (request is not None and request.expired):
+                self._response_cache.set(cache_key, text)
+                if self._persists(temperature):
+                    self._persistent_cache.set(cache_key, text)
+
+            return text
+
+        except InferenceCancelled:
+            raise
+
+        except Exception as e:
+            logger.error(f"Error generating response: {e}", exc_info=True)
+            return "I'm having trouble thinking right now. Can you try asking again?"
+
+    def _generate_local(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        stop: list,
+        lane: InferenceLane = InferenceLane.INTERACTIVE,
+        request: Optional[InferenceRequest] = None,
+        grammar: Optional[str] = None,
+    ) -> str:
+        """
+        Run one generation on a model context of this process
+
+        Unlike generate(), errors are raised (no cache, no fallback reply).
+        A reply stopped by the request's deadline or by max_tokens is cut
+        after its last complete sentence.
+
+        Returns:
+            Generated text
+
+        Raises:
+            InferenceCancelled: If the request was cancelled, or its deadline
+                passed before a sentence was generated
+        """
+        queued = time.perf_counter()
+        # Waits for a free context in the request's lane
+        with self.scheduler.slot(lane, request) as ticket:
+            context = self.contexts[ticket.context]
+            draft = self._draft_counts(context)
+            start = time.perf_counter()
+            first_token: list = []
+            response = context(
                 prompt,
                 max_tokens=max_tokens,
                 temperature=temperature,
                 stop=stop,
                 echo=False,  # Don't include prompt in output
+                **self._stopping_kwargs(request, first_token),
+                **self._grammar_kwargs(ticket.context, grammar),
             )
+            end = time.perf_counter()
+            self._record_spans(queued, start, first_token[0] if first_token else None, end)
+            if isinstance(response, dict) and "usage" in response:
+                self._record_decoding(context, draft, response["usage"]["completion_tokens"], end - start)
+
+        if ticket.cancelled:
+            self._record_stop("cancelled")
+            raise InferenceCancelled("Inference request cancelled during generation")
+
+        # Extract text from response
+        finish_reason = None
+        if isinstance(response, dict) and "choices" in response:
+            text = response["choices"][0]["text"].strip()
+            finish_reason = response["choices"][0].get("finish_reason")
+        else:
+            text = str(response).strip()
+
+        if ticket.expired:
+            limit = "deadline_truncated"
+        elif finish_reason == "length":
+            limit = "token_truncated"
+        else:
+            return text
 
-            # Extract text from response
-            if isinstance(response, dict) and "choices" in response:
-                text = response["choices"][0]["text"].strip()
-            else:
-                text = str(response).strip()
+        self._record_stop(limit)
+        if grammar is not None:
+            return text  # Cut-off JSON is left for the caller to reject
+        text = truncate_at_sentence(text)
+        if not text:
+            raise InferenceCancelled("Inference request deadline passed before a reply was generated")
+        return text
 
-            logger.debug(f"Generated {len(text)} characters")
+    @staticmethod
+    def _record_spans(queued: float, start: float, first_token: Optional[float], end: float) -> None:
+        """
+        Record the latency stages of one generation (time.perf_counter() values)
 
-            # Cache the response if caching is enabled
-            if self._cache_enabled and use_cache:
-                self._response_cache.set(cache_key, text)
+        Args:
+            queued: When the request started waiting for a context
+            start: When the model call started
+            first_token: When the first token was sampled (None if not observed)
+            end: When the model call returned
+        """
+        record_span("llm_queue", start - queued)
+        if first_token is None:
+            record_span("llm_generation", end - start)
+        else:
+            # Prompt evaluation, plus sampling the first token
+            record_span("llm_prompt_eval", first_token - start)
+            record_span("llm_generation", end - first_token)
+
+    @staticmethod
+    def _draft_counts(context) -> Optional[tuple]:
+        """Draft counters of a context before a generation (None without speculation)"""
+        draft = getattr(context, "draft_model", None)
+        return (draft.calls, draft.drafted) if isinstance(draft, DraftCounter) else None
+
+    def _record_decoding(self, context, draft_before: Optional[tuple], tokens: int, seconds: float) -> None:
+        """
+        Record the speed of one generation and, with speculation, its draft acceptance
 
-            return text
+        Args:
+            context: Model context that ran the generation
+            draft_before: _draft_counts() taken before the generation
+            tokens: Tokens generated
+            seconds: Generation time
+        """
+        drafted = accepted = 0
+        if draft_before is not None:
+            draft = context.draft_model
+            steps = draft.calls - draft_before[0] + 1  # The first step has no draft
+            drafted = draft.drafted - draft_before[1]
+            accepted = min(max(tokens - steps, 0), drafted)
+
+        with self._activity_lock:
+            stats = self._decoding_stats
+            stats["generations"] += 1
+            stats["tokens"] += tokens
+            stats["seconds"] += seconds
+            stats["drafted"] += drafted
+            stats["accepted"] += accepted
+
+    def get_decoding_stats(self) -> Dict[str, Any]:
+        """
+        Get decoding speed and speculative decoding statistics
 
-        except Exception as e:
-            logger.error(f"Error generating response: {e}", exc_info=True)
-            return "I'm having trouble thinking right now. Can you try asking again?"
+        Returns:
+            Dictionary with the speculative mode, tokens/s and (estimated)
+            draft acceptance rate
+        """
+        with self._activity_lock:
+            stats = dict(self._decoding_stats)
+
+        return {
+            "speculative": self.speculative_mode,
+            "generations": stats["generations"],
+            "tokens": stats["tokens"],
+            "tokens_per_second": round(stats["tokens"] / stats["seconds"], 2) if stats["seconds"] else 0.0,
+            "drafted_tokens": stats["drafted"],
+            "accepted_tokens": stats["accepted"],
+            "acceptance_rate": round(stats["accepted"] / stats["drafted"], 3) if stats["drafted"] else None,
+        }
+
+    def _record_stop(self, reason: str) -> None:
+        """Count a generation that was cancelled or cut short (a _stop_stats key)"""
+        with self._activity_lock:
+            self._stop_stats[reason] += 1
+
+    def get_stop_stats(self) -> Dict[str, int]:
+        """
+        Get counts of generations that didn't run to completion
+
+        Returns:
+            Dictionary with generations cancelled mid-way (e.g. the client
+            disconnected), and replies truncated by a request deadline or by
+            max_tokens
+        """
+        with self._activity_lock:
+            return dict(self._stop_stats)
+
+    @contextmanager
+    def _track_generation(self):
+        """Count a generation as active for the duration of the block"""
+        with self._activity_lock:
+            self._active_generations += 1
+        try:
+            yield
+        finally:
+            with self._activity_lock:
+                self._active_generations -= 1
+                self.last_generation_end = time.monotonic()
+
+    @staticmethod
+    def _stopping_kwargs(request: Optional[InferenceRequest], first_token: Optional[list] = None) -> Dict[str, Any]:
+        """
+        Model arguments that stop generation once a request is cancelled or
+        past its deadline, and note when the first token was sampled
+
+        Args:
+            request: Caller's ticket (None if the call cannot be cancelled)
+            first_token: List that gets the time.perf_counter() of the first token
+
+        Returns:
+            Keyword arguments for the model call
+        """
+        criteria = []
+        if request is not None:
+            criteria.append(lambda input_ids, logits: request.should_stop)
+        if first_token is not None:
+            def note_first_token(input_ids, logits) -> bool:
+                if not first_token:
+                    first_token.append(time.perf_counter())
+                return False
+
+            criteria.append(note_first_token)
+        if not criteria:
+            return {}
+
+        try:
+            from llama_cpp import StoppingCriteriaList
+        except ImportError:
+            return {}
+
+        # Checked by llama.cpp after every sampled token
+        return {"stopping_criteria": StoppingCriteriaList(criteria)}
+
+    def _grammar_kwargs(self, context_index: int, grammar: Optional[str]) -> Dict[str, Any]:
+        """
+        Model arguments that constrain output to a GBNF grammar
+
+        A compiled grammar carries its parse state, so each context gets
+        its own copy (compiled once and reused).
+
+        Args:
+            context_index: Context that runs the generation
+            grammar: GBNF grammar text (None for unconstrained output)
+
+        Returns:
+            Keyword arguments for the model call
+        """
+        if grammar is None:
+            return {}
+
+        key = (context_index, grammar)
+        if key not in self._grammars:
+            self._grammars[key] = self._compile_grammar(grammar)
+        compiled = self._grammars[key]
+        return {"grammar": compiled} if compiled is not None else {}
+
+    @staticmethod
+    def _compile_grammar(grammar: str):
+        """Compile a GBNF grammar (None if llama-cpp-python is unavailable)"""
+        try:
+            from llama_cpp import LlamaGrammar
+        except ImportError:
+            return None
+        return LlamaGrammar.from_string(grammar, verbose=False)
+
+    def generate_json(
+        self,
+        prompt: str,
+        grammar: str,
+        task: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        lane: InferenceLane = InferenceLane.INTERACTIVE,
+    ) -> Optional[Any]:
+        """
+        Generate grammar-constrained JSON and parse it
+
+        The grammar only lets the model emit JSON of the expected shape, and
+        generation ends as soon as the top-level value closes (no stop
+        sequences or trailing prose needed). Parse success and output tokens
+        are recorded per task.
+
+        Args:
+            prompt: The full prompt to send to the model
+            grammar: GBNF grammar for the JSON (see services/json_grammars.py)
+            task: Name the statistics are recorded under
+            max_tokens: Maximum tokens to generate (defaults to settings)
+            temperature: Sampling temperature (defaults to settings)
+            lane: Scheduler priority lane
+
+        Returns:
+            Parsed JSON value, or None if generation failed or the output
+            was cut off at max_tokens
+
+        Raises:
+            RuntimeError: If model is not loaded or cannot be loaded
+            InferenceCancelled: If the request was cancelled
+        """
+        if max_tokens is None:
+            max_tokens = self.max_tokens
+
+        text = self.generate(
+            prompt, max_tokens=max_tokens, temperature=temperature, stop=[], lane=lane, grammar=grammar
+        )
+
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON for {task}: {text[:100]}")
+            value = None
+
+        self._record_structured(task, value is not None, self.count_tokens(text), max_tokens)
+        return value
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the model tokens in text
+
+        Args:
+            text: Text to tokenize
+
+        Returns:
+            Token count (a word count if the model can't tokenize)
+        """
+        try:
+            if self.worker is not None:
+                return self.worker.count_tokens(text)
+            return len(self.model.tokenize(text.encode("utf-8"), add_bos=False))
+        except Exception:
+            return len(text.split())
+
+    def _record_structured(self, task: str, valid: bool, tokens: int, max_tokens: int) -> None:
+        """
+        Record one grammar-constrained generation
+
+        Args:
+            task: Task name
+            valid: Whether the output parsed
+            tokens: Output tokens
+            max_tokens: Token budget of the call
+        """
+        with self._activity_lock:
+            stats = self._structured_stats.setdefault(
+                task, {"calls": 0, "valid": 0, "tokens": 0, "budget": 0}
+            )
+            stats["calls"] += 1
+            stats["valid"] += int(valid)
+            stats["tokens"] += tokens
+            stats["budget"] += max_tokens
+
+    def get_structured_output_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get grammar-constrained generation statistics
+
+        Returns:
+            Per task: calls, valid/failed parses, success rate, output tokens
+            and the budgeted tokens saved by stopping when the JSON closed
+        """
+        with self._activity_lock:
+            tasks = {task: dict(stats) for task, stats in self._structured_stats.items()}
+
+        return {
+            task: {
+                "calls": stats["calls"],
+                "valid": stats["valid"],
+                "failed": stats["calls"] - stats["valid"],
+                "success_rate": round(stats["valid"] / stats["calls"], 3),
+                "output_tokens": stats["tokens"],
+                "avg_output_tokens": round(stats["tokens"] / stats["calls"], 1),
+                "tokens_saved": max(stats["budget"] - stats["tokens"], 0),
+            }
+            for task, stats in tasks.items()
+        }
+
+    @property
+    def is_generating(self) -> bool:
+        """Whether a generation is currently running"""
+        return self._active_generations > 0
 
     def _generate_cache_key(
         self,
         prompt: str,
         max_tokens: int,
         temperature: float,
-        stop: list
+        stop: list,
+        grammar: Optional[str] = None,
     ) -> str:
         """
         Generate a cache key for LLM parameters
@@ -315,16 +1082,19 @@ class LLMService:
             max_tokens: Max tokens setting
             temperature: Temperature setting
             stop: Stop sequences
+            grammar: GBNF grammar constraining the output
 
         Returns:
             Hash string for cache key
         """
         # Create dictionary of all parameters that affect output
         key_data = {
+            'model': self.model_fingerprint,
             'prompt': prompt,
             'max_tokens': max_tokens,
             'temperature': temperature,
             'stop': sorted(stop) if stop else [],
+            'grammar': grammar,
         }
 
         # Use the utility function to generate hash
@@ -336,15 +1106,22 @@ class LLMService:
         max_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
         stop: Optional[list] = None,
+        lane: InferenceLane = InferenceLane.INTERACTIVE,
+        request: Optional[InferenceRequest] = None,
     ) -> Iterator[str]:
         """
         Generate a streaming response from the LLM (token by token)
 
+        The model is held until the stream is exhausted or closed. A
+        cancelled request ends the stream early.
+
         Args:
             prompt: The full prompt to send to the model
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
             stop: List of stop sequences
+            lane: Scheduler priority lane (ignored if request is given)
+            request: Ticket that can cancel the stream while it waits or runs
 
         Yields:
             Generated text tokens
@@ -353,13 +1130,7 @@ class LLMService:
             RuntimeError: If model is not loaded or cannot be loaded
         """
         # Ensure model is loaded (lazy loading)
-        if not self.is_loaded:
-            logger.info("Model not loaded, attempting lazy load...")
-            if not self.ensure_loaded():
-                raise RuntimeError(f"Model could not be loaded: {self.load_error or 'Unknown error'}")
-
-        if self.model is None:
-            raise RuntimeError("Model not loaded. Call load_model() first.")
+        self._require_model()
 
         if max_tokens is None:
             max_tokens = self.max_tokens
@@ -371,30 +1142,92 @@ class LLMService:
         try:
             logger.debug("Starting streaming generation")
 
-            # Generate with streaming
-            for output in self.model(
-                prompt,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                stop=stop,
-                stream=True,
-                echo=False,
-            ):
-                if isinstance(output, dict) and "choices" in output:
-                    token = output["choices"][0]["text"]
-                    if token:
-                        yield token
+            # Generate with streaming (in the worker process, if there is one)
+            if self.worker is not None:
+                tokens = self.worker.generate_stream(
+                    prompt, lane=lane, request=request,
+                    max_tokens=max_tokens, temperature=temperature, stop=stop,
+                )
+            else:
+                tokens = self._stream_local(prompt, max_tokens, temperature, stop, lane, request)
+
+            with self._track_generation():
+                self._require_model()  # Reload if it was unloaded since the check above
+                yield from tokens
+
+        except InferenceCancelled:
+            logger.debug("Streaming generation cancelled while waiting")
 
         except Exception as e:
             logger.error(f"Error in streaming generation: {e}", exc_info=True)
             yield "I'm having trouble thinking right now. Can you try asking again?"
 
-    def get_embedding(self, text: str) -> list[float]:
+    def _stream_local(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        stop: list,
+        lane: InferenceLane = InferenceLane.INTERACTIVE,
+        request: Optional[InferenceRequest] = None,
+    ) -> Iterator[str]:
+        """
+        Stream one generation from a model context of this process
+
+        The context is held until the stream is exhausted or closed; a
+        cancelled request or its deadline ends it early (tokens already sent
+        can't be cut back to a sentence end). Errors are raised.
+
+        Yields:
+            Generated text tokens
+        """
+        queued = time.perf_counter()
+        # Waits for a free context in the request's lane
+        with self.scheduler.slot(lane, request) as ticket:
+            context = self.contexts[ticket.context]
+            draft = self._draft_counts(context)
+            start = time.perf_counter()
+            first_token = None
+            chunks = 0  # About one token each
+            try:
+                for output in context(
+                    prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stop=stop,
+                    stream=True,
+                    echo=False,
+                ):
+                    if ticket.should_stop:
+                        logger.debug("Streaming generation cancelled")
+                        self._record_stop("cancelled" if ticket.cancelled else "deadline_truncated")
+                        return
+                    chunks += 1
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    if isinstance(output, dict) and "choices" in output:
+                        if output["choices"][0].get("finish_reason") == "length":
+                            self._record_stop("token_truncated")
+                        token = output["choices"][0]["text"]
+                        if token:
+                            yield token
+            finally:
+                end = time.perf_counter()
+                self._record_spans(queued, start, first_token, end)
+                if chunks:
+                    self._record_decoding(context, draft, chunks, end - start)
+
+    def get_embedding(
+        self,
+        text: str,
+        lane: InferenceLane = InferenceLane.BACKGROUND,
+    ) -> list[float]:
         """
         Get embedding vector for text (if model supports it)
 
         Args:
             text: Text to embed
+            lane: Scheduler priority lane
 
         Returns:
             List of floats representing the embedding
@@ -403,14 +1236,19 @@ class LLMService:
             RuntimeError: If model is not loaded
             NotImplementedError: If model doesn't support embeddings
         """
-        if not self.is_loaded or self.model is None:
-            raise RuntimeError("Model not loaded. Call load_model() first.")
+        with self._track_generation():  # Keeps the model from being unloaded meanwhile
+            if not self.is_loaded or (self.worker is None and self.model is None):
+                raise RuntimeError("Model not loaded. Call load_model() first.")
 
-        try:
-            embedding = self.model.embed(text)
-            return embedding
-        except AttributeError:
-            raise NotImplementedError("Model does not support embeddings")
+            if self.worker is not None:
+                return self.worker.get_embedding(text, lane=lane)
+
+            try:
+                with self.scheduler.slot(lane) as ticket:
+                    embedding = self.contexts[ticket.context].embed(text)
+                return embedding
+            except AttributeError:
+                raise NotImplementedError("Model does not support embeddings")
 
     def clear_cache(self) -> Dict[str, int]:
         """
@@ -421,6 +1259,8 @@ class LLMService:
         """
         stats = self._response_cache.get_stats()
         self._response_cache.clear()
+        if self._persistent_cache is not None:
+            self._persistent_cache.clear()
         logger.info("LLM response cache cleared")
         return stats
 
@@ -429,9 +1269,34 @@ class LLMService:
         Get response cache statistics
 
         Returns:
-            Dictionary with cache statistics
+            Dictionary with cache statistics (the on-disk tier's under "persistent")
         """
-        return self._response_cache.get_stats()
+        stats = self._response_cache.get_stats()
+        stats["persistent"] = (
+            self._persistent_cache.get_stats() if self._persistent_cache is not None else None
+        )
+        return stats
+
+    def _persists(self, temperature: float) -> bool:
+        """Whether a reply at this temperature goes to the persistent cache (never without a model file)"""
+        return (
+            self._persistent_cache is not None
+            and temperature <= settings.PERSISTENT_CACHE_MAX_TEMPERATURE
+            and self.model_fingerprint != "missing"
+        )
+
+    @property
+    def model_fingerprint(self) -> str:
+        """Fingerprint of the model file (recomputed if the file changes)"""
+        try:
+            stat = self.model_path.stat()
+            identity = (str(self.model_path), stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            return "missing"
+
+        if self._model_fingerprint is None or self._model_fingerprint[:3] != identity:
+            self._model_fingerprint = (*identity, model_fingerprint(self.model_path))
+        return self._model_fingerprint[3]
 
     def set_cache_enabled(self, enabled: bool) -> None:
         """
@@ -454,7 +1319,7 @@ class LLMService:
         if self.load_start_time and self.is_loaded:
             load_time = time.time() - self.load_start_time
 
-        return {
+        info = {
             "loaded": self.is_loaded,
             "loading": self.is_loading,
             "load_error": self.load_error,
@@ -464,10 +1329,34 @@ class LLMService:
             "max_tokens": self.max_tokens,
             "temperature": self.temperature,
             "gpu_layers": self.n_gpu_layers,
+            "contexts": len(self.contexts),
+            "threads_per_context": self.threads_per_context,
             "cache_enabled": self._cache_enabled,
             "cache_stats": self.get_cache_stats(),
+            "scheduler": self.scheduler.get_stats(),
+            "decoding": self.get_decoding_stats(),
+            "structured_output": self.get_structured_output_stats(),
+            "stops": self.get_stop_stats(),
+            "out_of_process": self.worker is not None,
         }
 
+        # Context pool and scheduler live in the worker process
+        if self.worker is not None:
+            worker_info = self.worker.get_model_info() if self.is_loaded else None
+            for key in ("contexts", "threads_per_context", "scheduler", "decoding", "stops"):
+                info[key] = worker_info[key] if worker_info else None
+
+        return info
+
+    def get_worker_health(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the inference worker's health
+
+        Returns:
+            Worker health dictionary, or None if the model runs in this process
+        """
+        return self.worker.get_health() if self.worker is not None else None
+
 
 # Global instance
 llm_service = LLMService()
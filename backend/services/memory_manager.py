@@ -6,9 +6,9 @@ Extracts and manages user memories and profile information
 from typing import List, Dict, Optional
 import logging
 from datetime import datetime
-import json
 
 from sqlalchemy.orm import Session
+from database.database import commit_or_stage
 from models.user import User
 from models.memory import UserProfile
 from models.conversation import Message
@@ -100,7 +100,7 @@ class MemoryManager:
                 logger.debug(f"Created memory: {category}/{key}")
 
         if memories:
-            db.commit()
+            commit_or_stage(db)
             logger.info(f"Stored {len(memories)} memories for user {user_id}")
 
         return memories
@@ -187,6 +187,7 @@ class MemoryManager:
         Returns:
             List of tuples: (category, key, value)
         """
+        from services.inference_scheduler import InferenceLane
         from services.llm_service import llm_service
 
         # Check if LLM is available
@@ -198,33 +199,17 @@ class MemoryManager:
             # Format the extraction prompt
             prompt = MemoryExtractionPrompt.format_prompt(message)
 
-            # Generate extraction using LLM
-            response = llm_service.generate(
+            # Generate extraction using LLM (the grammar only allows a JSON array of memories)
+            extractions = llm_service.generate_json(
                 prompt,
+                MemoryExtractionPrompt.GRAMMAR,
+                task="memory_extraction",
                 max_tokens=300,
                 temperature=0.3,  # Low temperature for more consistent extraction
-                stop=None,
+                lane=InferenceLane.EXTRACTION,
             )
 
-            # Parse JSON response
-            response_clean = response.strip()
-
-            # Handle potential markdown code blocks
-            if response_clean.startswith("```json"):
-                response_clean = response_clean[7:]
-            if response_clean.startswith("```"):
-                response_clean = response_clean[3:]
-            if response_clean.endswith("```"):
-                response_clean = response_clean[:-3]
-
-            response_clean = response_clean.strip()
-
-            # Parse JSON
-            try:
-                extractions = json.loads(response_clean)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse LLM extraction response: {response_clean}")
-                logger.error(f"JSON error: {e}")
+            if not isinstance(extractions, list):
                 # Fallback to keyword extraction
                 return self._simple_keyword_extraction(message)
 
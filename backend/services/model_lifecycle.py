@@ -0,0 +1,210 @@
+"""
+Model Lifecycle Manager
+Unloads the model when nobody is chatting or RAM runs short, and warms it back up
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import psutil
+
+from services.inference_scheduler import InferenceLane
+from services.llm_service import llm_service
+from utils.config import settings
+from utils.memory_profiler import force_gc
+
+logger = logging.getLogger("chatbot.model_lifecycle")
+
+
+class ModelLifecycleManager:
+    """
+    Idle-aware model lifecycle
+
+    The model holds 2-4 GB of RAM for as long as it is loaded. A background
+    check unloads it after MODEL_IDLE_UNLOAD_MINUTES without chat, or sooner
+    (after a short quiet period) when system RAM use passes
+    MODEL_MEMORY_PRESSURE_PERCENT. warm_up() loads it back in the background
+    when the app regains focus or a conversation starts, then runs a
+    one-token priming prompt so the first real reply doesn't pay for
+    faulting in the weights.
+    """
+
+    # Quiet time required before unloading for memory pressure (not mid-chat)
+    PRESSURE_MIN_IDLE_SECONDS = 120
+
+    # Prompt that pulls the weights into memory after a load
+    PRIMING_PROMPT = "Hi!"
+
+    def __init__(
+        self,
+        service=None,
+        idle_minutes: Optional[float] = None,
+        pressure_percent: Optional[float] = None,
+        check_interval: Optional[int] = None,
+    ):
+        """
+        Initialize the lifecycle manager
+
+        Args:
+            service: LLM service to manage (defaults to the global llm_service)
+            idle_minutes: Unload after this long idle (defaults to MODEL_IDLE_UNLOAD_MINUTES, 0 = never)
+            pressure_percent: RAM use that triggers an unload (defaults to
+                MODEL_MEMORY_PRESSURE_PERCENT, 0 = off)
+            check_interval: Seconds between checks (defaults to MODEL_LIFECYCLE_CHECK_SECONDS)
+        """
+        self.llm = service or llm_service
+        self.idle_seconds = (
+            settings.MODEL_IDLE_UNLOAD_MINUTES if idle_minutes is None else idle_minutes
+        ) * 60
+        self.pressure_percent = (
+            settings.MODEL_MEMORY_PRESSURE_PERCENT if pressure_percent is None else pressure_percent
+        )
+        self.check_interval = check_interval or settings.MODEL_LIFECYCLE_CHECK_SECONDS
+
+        self._stop_event = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Warm-up state (a focused app counts as activity for the idle timer)
+        self._warm_lock = threading.Lock()
+        self._warming = False
+        self._last_warm_request = 0.0  # time.monotonic()
+
+        self.stats = {
+            "idle_unloads": 0,
+            "pressure_unloads": 0,
+            "warmups": 0,
+            "last_warmup_ms": None,
+        }
+
+    def start(self) -> None:
+        """Start the lifecycle checks"""
+        if self._running:
+            logger.warning("Model lifecycle manager already running")
+            return
+
+        self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._lifecycle_loop, daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Model lifecycle manager started (idle unload: {self.idle_seconds / 60:g} min, "
+            f"memory pressure: {self.pressure_percent or 'off'}%)"
+        )
+
+    def stop(self) -> None:
+        """Stop the lifecycle checks"""
+        if not self._running:
+            return
+
+        self._running = False
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        logger.info("Model lifecycle manager stopped")
+
+    def _lifecycle_loop(self) -> None:
+        """Background loop that periodically applies the unload policy"""
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Error in model lifecycle check: {e}", exc_info=True)
+
+    def check(self) -> Optional[str]:
+        """
+        Unload the model if it has been idle long enough or RAM is short
+
+        Returns:
+            Reason for the unload ("idle" or "memory_pressure"), or None if
+            the model stays loaded
+        """
+        if not self.llm.is_loaded or self._warming:
+            return None
+
+        memory_percent = psutil.virtual_memory().percent
+        if self.pressure_percent and memory_percent >= self.pressure_percent:
+            reason, min_idle = "memory_pressure", self.PRESSURE_MIN_IDLE_SECONDS
+        elif self.idle_seconds:
+            reason, min_idle = "idle", self.idle_seconds
+        else:
+            return None
+
+        if time.monotonic() - self._last_warm_request < min_idle:
+            return None
+        if not self.llm.unload_if_idle(min_idle):
+            return None
+
+        self.stats["pressure_unloads" if reason == "memory_pressure" else "idle_unloads"] += 1
+        gc_stats = force_gc()
+        logger.info(
+            f"Unloaded idle model ({reason}, RAM use {memory_percent:.0f}%, "
+            f"freed {gc_stats['memory_freed_mb']:.0f} MB after GC)"
+        )
+        return reason
+
+    def warm_up(self, reason: str) -> bool:
+        """
+        Load and prime the model in the background if it isn't loaded
+
+        Args:
+            reason: What asked for the warm-up (for the log)
+
+        Returns:
+            bool: True if a warm-up was started
+        """
+        with self._warm_lock:
+            self._last_warm_request = time.monotonic()
+            if self.llm.is_loaded or self._warming:
+                return False
+            self._warming = True
+
+        logger.info(f"Warming up model ({reason})")
+        threading.Thread(target=self._warm, daemon=True).start()
+        return True
+
+    def _warm(self) -> None:
+        """Load the model and run the priming prompt"""
+        start = time.perf_counter()
+        try:
+            if not self.llm.is_loaded and not self.llm.load_model(
+                blocking=True, use_mmap=settings.MODEL_USE_MMAP
+            ):
+                logger.warning(f"Model warm-up failed: {self.llm.load_error or 'model not loaded'}")
+                return
+
+            self.llm.generate(
+                self.PRIMING_PROMPT,
+                max_tokens=1,
+                temperature=0.0,
+                use_cache=False,
+                lane=InferenceLane.BACKGROUND,
+            )
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stats["warmups"] += 1
+            self.stats["last_warmup_ms"] = round(elapsed_ms)
+            logger.info(f"✓ Model warmed up in {elapsed_ms:.0f}ms")
+
+        except Exception as e:
+            logger.error(f"Model warm-up failed: {e}", exc_info=True)
+
+        finally:
+            with self._warm_lock:
+                self._warming = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lifecycle policy and statistics"""
+        return {
+            "running": self._running,
+            "idle_unload_minutes": self.idle_seconds / 60,
+            "memory_pressure_percent": self.pressure_percent,
+            "warming": self._warming,
+            **self.stats,
+        }
+
+
+# Global instance
+model_lifecycle = ModelLifecycleManager()
@@ -0,0 +1,238 @@
+"""
+Notification Pipeline Service
+Delivers parent notifications for safety flags in the background
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal
+from models.safety import SafetyFlag
+from services.parent_notification_service import parent_notification_service
+
+logger = logging.getLogger("chatbot.notification_pipeline")
+
+
+class NotificationPipeline:
+    """
+    Notification Pipeline - durable, at-least-once parent notifications
+
+    The chat turn only marks the SafetyFlag as 'pending' in the same commit
+    that stores the crisis reply, then returns. This pipeline picks up
+    pending flags, looks up the user and preferences, formats the
+    notification and queues the email in the outbox.
+
+    Features:
+    - Durable: pending flags live in the database and survive restarts
+    - At-least-once: a flag interrupted mid-notification is retried
+    - Retry with exponential backoff, then marked 'failed'
+    - Status visible via ParentNotificationService.get_notification_history
+
+    Usage:
+        notification_pipeline.enqueue(flag, safety_result)
+        db.commit()
+        notification_pipeline.wake()
+    """
+
+    MAX_ATTEMPTS = 5
+    RETRY_BASE_SECONDS = 10
+    RETRY_MAX_SECONDS = 600
+    POLL_SECONDS = 60
+
+    # Errors that retrying cannot fix; the notification stays in the log only
+    UNDELIVERABLE_ERRORS = {
+        "No parent email configured",
+        "Email service not configured",
+        "Email notifications are disabled",
+    }
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        """
+        Initialize NotificationPipeline
+
+        Args:
+            session_factory: Callable returning a new database session
+        """
+        self.session_factory = session_factory
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"processed": 0, "notified": 0, "logged": 0, "retried": 0, "failed": 0}
+
+        logger.info("NotificationPipeline initialized")
+
+    def enqueue(self, flag: SafetyFlag, safety_result: Dict) -> None:
+        """
+        Mark a flag as needing a parent notification
+
+        Does not commit; the caller commits together with the rest of the
+        chat turn and then calls wake().
+
+        Args:
+            flag: Newly logged SafetyFlag
+            safety_result: Safety check result that produced the flag
+        """
+        flag.notification_status = "pending"
+        flag.notification_attempts = 0
+        flag.notification_next_attempt_at = datetime.now()
+        flag.notification_category = parent_notification_service._get_notification_category(
+            safety_result.get("flags", []), safety_result.get("details", {})
+        )
+
+    def wake(self) -> None:
+        """Wake the background worker to process pending notifications now"""
+        self._wakeup.set()
+
+    def process_pending(self) -> int:
+        """
+        Process all due pending notifications
+
+        Returns:
+            Number of flags processed
+        """
+        db = self.session_factory()
+        processed = 0
+
+        try:
+            flags = (
+                db.query(SafetyFlag)
+                .filter(
+                    SafetyFlag.notification_status == "pending",
+                    or_(
+                        SafetyFlag.notification_next_attempt_at.is_(None),
+                        SafetyFlag.notification_next_attempt_at <= datetime.now(),
+                    ),
+                )
+                .order_by(SafetyFlag.timestamp.asc())
+                .all()
+            )
+
+            for flag in flags:
+                self._process_flag(flag, db)
+                processed += 1
+
+        except Exception as e:
+            logger.error(f"Error processing notification pipeline: {e}", exc_info=True)
+            db.rollback()
+
+        finally:
+            db.close()
+
+        return processed
+
+    def _process_flag(self, flag: SafetyFlag, db: Session) -> None:
+        """Notify the parent for one flag and record the outcome"""
+        flag.notification_status = "sending"
+        flag.notification_attempts = (flag.notification_attempts or 0) + 1
+        db.commit()
+
+        try:
+            result = parent_notification_service.notify_for_flag(flag, db)
+            error = result.get("error")
+        except Exception as e:
+            logger.error(f"Error notifying parent for flag {flag.id}: {e}", exc_info=True)
+            db.rollback()
+            result = {}
+            error = str(e)
+
+        self.stats["processed"] += 1
+
+        if result.get("sent"):
+            flag.notification_status = "notified"
+            flag.notification_outbox_id = result.get("outbox_id")
+            flag.notification_error = None
+            self.stats["notified"] += 1
+        elif error in self.UNDELIVERABLE_ERRORS:
+            # No email configured - the notification was written to the log
+            flag.notification_status = "logged"
+            flag.notification_error = error
+            self.stats["logged"] += 1
+        elif flag.notification_attempts >= self.MAX_ATTEMPTS:
+            flag.notification_status = "failed"
+            flag.notification_error = error
+            self.stats["failed"] += 1
+            logger.error(
+                f"Parent notification for flag {flag.id} failed after "
+                f"{flag.notification_attempts} attempts: {error}"
+            )
+        else:
+            delay = min(
+                self.RETRY_BASE_SECONDS * (2 ** (flag.notification_attempts - 1)),
+                self.RETRY_MAX_SECONDS,
+            )
+            flag.notification_status = "pending"
+            flag.notification_error = error
+            flag.notification_next_attempt_at = datetime.now() + timedelta(seconds=delay)
+            self.stats["retried"] += 1
+
+        db.commit()
+
+    def recover_interrupted(self) -> int:
+        """
+        Return flags left in 'sending' by a previous run to 'pending'
+
+        Returns:
+            Number of flags requeued
+        """
+        db = self.session_factory()
+
+        try:
+            count = (
+                db.query(SafetyFlag)
+                .filter(SafetyFlag.notification_status == "sending")
+                .update({"notification_status": "pending"}, synchronize_session=False)
+            )
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict:
+        """Get pipeline statistics for this session"""
+        return {"running": self._running, **self.stats}
+
+    def start(self):
+        """Start the background worker"""
+        if self._running:
+            logger.warning("Notification pipeline already running")
+            return
+
+        requeued = self.recover_interrupted()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted parent notifications")
+
+        self._running = True
+        self._wakeup.set()  # Catch up on anything pending from the previous run
+        self._thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self._thread.start()
+        logger.info("Notification pipeline started")
+
+    def stop(self):
+        """Stop the background worker"""
+        if not self._running:
+            return
+
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        logger.info("Notification pipeline stopped")
+
+    def _worker_loop(self):
+        """Background loop: process pending flags on wakeup or every poll interval"""
+        while self._running:
+            self._wakeup.wait(self.POLL_SECONDS)
+            self._wakeup.clear()
+
+            if not self._running:
+                break
+
+            self.process_pending()
+
+
+# Global instance
+notification_pipeline = NotificationPipeline()
@@ -10,11 +10,17 @@ from typing import Dict, List, Optional
 import logging
 from datetime import datetime
 
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from models.safety import SafetyFlag
 from models.conversation import Message
 from models.user import User
 from services.email_service import email_service
+from services.email_outbox_service import (
+    email_outbox_service,
+    PRIORITY_CRISIS,
+    PRIORITY_ALERT,
+)
 
 logger = logging.getLogger("chatbot.parent_notification")
 
@@ -118,6 +124,55 @@ class ParentNotificationService:
             "notification_id": notification_result.get("notification_id"),
         }
 
+    def notify_for_flag(self, flag: SafetyFlag, db: Session) -> Dict:
+        """
+        Notify parent about an already-logged safety flag
+
+        Used by the background notification pipeline, so the chat turn that
+        raised the flag never waits on user lookups or email delivery. Marks
+        this specific flag as parent-notified.
+
+        Args:
+            flag: SafetyFlag with notification_category set
+            db: Database session
+
+        Returns:
+            Dictionary with send result (see _send_notification)
+        """
+        user = db.query(User).filter(User.id == flag.user_id).first()
+        if not user:
+            logger.error(f"User {flag.user_id} not found for flag {flag.id} notification")
+            return {"sent": False, "delivery_method": "none", "error": "User not found"}
+
+        category = flag.notification_category or "safety_concern"
+
+        notification_message = self._format_crisis_notification(
+            user_name=user.name or "Your child",
+            category=category,
+            severity=flag.severity,
+            details={},
+            timestamp=flag.timestamp or datetime.now()
+        )
+
+        result = self._send_notification(
+            user_id=flag.user_id,
+            message=notification_message,
+            category=category,
+            severity=flag.severity,
+            db=db
+        )
+
+        flag.parent_notified = True
+        self.notification_count += 1
+
+        logger.warning(
+            f"PARENT NOTIFICATION: User {flag.user_id}, Flag {flag.id}, "
+            f"Category: {category}, Severity: {flag.severity}, "
+            f"Delivery: {result.get('delivery_method')}"
+        )
+
+        return result
+
     def notify_high_severity_event(
         self,
         user_id: int,
@@ -357,20 +412,31 @@ This notification was generated automatically by the safety monitoring system. Y
             lines = message.strip().split('\n')
             subject = lines[0] if lines else "Safety Alert"
 
-            email_result = email_service.send_email(
+            # Queue in the outbox; critical events take the priority lane
+            email_result = email_outbox_service.deliver(
+                db,
                 to_email=user.parent_email,
                 subject=subject,
-                body=message
+                body=message,
+                priority=PRIORITY_CRISIS if severity == "critical" else PRIORITY_ALERT,
+                user_id=user_id,
+                category=category,
             )
 
             if email_result.get("sent"):
+                queued = email_result.get("queued", False)
                 logger.info(
-                    f"Email notification sent to {user.parent_email} for user {user_id}"
+                    f"Email notification {'queued' if queued else 'sent'} to "
+                    f"{user.parent_email} for user {user_id}"
                 )
                 return {
                     "sent": True,
-                    "notification_id": f"notif_{user_id}_{datetime.now().timestamp()}",
-                    "delivery_method": "email",
+                    "notification_id": (
+                        f"outbox_{email_result['outbox_id']}" if queued
+                        else f"notif_{user_id}_{datetime.now().timestamp()}"
+                    ),
+                    "delivery_method": "email_outbox" if queued else "email",
+                    "outbox_id": email_result.get("outbox_id"),
                     "to_email": user.parent_email
                 }
             else:
@@ -452,6 +518,9 @@ This notification was generated automatically by the safety monitoring system. Y
         """
         Get parent notification history for a user
 
+        Includes notifications still in flight, with their pipeline status
+        and the delivery status of the notification email.
+
         Args:
             user_id: User ID
             db: Database session
@@ -460,10 +529,13 @@ This notification was generated automatically by the safety monitoring system. Y
         Returns:
             List of notification records
         """
-        # Get safety flags where parent was notified
+        # Get safety flags where parent was (or is being) notified
         notified_flags = (
             db.query(SafetyFlag)
-            .filter(SafetyFlag.user_id == user_id, SafetyFlag.parent_notified == True)
+            .filter(
+                SafetyFlag.user_id == user_id,
+                or_(SafetyFlag.parent_notified == True, SafetyFlag.notification_status.isnot(None)),
+            )
             .order_by(SafetyFlag.timestamp.desc())
             .limit(limit)
             .all()
@@ -471,12 +543,17 @@ This notification was generated automatically by the safety monitoring system. Y
 
         notifications = []
         for flag in notified_flags:
+            outbox = flag.notification_outbox
             notifications.append({
                 "timestamp": flag.timestamp.isoformat() if flag.timestamp else None,
                 "severity": flag.severity,
                 "flag_type": flag.flag_type,
                 "content_snippet": flag.content_snippet,
                 "action_taken": flag.action_taken,
+                "notification_status": flag.notification_status,
+                "delivery_status": outbox.status if outbox else None,
+                "attempts": flag.notification_attempts,
+                "error": flag.notification_error,
             })
 
         return notifications
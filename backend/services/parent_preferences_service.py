@@ -12,6 +12,18 @@ from models.user import User
 
 logger = logging.getLogger("chatbot.parent_preferences")
 
+# Fields that affect when the next summary report is due
+SCHEDULE_FIELDS = {
+    "email",
+    "email_notifications_enabled",
+    "summary_frequency",
+    "summary_day_of_week",
+    "summary_hour",
+    "quiet_hours_enabled",
+    "quiet_hours_start",
+    "quiet_hours_end",
+}
+
 
 class ParentPreferencesService:
     """
@@ -134,12 +146,31 @@ class ParentPreferencesService:
             else:
                 logger.warning(f"Attempted to update invalid field: {field}")
 
+        reschedule = bool(SCHEDULE_FIELDS.intersection(updates))
+        if reschedule:
+            prefs.next_report_at = prefs.compute_next_report_at()
+
         db.commit()
         db.refresh(prefs)
 
+        if reschedule:
+            self._notify_report_scheduler(prefs)
+
         logger.info(f"Updated preferences for user {user_id}")
         return prefs
 
+    def _notify_report_scheduler(self, prefs: ParentNotificationPreferences) -> None:
+        """
+        Tell the running report scheduler about a changed due time
+
+        Args:
+            prefs: Preferences with an updated next_report_at
+        """
+        # Imported here to avoid a circular import via weekly_report_service
+        from services.report_scheduler import report_scheduler
+
+        report_scheduler.reschedule(prefs.user_id, prefs.next_report_at)
+
     def update_severity_filters(
         self,
         db: Session,
@@ -380,7 +411,10 @@ class ParentPreferencesService:
             db.commit()
 
         # Create new defaults
-        return ParentNotificationPreferences.get_or_create_defaults(db, user_id)
+        prefs = ParentNotificationPreferences.get_or_create_defaults(db, user_id)
+        self._notify_report_scheduler(prefs)
+
+        return prefs
 
 
 # Global instance
@@ -0,0 +1,210 @@
+"""
+Personality Cache Service
+In-process read cache of each user's bot personality
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from database.cache_invalidation import CommitInvalidator, EngineCache
+from models.personality import BotPersonality
+
+logger = logging.getLogger("chatbot.personality_cache")
+
+# Session.info key holding user_ids whose personality changed in the transaction
+PENDING_KEY = "personality_cache_pending"
+
+
+@dataclass(frozen=True, slots=True)
+class PersonalitySnapshot:
+    """
+    Immutable, read-only copy of a BotPersonality row
+
+    Quirks and interests are parsed once when the snapshot is taken.
+    Exposes the same read API as BotPersonality (attributes,
+    get_quirks(), get_interests(), to_dict()), so read-only code can take
+    either.
+    """
+
+    id: int
+    user_id: int
+    name: str
+    humor: float
+    energy: float
+    curiosity: float
+    formality: float
+    friendship_level: int
+    friendship_points: int
+    total_conversations: int
+    mood: str
+    quirks: Tuple[str, ...]
+    interests: Tuple[str, ...]
+    catchphrase: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, personality: BotPersonality) -> "PersonalitySnapshot":
+        """Take a snapshot of a BotPersonality"""
+        return cls(
+            id=personality.id,
+            user_id=personality.user_id,
+            name=personality.name,
+            humor=personality.humor,
+            energy=personality.energy,
+            curiosity=personality.curiosity,
+            formality=personality.formality,
+            friendship_level=personality.friendship_level,
+            friendship_points=personality.friendship_points,
+            total_conversations=personality.total_conversations,
+            mood=personality.mood,
+            quirks=tuple(personality.get_quirks()),
+            interests=tuple(personality.get_interests()),
+            catchphrase=personality.catchphrase,
+            created_at=personality.created_at,
+            updated_at=personality.updated_at,
+        )
+
+    def get_quirks(self) -> List[str]:
+        """Quirks as a list"""
+        return list(self.quirks)
+
+    def get_interests(self) -> List[str]:
+        """Interests as a list"""
+        return list(self.interests)
+
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for API responses (same shape as BotPersonality.to_dict)"""
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "name": self.name,
+            "traits": {
+                "humor": self.humor,
+                "energy": self.energy,
+                "curiosity": self.curiosity,
+                "formality": self.formality,
+            },
+            "friendship_level": self.friendship_level,
+            "friendship_points": self.friendship_points,
+            "total_conversations": self.total_conversations,
+            "mood": self.mood,
+            "quirks": self.get_quirks(),
+            "interests": self.get_interests(),
+            "catchphrase": self.catchphrase,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class PersonalityCache:
+    """
+    Personality Cache - one immutable snapshot per user
+
+    Read-only endpoints (profile panel polling, feature checks, rate-limit
+    views) read the snapshot instead of querying SQLite and re-parsing
+    JSON. Invalidation is write-through: a session hook records every
+    BotPersonality that is inserted, updated or deleted, and the commit
+    drops those snapshots. Trait adjustments, drift, mood changes and
+    level-ups are covered without each service having to remember to
+    invalidate.
+
+    Snapshots are kept per database engine. A load that races with a
+    commit is not stored (a per-user generation counter is checked).
+    """
+
+    def __init__(self):
+        """Initialize the cache"""
+        # engine -> user_id -> PersonalitySnapshot
+        self._snapshots = EngineCache()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, db: Session) -> Optional[PersonalitySnapshot]:
+        """
+        Get a user's personality snapshot, loading it on a miss
+
+        Args:
+            user_id: User ID
+            db: Database session
+
+        Returns:
+            PersonalitySnapshot or None if the user has no personality
+        """
+        engine = db.get_bind()
+
+        snapshot, generation = self._snapshots.lookup(engine, user_id)
+        with self._lock:
+            if snapshot is not None:
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+
+        personality = (
+            db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
+        )
+        if not personality:
+            return None
+
+        snapshot = PersonalitySnapshot.from_model(personality)
+
+        # Never cache changes this session has not committed
+        if not personality_writes.uncommitted(db, user_id):
+            self._snapshots.store(engine, user_id, snapshot, generation)
+
+        return snapshot
+
+    def invalidate(self, user_id: Optional[int] = None, engine=None) -> None:
+        """
+        Drop cached snapshots
+
+        Args:
+            user_id: User to drop (all users if None)
+            engine: Engine whose snapshots to drop (all engines if None)
+        """
+        self._snapshots.invalidate(user_id, engine)
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "cached": len(self._snapshots.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 2) if total else 0,
+            }
+
+
+# Global instance
+personality_cache = PersonalityCache()
+
+
+def _written_personalities(session: Session) -> Set[int]:
+    """User IDs of the personalities the session inserts, updates or deletes"""
+    return {
+        obj.user_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, BotPersonality) and obj.user_id is not None
+    }
+
+
+def _invalidate_personalities(user_ids: Set[int], engine) -> None:
+    """Drop snapshots of personalities written by a committed transaction"""
+    for user_id in user_ids:
+        personality_cache.invalidate(user_id, engine)
+
+
+personality_writes = CommitInvalidator(PENDING_KEY, _written_personalities, _invalidate_personalities)
+
+
+# Convenience function
+def get_personality_snapshot(user_id: int, db: Session) -> Optional[PersonalitySnapshot]:
+    """Get a cached personality snapshot"""
+    return personality_cache.get(user_id, db)
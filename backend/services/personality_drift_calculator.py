@@ -4,6 +4,7 @@ Calculates personality trait changes based on conversation metrics
 """
 
 from typing import Dict, List, Tuple, Optional
+import json
 import logging
 from datetime import datetime, timedelta
 
@@ -11,8 +12,10 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from models.personality import BotPersonality
 from models.personality_drift import PersonalityDrift
-from models.conversation import Conversation, Message
+from models.conversation import Conversation
+from services.conversation_analyzer import conversation_analyzer
 from services.drift_rate_limiter import drift_rate_limiter
+from services.drift_timeseries import RESOLUTION_RAW, drift_timeseries
 
 logger = logging.getLogger("chatbot.personality_drift")
 
@@ -42,7 +45,6 @@ class PersonalityDriftCalculator:
     # Thresholds for conversation analysis
     LONG_CONVERSATION_THRESHOLD = 10  # messages
     QUALITY_CONVERSATION_THRESHOLD = 20  # messages
-    SHORT_MESSAGE_THRESHOLD = 10  # characters
 
     def __init__(self):
         """Initialize the drift calculator"""
@@ -52,7 +54,8 @@ class PersonalityDriftCalculator:
         self,
         personality: BotPersonality,
         conversation: Conversation,
-        db: Session
+        db: Session,
+        features: Optional[Dict] = None
     ) -> List[PersonalityDrift]:
         """
         Calculate personality drift after a conversation completes
@@ -61,6 +64,7 @@ class PersonalityDriftCalculator:
             personality: BotPersonality object
             conversation: Conversation object
             db: Database session
+            features: Optional conversation_analyzer features (computed if omitted)
 
         Returns:
             List of PersonalityDrift objects created
@@ -68,7 +72,7 @@ class PersonalityDriftCalculator:
         drift_events = []
 
         # Analyze conversation
-        analysis = self._analyze_conversation(conversation, db)
+        analysis = self._analyze_conversation(conversation, db, features)
 
         # Calculate drift for each trait
         humor_drift = self._calculate_humor_drift(personality, analysis)
@@ -76,12 +80,15 @@ class PersonalityDriftCalculator:
         curiosity_drift = self._calculate_curiosity_drift(personality, analysis)
         formality_drift = self._calculate_formality_drift(personality, analysis)
 
+        # One query covers the rate limits of every trait
+        rate_limit_snapshot = drift_rate_limiter.get_drift_snapshot(personality.user_id, db)
+
         # Apply drifts and create events
         if humor_drift != 0:
             event = self._apply_drift(
                 personality, "humor", humor_drift,
                 "conversation_pattern", analysis["humor_reasons"],
-                conversation.id, db
+                conversation.id, db, rate_limit_snapshot["humor"]
             )
             drift_events.append(event)
 
@@ -89,7 +96,7 @@ class PersonalityDriftCalculator:
             event = self._apply_drift(
                 personality, "energy", energy_drift,
                 "conversation_pattern", analysis["energy_reasons"],
-                conversation.id, db
+                conversation.id, db, rate_limit_snapshot["energy"]
             )
             drift_events.append(event)
 
@@ -97,7 +104,7 @@ class PersonalityDriftCalculator:
             event = self._apply_drift(
                 personality, "curiosity", curiosity_drift,
                 "conversation_pattern", analysis["curiosity_reasons"],
-                conversation.id, db
+                conversation.id, db, rate_limit_snapshot["curiosity"]
             )
             drift_events.append(event)
 
@@ -105,7 +112,7 @@ class PersonalityDriftCalculator:
             event = self._apply_drift(
                 personality, "formality", formality_drift,
                 "conversation_pattern", analysis["formality_reasons"],
-                conversation.id, db
+                conversation.id, db, rate_limit_snapshot["formality"]
             )
             drift_events.append(event)
 
@@ -123,7 +130,8 @@ class PersonalityDriftCalculator:
     def _analyze_conversation(
         self,
         conversation: Conversation,
-        db: Session
+        db: Session,
+        features: Optional[Dict] = None
     ) -> Dict:
         """
         Analyze a conversation for drift triggers
@@ -131,88 +139,32 @@ class PersonalityDriftCalculator:
         Args:
             conversation: Conversation object
             db: Database session
+            features: Optional conversation_analyzer features (computed if omitted)
 
         Returns:
             Dictionary with analysis results
         """
-        analysis = {
+        if features is None:
+            features = conversation_analyzer.analyze(conversation.id, db)
+
+        return {
             "message_count": conversation.message_count or 0,
             "duration_seconds": conversation.duration_seconds or 0,
-            "user_messages": [],
-            "laughter_count": 0,
-            "thanks_count": 0,
-            "feelings_count": 0,
-            "questions_count": 0,
-            "short_messages_count": 0,
-            "casual_language_count": 0,
-            "formal_language_count": 0,
-            "deep_topics_count": 0,
+            "user_message_count": features["user_message_count"],
+            "laughter_count": features["laughter_count"],
+            "thanks_count": features["thanks_count"],
+            "feelings_count": features["feelings_count"],
+            "questions_count": features["questions_count"],
+            "short_messages_count": features["short_messages_count"],
+            "casual_language_count": features["casual_language_count"],
+            "formal_language_count": features["formal_language_count"],
+            "deep_topics_count": features["deep_topics_count"],
             "humor_reasons": [],
             "energy_reasons": [],
             "curiosity_reasons": [],
             "formality_reasons": [],
         }
 
-        # Get user messages from conversation
-        user_messages = (
-            db.query(Message)
-            .filter(
-                Message.conversation_id == conversation.id,
-                Message.role == "user"
-            )
-            .all()
-        )
-
-        analysis["user_messages"] = user_messages
-
-        # Analyze each user message
-        for msg in user_messages:
-            content_lower = msg.content.lower()
-
-            # Laughter detection
-            if any(word in content_lower for word in ["lol", "haha", "hehe", "funny", "😂", "hilarious"]):
-                analysis["laughter_count"] += 1
-
-            # Gratitude detection
-            if any(word in content_lower for word in ["thank", "thanks", "thx", "ty", "appreciate"]):
-                analysis["thanks_count"] += 1
-
-            # Feelings sharing
-            feeling_words = [
-                "feel", "feeling", "sad", "happy", "excited", "worried",
-                "anxious", "scared", "nervous", "proud", "angry", "upset"
-            ]
-            if any(word in content_lower for word in feeling_words):
-                analysis["feelings_count"] += 1
-
-            # Questions asked by user
-            if "?" in msg.content:
-                analysis["questions_count"] += 1
-
-            # Short messages
-            if len(msg.content.strip()) < self.SHORT_MESSAGE_THRESHOLD:
-                analysis["short_messages_count"] += 1
-
-            # Casual language
-            casual_words = ["yeah", "yep", "nah", "nope", "lol", "omg", "btw", "tbh", "idk"]
-            if any(word in content_lower for word in casual_words):
-                analysis["casual_language_count"] += 1
-
-            # Formal language
-            formal_indicators = ["however", "therefore", "furthermore", "consequently", "regarding"]
-            if any(word in content_lower for word in formal_indicators):
-                analysis["formal_language_count"] += 1
-
-            # Deep topics
-            deep_topics = [
-                "life", "future", "dream", "goal", "worry", "fear",
-                "meaning", "purpose", "philosophy", "death", "love"
-            ]
-            if any(topic in content_lower for topic in deep_topics):
-                analysis["deep_topics_count"] += 1
-
-        return analysis
-
     def _calculate_humor_drift(
         self,
         personality: BotPersonality,
@@ -261,7 +213,7 @@ class PersonalityDriftCalculator:
             reasons.append(f"Long conversation with {analysis['message_count']} messages")
 
         # Many short messages -> decrease energy (user not engaged)
-        user_msg_count = len(analysis["user_messages"])
+        user_msg_count = analysis["user_message_count"]
         if user_msg_count > 0:
             short_ratio = analysis["short_messages_count"] / user_msg_count
             if short_ratio > 0.7:  # More than 70% short messages
@@ -299,7 +251,7 @@ class PersonalityDriftCalculator:
             reasons.append(f"User shared feelings {analysis['feelings_count']} times")
 
         # Many short messages -> decrease curiosity (user not engaged)
-        user_msg_count = len(analysis["user_messages"])
+        user_msg_count = analysis["user_message_count"]
         if user_msg_count > 0:
             short_ratio = analysis["short_messages_count"] / user_msg_count
             if short_ratio > 0.7:
@@ -352,7 +304,8 @@ class PersonalityDriftCalculator:
         trigger_type: str,
         reasons: List[str],
         conversation_id: Optional[int],
-        db: Session
+        db: Session,
+        rate_limit_snapshot: Optional[Dict] = None
     ) -> PersonalityDrift:
         """
         Apply a trait drift and create a drift event
@@ -365,6 +318,7 @@ class PersonalityDriftCalculator:
             reasons: List of reasons for drift
             conversation_id: Optional conversation ID
             db: Database session
+            rate_limit_snapshot: Optional trait entry from drift_rate_limiter.get_drift_snapshot()
 
         Returns:
             PersonalityDrift object created
@@ -376,7 +330,8 @@ class PersonalityDriftCalculator:
             drift_amount,
             db,
             conversation_id,
-            enforce_cooldown=True
+            enforce_cooldown=True,
+            snapshot=rate_limit_snapshot
         )
 
         # Add rate limit messages to reasons
@@ -548,13 +503,10 @@ class PersonalityDriftCalculator:
         Returns:
             Dictionary with drift summary
         """
-        # Get all drifts
-        all_drifts = db.query(PersonalityDrift).filter(
-            PersonalityDrift.user_id == user_id
-        ).all()
+        trait_stats = drift_timeseries.get_trait_stats(user_id, db)
 
         summary = {
-            "total_drifts": len(all_drifts),
+            "total_drifts": sum(stats["drift_count"] for stats in trait_stats.values()),
             "by_trait": {},
             "by_trigger": {},
             "recent_drifts": [],
@@ -562,25 +514,25 @@ class PersonalityDriftCalculator:
 
         # Analyze by trait
         for trait in ["humor", "energy", "curiosity", "formality"]:
-            trait_drifts = [d for d in all_drifts if d.trait_name == trait]
-
-            if trait_drifts:
-                total_change = sum(d.change_amount for d in trait_drifts)
-                avg_change = total_change / len(trait_drifts)
+            stats = trait_stats.get(trait)
 
+            if stats:
                 summary["by_trait"][trait] = {
-                    "drift_count": len(trait_drifts),
-                    "total_change": round(total_change, 3),
-                    "average_change": round(avg_change, 3),
-                    "current_value": trait_drifts[0].new_value,
-                    "original_value": trait_drifts[-1].old_value if trait_drifts else None,
+                    "drift_count": stats["drift_count"],
+                    "total_change": round(stats["total_change"], 3),
+                    "average_change": round(stats["total_change"] / stats["drift_count"], 3),
+                    "current_value": stats["current_value"],
+                    "original_value": stats["original_value"],
                 }
 
         # Analyze by trigger type
-        trigger_types = set(d.trigger_type for d in all_drifts)
-        for trigger in trigger_types:
-            trigger_drifts = [d for d in all_drifts if d.trigger_type == trigger]
-            summary["by_trigger"][trigger] = len(trigger_drifts)
+        trigger_counts = (
+            db.query(PersonalityDrift.trigger_type, func.count(PersonalityDrift.id))
+            .filter(PersonalityDrift.user_id == user_id)
+            .group_by(PersonalityDrift.trigger_type)
+            .all()
+        )
+        summary["by_trigger"] = {trigger: count for trigger, count in trigger_counts}
 
         # Get recent drifts
         recent = (
@@ -599,7 +551,9 @@ class PersonalityDriftCalculator:
         self,
         user_id: int,
         trait_name: str,
-        db: Session
+        db: Session,
+        resolution: str = RESOLUTION_RAW,
+        max_points: Optional[int] = None
     ) -> List[Dict]:
         """
         Get timeline of a specific trait's changes
@@ -608,29 +562,29 @@ class PersonalityDriftCalculator:
             user_id: User ID
             trait_name: Trait name
             db: Database session
+            resolution: "raw" (one point per drift), "day" or "week"
+            max_points: Downsample to at most this many points (LTTB)
 
         Returns:
             List of timeline points
         """
-        drifts = (
-            db.query(PersonalityDrift)
-            .filter(
-                PersonalityDrift.user_id == user_id,
-                PersonalityDrift.trait_name == trait_name
-            )
-            .order_by(PersonalityDrift.timestamp.asc())
-            .all()
+        timeline, _ = drift_timeseries.get_timeline(
+            user_id, trait_name, db, resolution, max_points
         )
 
-        timeline = []
-        for drift in drifts:
-            timeline.append({
-                "timestamp": drift.timestamp.isoformat(),
-                "value": drift.new_value,
-                "change": drift.change_amount,
-                "trigger": drift.trigger_type,
-                "reasons": drift.get_trigger_details().get("reasons", []),
-            })
+        if resolution == RESOLUTION_RAW and timeline:
+            # Reasons only for the points that survived downsampling
+            details = dict(
+                db.query(PersonalityDrift.id, PersonalityDrift.trigger_details)
+                .filter(PersonalityDrift.id.in_([point["id"] for point in timeline]))
+                .all()
+            )
+            for point in timeline:
+                raw_details = details.get(point.pop("id"))
+                try:
+                    point["reasons"] = json.loads(raw_details).get("reasons", []) if raw_details else []
+                except json.JSONDecodeError:
+                    point["reasons"] = []
 
         return timeline
 
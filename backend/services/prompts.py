@@ -5,6 +5,8 @@ Contains all prompt templates used across the application
 
 from typing import Dict, List
 
+from services.json_grammars import MEMORY_EXTRACTION_GRAMMAR
+
 
 class MemoryExtractionPrompt:
     """
@@ -85,6 +87,9 @@ Response: [
 
 Extract facts from this message. Return ONLY valid JSON array, no other text:"""
 
+    # Constrains generation to the JSON array described above
+    GRAMMAR = MEMORY_EXTRACTION_GRAMMAR
+
     @classmethod
     def format_prompt(cls, user_message: str) -> str:
         """
@@ -0,0 +1,353 @@
+"""
+Quirk Engine
+Applies the emoji, pun and fact quirks to a bot response in one pass
+"""
+
+import logging
+import random
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from services.conversation_analyzer import KeywordMatcher
+from services.emoji_quirk_service import EmojiQuirkService
+from services.fact_quirk_service import FactQuirkService
+from services.pun_quirk_service import PunQuirkService
+
+logger = logging.getLogger("chatbot.quirk_engine")
+
+# Whitespace after sentence-ending punctuation separates sentences
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])(\s+)")
+
+# Transition phrases placed before an appended pun or fact
+PUN_TRANSITIONS = [
+    "Oh, and here's a fun one: ",
+    "Speaking of which... ",
+    "That reminds me: ",
+    "By the way, ",
+]
+FACT_TRANSITIONS = [
+    "Here's something cool: ",
+    "Fun fact: ",
+    "By the way, ",
+    "Also, ",
+]
+
+# A sentence: (text without trailing whitespace, whitespace that follows it)
+Segment = Tuple[str, str]
+
+
+def split_sentences(text: str) -> List[Segment]:
+    """
+    Split text into sentences, keeping the whitespace between them
+
+    Args:
+        text: Text to split
+
+    Returns:
+        List of (sentence, following whitespace); joining them gives the text back
+    """
+    parts = SENTENCE_BREAK.split(text)
+    parts.append("")  # The last sentence is followed by nothing
+    return [(parts[i], parts[i + 1]) for i in range(0, len(parts), 2)]
+
+
+def quirk_seed(*parts) -> int:
+    """
+    Build a stable per-request seed
+
+    Args:
+        *parts: Values identifying the request (e.g. conversation ID, turn)
+
+    Returns:
+        32-bit seed that is the same for the same parts in every process
+    """
+    return zlib.crc32(":".join(str(part) for part in parts).encode("utf-8"))
+
+
+class QuirkEngine:
+    """
+    Quirk Engine - compiled emoji/pun/fact quirk rendering
+
+    The keyword tables of all three quirks are compiled into one matcher,
+    so the user message is scanned once for puns and facts together and
+    each sentence is scanned once for emojis. The response is split into
+    sentences once; puns and facts are appended as sentences that were
+    split when first used and are then reused. Keyword matches use the
+    same substring rule and table order as the individual quirk services.
+
+    All randomness comes from one RNG per request. With a seed, the same
+    response, context and personality always give the same result, so
+    output can be reproduced and cached. Without one, the global random
+    module is used.
+    """
+
+    FACT_BASE_PROBABILITY = 0.20
+    FACT_MAX_PROBABILITY = 0.35
+    PUN_BASE_PROBABILITY = 0.25
+    PUN_MAX_PROBABILITY = 0.40
+    PROBABILITY_PER_LEVEL = 0.02
+    EMOJI_BASE_INTENSITY = 0.4
+    EMOJI_MAX_INTENSITY = 0.7
+    EMOJI_INTENSITY_PER_LEVEL = 0.05
+    MIN_EMOJI_SENTENCE_LENGTH = 5
+    FINAL_EMOJI_FACTOR = 0.6
+
+    # Emojis that already end a message well (no final emoji added after them)
+    ENDING_EMOJIS = frozenset(["😊", "🙂", "😄", "🎉", "😃", "🤩", "💙", "🫂", "😆", "😌", "✨", "🤔"])
+
+    def __init__(self):
+        """Compile the quirk tables"""
+        self.context_emojis = EmojiQuirkService.CONTEXT_EMOJIS
+        self.mood_emojis = EmojiQuirkService.MOOD_EMOJIS
+        self.generic_emojis = EmojiQuirkService.GENERIC_POSITIVE
+        self.pun_keywords = PunQuirkService.CONTEXT_KEYWORDS
+        self.fact_keywords = FactQuirkService.CONTEXT_KEYWORDS
+
+        # One matcher over every table; labels are (table, position in table, keyword)
+        self.matcher = KeywordMatcher({
+            (table, position, keyword): [keyword]
+            for table, keywords in (
+                ("emoji", self.context_emojis),
+                ("pun", self.pun_keywords),
+                ("fact", self.fact_keywords),
+            )
+            for position, keyword in enumerate(keywords)
+        })
+
+        # Fallback pools, built once instead of on every call
+        self.all_puns = tuple(
+            PunQuirkService.GENERAL_PUNS + PunQuirkService.SCHOOL_PUNS
+            + PunQuirkService.FRIEND_PUNS + PunQuirkService.GAME_PUNS
+            + PunQuirkService.FOOD_PUNS + PunQuirkService.ANIMAL_PUNS
+            + PunQuirkService.NATURE_PUNS + PunQuirkService.TECH_PUNS
+        )
+        self.all_facts = tuple(
+            FactQuirkService.GENERAL_FACTS + FactQuirkService.SCIENCE_FACTS
+            + FactQuirkService.ANIMAL_FACTS + FactQuirkService.SPACE_FACTS
+            + FactQuirkService.NATURE_FACTS + FactQuirkService.HISTORY_FACTS
+            + FactQuirkService.TECH_FACTS + FactQuirkService.BODY_FACTS
+            + FactQuirkService.GEOGRAPHY_FACTS
+        )
+
+        # Sentences and contextual emojis of appended puns/facts (fixed texts)
+        self._addition_cache: Dict[str, List[Tuple[str, str, List[str]]]] = {}
+        # Token -> (table position, keyword) of the emoji keywords inside it
+        self._token_emoji_keywords: Dict[str, Tuple[Tuple[int, str], ...]] = {}
+
+    @staticmethod
+    def make_rng(seed: Optional[int] = None):
+        """
+        Get the RNG for one request
+
+        Args:
+            seed: Per-request seed (None for the global random module)
+
+        Returns:
+            Seeded random.Random, or the random module itself
+        """
+        return random.Random(seed) if seed is not None else random
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """
+        Find the quirk keywords in a text with one scan
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Dictionary of table ("emoji", "pun", "fact") -> matched keywords
+            in table order
+        """
+        matches = {"emoji": [], "pun": [], "fact": []}
+        for table, _, keyword in sorted(self.matcher.categories(text.lower())):
+            matches[table].append(keyword)
+        return matches
+
+    def _emoji_candidates(self, text: str) -> List[str]:
+        """Contextual emojis for a sentence, in table order (empty if none)"""
+        cache = self._token_emoji_keywords
+        keywords = []
+        for token in text.lower().split():
+            token_keywords = cache.get(token)
+            if token_keywords is None:
+                token_keywords = tuple(sorted(
+                    (position, keyword)
+                    for table, position, keyword in self.matcher.categories(token)
+                    if table == "emoji"
+                ))
+                if len(cache) >= KeywordMatcher.TOKEN_CACHE_SIZE:
+                    cache.clear()
+                cache[token] = token_keywords
+            if token_keywords:
+                keywords.extend(token_keywords)
+
+        if not keywords:
+            return []
+        return [
+            emoji for _, keyword in sorted(set(keywords)) for emoji in self.context_emojis[keyword]
+        ]
+
+    def apply(
+        self,
+        response: str,
+        quirks: Sequence[str],
+        mood: str = "happy",
+        friendship_level: int = 1,
+        context: str = "",
+        rng=None
+    ) -> str:
+        """
+        Apply the shares_facts, tells_puns and uses_emojis quirks
+
+        Facts are added first, then puns, then emojis over every sentence
+        (including an added fact or pun), as the quirk services were chained.
+
+        Args:
+            response: Bot response
+            quirks: Personality quirks
+            mood: Bot's current mood
+            friendship_level: Friendship level (raises quirk frequency)
+            context: User message used to pick contextual puns and facts
+            rng: RNG from make_rng (global random module if None)
+
+        Returns:
+            Response with quirks applied
+        """
+        rng = rng or random
+        wants_facts = "shares_facts" in quirks
+        wants_puns = "tells_puns" in quirks
+        wants_emojis = "uses_emojis" in quirks
+
+        if not (wants_facts or wants_puns or wants_emojis):
+            return response
+
+        # Sentences as (text, following whitespace, contextual emojis or None if not scanned yet)
+        sentences = [(text, gap, None) for text, gap in split_sentences(response)]
+        context_matches = self.match(context) if context and (wants_facts or wants_puns) else None
+        level_bonus = max(friendship_level - 1, 0)
+
+        if wants_facts:
+            probability = min(
+                self.FACT_MAX_PROBABILITY,
+                self.FACT_BASE_PROBABILITY + level_bonus * self.PROBABILITY_PER_LEVEL
+            )
+            self._maybe_append(
+                sentences, rng, probability, context_matches, "fact",
+                self.fact_keywords, self.all_facts, FACT_TRANSITIONS
+            )
+
+        if wants_puns:
+            probability = min(
+                self.PUN_MAX_PROBABILITY,
+                self.PUN_BASE_PROBABILITY + level_bonus * self.PROBABILITY_PER_LEVEL
+            )
+            self._maybe_append(
+                sentences, rng, probability, context_matches, "pun",
+                self.pun_keywords, self.all_puns, PUN_TRANSITIONS
+            )
+
+        if wants_emojis and any(text.strip() for text, _, _ in sentences):
+            intensity = min(
+                self.EMOJI_MAX_INTENSITY,
+                self.EMOJI_BASE_INTENSITY + level_bonus * self.EMOJI_INTENSITY_PER_LEVEL
+            )
+            return self._apply_emojis(sentences, rng, mood, intensity)
+
+        return "".join(text + gap for text, gap, _ in sentences)
+
+    def _maybe_append(
+        self,
+        sentences: List,
+        rng,
+        probability: float,
+        context_matches: Optional[Dict[str, List[str]]],
+        table: str,
+        keywords: Dict[str, List[str]],
+        fallback: Tuple[str, ...],
+        transitions: List[str]
+    ) -> None:
+        """Append a pun or fact (as sentences) with the given probability"""
+        if rng.random() > probability:
+            return
+
+        matched = context_matches[table] if context_matches else None
+        if matched:
+            addition = rng.choice(keywords[matched[0]])
+        else:
+            addition = rng.choice(fallback)
+
+        # Trim the response end; an empty response becomes just the addition
+        text, _, emojis = sentences[-1]
+        sentences[-1] = (text.rstrip(), " ", emojis)
+        if not any(text for text, _, _ in sentences):
+            sentences.clear()
+        elif rng.random() >= 0.5:
+            addition = rng.choice(transitions) + addition
+
+        sentences.extend(self._addition_sentences(addition))
+        text, _, emojis = sentences[-1]
+        sentences[-1] = (text, "", emojis)
+
+    def _addition_sentences(self, addition: str) -> List[Tuple[str, str, List[str]]]:
+        """Split and scan an appended pun/fact once, then reuse it"""
+        cached = self._addition_cache.get(addition)
+        if cached is None:
+            cached = [
+                (text, gap, self._emoji_candidates(text))
+                for text, gap in split_sentences(addition)
+            ]
+            self._addition_cache[addition] = cached
+        return list(cached)
+
+    def _apply_emojis(self, sentences: List, rng, mood: str, intensity: float) -> str:
+        """Add emojis to sentences and maybe one at the very end"""
+        mood_emojis = self.mood_emojis.get(mood, self.generic_emojis)
+        parts = []
+
+        for text, gap, emojis in sentences:
+            if len(text.strip()) >= self.MIN_EMOJI_SENTENCE_LENGTH and rng.random() < intensity:
+                if emojis is None:
+                    emojis = self._emoji_candidates(text)
+
+                # Contextual emoji first, mood emoji otherwise
+                text = self._add_emoji_to_sentence(text, rng.choice(emojis or mood_emojis))
+
+            parts.append(text + gap)
+
+        result = "".join(parts).rstrip()
+
+        # Sometimes add an emoji at the very end for extra personality
+        if rng.random() < intensity * self.FINAL_EMOJI_FACTOR:
+            emoji = rng.choice(mood_emojis)
+            if result and result[-1] not in self.ENDING_EMOJIS:
+                result = f"{result} {emoji}"
+
+        return result
+
+    @staticmethod
+    def _add_emoji_to_sentence(sentence: str, emoji: str) -> str:
+        """Add an emoji at the end of a sentence, before its punctuation"""
+        sentence = sentence.rstrip()
+        if sentence and sentence[-1] in EmojiQuirkService.EMOJI_INSERTION_POINTS:
+            return f"{sentence[:-1]} {emoji}{sentence[-1]}"
+        return f"{sentence} {emoji}"
+
+
+# Global instance
+quirk_engine = QuirkEngine()
+
+
+# Convenience function
+def apply_quirks(
+    response: str,
+    quirks: Sequence[str],
+    mood: str = "happy",
+    friendship_level: int = 1,
+    context: str = "",
+    seed: Optional[int] = None
+) -> str:
+    """Apply personality quirks to a response"""
+    return quirk_engine.apply(
+        response, quirks, mood, friendship_level, context, quirk_engine.make_rng(seed)
+    )
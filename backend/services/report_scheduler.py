@@ -3,16 +3,15 @@ Report Scheduler Service
 Automatically sends weekly/daily reports based on user preferences
 """
 
+import heapq
 import logging
-from datetime import datetime, time as dt_time
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-
 from database.database import SessionLocal
-from models.user import User
 from models.parent_preferences import ParentNotificationPreferences
 from services.weekly_report_service import weekly_report_service
 from utils.config import settings
@@ -25,11 +24,11 @@ class ReportScheduler:
     Automated Report Scheduler
 
     Features:
-    - Background scheduler that runs hourly
-    - Checks all users for due weekly/daily reports
-    - Sends reports based on user preferences
-    - Respects configured day of week and hour
-    - Handles timezone considerations
+    - Persistent due-time queue (ParentNotificationPreferences.next_report_at)
+    - In-memory min-heap; the scheduler thread sleeps until the next due report
+    - Catches up on reports that fell due while the app was closed
+    - Sends due reports in a small worker pool
+    - Respects configured frequency, day of week, hour and quiet hours
 
     Usage:
         scheduler = ReportScheduler()
@@ -38,115 +37,330 @@ class ReportScheduler:
         scheduler.stop()
     """
 
-    def __init__(self):
-        """Initialize ReportScheduler"""
-        self.scheduler = BackgroundScheduler()
+    # Upper bound on a single sleep so clock jumps (suspend/resume) are noticed
+    MAX_SLEEP_SECONDS = 300
+
+    # Delay before retrying a report whose email failed to send
+    RETRY_DELAY = timedelta(hours=1)
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_workers: Optional[int] = None,
+    ):
+        """
+        Initialize ReportScheduler
+
+        Args:
+            session_factory: Callable returning a new database session
+            max_workers: Worker pool size (defaults to REPORT_SCHEDULER_WORKERS)
+        """
+        self.session_factory = session_factory
+        self.max_workers = max_workers or settings.REPORT_SCHEDULER_WORKERS
         self.enabled = settings.ENABLE_WEEKLY_REPORTS and settings.ENABLE_PARENT_NOTIFICATIONS
+
+        # Heap of (due_at, user_id); stale entries are skipped when popped
+        self._heap: List[Tuple[datetime, int]] = []
+        self._scheduled: Dict[int, datetime] = {}
+        self._in_flight: set = set()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
         logger.info(
             f"ReportScheduler initialized - Enabled: {self.enabled}, "
             f"Weekly Reports: {settings.ENABLE_WEEKLY_REPORTS}, "
             f"Notifications: {settings.ENABLE_PARENT_NOTIFICATIONS}"
         )
 
+    @property
+    def running(self) -> bool:
+        """Whether the scheduler thread is running"""
+        return self._running
+
     def start(self):
         """
         Start the scheduler
 
-        Sets up a cron job to run every hour at minute 0
+        Loads the due-time queue from the database (computing any missing
+        next_report_at values) and starts the scheduler thread. Reports that
+        fell due while the app was closed are sent immediately.
         """
         if not self.enabled:
             logger.info("Report scheduler disabled - skipping start")
             return
 
-        # Run every hour at minute 0
-        self.scheduler.add_job(
-            self.check_and_send_reports,
-            trigger=CronTrigger(minute=0),  # Every hour at :00
-            id='report_checker',
-            name='Check and send scheduled reports',
-            replace_existing=True
+        if self._running:
+            logger.warning("Report scheduler already running")
+            return
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="report-worker"
         )
+        self._running = True
+        self.load_queue()
+
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
 
-        self.scheduler.start()
-        logger.info("Report scheduler started - checking for due reports every hour")
+        next_due = self.get_next_due()
+        logger.info(
+            f"Report scheduler started - {len(self._scheduled)} reports queued, "
+            f"next due: {next_due.isoformat() if next_due else 'none'}"
+        )
 
     def stop(self):
         """Stop the scheduler"""
-        if self.scheduler.running:
-            self.scheduler.shutdown()
-            logger.info("Report scheduler stopped")
+        if not self._running:
+            return
 
-    def check_and_send_reports(self):
-        """
-        Check all users and send reports if due
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
 
-        This method:
-        1. Gets current day of week and hour
-        2. Queries all users with active preferences
-        3. Checks if each user is due for a report
-        4. Sends reports for users who are due
+        logger.info("Report scheduler stopped")
+
+    def load_queue(self) -> int:
         """
-        logger.info("Starting scheduled report check")
+        Rebuild the in-memory heap from persisted due times
 
-        # Create database session
-        db = SessionLocal()
+        Returns:
+            Number of users queued
+        """
+        db = self.session_factory()
 
         try:
-            # Get current time
-            now = datetime.now()
-            current_day = now.weekday()  # 0=Monday, 6=Sunday
-            current_hour = now.hour
+            queued = {}
+            for user_id, prefs in self._get_users_with_reports_enabled(db):
+                if prefs.next_report_at is None:
+                    prefs.next_report_at = prefs.compute_next_report_at()
+                if prefs.next_report_at is not None:
+                    queued[user_id] = prefs.next_report_at
+
+            db.commit()
+
+        finally:
+            db.close()
+
+        with self._condition:
+            self._scheduled = queued
+            self._heap = [(due_at, user_id) for user_id, due_at in queued.items()]
+            heapq.heapify(self._heap)
+            self._condition.notify_all()
+
+        return len(queued)
+
+    def reschedule(self, user_id: int, due_at: Optional[datetime]):
+        """
+        Update the queued due time for a user
+
+        Called after preferences change. A None due time removes the user
+        from the queue. Ignored while the scheduler is stopped, since the
+        queue is rebuilt from the database on start.
+
+        Args:
+            user_id: User ID
+            due_at: New due time, or None if reports are disabled
+        """
+        with self._condition:
+            if not self._running:
+                return
+            if due_at is None:
+                self._scheduled.pop(user_id, None)
+            else:
+                self._scheduled[user_id] = due_at
+                heapq.heappush(self._heap, (due_at, user_id))
+            self._condition.notify_all()
+
+    def get_next_due(self) -> Optional[datetime]:
+        """Get the earliest queued due time"""
+        with self._condition:
+            return min(self._scheduled.values()) if self._scheduled else None
+
+    def _run_loop(self):
+        """Scheduler thread: sleep until the earliest due report, then dispatch it"""
+        while True:
+            with self._condition:
+                user_id = self._wait_for_due_user()
+                if user_id is None:
+                    return
+                self._in_flight.add(user_id)
+
+            self._executor.submit(self._process_user, user_id)
+
+    def _wait_for_due_user(self) -> Optional[int]:
+        """
+        Block until a queued report is due (caller holds the condition)
+
+        Returns:
+            User ID of the due report, or None if the scheduler is stopping
+        """
+        while self._running:
+            if not self._heap:
+                self._condition.wait(self.MAX_SLEEP_SECONDS)
+                continue
+
+            due_at, user_id = self._heap[0]
+
+            # Skip entries superseded by a reschedule or already being sent
+            if self._scheduled.get(user_id) != due_at or user_id in self._in_flight:
+                heapq.heappop(self._heap)
+                continue
 
-            logger.debug(f"Current time: Day {current_day}, Hour {current_hour}")
+            wait_seconds = (due_at - datetime.now()).total_seconds()
+            if wait_seconds > 0:
+                self._condition.wait(min(wait_seconds, self.MAX_SLEEP_SECONDS))
+                continue
 
-            # Get all users with email notifications enabled
-            users_to_check = self._get_users_with_reports_enabled(db)
+            heapq.heappop(self._heap)
+            del self._scheduled[user_id]
+            return user_id
 
-            logger.info(f"Found {len(users_to_check)} users with reports enabled")
+        return None
 
-            # Check each user
-            sent_count = 0
-            skipped_count = 0
-            error_count = 0
+    def _process_user(self, user_id: int) -> Optional[str]:
+        """
+        Send a due report for one user and schedule the next one
 
-            for user_id, prefs in users_to_check:
-                try:
-                    # Check if report is due
-                    if self._is_report_due(prefs, current_day, current_hour):
-                        period = prefs.summary_frequency  # "daily" or "weekly"
+        Runs on a worker thread with its own database session.
 
-                        logger.info(
-                            f"Sending {period} report for user {user_id} "
-                            f"(scheduled for day={prefs.summary_day_of_week}, hour={prefs.summary_hour})"
-                        )
+        Args:
+            user_id: User ID
 
-                        # Send the report
-                        result = weekly_report_service.generate_and_send_report(
-                            db, user_id, period, force_send=False
-                        )
+        Returns:
+            "sent", "skipped", "error", or None if the report was no longer due
+        """
+        db = self.session_factory()
+        outcome = None
+        next_due = None
 
-                        if result.get("sent"):
-                            sent_count += 1
-                            logger.info(f"Successfully sent {period} report to user {user_id}")
-                        else:
-                            skipped_count += 1
-                            reason = result.get("reason") or result.get("error")
-                            logger.warning(f"Report not sent for user {user_id}: {reason}")
+        try:
+            prefs = (
+                db.query(ParentNotificationPreferences)
+                .filter(ParentNotificationPreferences.user_id == user_id)
+                .first()
+            )
 
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"Error sending report for user {user_id}: {e}", exc_info=True)
+            now = datetime.now()
+            if not prefs or prefs.next_report_at is None or prefs.next_report_at > now:
+                # Preferences changed since this entry was queued
+                next_due = prefs.next_report_at if prefs else None
+                return None
 
+            seen_due = prefs.next_report_at
+            period = prefs.summary_frequency  # "daily" or "weekly"
             logger.info(
-                f"Report check complete - Sent: {sent_count}, Skipped: {skipped_count}, Errors: {error_count}"
+                f"Sending {period} report for user {user_id} "
+                f"(due {prefs.next_report_at.isoformat()})"
             )
 
+            try:
+                result = weekly_report_service.generate_and_send_report(
+                    db, user_id, period, force_send=False
+                )
+            except Exception as e:
+                logger.error(f"Error sending report for user {user_id}: {e}", exc_info=True)
+                result = {"sent": False, "error": str(e)}
+
+            if result.get("sent"):
+                outcome = "sent"
+                logger.info(f"Successfully sent {period} report to user {user_id}")
+                next_due = prefs.compute_next_report_at(after=now)
+            elif result.get("reason"):
+                outcome = "skipped"
+                logger.warning(f"Report not sent for user {user_id}: {result['reason']}")
+                next_due = prefs.compute_next_report_at(after=now)
+            else:
+                outcome = "error"
+                logger.warning(f"Report failed for user {user_id}: {result.get('error')}")
+                next_due = now + self.RETRY_DELAY
+                regular_due = prefs.compute_next_report_at(after=now)
+                if regular_due is not None and regular_due < next_due:
+                    next_due = regular_due
+
+            # Compare-and-set: if the parent changed the schedule while the
+            # report was in flight, their next_report_at wins
+            updated = (
+                db.query(ParentNotificationPreferences)
+                .filter(
+                    ParentNotificationPreferences.user_id == user_id,
+                    ParentNotificationPreferences.next_report_at == seen_due,
+                )
+                .update(
+                    {ParentNotificationPreferences.next_report_at: next_due},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if not updated:
+                db.expire(prefs)
+                next_due = prefs.next_report_at
+                logger.info(f"Report schedule for user {user_id} changed while sending - keeping it")
+
         except Exception as e:
-            logger.error(f"Error in scheduled report check: {e}", exc_info=True)
+            outcome = "error"
+            logger.error(f"Error processing report for user {user_id}: {e}", exc_info=True)
+            db.rollback()
+            next_due = datetime.now() + self.RETRY_DELAY
+
+        finally:
+            db.close()
+            with self._condition:
+                self._in_flight.discard(user_id)
+            if next_due is not None:
+                self.reschedule(user_id, next_due)
+
+        return outcome
+
+    def check_and_send_reports(self) -> Dict[str, int]:
+        """
+        Send every report that is currently due
+
+        Used for manual triggering; the scheduler thread normally dispatches
+        reports on its own as they fall due.
+
+        Returns:
+            Dictionary with sent/skipped/error counts
+        """
+        logger.info("Starting report check")
+
+        db = self.session_factory()
 
+        try:
+            due_user_ids = [
+                user_id
+                for user_id, prefs in self._get_users_with_reports_enabled(db)
+                if prefs.next_report_at is not None and prefs.next_report_at <= datetime.now()
+            ]
         finally:
             db.close()
 
+        logger.info(f"Found {len(due_user_ids)} users with reports due")
+
+        counts = {"sent": 0, "skipped": 0, "error": 0}
+        for user_id in due_user_ids:
+            with self._condition:
+                if user_id in self._in_flight:
+                    continue
+                self._in_flight.add(user_id)
+
+            outcome = self._process_user(user_id)
+            if outcome in counts:
+                counts[outcome] += 1
+
+        logger.info(
+            f"Report check complete - Sent: {counts['sent']}, "
+            f"Skipped: {counts['skipped']}, Errors: {counts['error']}"
+        )
+        return counts
+
     def _get_users_with_reports_enabled(self, db: Session) -> List[tuple]:
         """
         Get all users with email reports enabled
@@ -170,49 +384,6 @@ class ReportScheduler:
 
         return [(pref.user_id, pref) for pref in preferences]
 
-    def _is_report_due(
-        self,
-        prefs: ParentNotificationPreferences,
-        current_day: int,
-        current_hour: int
-    ) -> bool:
-        """
-        Check if a report is due for a user
-
-        Args:
-            prefs: User's notification preferences
-            current_day: Current day of week (0=Monday, 6=Sunday)
-            current_hour: Current hour (0-23)
-
-        Returns:
-            True if report should be sent now
-        """
-        # Check hour match
-        if current_hour != prefs.summary_hour:
-            return False
-
-        # For daily reports, send every day at the configured hour
-        if prefs.summary_frequency == "daily":
-            logger.debug(f"User {prefs.user_id}: Daily report due (hour={current_hour})")
-            return True
-
-        # For weekly reports, check day of week
-        if prefs.summary_frequency == "weekly":
-            if current_day == prefs.summary_day_of_week:
-                logger.debug(
-                    f"User {prefs.user_id}: Weekly report due "
-                    f"(day={current_day}, hour={current_hour})"
-                )
-                return True
-            else:
-                logger.debug(
-                    f"User {prefs.user_id}: Not due yet "
-                    f"(current_day={current_day}, scheduled_day={prefs.summary_day_of_week})"
-                )
-                return False
-
-        return False
-
     def force_check_now(self):
         """
         Force an immediate check for due reports (for testing)
@@ -220,7 +391,7 @@ class ReportScheduler:
         This can be called manually for testing purposes
         """
         logger.info("Forcing immediate report check")
-        self.check_and_send_reports()
+        return self.check_and_send_reports()
 
 
 # Global scheduler instance
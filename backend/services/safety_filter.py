@@ -16,6 +16,7 @@ import logging
 from datetime import datetime
 
 from sqlalchemy.orm import Session
+from database.database import commit_or_stage
 from models.safety import SafetyFlag
 from utils.config import settings
 
@@ -337,8 +338,8 @@ How about we talk about something more fun instead? I'd love to hear about your
         )
 
         db.add(flag)
-        db.commit()
-        db.refresh(flag)
+        if commit_or_stage(db):
+            db.refresh(flag)
 
         if settings.LOG_SAFETY_EVENTS:
             logger.info(
@@ -0,0 +1,448 @@
+"""
+Summary Queue Service
+Generates conversation summaries in the background during idle time
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session, aliased
+
+from database.database import SessionLocal
+from models.conversation import Conversation, Message
+from services.conversation_summary_service import conversation_summary_service
+from services.llm_service import llm_service
+from services.memory_manager import memory_manager
+from utils.config import settings
+
+logger = logging.getLogger("chatbot.summary_queue")
+
+# Priority lanes (lower is summarized first)
+PRIORITY_REQUESTED = 0  # A parent asked for it or is looking at it
+PRIORITY_FLAGGED = 1  # Conversation contains safety-flagged messages
+PRIORITY_NORMAL = 2  # Any other ended conversation
+
+
+class SummaryQueue:
+    """
+    Summary Queue - background LLM summarization of conversations
+
+    Ending a conversation only queues its summary. A single worker thread
+    summarizes queued conversations one at a time, and only while no chat
+    generation is running, so summaries never compete with the child's chat.
+
+    Features:
+    - Priority lanes: parent-requested, then flagged, then newest first
+    - Skips conversations that already have a summary (unless forced)
+    - Batch jobs with progress polling by job id
+    - Keyword fallback summary if the LLM summary fails
+    - Backfills unsummarized conversations on start
+
+    Usage:
+        summary_queue.enqueue(conversation_id)
+        job = summary_queue.submit_job([1, 2, 3])
+        summary_queue.get_job(job["job_id"])
+    """
+
+    # How often the worker re-checks for idle time while chat is active
+    IDLE_CHECK_SECONDS = 1.0
+
+    # Finished jobs kept for polling
+    MAX_JOBS = 50
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        idle_seconds: Optional[float] = None,
+    ):
+        """
+        Initialize SummaryQueue
+
+        Args:
+            session_factory: Callable returning a new database session
+            idle_seconds: Quiet time required after chat generation (defaults
+                to SUMMARY_IDLE_SECONDS)
+        """
+        self.session_factory = session_factory
+        self.idle_seconds = (
+            idle_seconds if idle_seconds is not None else settings.SUMMARY_IDLE_SECONDS
+        )
+
+        # Heap of (priority, -timestamp, seq, conversation_id); stale entries
+        # (superseded by a higher priority) are skipped when popped
+        self._heap: List[Tuple[int, float, int, int]] = []
+        self._queued: Dict[int, Tuple[int, bool]] = {}  # conversation_id -> (priority, force)
+        self._seq = itertools.count()
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._conversation_jobs: Dict[int, List[str]] = {}
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._last_own_generation_end = 0.0
+
+        self.stats = {"summarized": 0, "skipped": 0, "fallback": 0, "failed": 0}
+
+        logger.info(f"SummaryQueue initialized - idle threshold: {self.idle_seconds}s")
+
+    def enqueue(
+        self,
+        conversation_id: int,
+        priority: int = PRIORITY_NORMAL,
+        timestamp: Optional[datetime] = None,
+        force: bool = False,
+    ) -> None:
+        """
+        Queue a conversation for summarization
+
+        Re-queueing a conversation keeps the higher of the two priorities.
+
+        Args:
+            conversation_id: Conversation ID
+            priority: Priority lane (PRIORITY_REQUESTED is summarized first)
+            timestamp: Conversation start time; newer conversations go first
+                within a lane
+            force: Regenerate even if a summary already exists
+        """
+        with self._condition:
+            self._push(conversation_id, priority, timestamp, force)
+            self._condition.notify_all()
+
+    def prioritize(self, conversation_ids: Iterable[int]) -> int:
+        """
+        Move already-queued conversations to the front
+
+        Called when a parent views conversations that are still waiting for
+        a summary.
+
+        Args:
+            conversation_ids: Conversation IDs the parent is looking at
+
+        Returns:
+            Number of conversations moved up
+        """
+        moved = 0
+        with self._condition:
+            for conversation_id in conversation_ids:
+                queued = self._queued.get(conversation_id)
+                if queued and queued[0] > PRIORITY_REQUESTED:
+                    self._push(conversation_id, PRIORITY_REQUESTED, None, queued[1])
+                    moved += 1
+            if moved:
+                self._condition.notify_all()
+        return moved
+
+    def _push(
+        self,
+        conversation_id: int,
+        priority: int,
+        timestamp: Optional[datetime],
+        force: bool,
+    ) -> None:
+        """Add or upgrade a heap entry (caller holds the condition)"""
+        queued = self._queued.get(conversation_id)
+        if queued:
+            force = force or queued[1]
+            if queued[0] <= priority:
+                self._queued[conversation_id] = (queued[0], force)
+                return
+
+        self._queued[conversation_id] = (priority, force)
+        sort_time = -timestamp.timestamp() if timestamp else 0.0
+        heapq.heappush(self._heap, (priority, sort_time, next(self._seq), conversation_id))
+
+    def submit_job(self, conversation_ids: List[int], force: bool = False) -> Dict:
+        """
+        Queue a batch of conversations as a trackable job
+
+        Args:
+            conversation_ids: Conversation IDs to summarize
+            force: Regenerate summaries that already exist
+
+        Returns:
+            Job status dictionary (see get_job)
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "total": len(conversation_ids),
+            "completed": 0,
+            "summarized": 0,
+            "skipped": 0,
+            "failed": 0,
+            "results": {},
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+        }
+
+        with self._condition:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.MAX_JOBS:
+                self._jobs.popitem(last=False)
+
+            for conversation_id in conversation_ids:
+                self._conversation_jobs.setdefault(conversation_id, []).append(job_id)
+                self._push(conversation_id, PRIORITY_REQUESTED, None, force)
+
+            if not conversation_ids:
+                job["status"] = "completed"
+                job["finished_at"] = datetime.now().isoformat()
+
+            self._condition.notify_all()
+            return self._copy_job(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """
+        Get job progress
+
+        Args:
+            job_id: Job ID returned by submit_job
+
+        Returns:
+            Job status dictionary, or None if the job is unknown
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return self._copy_job(job) if job else None
+
+    @staticmethod
+    def _copy_job(job: Dict) -> Dict:
+        """Snapshot a job so callers never see it change under them"""
+        return {**job, "results": dict(job["results"])}
+
+    def is_idle(self) -> bool:
+        """
+        Whether chat generation is quiet enough to run a summary
+
+        Generations finished by this queue itself don't count as activity.
+        """
+        if llm_service.is_generating:
+            return False
+
+        last_end = llm_service.last_generation_end
+        if last_end <= self._last_own_generation_end:
+            return True
+
+        return time.monotonic() - last_end >= self.idle_seconds
+
+    def _pop_next(self) -> Optional[Tuple[int, bool]]:
+        """Pop the highest-priority queued conversation (caller holds the condition)"""
+        while self._heap:
+            priority, _, _, conversation_id = heapq.heappop(self._heap)
+            queued = self._queued.get(conversation_id)
+            if queued and queued[0] == priority:
+                del self._queued[conversation_id]
+                return conversation_id, queued[1]
+        return None
+
+    def process_next(self) -> Optional[int]:
+        """
+        Summarize the next queued conversation
+
+        Returns:
+            Conversation ID processed, or None if the queue is empty
+        """
+        with self._condition:
+            item = self._pop_next()
+            if item is None:
+                return None
+            conversation_id, force = item
+            for job_id in self._conversation_jobs.get(conversation_id, []):
+                if job_id in self._jobs and self._jobs[job_id]["status"] == "queued":
+                    self._jobs[job_id]["status"] = "running"
+
+        result = self._summarize(conversation_id, force)
+        self.stats[result["status"]] += 1
+        self._record_result(conversation_id, result)
+
+        return conversation_id
+
+    def _summarize(self, conversation_id: int, force: bool) -> Dict:
+        """
+        Summarize one conversation with its own database session
+
+        Returns:
+            Dictionary with status ("summarized", "skipped", "fallback" or
+            "failed") and the summary text
+        """
+        db = self.session_factory()
+
+        try:
+            conversation = (
+                db.query(Conversation).filter(Conversation.id == conversation_id).first()
+            )
+            if not conversation:
+                return {"status": "failed", "error": "Conversation not found"}
+
+            if conversation.conversation_summary and not force:
+                return {"status": "skipped", "summary": conversation.conversation_summary}
+
+            try:
+                summary_data = conversation_summary_service.generate_summary(conversation_id, db)
+                self._last_own_generation_end = time.monotonic()
+                logger.info(
+                    f"Summary generated for conversation {conversation_id} - "
+                    f"Topics: {summary_data.get('topics', [])}, "
+                    f"Mood: {summary_data.get('mood', 'unknown')}"
+                )
+                return {"status": "summarized", "summary": summary_data.get("summary")}
+
+            except Exception as e:
+                self._last_own_generation_end = time.monotonic()
+                logger.error(f"Failed to generate summary for conversation {conversation_id}: {e}")
+                db.rollback()
+
+                # Fallback to simple keyword summary
+                messages = (
+                    db.query(Message)
+                    .filter(Message.conversation_id == conversation_id, Message.role == "user")
+                    .all()
+                )
+                if not messages:
+                    return {"status": "failed", "error": str(e)}
+
+                all_text = " ".join([m.content for m in messages])
+                keywords = memory_manager.extract_keywords(all_text)
+                conversation.conversation_summary = f"Discussed: {', '.join(keywords[:5])}"
+                db.commit()
+                return {
+                    "status": "fallback",
+                    "summary": conversation.conversation_summary,
+                    "error": str(e),
+                }
+
+        except Exception as e:
+            logger.error(f"Error summarizing conversation {conversation_id}: {e}", exc_info=True)
+            db.rollback()
+            return {"status": "failed", "error": str(e)}
+
+        finally:
+            db.close()
+
+    def _record_result(self, conversation_id: int, result: Dict) -> None:
+        """Update every job waiting on this conversation"""
+        job_status = {"summarized": "summarized", "fallback": "summarized"}.get(
+            result["status"], result["status"]
+        )
+
+        with self._condition:
+            for job_id in self._conversation_jobs.pop(conversation_id, []):
+                job = self._jobs.get(job_id)
+                if not job:
+                    continue
+                job["results"][conversation_id] = result
+                job["completed"] += 1
+                job[job_status] += 1
+                if job["completed"] >= job["total"]:
+                    job["status"] = "completed"
+                    job["finished_at"] = datetime.now().isoformat()
+
+    def backfill(self) -> int:
+        """
+        Queue ended conversations that have messages but no summary
+
+        Picks up summaries lost when the app closed with a non-empty queue.
+        A conversation has ended if it was ended (its duration is set) or
+        the child has started a newer one; the latest conversation may
+        still be in progress, so it is left alone.
+
+        Returns:
+            Number of conversations queued
+        """
+        db = self.session_factory()
+
+        try:
+            newer = aliased(Conversation)
+            superseded = (
+                db.query(newer.id)
+                .filter(newer.user_id == Conversation.user_id, newer.id > Conversation.id)
+                .exists()
+            )
+            conversations = (
+                db.query(Conversation.id, Conversation.timestamp)
+                .filter(
+                    Conversation.conversation_summary.is_(None),
+                    Conversation.message_count > 0,
+                    Conversation.duration_seconds.isnot(None) | superseded,
+                )
+                .all()
+            )
+        finally:
+            db.close()
+
+        with self._condition:
+            for conversation_id, timestamp in conversations:
+                self._push(conversation_id, PRIORITY_NORMAL, timestamp, False)
+            self._condition.notify_all()
+
+        return len(conversations)
+
+    def get_stats(self) -> Dict:
+        """Get queue statistics"""
+        with self._condition:
+            queued = len(self._queued)
+        return {
+            "running": self._running,
+            "queued": queued,
+            "idle": self.is_idle(),
+            **self.stats,
+        }
+
+    def start(self):
+        """Start the background worker (backfilling only if AUTO_GENERATE_SUMMARIES is on)"""
+        if self._running:
+            logger.warning("Summary queue already running")
+            return
+
+        # Parent-requested summaries still run when automatic summaries are off
+        if settings.AUTO_GENERATE_SUMMARIES:
+            backfilled = self.backfill()
+            if backfilled:
+                logger.info(f"Queued {backfilled} conversations missing summaries")
+
+        self._running = True
+        self._thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self._thread.start()
+        logger.info("Summary queue started")
+
+    def stop(self):
+        """Stop the background worker (queued conversations are backfilled on next start)"""
+        if not self._running:
+            return
+
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread:
+            self._thread.join(timeout=10)
+        logger.info("Summary queue stopped")
+
+    def _worker_loop(self):
+        """Background loop: wait for queued work and idle time, then summarize one"""
+        while True:
+            with self._condition:
+                while self._running and not self._queued:
+                    self._condition.wait()
+                if not self._running:
+                    return
+
+            if not self.is_idle():
+                with self._condition:
+                    self._condition.wait(self.IDLE_CHECK_SECONDS)
+                continue
+
+            try:
+                self.process_next()
+            except Exception as e:
+                logger.error(f"Error in summary worker: {e}", exc_info=True)
+
+
+# Global instance
+summary_queue = SummaryQueue()
@@ -6,18 +6,198 @@ This service extracts user context and intelligently fills template
 placeholders to make advice more personal and relevant.
 """
 
-from typing import Dict, List, Optional, Any
+from dataclasses import dataclass
+from string import Formatter
+from typing import Dict, List, Optional, Any, Set, Tuple
 import logging
 import re
 
 from sqlalchemy.orm import Session
+from database.cache_invalidation import CommitInvalidator, EngineCache
 from models.user import User
 from models.personality import BotPersonality
 from models.conversation import Message
 from models.safety import AdviceTemplate
+from services.personality_cache import personality_cache
 
 logger = logging.getLogger("chatbot.template_personalization")
 
+# Session.info key holding user_ids whose profile changed in the transaction
+PENDING_KEY = "template_profile_pending"
+
+# Message patterns, compiled once. Friend names are matched against the
+# message as written, the others against the lowercased message.
+FRIEND_NAME_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"(?:my friend|with|and)\s+([A-Z][a-z]+)",
+    r"(?:named|called)\s+([A-Z][a-z]+)",
+    r"([A-Z][a-z]+)\s+(?:is|was|said|told)",
+))
+ACTIVITY_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"(?:playing|doing|practicing|studying|watching|reading|making)\s+(\w+)",
+    r"(?:play|do|practice|study|watch|read|make)\s+(\w+)",
+))
+TOPIC_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"about\s+(\w+)",
+    r"(?:homework|test|project|assignment|essay)(?:\s+in|\s+for)?\s+(\w+)",
+))
+SITUATION_PATTERN = re.compile(r"(?:problem with|trouble with|issue with)\s+(.+?)(?:\.|$|\?)")
+
+# Words that are captured by the message patterns but are not names/activities/topics
+NON_NAMES = frozenset({"He", "She", "They", "My", "The", "This", "That", "We", "I"})
+ACTIVITY_STOPWORDS = frozenset({"the", "a", "an", "my", "your", "about", "with", "for", "to", "on"})
+TOPIC_STOPWORDS = frozenset({"the", "a", "an", "my", "your", "this", "that", "it"})
+
+# Grammar around a placeholder that is removed along with it
+WITH_BEFORE = re.compile(r"\s+with\s+$")
+AND_AFTER = re.compile(r"^\s+and\s+")
+AND_BEFORE = re.compile(r"\s+and\s+$")
+
+# Placeholder names that are filled (other fields are kept as literal text)
+PLACEHOLDER_NAME = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """
+    Advice template text split into literal text and placeholder slots
+
+    Each segment is (literal text, placeholder name or None, format string
+    or None); the format string is only set when the placeholder has a
+    conversion or format spec.
+    """
+
+    segments: Tuple[Tuple[str, Optional[str], Optional[str]], ...]
+    placeholders: Tuple[str, ...]
+
+
+def compile_template(text: str) -> CompiledTemplate:
+    """
+    Split template text into literal text and placeholder slots
+
+    Args:
+        text: Template text with {placeholders}
+
+    Returns:
+        CompiledTemplate (the whole text as one literal if it is malformed)
+    """
+    try:
+        parsed = list(Formatter().parse(text))
+    except ValueError:
+        return CompiledTemplate(segments=((text, None, None),), placeholders=())
+
+    segments = []
+    literal = ""
+    for literal_text, field_name, format_spec, conversion in parsed:
+        literal += literal_text
+        if field_name is None:
+            continue
+        if not PLACEHOLDER_NAME.fullmatch(field_name):
+            # Positional, attribute or index fields are not filled - keep them as written
+            literal += "{" + field_name + (f"!{conversion}" if conversion else "") + (
+                f":{format_spec}" if format_spec else "") + "}"
+            continue
+        format_string = None
+        if conversion or format_spec:
+            format_string = "{0" + (f"!{conversion}" if conversion else "") + (
+                f":{format_spec}" if format_spec else "") + "}"
+        segments.append((literal, field_name, format_string))
+        literal = ""
+    if literal or not segments:
+        segments.append((literal, None, None))
+
+    return CompiledTemplate(
+        segments=tuple(segments),
+        placeholders=tuple(dict.fromkeys(name for _, name, _ in segments if name)),
+    )
+
+
+class UserProfileCache:
+    """
+    Cached template context (names, mood, interests) for each user
+
+    Built from the User row and the personality snapshot, and dropped when
+    a committed transaction writes the user or their personality.
+    Contexts are kept per database engine; a load that races with a
+    commit is not stored.
+    """
+
+    def __init__(self):
+        """Initialize the cache"""
+        # engine -> user_id -> context
+        self._contexts = EngineCache()
+
+    def get(self, db: Session, user_id: int) -> Dict[str, Any]:
+        """
+        Get a user's template context, loading it on a miss
+
+        Args:
+            db: Database session
+            user_id: User ID
+
+        Returns:
+            Dictionary with user context variables (a copy)
+        """
+        engine = db.get_bind()
+        context, generation = self._contexts.lookup(engine, user_id)
+        if context is not None:
+            return dict(context)
+
+        user = db.query(User).filter(User.id == user_id).first()
+        personality = personality_cache.get(user_id, db)
+        context = self._build_context(user, personality)
+
+        # Only cache committed users (changes staged in this session are not)
+        if user is not None and not profile_writes.uncommitted(db, user_id):
+            self._contexts.store(engine, user_id, dict(context), generation)
+
+        return context
+
+    def invalidate(self, user_id: Optional[int] = None, engine=None) -> None:
+        """
+        Drop cached contexts
+
+        Args:
+            user_id: User to drop (all users if None)
+            engine: Engine whose contexts to drop (all engines if None)
+        """
+        self._contexts.invalidate(user_id, engine)
+
+    @staticmethod
+    def _build_context(user, personality) -> Dict[str, Any]:
+        """Template context from a user and their personality (either may be None)"""
+        context = {}
+
+        if user:
+            context["name"] = user.name or "friend"
+            context["user_name"] = user.name or "friend"
+
+        if personality:
+            context["bot_name"] = personality.name or "ChessBot"
+            context["friendship_level"] = personality.friendship_level
+            context["mood"] = personality.mood
+
+            # Extract interests if available
+            interests = personality.get_interests()
+            if interests:
+                context["interests"] = ", ".join(interests[:3])
+                context["interest"] = interests[0] if interests else "hobbies"
+
+            # Extract quirks if available
+            quirks = personality.get_quirks()
+            if quirks:
+                context["quirks"] = ", ".join(quirks)
+
+        # Default values if not found
+        context.setdefault("name", "friend")
+        context.setdefault("user_name", "friend")
+        context.setdefault("bot_name", "ChessBot")
+
+        return context
+
+
+# Global instance
+user_profile_cache = UserProfileCache()
+
 
 class TemplatePersonalizationService:
     """
@@ -31,6 +211,11 @@ class TemplatePersonalizationService:
     - Extract entities from user messages (friend names, situations, etc.)
     - Support multiple placeholder formats
 
+    Template texts are compiled once into literal text and placeholder
+    slots, so rendering is a single join; user context comes from the
+    cached user profile and every message-derived field is extracted in
+    one pass with precompiled patterns.
+
     Supported Placeholders:
     - {name} - User's name
     - {friend_name} - Friend's name (extracted from context)
@@ -42,9 +227,28 @@ class TemplatePersonalizationService:
     - {activity} - Activity mentioned
     """
 
+    # Compiled template texts kept before the cache is cleared
+    COMPILED_CACHE_SIZE = 1000
+
+    # Values for placeholders the context does not provide
+    DEFAULT_PLACEHOLDER_VALUES = {
+        "name": "friend",
+        "user_name": "friend",
+        "bot_name": "me",
+        "friend_name": "your friend",
+        "friends": "your friends",
+        "feeling": "this way",
+        "emotion": "this way",
+        "activity": "that",
+        "topic": "this",
+        "subject": "this",
+        "situation": "this situation",
+    }
+
     def __init__(self):
         """Initialize TemplatePersonalizationService"""
         self.templates_personalized = 0
+        self._compiled: Dict[str, CompiledTemplate] = {}
         logger.info("TemplatePersonalizationService initialized")
 
     def personalize_template(
@@ -85,11 +289,8 @@ class TemplatePersonalizationService:
         if additional_context:
             context_vars.update(additional_context)
 
-        # Format template
-        personalized = template.format_advice(**context_vars)
-
-        # Post-process to clean up any remaining placeholders
-        personalized = self._clean_remaining_placeholders(personalized, context_vars)
+        # Fill placeholders (defaults or graceful removal for unknown ones)
+        personalized = self._render(self._compile(template.template), context_vars)
 
         self.templates_personalized += 1
 
@@ -111,38 +312,7 @@ class TemplatePersonalizationService:
         Returns:
             Dictionary with user context variables
         """
-        context = {}
-
-        # Get user
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            context["name"] = user.name or "friend"
-            context["user_name"] = user.name or "friend"
-
-        # Get bot personality
-        personality = db.query(BotPersonality).filter(BotPersonality.user_id == user_id).first()
-        if personality:
-            context["bot_name"] = personality.name or "ChessBot"
-            context["friendship_level"] = personality.friendship_level
-            context["mood"] = personality.mood
-
-            # Extract interests if available
-            interests = personality.get_interests()
-            if interests:
-                context["interests"] = ", ".join(interests[:3])
-                context["interest"] = interests[0] if interests else "hobbies"
-
-            # Extract quirks if available
-            quirks = personality.get_quirks()
-            if quirks:
-                context["quirks"] = ", ".join(quirks)
-
-        # Default values if not found
-        context.setdefault("name", "friend")
-        context.setdefault("user_name", "friend")
-        context.setdefault("bot_name", "ChessBot")
-
-        return context
+        return user_profile_cache.get(db, user_id)
 
     def _extract_message_context(
         self, user_message: str, detected_mood: Optional[str] = None
@@ -164,67 +334,83 @@ class TemplatePersonalizationService:
             context["feeling"] = detected_mood
             context["emotion"] = detected_mood
 
-        # Extract potential friend names (capitalized words after "my friend", "with", etc.)
-        friend_names = self._extract_friend_names(user_message)
+        fields = self._scan_message(user_message)
+
+        # Friend names (capitalized words after "my friend", "with", etc.)
+        friend_names = fields["friend_names"]
         if friend_names:
             context["friend_name"] = friend_names[0]
             if len(friend_names) > 1:
                 context["friends"] = " and ".join(friend_names)
 
-        # Extract activities (words after "doing", "playing", "studying", etc.)
-        activities = self._extract_activities(user_message)
+        # Activities (words after "doing", "playing", "studying", etc.)
+        activities = fields["activities"]
         if activities:
             context["activity"] = activities[0]
 
-        # Extract subjects/topics (words after "about", "with", etc.)
-        topics = self._extract_topics(user_message)
+        # Subjects/topics (words after "about", "homework in", etc.)
+        topics = fields["topics"]
         if topics:
             context["topic"] = topics[0]
             context["subject"] = topics[0]
 
-        # Extract situations (phrases describing problems/situations)
-        situation = self._extract_situation(user_message)
-        if situation:
-            context["situation"] = situation
+        # Situations (phrases describing problems/situations)
+        if fields["situation"]:
+            context["situation"] = fields["situation"]
 
         return context
 
-    def _extract_friend_names(self, message: str) -> List[str]:
+    def _scan_message(self, message: str) -> Dict[str, Any]:
         """
-        Extract potential friend names from message
+        Extract friend names, activities, topics and situation in one pass
 
         Args:
             message: User's message
 
         Returns:
-            List of potential friend names
+            Dictionary with friend_names, activities, topics (lists, at most
+            2 each) and situation (or None)
         """
-        names = []
+        lowered = message.lower()
 
-        # Patterns to detect friend names
-        patterns = [
-            r"(?:my friend|with|and)\s+([A-Z][a-z]+)",
-            r"(?:named|called)\s+([A-Z][a-z]+)",
-            r"([A-Z][a-z]+)\s+(?:is|was|said|told)",
+        # Names in pattern order, without common non-name words or duplicates
+        names = [
+            name for pattern in FRIEND_NAME_PATTERNS
+            for name in pattern.findall(message) if name not in NON_NAMES
+        ]
+        activities = [
+            activity for pattern in ACTIVITY_PATTERNS
+            for activity in pattern.findall(lowered) if activity not in ACTIVITY_STOPWORDS
+        ]
+        topics = [
+            topic for pattern in TOPIC_PATTERNS
+            for topic in pattern.findall(lowered) if topic not in TOPIC_STOPWORDS and len(topic) > 2
         ]
 
-        for pattern in patterns:
-            matches = re.findall(pattern, message)
-            names.extend(matches)
+        # First situation, if it is a reasonable length
+        match = SITUATION_PATTERN.search(lowered)
+        situation = match.group(1).strip() if match else None
+        if situation and not 5 < len(situation) < 50:
+            situation = None
 
-        # Remove common non-name words
-        non_names = {"He", "She", "They", "My", "The", "This", "That", "We", "I"}
-        names = [n for n in names if n not in non_names]
+        return {
+            "friend_names": list(dict.fromkeys(names))[:2],
+            "activities": activities[:2],
+            "topics": topics[:2],
+            "situation": situation,
+        }
 
-        # Deduplicate while preserving order
-        seen = set()
-        unique_names = []
-        for name in names:
-            if name not in seen:
-                seen.add(name)
-                unique_names.append(name)
+    def _extract_friend_names(self, message: str) -> List[str]:
+        """
+        Extract potential friend names from message
 
-        return unique_names[:2]  # Limit to 2 names
+        Args:
+            message: User's message
+
+        Returns:
+            List of potential friend names
+        """
+        return self._scan_message(message)["friend_names"]
 
     def _extract_activities(self, message: str) -> List[str]:
         """
@@ -236,23 +422,7 @@ class TemplatePersonalizationService:
         Returns:
             List of activities
         """
-        activities = []
-
-        # Patterns to detect activities
-        patterns = [
-            r"(?:playing|doing|practicing|studying|watching|reading|making)\s+(\w+)",
-            r"(?:play|do|practice|study|watch|read|make)\s+(\w+)",
-        ]
-
-        for pattern in patterns:
-            matches = re.findall(pattern, message.lower())
-            activities.extend(matches)
-
-        # Clean up common words
-        stopwords = {"the", "a", "an", "my", "your", "about", "with", "for", "to", "on"}
-        activities = [a for a in activities if a not in stopwords]
-
-        return activities[:2]  # Limit to 2 activities
+        return self._scan_message(message)["activities"]
 
     def _extract_topics(self, message: str) -> List[str]:
         """
@@ -264,23 +434,7 @@ class TemplatePersonalizationService:
         Returns:
             List of topics
         """
-        topics = []
-
-        # Patterns to detect topics
-        patterns = [
-            r"about\s+(\w+)",
-            r"(?:homework|test|project|assignment|essay)(?:\s+in|\s+for)?\s+(\w+)",
-        ]
-
-        for pattern in patterns:
-            matches = re.findall(pattern, message.lower())
-            topics.extend(matches)
-
-        # Filter out common words
-        stopwords = {"the", "a", "an", "my", "your", "this", "that", "it"}
-        topics = [t for t in topics if t not in stopwords and len(t) > 2]
-
-        return topics[:2]  # Limit to 2 topics
+        return self._scan_message(message)["topics"]
 
     def _extract_situation(self, message: str) -> Optional[str]:
         """
@@ -292,29 +446,83 @@ class TemplatePersonalizationService:
         Returns:
             Situation description or None
         """
-        # Look for common problem/situation patterns
-        situation_markers = [
-            r"(?:I have|I'm having|I got)\s+(a\s+)?(.+?)(?:\.|$|\?)",
-            r"(?:problem with|trouble with|issue with)\s+(.+?)(?:\.|$|\?)",
-        ]
+        return self._scan_message(message)["situation"]
+
+    def _compile(self, text: str) -> CompiledTemplate:
+        """Compile template text once and reuse it"""
+        compiled = self._compiled.get(text)
+        if compiled is None:
+            compiled = compile_template(text)
+            if len(self._compiled) >= self.COMPILED_CACHE_SIZE:
+                self._compiled.clear()
+            self._compiled[text] = compiled
+        return compiled
+
+    def _render(self, compiled: CompiledTemplate, context: Dict[str, Any]) -> str:
+        """
+        Fill a compiled template's placeholders
 
-        for pattern in situation_markers:
-            match = re.search(pattern, message.lower())
-            if match:
-                # Get the last capturing group
-                situation = match.group(match.lastindex)
-                # Clean up
-                situation = situation.strip()
-                if len(situation) > 5 and len(situation) < 50:
-                    return situation
+        Placeholders missing from the context get a default value, or are
+        removed together with a surrounding "with"/"and".
 
-        return None
+        Args:
+            compiled: Compiled template
+            context: Context variables
+
+        Returns:
+            Filled text
+        """
+        segments = compiled.segments
+        parts = []
+        removed = False
+        trim_next = False
+
+        for i, (literal, name, format_string) in enumerate(segments):
+            if trim_next:
+                literal = AND_AFTER.sub("", literal, count=1)
+                trim_next = False
+            parts.append(literal)
+            if name is None:
+                continue
+
+            if name in context:
+                value = context[name]
+            else:
+                value = self._get_default_placeholder_value(name)
+                if not value:
+                    # Remove "with {x}", "{x} and" or "and {x}" along with the placeholder
+                    removed = True
+                    following = segments[i + 1][0] if i + 1 < len(segments) else ""
+                    match = WITH_BEFORE.search(literal)
+                    if match:
+                        parts[-1] = literal[:match.start()]
+                    elif AND_AFTER.match(following):
+                        trim_next = True
+                    else:
+                        match = AND_BEFORE.search(literal)
+                        if match:
+                            parts[-1] = literal[:match.start()]
+                    continue
+
+            if format_string:
+                try:
+                    value = format_string.format(value)
+                except (ValueError, TypeError):
+                    value = str(value)
+            parts.append(value if type(value) is str else str(value))
+
+        text = "".join(parts)
+        if removed:
+            # Clean up double spaces and spaces before punctuation
+            text = re.sub(r"\s+", " ", text)
+            text = re.sub(r"\s+([.,!?])", r"\1", text).strip()
+        return text
 
     def _clean_remaining_placeholders(
         self, text: str, filled_context: Dict[str, Any]
     ) -> str:
         """
-        Clean up any remaining placeholders that weren't filled
+        Fill placeholders in text, defaulting or removing ones without a value
 
         Args:
             text: Text with potential unfilled placeholders
@@ -323,20 +531,7 @@ class TemplatePersonalizationService:
         Returns:
             Cleaned text
         """
-        # Find all placeholders still in text
-        placeholders = re.findall(r"\{(\w+)\}", text)
-
-        for placeholder in placeholders:
-            # If we don't have this variable, try to provide a reasonable default
-            if placeholder not in filled_context:
-                default_value = self._get_default_placeholder_value(placeholder)
-                if default_value:
-                    text = text.replace(f"{{{placeholder}}}", default_value)
-                else:
-                    # Remove the placeholder and clean up grammar
-                    text = self._remove_placeholder_gracefully(text, placeholder)
-
-        return text
+        return self._render(self._compile(text), filled_context)
 
     def _get_default_placeholder_value(self, placeholder: str) -> Optional[str]:
         """
@@ -348,21 +543,7 @@ class TemplatePersonalizationService:
         Returns:
             Default value or None
         """
-        defaults = {
-            "name": "friend",
-            "user_name": "friend",
-            "bot_name": "me",
-            "friend_name": "your friend",
-            "friends": "your friends",
-            "feeling": "this way",
-            "emotion": "this way",
-            "activity": "that",
-            "topic": "this",
-            "subject": "this",
-            "situation": "this situation",
-        }
-
-        return defaults.get(placeholder)
+        return self.DEFAULT_PLACEHOLDER_VALUES.get(placeholder)
 
     def _remove_placeholder_gracefully(self, text: str, placeholder: str) -> str:
         """
@@ -409,8 +590,7 @@ class TemplatePersonalizationService:
         Returns:
             List of placeholder names
         """
-        placeholders = re.findall(r"\{(\w+)\}", template.template)
-        return list(set(placeholders))
+        return list(self._compile(template.template).placeholders)
 
     def can_fill_template(
         self,
@@ -455,6 +635,27 @@ class TemplatePersonalizationService:
 template_personalization_service = TemplatePersonalizationService()
 
 
+def _written_profiles(session: Session) -> Set[int]:
+    """User IDs whose User row or personality the session inserts, updates or deletes"""
+    user_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, BotPersonality):
+            user_ids.add(obj.user_id)
+    user_ids.discard(None)
+    return user_ids
+
+
+def _invalidate_profiles(user_ids: Set[int], engine) -> None:
+    """Drop cached contexts of users written by a committed transaction"""
+    for user_id in user_ids:
+        user_profile_cache.invalidate(user_id, engine)
+
+
+profile_writes = CommitInvalidator(PENDING_KEY, _written_profiles, _invalidate_profiles)
+
+
 # Convenience functions
 def personalize_template(
     template: AdviceTemplate,
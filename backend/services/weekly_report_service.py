@@ -13,7 +13,7 @@ from models.safety import SafetyFlag
 from models.conversation import Conversation, Message
 from models.parent_preferences import ParentNotificationPreferences
 from models.user import User
-from services.email_service import email_service
+from services.email_outbox_service import email_outbox_service
 from services.parent_preferences_service import parent_preferences_service
 from services.email_template_service import email_template_service
 
@@ -385,11 +385,14 @@ class WeeklyReportService:
 
         # Send email
         try:
-            email_result = email_service.send_email(
+            email_result = email_outbox_service.deliver(
+                db,
                 to_email=parent_email,
                 subject=subject,
                 body=plain_body,
-                html_body=html_body
+                html_body=html_body,
+                user_id=user_id,
+                category=f"{period}_report"
             )
 
             if email_result.get("sent"):
@@ -397,6 +400,7 @@ class WeeklyReportService:
                 return {
                     "success": True,
                     "sent": True,
+                    "queued": email_result.get("queued", False),
                     "to_email": parent_email,
                     "period": period,
                     "report_data": report_data
@@ -0,0 +1,138 @@
+"""
+Tests for Advice Template Index
+Tests indexed template lookups, reload on change and buffered usage counts
+"""
+
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base
+from database.seed import seed_advice_templates
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.safety import AdviceTemplate
+from services.advice_template_index import AdviceTemplateIndex, advice_template_index
+from services.advice_template_service import AdviceTemplateService
+
+
+@pytest.fixture
+def session_factory():
+    """Session factory bound to a fresh in-memory database with the seeded templates"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    seed_advice_templates(db)
+    db.close()
+    return factory
+
+
+@pytest.fixture
+def query_log(session_factory):
+    """Statements run on the engine"""
+    statements = []
+    event.listen(session_factory.kw["bind"], "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+class TestLookups:
+    """Test indexed lookups"""
+
+    def test_matches_database_query(self, session_factory):
+        """Test the index returns what get_by_category and the tone filter did"""
+        index = AdviceTemplateIndex()
+        db = session_factory()
+        categories = [row[0] for row in db.query(AdviceTemplate.category).distinct()]
+        subcategories = [None] + [
+            row[0] for row in db.query(AdviceTemplate.subcategory).distinct() if row[0]
+        ][:3]
+
+        for category in categories + ["unknown"]:
+            for level in (0, 1, 3, 5, 10, 12):
+                for age in (None, 7, 8, 11, 14, 15):
+                    for subcategory in subcategories:
+                        for tone in (None, "supportive", "practical"):
+                            expected = [
+                                t.id for t in AdviceTemplate.get_by_category(
+                                    db, category, level, age, subcategory
+                                )
+                                if not tone or t.tone == tone or t.tone is None
+                            ]
+                            found = index.get_templates(db, category, level, age, subcategory, tone)
+                            assert [t.id for t in found] == expected
+
+    def test_second_lookup_skips_database(self, session_factory, query_log):
+        """Test templates are loaded once, with keywords already parsed"""
+        index = AdviceTemplateIndex()
+        index.get_templates(session_factory(), "school_stress", 5)
+        query_log.clear()
+
+        templates = index.get_templates(session_factory(), "school_stress", 5, age=10)
+
+        assert templates
+        assert query_log == []
+        assert isinstance(templates[0].keywords, tuple)
+        assert templates[0].get_keywords() == list(templates[0].keywords)
+
+    def test_template_change_reloads(self, session_factory):
+        """Test a committed template change is visible on the next lookup"""
+        db = session_factory()
+        assert advice_template_index.get_templates(db, "pet_care", 5) == []
+
+        db.add(AdviceTemplate(category="pet_care", keywords='["dog"]', template="Walk {name}'s dog!",
+                              created_at=datetime.now()))
+        db.commit()
+
+        templates = advice_template_index.get_templates(session_factory(), "pet_care", 5)
+        assert [t.template for t in templates] == ["Walk {name}'s dog!"]
+
+
+class TestUsageCounts:
+    """Test buffered usage counting"""
+
+    def test_uses_are_buffered_then_flushed(self, session_factory, query_log):
+        """Test advice requests do not write, and a flush writes every use"""
+        service = AdviceTemplateService()
+        db = session_factory()
+        template = service.get_advice_template(db, "school_stress", 5, strategy="random")
+        query_log.clear()
+
+        for _ in range(3):
+            advice_template_index.record_use(template, db)
+
+        assert query_log == []
+        assert template.usage_count == 3  # Visible to most_used selection right away
+
+        assert advice_template_index.flush_usage() >= 3
+        stored = session_factory().query(AdviceTemplate).filter(AdviceTemplate.id == template.id).first()
+        assert stored.usage_count == 3
+
+    def test_formatted_advice_does_not_commit(self, session_factory):
+        """Test getting advice leaves the usage count to the flusher"""
+        service = AdviceTemplateService()
+        db = session_factory()
+        commits = []
+        event.listen(db, "after_commit", lambda session: commits.append(session))
+
+        advice = service.get_formatted_advice(db, "school_stress", 5, name="Alex")
+
+        assert advice
+        assert commits == []
+        assert advice_template_index.get_stats()["uses_pending"] >= 1
+
+    def test_stop_writes_remaining_uses(self, session_factory):
+        """Test stopping the flusher writes counts that are still buffered"""
+        index = AdviceTemplateIndex(flush_interval_seconds=3600)
+        db = session_factory()
+        index.start()
+        template = index.get_templates(db, "school_stress", 5)[0]
+        index.record_use(template, db)
+
+        index.stop()
+
+        stored = session_factory().query(AdviceTemplate).filter(AdviceTemplate.id == template.id).first()
+        assert stored.usage_count == 1
+        assert index.get_stats()["uses_pending"] == 0
@@ -0,0 +1,132 @@
+"""
+Tests for the in-memory caches
+Tests TTLCache expiry, LRU and size bounds, thread safety, and the cache key fast paths
+"""
+
+import threading
+
+from utils.cache import TTLCache, cached, generate_cache_key
+
+
+class TestTTLCache:
+    """Test the TTL cache"""
+
+    def test_expiry(self):
+        """Test expired entries are misses"""
+        cache = TTLCache(default_ttl=60)
+        cache.set("gone", "value", ttl=-1)
+        cache.set("kept", "value")
+
+        assert cache.get("gone") is None
+        assert cache.get("kept") == "value"
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+
+    def test_cleanup_removes_only_expired(self):
+        """Test cleanup removes expired entries and skips overwritten ones"""
+        cache = TTLCache(default_ttl=60)
+        for i in range(5):
+            cache.set(f"short{i}", i, ttl=-1)
+        cache.set("renewed", 1, ttl=-1)
+        cache.set("renewed", 2)  # Old expiry is stale now
+        cache.set("long", 3)
+
+        assert cache.cleanup_expired() == 5
+        assert cache.cleanup_expired() == 0
+        assert len(cache) == 2
+        assert cache.get("renewed") == 2
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted when full"""
+        cache = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_replace_does_not_evict(self):
+        """Test overwriting a key in a full cache keeps the other entries"""
+        cache = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("b", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") == 3
+
+    def test_max_bytes(self):
+        """Test the byte bound evicts old entries and skips oversized values"""
+        cache = TTLCache(max_bytes=2500)
+        cache.set("a", "x" * 1000)
+        cache.set("b", "x" * 1000)
+        cache.set("c", "x" * 1000)
+
+        assert cache.get("a") is None
+        assert cache.get_stats()["bytes"] == 2000
+
+        cache.set("b", "x" * 3000)
+        assert cache.get("b") is None
+        assert cache.get_stats()["bytes"] == 1000
+
+    def test_concurrent_access(self):
+        """Test gets, sets and cleanup from several threads keep the cache consistent"""
+        cache = TTLCache(max_size=50, max_bytes=20000)
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(2000):
+                    key = f"k{(n * 7 + i) % 80}"
+                    cache.set(key, "v" * (i % 300), ttl=(i % 3) - 1)
+                    cache.get(key)
+                    if i % 100 == 0:
+                        cache.cleanup_expired()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        stats = cache.get_stats()
+        assert stats["size"] <= 50
+        assert stats["bytes"] == sum(entry.size for entry in cache._cache.values())
+
+
+class TestCacheKeys:
+    """Test cache key generation"""
+
+    def test_plain_args_distinct(self):
+        """Test equal-comparing values of different types get different keys"""
+        keys = {generate_cache_key(value) for value in (1, 1.0, True, "1", b"1", None)}
+        assert len(keys) == 6
+
+    def test_stable_and_order_independent(self):
+        """Test keys are fixed strings and keyword order doesn't matter"""
+        assert generate_cache_key("a", n=1, t=0.5) == generate_cache_key("a", t=0.5, n=1)
+        assert generate_cache_key("a", ["b"]) == generate_cache_key("a", ["b"])
+        assert len(generate_cache_key("a", ["b"])) == 64
+
+    def test_cached_decorator(self):
+        """Test results are reused per argument value and type"""
+        calls = []
+
+        @cached(ttl=60)
+        def double(x):
+            calls.append(x)
+            return x * 2
+
+        assert double(2) == 4
+        assert double(2) == 4
+        assert double(2.0) == 4.0
+        assert double([1]) == [1, 1]
+        assert double([1]) == [1, 1]
+        assert calls == [2, 2.0, [1]]
+        assert double._cache_key(2) != double._cache_key(2.0)
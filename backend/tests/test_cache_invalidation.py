@@ -0,0 +1,114 @@
+"""
+Tests for Cache Invalidation
+Tests the engine-keyed cache generations and the commit invalidation hooks
+"""
+
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.cache_invalidation import EngineCache
+from database.database import Base
+from models.user import User
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.personality import BotPersonality
+from services.personality_cache import personality_writes
+
+
+@pytest.fixture
+def session_factory():
+    """Session factory bound to a fresh in-memory database with one personality"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add(User(id=1, name="Test User", age=10, created_at=datetime.now()))
+    db.add(BotPersonality(user_id=1, name="Buddy", humor=0.5))
+    db.commit()
+    db.close()
+    return factory
+
+
+class TestEngineCache:
+    """Test values cached per engine"""
+
+    def test_store_and_lookup(self):
+        """Test a stored value is returned for its engine only"""
+        cache, engine, other = EngineCache(), create_engine("sqlite://"), create_engine("sqlite://")
+        _, generation = cache.lookup(engine, 1)
+
+        assert cache.store(engine, 1, "value", generation)
+        assert cache.lookup(engine, 1)[0] == "value"
+        assert cache.lookup(other, 1)[0] is None
+        assert cache.values() == ["value"]
+
+    def test_load_racing_invalidation_not_stored(self):
+        """Test a value loaded before an invalidation is not cached"""
+        cache, engine = EngineCache(), create_engine("sqlite://")
+        _, generation = cache.lookup(engine, 1)
+
+        cache.invalidate(1, engine)
+
+        assert not cache.store(engine, 1, "stale", generation)
+        assert cache.lookup(engine, 1)[0] is None
+
+    def test_invalidate_scope(self):
+        """Test invalidation by key, by engine and for everything"""
+        cache, engine, other = EngineCache(), create_engine("sqlite://"), create_engine("sqlite://")
+        for each in (engine, other):
+            for key in (1, 2):
+                cache.store(each, key, f"{key}", cache.lookup(each, key)[1])
+
+        cache.invalidate(1, engine)
+        assert [cache.lookup(engine, key)[0] for key in (1, 2)] == [None, "2"]
+
+        cache.invalidate(engine=other)
+        assert [cache.lookup(other, key)[0] for key in (1, 2)] == [None, None]
+
+        cache.invalidate()
+        assert cache.values() == []
+
+
+class TestCommitInvalidator:
+    """Test the session hooks (through the personality cache's)"""
+
+    def test_commit_invalidates_written_keys(self, session_factory):
+        """Test a commit invalidates what its transaction wrote, with the session's engine"""
+        db = session_factory()
+        db.query(BotPersonality).first().humor = 0.9
+
+        with patch("services.personality_cache.personality_cache.invalidate") as invalidate:
+            db.commit()
+
+        invalidate.assert_called_once_with(1, db.get_bind())
+        assert personality_writes.pending_key not in db.info
+
+    def test_rollback_invalidates_nothing(self, session_factory):
+        """Test rolled-back writes are forgotten"""
+        db = session_factory()
+        db.query(BotPersonality).first().humor = 0.9
+        db.flush()
+
+        with patch("services.personality_cache.personality_cache.invalidate") as invalidate:
+            db.rollback()
+            db.commit()
+
+        invalidate.assert_not_called()
+        assert personality_writes.pending_key not in db.info
+
+    def test_uncommitted(self, session_factory):
+        """Test unflushed and flushed writes count as uncommitted until the commit"""
+        db = session_factory()
+        assert not personality_writes.uncommitted(db, 1)
+
+        db.query(BotPersonality).first().humor = 0.9
+        assert personality_writes.uncommitted(db, 1)
+
+        db.flush()
+        assert personality_writes.uncommitted(db, 1)
+
+        db.commit()
+        assert not personality_writes.uncommitted(db, 1)
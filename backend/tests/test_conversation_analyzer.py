@@ -0,0 +1,123 @@
+"""
+Tests for Conversation Analyzer
+Tests the compiled keyword matcher and one-pass feature extraction
+"""
+
+import random
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base
+from models.user import User
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.conversation import Conversation, Message
+from services.conversation_analyzer import (
+    KEYWORD_CATEGORIES,
+    ConversationAnalyzer,
+    KeywordMatcher,
+)
+
+
+@pytest.fixture
+def test_db():
+    """Create test database with a user and conversation"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(User(id=1, name="Test User", age=12, created_at=datetime.now()))
+    db.add(Conversation(id=1, user_id=1, timestamp=datetime.now(), message_count=0))
+    db.commit()
+    yield db
+    db.close()
+
+
+class TestKeywordMatcher:
+    """Test the compiled matcher"""
+
+    def naive_categories(self, text):
+        """The per-keyword substring checks the matcher replaces"""
+        return {
+            category for category, keywords in KEYWORD_CATEGORIES.items()
+            if any(keyword in text for keyword in keywords)
+        }
+
+    def test_overlapping_keywords(self):
+        """Test keywords that overlap or share prefixes are all found"""
+        matcher = KeywordMatcher(KEYWORD_CATEGORIES)
+
+        # "thanks" hides "thank"; "feeling" hides "feel"; "lol" is in two categories
+        assert matcher.categories("thanks lol") == {"thanks", "laughter", "casual_language", "casual_words"}
+        assert matcher.categories("feeling") == {"feelings"}
+        assert matcher.categories("party") == {"thanks"}  # Substring rule: "ty"
+        assert matcher.categories("nothing here") == set()
+
+    def test_matches_naive_substring_checks(self):
+        """Test the matcher agrees with plain substring checks"""
+        matcher = KeywordMatcher(KEYWORD_CATEGORIES)
+        rng = random.Random(7)
+        vocabulary = [kw for kws in KEYWORD_CATEGORIES.values() for kw in kws]
+        vocabulary += ["a", "e", "s", "t", "y", "ing", " ", "?", "ok"]
+
+        for _ in range(2000):
+            text = "".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 8)))
+            assert matcher.categories(text) == self.naive_categories(text), text
+
+    def test_token_cache_cleared_concurrently(self):
+        """Test another thread clearing the token cache mid-call does not break the result"""
+        class ClearedByOtherThread(dict):
+            def __setitem__(self, key, value):
+                super().__setitem__(key, value)
+                self.clear()
+
+        matcher = KeywordMatcher(KEYWORD_CATEGORIES)
+        matcher._token_cache = ClearedByOtherThread()
+
+        assert matcher.categories("thanks lol") == self.naive_categories("thanks lol")
+
+
+class TestConversationAnalyzer:
+    """Test one-pass feature extraction"""
+
+    def test_analyze_messages(self):
+        """Test counts cover user messages only, except totals and flags"""
+        analyzer = ConversationAnalyzer()
+
+        features = analyzer.analyze_messages([
+            ("user", "haha that's hilarious!", False),
+            ("assistant", "lol glad you liked it", False),
+            ("user", "I feel worried about my future?", True),
+            ("user", "ok", False),
+        ])
+
+        assert features["message_count"] == 4
+        assert features["user_message_count"] == 3
+        assert features["flagged_count"] == 1
+        assert features["laughter_count"] == 1
+        assert features["feelings_count"] == 1
+        assert features["deep_topics_count"] == 1
+        assert features["questions_count"] == 1
+        assert features["short_messages_count"] == 1
+        assert features["avg_message_length"] == pytest.approx((22 + 31 + 2) / 3)
+
+    def test_analyze_single_query(self, test_db):
+        """Test a conversation is read with one query"""
+        analyzer = ConversationAnalyzer()
+        for i in range(30):
+            role = "user" if i % 2 == 0 else "assistant"
+            test_db.add(Message(conversation_id=1, role=role, content=f"yeah cool {i}?",
+                                timestamp=datetime.now()))
+        test_db.commit()
+
+        queries = []
+        event.listen(test_db.get_bind(), "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: queries.append(statement))
+
+        features = analyzer.analyze(1, test_db)
+
+        assert len(queries) == 1
+        assert features["message_count"] == 30
+        assert features["casual_language_count"] == 15
+        assert features["questions_count"] == 15
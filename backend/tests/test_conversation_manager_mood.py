@@ -17,6 +17,7 @@ class TestMoodChangeOnCrisis:
         """Set up test fixtures"""
         self.manager = ConversationManager()
         self.mock_db = Mock()
+        self.mock_db.info = {}  # Session.info, used by unit_of_work
 
         # Mock user
         self.mock_user = Mock()
@@ -373,6 +374,7 @@ class TestMoodChangeMetadata:
         """Set up test fixtures"""
         self.manager = ConversationManager()
         self.mock_db = Mock()
+        self.mock_db.info = {}  # Session.info, used by unit_of_work
 
         # Mock personality
         self.mock_personality = Mock()
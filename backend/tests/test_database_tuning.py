@@ -0,0 +1,108 @@
+"""
+Tests for SQLite Tuning Profiles
+Tests that PRAGMAs are applied on every connection and maintenance runs
+"""
+
+import pytest
+from unittest.mock import patch
+
+from database.database import (
+    create_db_engine,
+    get_sqlite_pragmas,
+    run_maintenance,
+)
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    """Database file in a temporary directory"""
+    return f"sqlite:///{tmp_path}/tuning.db"
+
+
+def read_pragma(db_engine, name):
+    """Read a PRAGMA value from a fresh pooled connection"""
+    with db_engine.connect() as conn:
+        return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+class TestProfiles:
+    """Test profile selection and overrides"""
+
+    def test_performance_profile_applied(self, db_url):
+        """Test the performance profile PRAGMAs are set on connect"""
+        db_engine = create_db_engine(db_url, profile="performance")
+
+        assert read_pragma(db_engine, "journal_mode") == "wal"
+        assert read_pragma(db_engine, "synchronous") == 1  # NORMAL
+        assert read_pragma(db_engine, "temp_store") == 2  # MEMORY
+        assert read_pragma(db_engine, "cache_size") == -16000
+        assert read_pragma(db_engine, "busy_timeout") == 5000
+        assert read_pragma(db_engine, "foreign_keys") == 1
+
+    def test_default_profile_keeps_sqlite_defaults(self, db_url):
+        """Test the default profile only enables foreign keys"""
+        db_engine = create_db_engine(db_url, profile="default")
+
+        assert read_pragma(db_engine, "journal_mode") == "delete"
+        assert read_pragma(db_engine, "synchronous") == 2  # FULL
+        assert read_pragma(db_engine, "foreign_keys") == 1
+
+    @patch("database.database.settings")
+    def test_overrides_apply_to_configured_profile(self, mock_settings):
+        """Test individual SQLITE_* settings override the configured profile"""
+        mock_settings.SQLITE_PROFILE = "performance"
+        mock_settings.SQLITE_BUSY_TIMEOUT_MS = 100
+        mock_settings.SQLITE_JOURNAL_MODE = None
+        mock_settings.SQLITE_SYNCHRONOUS = "FULL"
+        mock_settings.SQLITE_MMAP_SIZE = 0
+        mock_settings.SQLITE_CACHE_SIZE = None
+        mock_settings.SQLITE_TEMP_STORE = None
+
+        pragmas = get_sqlite_pragmas()
+
+        assert pragmas["busy_timeout"] == 100
+        assert pragmas["synchronous"] == "FULL"
+        assert pragmas["mmap_size"] == 0
+        assert pragmas["journal_mode"] == "WAL"
+
+        # Explicit profiles ignore overrides
+        assert get_sqlite_pragmas("performance")["synchronous"] == "NORMAL"
+
+    @patch("database.database.settings")
+    def test_unknown_profile_falls_back(self, mock_settings):
+        """Test an unknown profile name uses SQLite defaults"""
+        mock_settings.SQLITE_PROFILE = "turbo"
+        mock_settings.SQLITE_BUSY_TIMEOUT_MS = None
+        mock_settings.SQLITE_JOURNAL_MODE = None
+        mock_settings.SQLITE_SYNCHRONOUS = None
+        mock_settings.SQLITE_MMAP_SIZE = None
+        mock_settings.SQLITE_CACHE_SIZE = None
+        mock_settings.SQLITE_TEMP_STORE = None
+
+        assert get_sqlite_pragmas() == {}
+
+
+class TestMaintenance:
+    """Test WAL checkpoint and optimize"""
+
+    def test_checkpoint_truncates_wal(self, db_url):
+        """Test a TRUNCATE checkpoint empties the WAL"""
+        db_engine = create_db_engine(db_url, profile="performance")
+        with db_engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+            for i in range(100):
+                conn.exec_driver_sql(f"INSERT INTO items (name) VALUES ('item {i}')")
+
+        result = run_maintenance(db_engine, checkpoint_mode="TRUNCATE")
+
+        assert result["journal_mode"] == "wal"
+        assert result["checkpoint_busy"] is False
+        assert result["wal_pages"] == 0
+
+    def test_maintenance_without_wal(self, db_url):
+        """Test maintenance skips the checkpoint in rollback-journal mode"""
+        db_engine = create_db_engine(db_url, profile="default")
+
+        result = run_maintenance(db_engine)
+
+        assert result == {"journal_mode": "delete"}
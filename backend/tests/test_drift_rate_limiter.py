@@ -5,13 +5,14 @@ Tests rate limiting on personality trait drift
 
 import pytest
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from database.database import Base
 from models.user import User
 from models.personality import BotPersonality
 from models.personality_drift import PersonalityDrift
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
 from services.drift_rate_limiter import DriftRateLimiter, drift_rate_limiter
 
 
@@ -394,6 +395,105 @@ class TestDriftRateStats:
             assert "in_cooldown" in stats["traits"][trait]
 
 
+class TestDriftSnapshot:
+    """Test the batched drift snapshot"""
+
+    def add_drift(self, test_db, trait_name, change_amount, age):
+        """Add a drift event that happened `age` ago"""
+        test_db.add(PersonalityDrift(
+            user_id=1,
+            trait_name=trait_name,
+            old_value=0.5,
+            new_value=0.5 + change_amount,
+            change_amount=change_amount,
+            trigger_type="conversation_pattern",
+            friendship_level=3,
+            timestamp=datetime.now() - age,
+        ))
+        test_db.commit()
+
+    def count_queries(self, test_db, personality):
+        """Count statements run on the session's engine"""
+        test_db.refresh(personality)
+        queries = []
+        event.listen(
+            test_db.get_bind(), "before_cursor_execute",
+            lambda conn, cursor, statement, *args: queries.append(statement)
+        )
+        return queries
+
+    def test_windowed_totals(self, test_db, test_personality):
+        """Test totals are bucketed by period and summed as absolute values"""
+        limiter = DriftRateLimiter()
+        self.add_drift(test_db, "humor", 0.01, timedelta(hours=2))
+        self.add_drift(test_db, "humor", -0.02, timedelta(days=3))
+        self.add_drift(test_db, "humor", 0.03, timedelta(days=20))
+        self.add_drift(test_db, "humor", 0.05, timedelta(days=40))
+        self.add_drift(test_db, "energy", 0.01, timedelta(hours=1))
+
+        snapshot = limiter.get_drift_snapshot(1, test_db)
+
+        assert snapshot["humor"]["totals"][1] == pytest.approx(0.01)
+        assert snapshot["humor"]["totals"][7] == pytest.approx(0.03)
+        assert snapshot["humor"]["totals"][30] == pytest.approx(0.06)
+        assert snapshot["energy"]["totals"][1] == pytest.approx(0.01)
+        assert snapshot["curiosity"]["totals"] == {1: 0.0, 7: 0.0, 30: 0.0}
+        assert snapshot["humor"]["last_large_drift"] is None
+
+    def test_latest_large_drift(self, test_db, test_personality):
+        """Test the snapshot carries the most recent large drift"""
+        limiter = DriftRateLimiter()
+        self.add_drift(test_db, "humor", 0.05, timedelta(hours=3))
+        self.add_drift(test_db, "humor", -0.045, timedelta(hours=1))
+        self.add_drift(test_db, "humor", 0.01, timedelta(minutes=5))
+
+        timestamp, amount = limiter.get_drift_snapshot(1, test_db)["humor"]["last_large_drift"]
+
+        assert amount == pytest.approx(-0.045)
+        assert timestamp > datetime.now() - timedelta(hours=2)
+
+    def test_matches_individual_checks(self, test_db, test_personality):
+        """Test apply_rate_limits gives the same result as the per-period checks"""
+        limiter = DriftRateLimiter()
+        self.add_drift(test_db, "humor", 0.03, timedelta(days=2))
+        self.add_drift(test_db, "humor", 0.03, timedelta(days=3))
+        self.add_drift(test_db, "humor", 0.03, timedelta(days=5))
+
+        final_drift, messages = limiter.apply_rate_limits(test_personality, "humor", 0.02, test_db)
+
+        expected = 0.02
+        for period_days in (1, 7, 30):
+            _, expected, _ = limiter.check_time_period_limit(
+                test_personality, "humor", expected, test_db, period_days
+            )
+        assert final_drift == pytest.approx(expected)
+        assert final_drift == pytest.approx(0.01)  # Capped by the weekly limit
+        assert len(messages) == 1
+
+    def test_apply_rate_limits_single_query(self, test_db, test_personality):
+        """Test all limits for a trait are evaluated from one query"""
+        limiter = DriftRateLimiter()
+        self.add_drift(test_db, "humor", 0.01, timedelta(hours=2))
+        queries = self.count_queries(test_db, test_personality)
+
+        limiter.apply_rate_limits(test_personality, "humor", 0.02, test_db)
+
+        assert len(queries) == 1
+
+    def test_stats_single_query(self, test_db, test_personality):
+        """Test stats for every trait come from one query"""
+        limiter = DriftRateLimiter()
+        self.add_drift(test_db, "humor", 0.05, timedelta(hours=1))
+        queries = self.count_queries(test_db, test_personality)
+
+        stats = limiter.get_drift_rate_stats(test_personality, test_db)
+
+        assert len(queries) == 1
+        assert stats["traits"]["humor"]["in_cooldown"] is True
+        assert stats["traits"]["humor"]["allowances"]["daily"]["used_drift"] == pytest.approx(0.05)
+        assert stats["traits"]["energy"]["in_cooldown"] is False
+
+
 class TestGlobalInstance:
     """Test global drift_rate_limiter instance"""
 
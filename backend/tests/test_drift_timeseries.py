@@ -0,0 +1,201 @@
+"""
+Tests for Drift Time Series Store
+Tests per-trait series, bucketing and LTTB downsampling
+"""
+
+import math
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base
+from models.user import User
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift
+from services.drift_timeseries import DriftTimeSeriesStore, bucket_points, drift_timeseries, lttb_indices
+from services.personality_drift_calculator import PersonalityDriftCalculator
+
+
+@pytest.fixture
+def test_db():
+    """Create test database with a user"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(User(id=1, name="Test User", age=12, created_at=datetime.now()))
+    db.commit()
+    yield db
+    db.close()
+
+
+def add_drifts(db, trait_name, count, start, step, first_value=0.5, change=0.01):
+    """Add `count` consecutive drifts starting at `start`, `step` apart"""
+    value = first_value
+    for i in range(count):
+        db.add(PersonalityDrift(
+            user_id=1,
+            trait_name=trait_name,
+            old_value=value,
+            new_value=value + change,
+            change_amount=change,
+            trigger_type="conversation_pattern",
+            trigger_details='{"reasons": ["test %d"]}' % i,
+            friendship_level=3,
+            timestamp=start + step * i,
+        ))
+        value += change
+    db.commit()
+
+
+class TestDownsampling:
+    """Test the pure downsampling helpers"""
+
+    def test_lttb_keeps_endpoints_and_peak(self):
+        """Test LTTB keeps first, last and an isolated spike"""
+        xs = list(range(100))
+        ys = [0.0] * 100
+        ys[37] = 1.0
+
+        keep = lttb_indices(xs, ys, 10)
+
+        assert len(keep) == 10
+        assert keep[0] == 0 and keep[-1] == 99
+        assert 37 in keep
+        assert keep == sorted(keep)
+
+    def test_lttb_small_series_unchanged(self):
+        """Test series at or below the threshold are returned whole"""
+        assert lttb_indices([1, 2, 3], [1, 2, 3], 5) == [0, 1, 2]
+
+    def test_day_buckets(self):
+        """Test daily buckets report close, range and summed change"""
+        day = datetime(2024, 3, 4, 9, 0)
+        timestamps = [day.timestamp(), (day + timedelta(hours=5)).timestamp(),
+                      (day + timedelta(days=1)).timestamp()]
+
+        buckets = bucket_points(timestamps, [0.51, 0.49, 0.5], [0.01, -0.02, 0.01], "day")
+
+        assert len(buckets) == 2
+        assert buckets[0]["timestamp"] == "2024-03-04T00:00:00"
+        assert buckets[0]["value"] == 0.49
+        assert buckets[0]["max"] == 0.51
+        assert buckets[0]["change"] == -0.01
+        assert buckets[0]["count"] == 2
+
+    def test_week_buckets_start_monday(self):
+        """Test weekly buckets start on Monday"""
+        sunday = datetime(2024, 3, 10, 12, 0)
+        monday = datetime(2024, 3, 11, 12, 0)
+
+        buckets = bucket_points([sunday.timestamp(), monday.timestamp()], [0.5, 0.6], [0, 0], "week")
+
+        assert [b["timestamp"] for b in buckets] == ["2024-03-04T00:00:00", "2024-03-11T00:00:00"]
+
+
+class TestTimeSeriesStore:
+    """Test the store against the database"""
+
+    def test_series_are_per_trait_and_ordered(self, test_db):
+        """Test traits are separated and back-dated drifts are ordered"""
+        store = DriftTimeSeriesStore()
+        now = datetime.now()
+        add_drifts(test_db, "humor", 3, now - timedelta(days=1), timedelta(hours=1))
+        add_drifts(test_db, "energy", 2, now - timedelta(days=1), timedelta(hours=1))
+        add_drifts(test_db, "humor", 1, now - timedelta(days=10), timedelta(hours=1),
+                   first_value=0.4)
+
+        ids, timestamps, values, changes, triggers = store.get_trait_series(1, "humor", test_db)
+
+        assert len(ids) == 4
+        assert timestamps == sorted(timestamps)
+        assert values[0] == pytest.approx(0.41)
+        assert store.get_trait_stats(1, test_db)["humor"]["original_value"] == 0.4
+        assert store.get_trait_stats(1, test_db)["energy"]["drift_count"] == 2
+
+    def test_incremental_refresh(self, test_db):
+        """Test drifts added after the first read are picked up"""
+        store = DriftTimeSeriesStore()
+        now = datetime.now()
+        add_drifts(test_db, "humor", 2, now - timedelta(hours=5), timedelta(hours=1))
+        assert store.get_trait_stats(1, test_db)["humor"]["drift_count"] == 2
+
+        add_drifts(test_db, "humor", 3, now - timedelta(hours=2), timedelta(minutes=10),
+                   first_value=0.52)
+
+        stats = store.get_trait_stats(1, test_db)["humor"]
+        assert stats["drift_count"] == 5
+        assert stats["current_value"] == pytest.approx(0.55)
+        assert stats["total_change"] == pytest.approx(0.05)
+
+    def test_timeline_bounded(self, test_db):
+        """Test long histories are reduced to max_points"""
+        store = DriftTimeSeriesStore()
+        add_drifts(test_db, "humor", 300, datetime.now() - timedelta(days=300),
+                   timedelta(days=1), change=0.001)
+
+        raw, total = store.get_timeline(1, "humor", test_db, "raw", max_points=50)
+        weekly, _ = store.get_timeline(1, "humor", test_db, "week")
+
+        assert total == 300
+        assert len(raw) == 50
+        assert math.isclose(raw[-1]["value"], 0.8, abs_tol=1e-9)
+        assert 43 <= len(weekly) <= 45
+
+    def test_deleted_drift_invalidates(self, test_db):
+        """Test a committed delete drops the history, even if SQLite reuses the row id"""
+        now = datetime.now()
+        add_drifts(test_db, "humor", 3, now - timedelta(hours=5), timedelta(hours=1))
+        assert drift_timeseries.get_trait_stats(1, test_db)["humor"]["drift_count"] == 3
+
+        last = test_db.query(PersonalityDrift).order_by(PersonalityDrift.id.desc()).first()
+        test_db.delete(last)
+        test_db.commit()
+        add_drifts(test_db, "humor", 1, now, timedelta(hours=1), first_value=0.6)  # Reuses the id
+
+        stats = drift_timeseries.get_trait_stats(1, test_db)["humor"]
+        assert stats["drift_count"] == 3
+        assert stats["current_value"] == pytest.approx(0.61)
+
+    def test_deleted_user_invalidates(self, test_db):
+        """Test drifts removed by the user delete cascade are dropped"""
+        add_drifts(test_db, "humor", 2, datetime.now() - timedelta(hours=5), timedelta(hours=1))
+        assert drift_timeseries.get_trait_stats(1, test_db)
+
+        test_db.delete(test_db.get(User, 1))
+        test_db.commit()
+
+        assert drift_timeseries.get_trait_stats(1, test_db) == {}
+
+    def test_invalid_resolution(self, test_db):
+        """Test unknown resolutions are rejected"""
+        with pytest.raises(ValueError):
+            DriftTimeSeriesStore().get_timeline(1, "humor", test_db, "hourly")
+
+
+class TestCalculatorIntegration:
+    """Test the calculator reads through the store"""
+
+    def test_summary_values(self, test_db):
+        """Test summary reports the oldest original and newest current value"""
+        add_drifts(test_db, "humor", 4, datetime.now() - timedelta(days=4), timedelta(days=1))
+
+        summary = PersonalityDriftCalculator().get_drift_summary(1, test_db)
+
+        assert summary["total_drifts"] == 4
+        assert summary["by_trait"]["humor"]["original_value"] == 0.5
+        assert summary["by_trait"]["humor"]["current_value"] == pytest.approx(0.54)
+        assert summary["by_trigger"] == {"conversation_pattern": 4}
+
+    def test_raw_timeline_keeps_reasons(self, test_db):
+        """Test downsampled raw points still carry their reasons"""
+        add_drifts(test_db, "humor", 20, datetime.now() - timedelta(days=20), timedelta(days=1))
+
+        timeline = PersonalityDriftCalculator().get_trait_timeline(
+            1, "humor", test_db, "raw", max_points=5
+        )
+
+        assert len(timeline) == 5
+        assert timeline[0]["reasons"] == ["test 0"]
+        assert timeline[-1]["reasons"] == ["test 19"]
+        assert "id" not in timeline[0]
@@ -0,0 +1,238 @@
+"""
+Tests for Email Outbox
+Delivers through a local aiosmtpd server to check batching, priority,
+retry and deduplication
+"""
+
+import socket
+import pytest
+from datetime import datetime, timedelta
+from email import message_from_bytes
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+from aiosmtpd.smtp import AuthResult
+
+from database.database import Base
+from models.user import User
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.email_outbox import EmailOutbox
+from services.email_service import EmailService
+from services.email_outbox_service import (
+    EmailOutboxService,
+    PRIORITY_CRISIS,
+    PRIORITY_NORMAL,
+)
+
+
+class RecordingHandler:
+    """aiosmtpd handler that records delivered messages"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(message_from_bytes(envelope.content))
+        return "250 OK"
+
+
+class ConnectionCountingController(aiosmtpd_controller.Controller):
+    """Controller that counts authenticated logins"""
+
+    def __init__(self, handler, port):
+        self.logins = 0
+        super().__init__(
+            handler,
+            hostname="127.0.0.1",
+            port=port,
+            auth_require_tls=False,
+            authenticator=self._authenticate,
+        )
+
+    def _authenticate(self, server, session, envelope, mechanism, auth_data):
+        self.logins += 1
+        return AuthResult(success=True)
+
+
+def free_port() -> int:
+    """Find a free local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    """Run a local SMTP server for the duration of a test"""
+    handler = RecordingHandler()
+    controller = ConnectionCountingController(handler, free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+@pytest.fixture
+def email_service(smtp_server):
+    """EmailService pointed at the local SMTP server"""
+    controller, _ = smtp_server
+    with patch("services.email_service.settings") as mock_settings:
+        mock_settings.SMTP_HOST = controller.hostname
+        mock_settings.SMTP_PORT = controller.port
+        mock_settings.SMTP_USERNAME = "user@test.com"
+        mock_settings.SMTP_PASSWORD = "password"
+        mock_settings.SMTP_FROM_EMAIL = "from@test.com"
+        mock_settings.SMTP_USE_TLS = False
+        mock_settings.ENABLE_PARENT_NOTIFICATIONS = True
+        service = EmailService()
+
+    with patch("services.email_outbox_service.email_service", service):
+        yield service
+
+
+@pytest.fixture
+def session_factory():
+    """Create an in-memory database"""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def test_db(session_factory):
+    """Create test database session"""
+    db = session_factory()
+    db.add(User(id=1, name="Test Child", age=10, created_at=datetime.now()))
+    db.commit()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def outbox(session_factory, email_service):
+    """Outbox service bound to the test database"""
+    service = EmailOutboxService(session_factory=session_factory)
+    service.enabled = True
+    return service
+
+
+class TestSendBatch:
+    """Test batched SMTP delivery"""
+
+    def test_batch_uses_single_login(self, smtp_server, email_service):
+        """Test a batch of emails shares one authenticated connection"""
+        controller, handler = smtp_server
+
+        results = email_service.send_batch([
+            {"to_email": f"parent{i}@example.com", "subject": f"Report {i}", "body": "Hi"}
+            for i in range(5)
+        ])
+
+        assert all(r["sent"] for r in results)
+        assert len(handler.messages) == 5
+        assert controller.logins == 1
+
+    def test_batch_connection_failure(self, email_service):
+        """Test every email fails when the server is unreachable"""
+        email_service.smtp_port = free_port()
+
+        results = email_service.send_batch([
+            {"to_email": "a@example.com", "subject": "A", "body": "A"},
+            {"to_email": "b@example.com", "subject": "B", "body": "B"},
+        ])
+
+        assert [r["sent"] for r in results] == [False, False]
+        assert results[0]["error"] == "SMTP connection failed"
+
+
+class TestOutbox:
+    """Test outbox queueing and background delivery"""
+
+    def test_deliver_queues_without_sending(self, outbox, test_db, smtp_server):
+        """Test deliver() returns immediately and leaves the email pending"""
+        _, handler = smtp_server
+
+        result = outbox.deliver(
+            test_db, to_email="parent@example.com", subject="Alert", body="Body", user_id=1
+        )
+
+        assert result["sent"] is True
+        assert result["queued"] is True
+        assert handler.messages == []
+        assert test_db.query(EmailOutbox).one().status == "pending"
+
+    def test_crisis_sent_first(self, outbox, test_db, smtp_server):
+        """Test crisis notifications jump ahead of earlier normal emails"""
+        _, handler = smtp_server
+
+        outbox.enqueue(test_db, "parent@example.com", "Weekly report", "Report", priority=PRIORITY_NORMAL)
+        outbox.enqueue(test_db, "parent@example.com", "URGENT", "Crisis", priority=PRIORITY_CRISIS)
+
+        assert outbox.process_pending() == 2
+        assert [m["Subject"] for m in handler.messages] == ["URGENT", "Weekly report"]
+
+    def test_identical_emails_deduplicated(self, outbox, test_db, smtp_server):
+        """Test identical emails inside the dedup window are sent once"""
+        _, handler = smtp_server
+
+        first = outbox.enqueue(test_db, "parent@example.com", "Alert", "Same body")
+        second = outbox.enqueue(test_db, "parent@example.com", "Alert", "Same body")
+        outbox.process_pending()
+
+        assert first.id == second.id
+        assert len(handler.messages) == 1
+        assert outbox.stats["deduplicated"] == 1
+
+    def test_failed_send_retried_with_backoff(self, outbox, test_db, email_service):
+        """Test a failed email is rescheduled and eventually marked failed"""
+        email_service.smtp_port = free_port()
+        outbox.max_attempts = 2
+
+        entry = outbox.enqueue(test_db, "parent@example.com", "Alert", "Body")
+        outbox.process_pending()
+
+        test_db.expire_all()
+        entry = test_db.get(EmailOutbox, entry.id)
+        assert entry.status == "pending"
+        assert entry.attempts == 1
+        assert entry.next_attempt_at > datetime.now()
+
+        entry.next_attempt_at = datetime.now() - timedelta(seconds=1)
+        test_db.commit()
+        outbox.process_pending()
+
+        test_db.expire_all()
+        entry = test_db.get(EmailOutbox, entry.id)
+        assert entry.status == "failed"
+        assert entry.attempts == 2
+
+    def test_unexpected_error_requeues_batch(self, outbox, test_db, email_service):
+        """Test an error other than an SMTP failure doesn't leave emails in 'sending'"""
+        entry = outbox.enqueue(test_db, "parent@example.com", "Alert", "Body")
+
+        with patch.object(email_service, "send_batch", side_effect=RuntimeError("template broke")):
+            assert outbox.process_pending() == 1
+
+        test_db.expire_all()
+        entry = test_db.get(EmailOutbox, entry.id)
+        assert entry.status == "pending"
+        assert entry.next_attempt_at > datetime.now()
+        assert "template broke" in entry.last_error
+
+    def test_interrupted_sends_requeued(self, outbox, test_db):
+        """Test emails left 'sending' by a crash are requeued on start"""
+        entry = outbox.enqueue(test_db, "parent@example.com", "Alert", "Body")
+        entry.status = "sending"
+        test_db.commit()
+
+        assert outbox.recover_interrupted() == 1
+
+        test_db.expire_all()
+        assert test_db.get(EmailOutbox, entry.id).status == "pending"
@@ -483,3 +483,60 @@ class TestEdgeCases:
 
         results = manager.check_multiple_features([], 5)
         assert results == {}
+
+
+class TestCompiledIndex:
+    """Test the compiled bitset index"""
+
+    def test_index_matches_definitions(self):
+        """Test indexed queries agree with filtering the definitions"""
+        manager = FeatureUnlockManager()
+        definitions = manager.feature_definitions
+
+        for level in range(0, 12):
+            unlocked = [f["id"] for f in manager.get_unlocked_features(level)]
+            expected = sorted(
+                (fid for fid, data in definitions.items() if data["level"] <= level),
+                key=lambda fid: (definitions[fid]["level"], definitions[fid]["name"])
+            )
+            assert unlocked == expected
+
+            locked = manager.get_locked_features(level)
+            assert len(locked) + len(unlocked) == len(definitions)
+            assert all(f["unlock_at_level"] > level for f in locked)
+
+            for category in manager.categories:
+                in_category = {f["id"] for f in manager.get_features_by_category(category, level)}
+                assert in_category == {
+                    fid for fid in expected if definitions[fid]["category"] == category
+                }
+
+    def test_returned_features_are_copies(self):
+        """Test callers cannot modify the compiled catalog"""
+        manager = FeatureUnlockManager()
+
+        manager.get_unlocked_features(5)[0]["name"] = "Changed"
+
+        assert manager.get_unlocked_features(5)[0]["name"] != "Changed"
+
+    def test_level_summary_cached(self, test_personality_level_5):
+        """Test the per-level summary is built once and matches the full summary"""
+        manager = FeatureUnlockManager()
+
+        summary = manager.get_level_summary(5)
+
+        assert manager.get_level_summary(5) is summary
+        assert manager.get_feature_summary(test_personality_level_5) == summary
+        assert manager.get_feature_summary(test_personality_level_5) is not summary
+
+    def test_decorator_finds_personality_parameter(self, test_personality_level_1):
+        """Test the gate checks a named personality parameter in any position"""
+
+        @require_feature("advice_mode_unlocked")
+        def give_advice(topic, personality):
+            return topic
+
+        with pytest.raises(FeatureNotUnlockedException) as exc_info:
+            give_advice("school", test_personality_level_1)
+
+        assert exc_info.value.required_level == 5
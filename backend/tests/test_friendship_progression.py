@@ -9,6 +9,7 @@ from sqlalchemy.orm import sessionmaker
 
 from models.personality import BotPersonality
 from models.user import User
+from models.conversation import Conversation
 from database.database import Base
 from services.friendship_progression import (
     FriendshipProgressionManager,
@@ -457,3 +458,56 @@ class TestEdgeCases:
         # Should handle division by zero
         assert history["total_conversations"] == 0
         assert history["avg_points_per_conversation"] == 0.0
+
+
+class TestLevelProjection:
+    """Test threshold lookups and bulk level projection"""
+
+    def test_lookup_matches_linear_scan(self):
+        """Test bisect lookup agrees with scanning the level list"""
+        manager = FriendshipProgressionManager()
+
+        for points in range(-5, 8000, 7):
+            expected = 1
+            for level_info in manager.friendship_levels:
+                if points >= level_info["min_points"]:
+                    expected = level_info["level"]
+            assert manager.get_level_from_points(points) == expected
+
+    def test_projection_milestones(self):
+        """Test the day each level is reached, including multi-level jumps"""
+        manager = FriendshipProgressionManager()
+
+        projection = manager.project_level_timeline(90, [5, 5, 200, 0, 400])
+
+        assert projection["points"] == [95, 100, 300, 300, 700]
+        assert projection["levels"] == [1, 2, 3, 3, 4]
+        assert [(m["level"], m["day"]) for m in projection["milestones"]] == [(2, 2), (3, 3), (4, 5)]
+        assert projection["final_level"] == 4
+
+    def test_projection_rejects_negative_schedule(self):
+        """Test negative daily points are rejected"""
+        with pytest.raises(ValueError):
+            FriendshipProgressionManager().project_level_timeline(0, [10, -5])
+
+    def test_project_from_recent_activity(self, test_personality, db_session):
+        """Test daily points are estimated from recent conversations"""
+        for day in range(7):
+            db_session.add(Conversation(
+                user_id=test_personality.user_id,
+                timestamp=datetime.now() - timedelta(days=day, hours=1),
+                message_count=12,
+            ))
+        db_session.commit()
+
+        manager = FriendshipProgressionManager()
+        projection = manager.project_progression(test_personality, db_session, days=30,
+                                                 daily_points=None)
+
+        # 7 of 14 days active, each with one long 12-message conversation
+        rates = projection["activity_rates"]
+        assert rates["conversations"] == 7
+        assert rates["messages_per_conversation"] == 12
+        assert projection["daily_points"] == pytest.approx(0.5 * (15 + 20 + 60 + 30), abs=0.1)
+        assert projection["days"] == 30
+        assert projection["milestones"][0]["level"] == 2
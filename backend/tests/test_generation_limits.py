@@ -0,0 +1,146 @@
+"""
+Tests for generation cancellation and deadlines
+Tests sentence truncation, deadline and token limits, stop counters and disconnect cancellation
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from routes.conversation import cancel_on_disconnect
+from services.inference_scheduler import InferenceCancelled, InferenceRequest, InferenceScheduler
+from services.llm_service import LLMService, truncate_at_sentence
+
+
+class FakeModel:
+    """Model context that takes a while, then returns a fixed reply"""
+
+    def __init__(self, text: str, finish_reason: str = "stop", delay: float = 0.0, on_call=None):
+        self.text = text
+        self.finish_reason = finish_reason
+        self.delay = delay
+        self.on_call = on_call
+
+    def __call__(self, prompt, **kwargs):
+        if self.on_call:
+            self.on_call()
+        time.sleep(self.delay)
+        return {
+            "choices": [{"text": self.text, "finish_reason": self.finish_reason}],
+            "usage": {"completion_tokens": len(self.text.split())},
+        }
+
+
+@pytest.fixture
+def service():
+    """LLM service with no model yet"""
+    llm = LLMService(use_worker=False)
+    llm.is_loaded = True
+    llm.scheduler = InferenceScheduler()
+    return llm
+
+
+class TestTruncateAtSentence:
+    """Test cutting replies at a sentence boundary"""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("Great move! Knights love forks. Next you could", "Great move! Knights love forks."),
+        ('She said "well done." And then', 'She said "well done."'),
+        ("Is that your dog? I", "Is that your dog?"),
+        ("Version 2.5 is out and", "Version 2.5 is out and..."),
+        ("Let's think about this,", "Let's think about this..."),
+        ("", ""),
+    ])
+    def test_cut_points(self, text, expected):
+        """Test the text is cut after the last complete sentence"""
+        assert truncate_at_sentence(text) == expected
+
+
+class TestDeadlines:
+    """Test replies stopped by a deadline or the token limit"""
+
+    def test_deadline_truncates_at_sentence(self, service):
+        """Test a reply past its deadline is cut and counted"""
+        service.model = FakeModel("You did it. Castling protects your", delay=0.05)
+        request = InferenceRequest(deadline_seconds=0.01)
+
+        assert service.generate("hi", request=request) == "You did it."
+        assert service.get_stop_stats()["deadline_truncated"] == 1
+        assert service.get_cache_stats()["size"] == 0  # Cut replies aren't cached
+
+    def test_deadline_without_sentence(self, service):
+        """Test a deadline that left nothing usable raises InferenceCancelled"""
+        service.model = FakeModel("", delay=0.05)
+
+        with pytest.raises(InferenceCancelled):
+            service.generate("hi", request=InferenceRequest(deadline_seconds=0.01))
+
+    def test_token_limit_truncates(self, service):
+        """Test a reply that ran into max_tokens is cut and counted"""
+        service.model = FakeModel("That's a great question. The bishop moves", finish_reason="length")
+
+        assert service.generate("hi") == "That's a great question."
+        assert service.get_model_info()["stops"]["token_truncated"] == 1
+
+    def test_complete_reply_unchanged(self, service):
+        """Test a reply that finished in time is returned as is"""
+        service.model = FakeModel("All done 🎉")
+
+        assert service.generate("hi", request=InferenceRequest(deadline_seconds=10)) == "All done 🎉"
+        assert service.get_stop_stats() == {"cancelled": 0, "deadline_truncated": 0, "token_truncated": 0}
+
+    def test_remaining_seconds(self):
+        """Test the deadline counts down and then expires"""
+        request = InferenceRequest(deadline_seconds=0.02)
+        assert 0 < request.remaining_seconds() <= 0.02
+        assert not request.expired
+
+        time.sleep(0.03)
+        assert request.expired
+        assert request.should_stop
+        assert request.remaining_seconds() == 0.0
+        assert InferenceRequest().remaining_seconds() is None
+
+
+class TestCancellation:
+    """Test cancellation during generation"""
+
+    def test_cancel_mid_generation_is_counted(self, service):
+        """Test a request cancelled while generating raises and is counted"""
+        request = InferenceRequest()
+        service.model = FakeModel("Hello there.", on_call=request.cancel)
+
+        with pytest.raises(InferenceCancelled):
+            service.generate("hi", request=request)
+        assert service.get_stop_stats()["cancelled"] == 1
+
+    async def test_disconnect_cancels_request(self):
+        """Test a client disconnect cancels the inference request"""
+        class Client:
+            checks = 0
+
+            async def is_disconnected(self):
+                self.checks += 1
+                return self.checks >= 2
+
+        request = InferenceRequest()
+        async with cancel_on_disconnect(Client(), request):
+            for _ in range(100):
+                if request.cancelled:
+                    break
+                await asyncio.sleep(0.01)
+
+        assert request.cancelled
+
+    async def test_connected_client_not_cancelled(self):
+        """Test the watcher stops with the block while the client is connected"""
+        class Client:
+            async def is_disconnected(self):
+                return False
+
+        request = InferenceRequest()
+        async with cancel_on_disconnect(Client(), request):
+            await asyncio.sleep(0.01)
+
+        assert not request.cancelled
@@ -0,0 +1,315 @@
+"""
+Tests for Inference Scheduler
+Tests context hand-out, lane priority, cancellation, queue stats and pool sizing
+"""
+
+import threading
+import time
+
+import pytest
+
+from services.inference_scheduler import (
+    InferenceCancelled,
+    InferenceLane,
+    InferenceRequest,
+    InferenceScheduler,
+)
+from services.llm_service import LLMService, estimate_context_mb, plan_context_pool
+from utils.config import settings
+
+
+def wait_until(condition, timeout: float = 2.0) -> None:
+    """Poll until condition() is true"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.005)
+
+
+def queued(scheduler: InferenceScheduler, lane: InferenceLane) -> int:
+    """Current queue depth of a lane"""
+    return scheduler.get_stats()["lanes"][lane.name.lower()]["queued"]
+
+
+class CallLog:
+    """Overlapping calls across every fake context"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.prompts = []
+        self.lock = threading.Lock()
+
+
+class FakeModel:
+    """Model context that records overlapping calls"""
+
+    def __init__(self, log: CallLog = None, delay: float = 0.01):
+        self.log = log or CallLog()
+        self.delay = delay
+        self.prompts = []
+
+    @property
+    def max_active(self):
+        return self.log.max_active
+
+    def __call__(self, prompt, **kwargs):
+        log = self.log
+        with log.lock:
+            log.active += 1
+            log.max_active = max(log.max_active, log.active)
+        time.sleep(self.delay)
+        with log.lock:
+            log.active -= 1
+            log.prompts.append(prompt)
+            self.prompts.append(prompt)
+        if kwargs.get("stream"):
+            return iter([{"choices": [{"text": "a"}]}, {"choices": [{"text": "b"}]}])
+        return {"choices": [{"text": f"reply to {prompt}"}]}
+
+
+@pytest.fixture
+def service():
+    """LLM service with a fake loaded model and its own scheduler"""
+    llm = LLMService()
+    llm.model = FakeModel()
+    llm.is_loaded = True
+    llm.scheduler = InferenceScheduler()
+    llm.set_cache_enabled(False)
+    return llm
+
+
+class TestScheduling:
+    """Test slot ordering"""
+
+    def test_waiters_served_by_lane_then_arrival(self):
+        """Test a freed slot goes to the highest lane, oldest waiter first"""
+        scheduler = InferenceScheduler()
+        order = []
+        threads = []
+
+        def run(lane, label):
+            with scheduler.slot(lane):
+                order.append(label)
+
+        with scheduler.slot(InferenceLane.BACKGROUND):
+            for lane, label in [
+                (InferenceLane.BACKGROUND, "summary"),
+                (InferenceLane.EXTRACTION, "extraction"),
+                (InferenceLane.INTERACTIVE, "chat 1"),
+                (InferenceLane.CRISIS, "crisis"),
+                (InferenceLane.INTERACTIVE, "chat 2"),
+            ]:
+                thread = threading.Thread(target=run, args=(lane, label))
+                thread.start()
+                threads.append(thread)
+                wait_until(lambda: queued(scheduler, lane) >= 1)
+            wait_until(lambda: queued(scheduler, InferenceLane.INTERACTIVE) == 2)
+
+        for thread in threads:
+            thread.join(timeout=2)
+
+        assert order == ["chat 1", "chat 2", "crisis", "extraction", "summary"]
+
+    def test_model_calls_never_overlap(self, service):
+        """Test concurrent callers from every lane reach the model one at a time"""
+        threads = [
+            threading.Thread(target=service.generate, args=(f"prompt {i}",),
+                             kwargs={"lane": list(InferenceLane)[i % len(InferenceLane)]})
+            for i in range(12)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(service.model.prompts) == 12
+        assert service.model.max_active == 1
+        assert service.is_generating is False
+
+
+class TestCancellation:
+    """Test cancelling requests"""
+
+    def test_cancelled_waiter_leaves_queue(self):
+        """Test cancelling a queued request raises in its caller and frees its place"""
+        scheduler = InferenceScheduler()
+        request = InferenceRequest(InferenceLane.EXTRACTION)
+        errors = []
+
+        def run():
+            try:
+                with scheduler.slot(request=request):
+                    pass
+            except InferenceCancelled as e:
+                errors.append(e)
+
+        with scheduler.slot(InferenceLane.INTERACTIVE):
+            thread = threading.Thread(target=run)
+            thread.start()
+            wait_until(lambda: queued(scheduler, InferenceLane.EXTRACTION) == 1)
+            request.cancel()
+            thread.join(timeout=2)
+
+        assert len(errors) == 1
+        stats = scheduler.get_stats()["lanes"]["extraction"]
+        assert stats["queued"] == 0
+        assert stats["cancelled"] == 1
+        assert stats["served"] == 0
+
+    def test_cancelled_generate_raises(self, service):
+        """Test generate reports cancellation instead of the fallback reply"""
+        request = InferenceRequest()
+        request.cancel()
+
+        with pytest.raises(InferenceCancelled):
+            service.generate("hello", request=request)
+        assert service.model.prompts == []
+
+    def test_cancelled_stream_ends(self, service):
+        """Test a stream cancelled mid-way stops yielding tokens"""
+        request = InferenceRequest()
+        tokens = []
+        for token in service.generate_stream("hello", request=request):
+            tokens.append(token)
+            request.cancel()
+
+        assert tokens == ["a"]
+        assert service.scheduler.busy == 0
+
+
+class TestStats:
+    """Test queue metrics"""
+
+    def test_stats_track_depth_and_served(self, service):
+        """Test per-lane stats appear in the model info"""
+        scheduler = service.scheduler
+        with scheduler.slot(InferenceLane.INTERACTIVE):
+            assert scheduler.get_stats()["active_lanes"] == ["interactive"]
+            thread = threading.Thread(target=service.generate, args=("summarize",),
+                                      kwargs={"lane": InferenceLane.BACKGROUND})
+            thread.start()
+            wait_until(lambda: queued(scheduler, InferenceLane.BACKGROUND) == 1)
+        thread.join(timeout=2)
+
+        stats = service.get_model_info()["scheduler"]
+        assert stats["active_lanes"] == []
+        assert stats["lanes"]["background"] == {
+            "queued": 0,
+            "max_queued": 1,
+            "served": 1,
+            "cancelled": 0,
+            "avg_wait_ms": stats["lanes"]["background"]["avg_wait_ms"],
+        }
+        assert stats["lanes"]["background"]["avg_wait_ms"] > 0
+        assert stats["lanes"]["interactive"]["served"] == 1
+
+
+class TestContextPool:
+    """Test several contexts"""
+
+    @pytest.fixture
+    def pool(self, service):
+        """Service with three fake contexts sharing one call log"""
+        log = CallLog()
+        service.contexts = [FakeModel(log, delay=0.05) for _ in range(3)]
+        service.scheduler = InferenceScheduler(capacity=3)
+        return service
+
+    def test_sessions_generate_in_parallel(self, pool):
+        """Test concurrent chats run on separate contexts at the same time"""
+        threads = [
+            threading.Thread(target=pool.generate, args=(f"chat {i}",)) for i in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(pool.contexts[0].log.prompts) == 3
+        assert pool.contexts[0].max_active == 3
+
+    def test_never_more_calls_than_contexts(self, pool):
+        """Test a busy pool queues the extra requests"""
+        threads = [
+            threading.Thread(target=pool.generate, args=(f"chat {i}",)) for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(pool.contexts[0].log.prompts) == 8
+        assert pool.contexts[0].max_active == 3
+
+    def test_affinity_reuses_context(self, pool):
+        """Test a profile goes back to its own context when it is free"""
+        for user_id in (1, 2, 1, 1, 2):
+            pool.generate(f"user {user_id}", request=InferenceRequest(affinity=user_id))
+
+        by_context = [context.prompts for context in pool.contexts]
+        assert ["user 1", "user 1", "user 1"] in by_context
+        assert ["user 2", "user 2"] in by_context
+
+    def test_resize_while_busy(self):
+        """Test shrinking the pool retires contexts as they are released"""
+        scheduler = InferenceScheduler(capacity=2)
+        with scheduler.slot() as first, scheduler.slot() as second:
+            assert {first.context, second.context} == {0, 1}
+            scheduler.resize(1)
+            assert scheduler.busy == 2
+
+        with scheduler.slot() as request:
+            assert request.context == 0
+        assert scheduler.get_stats()["contexts"] == 1
+
+
+class TestPoolSizing:
+    """Test context pool sizing"""
+
+    @pytest.fixture(autouse=True)
+    def auto_sizing(self, monkeypatch):
+        """Automatic sizing with default limits"""
+        monkeypatch.setattr(settings, "MODEL_CONTEXTS", 0)
+        monkeypatch.setattr(settings, "MODEL_MAX_CONTEXTS", 4)
+        monkeypatch.setattr(settings, "MODEL_MIN_THREADS_PER_CONTEXT", 4)
+        monkeypatch.setattr(settings, "MODEL_RAM_RESERVE_MB", 1024)
+
+    def test_limited_by_cores(self):
+        """Test contexts follow core count and split the threads"""
+        plan = plan_context_pool(2000, 300, cpu_cores=8, available_mb=32000)
+        assert plan == {"contexts": 2, "threads_per_context": 4}
+
+    def test_limited_by_ram(self):
+        """Test contexts must fit next to the weights and the reserve"""
+        plan = plan_context_pool(2000, 300, cpu_cores=32, available_mb=3700)
+        assert plan == {"contexts": 2, "threads_per_context": 16}
+
+    def test_capped_and_at_least_one(self):
+        """Test the pool stays between one context and the maximum"""
+        assert plan_context_pool(2000, 300, cpu_cores=64, available_mb=64000)["contexts"] == 4
+        assert plan_context_pool(2000, 300, cpu_cores=2, available_mb=1000) == {
+            "contexts": 1, "threads_per_context": 2
+        }
+
+    def test_override_and_gpu(self, monkeypatch):
+        """Test MODEL_CONTEXTS wins, and GPU offload keeps one context"""
+        assert plan_context_pool(2000, 300, cpu_cores=16, available_mb=32000,
+                                 gpu_offload=True)["contexts"] == 1
+        monkeypatch.setattr(settings, "MODEL_CONTEXTS", 3)
+        assert plan_context_pool(2000, 300, cpu_cores=12, available_mb=100) == {
+            "contexts": 3, "threads_per_context": 4
+        }
+
+    def test_context_estimate_from_metadata(self):
+        """Test the KV cache size follows the model's grouped-query attention"""
+        metadata = {
+            "general.architecture": "llama",
+            "llama.block_count": "28",
+            "llama.embedding_length": "3072",
+            "llama.attention.head_count": "24",
+            "llama.attention.head_count_kv": "8",
+        }
+        assert estimate_context_mb(2048, metadata) == estimate_context_mb(2048)
+        assert estimate_context_mb(4096, metadata) == 2 * estimate_context_mb(2048, metadata)
+        assert 300 < estimate_context_mb(2048) < 400
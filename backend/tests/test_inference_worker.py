@@ -0,0 +1,133 @@
+"""
+Tests for Inference Worker
+Tests generation, streaming, cancellation and crash restarts through a worker process
+"""
+
+import os
+import time
+
+import pytest
+
+from services.inference_scheduler import InferenceCancelled, InferenceRequest
+from services.inference_worker import InferenceWorker
+from services.llm_service import LLMService
+
+
+class FakeModel:
+    """Model context that echoes prompts (runs in the worker process)"""
+
+    def __call__(self, prompt, stream=False, **kwargs):
+        if prompt == "crash":
+            os._exit(3)  # Simulate llama.cpp taking the process down
+        if stream:
+            delay = 0.2 if prompt.startswith("slow") else 0
+            return ({"choices": [{"text": f"{word} "}]} for word in prompt.split() if not time.sleep(delay))
+        return {"choices": [{"text": f"reply to {prompt}"}]}
+
+
+def fake_service() -> LLMService:
+    """Worker-side service with the fake model (picklable for the spawned process)"""
+    service = LLMService(use_worker=False)
+    service.model = FakeModel()
+    service.is_loaded = True
+    return service
+
+
+@pytest.fixture
+def worker():
+    """Running worker with the fake model"""
+    worker = InferenceWorker(service_factory=fake_service)
+    worker.RESTART_BACKOFF_SECONDS = 0.1
+    worker.start()
+    assert worker.wait_until_loaded(30)
+    yield worker
+    worker.stop()
+
+
+@pytest.fixture
+def client(worker):
+    """LLM service that is a thin client of the worker"""
+    service = LLMService(use_worker=False)
+    service.worker = worker
+    worker.on_status = service._on_worker_status
+    service.is_loaded = True
+    return service
+
+
+class TestWorkerRequests:
+    """Test requests served by the worker process"""
+
+    def test_generate(self, client):
+        """Test generate returns the worker's reply and caches it here"""
+        assert client.generate("hello") == "reply to hello"
+        assert client.generate("hello") == "reply to hello"
+        assert client.get_cache_stats()["hits"] == 1
+        assert client.is_generating is False
+
+    def test_stream_tokens(self, client):
+        """Test streamed tokens arrive as separate frames"""
+        assert list(client.generate_stream("one two three")) == ["one ", "two ", "three "]
+
+    def test_cancel_stream(self, client, worker):
+        """Test a cancelled stream stops early and leaves no request behind"""
+        request = InferenceRequest()
+        tokens = []
+        for token in client.generate_stream("slow slow slow slow slow", request=request):
+            tokens.append(token)
+            request.cancel()
+
+        assert len(tokens) < 5
+        assert worker.get_health()["pending_requests"] == 0
+
+    def test_cancelled_generate_raises(self, worker):
+        """Test cancellation reaches the caller as InferenceCancelled"""
+        request = InferenceRequest()
+        request.cancel()
+        with pytest.raises(InferenceCancelled):
+            worker.generate("hello", request=request, max_tokens=10, temperature=0.5, stop=[])
+
+    def test_model_info_from_worker(self, client):
+        """Test the context pool and scheduler stats come from the worker"""
+        client.generate("hello", use_cache=False)
+        info = client.get_model_info()
+
+        assert info["out_of_process"] is True
+        assert info["contexts"] == 1
+        assert info["scheduler"]["lanes"]["interactive"]["served"] >= 1
+
+
+class TestWorkerRestart:
+    """Test crash handling"""
+
+    def test_crash_fails_request_and_restarts(self, client, worker):
+        """Test a worker crash fails the request in flight, then the worker comes back"""
+        pid = worker.get_health()["pid"]
+
+        assert client.generate("crash", use_cache=False) == (
+            "I'm having trouble thinking right now. Can you try asking again?"
+        )
+
+        assert client.ensure_loaded(timeout=30)
+        health = worker.get_health()
+        assert health["alive"] is True
+        assert health["pid"] != pid
+        assert health["restarts"] == 1
+        assert health["last_exit_code"] == 3
+        assert client.generate("hello again") == "reply to hello again"
+
+    def test_reload_after_idle_unload(self, client, worker):
+        """Test the first request after an idle unload waits for the restarted worker"""
+        assert client.unload_if_idle(0)
+        assert client.is_loaded is False
+
+        assert client.generate("welcome back") == "reply to welcome back"
+        assert client.is_loaded is True
+
+    def test_stop_reports_unloaded(self, worker):
+        """Test a stopped worker is reported as not running"""
+        worker.stop()
+        health = worker.get_health()
+
+        assert health["running"] is False
+        assert health["alive"] is False
+        assert worker.is_loaded is False
@@ -0,0 +1,140 @@
+"""
+Tests for latency metrics
+Tests histograms, spans and traces, the Prometheus text format and the stage timings of a chat turn
+"""
+
+from unittest.mock import Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.conversation_manager import ConversationManager
+from services.inference_scheduler import InferenceScheduler
+from services.llm_service import LLMService
+from utils.config import settings
+from utils.metrics import STAGE_METRIC, Histogram, MetricsRegistry, metrics_registry, record_span, span, trace
+
+
+class FakeModel:
+    """Model context that returns a fixed reply"""
+
+    def __call__(self, prompt, **kwargs):
+        return {"choices": [{"text": "Nice move."}], "usage": {"completion_tokens": 2}}
+
+
+def stage_count(stage: str) -> int:
+    """Number of spans recorded for a stage"""
+    histogram = metrics_registry.get_histogram(STAGE_METRIC, {"stage": stage})
+    return histogram.snapshot()[2] if histogram else 0
+
+
+class TestHistogram:
+    """Test the histogram and its text format"""
+
+    def test_cumulative_buckets(self):
+        """Test observations land in cumulative buckets with sum and count"""
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        assert histogram.snapshot() == ([2, 3, 4], 2.65, 4)
+
+    def test_render(self):
+        """Test the Prometheus text exposition of histograms and gauges"""
+        registry = MetricsRegistry()
+        registry.observe("latency_seconds", 0.2, {"stage": "llm"}, help_text="Latency")
+        registry.set_gauge("hit_ratio", 0.5, {"cache": 'a"b'})
+
+        text = registry.render()
+
+        assert "# HELP latency_seconds Latency\n# TYPE latency_seconds histogram" in text
+        assert 'latency_seconds_bucket{stage="llm",le="0.1"} 0' in text
+        assert 'latency_seconds_bucket{stage="llm",le="0.25"} 1' in text
+        assert 'latency_seconds_bucket{stage="llm",le="+Inf"} 1' in text
+        assert 'latency_seconds_count{stage="llm"} 1' in text
+        assert '# TYPE hit_ratio gauge\nhit_ratio{cache="a\\"b"} 0.5' in text
+
+
+class TestSpans:
+    """Test spans and traces"""
+
+    def test_trace_collects_spans(self):
+        """Test spans inside a trace are collected and added up per stage"""
+        before = stage_count("test_stage")
+        with trace() as turn:
+            with span("test_stage"):
+                pass
+            record_span("test_stage", 0.5)
+
+        record_span("test_stage", 1.0)  # Outside the trace
+
+        assert turn.spans["test_stage"] >= 0.5
+        assert turn.as_ms()["test_stage"] < 1000
+        assert stage_count("test_stage") == before + 3
+
+    def test_span_recorded_on_error(self):
+        """Test a stage that raises is still timed"""
+        with trace() as turn:
+            with pytest.raises(ValueError):
+                with span("failing_stage"):
+                    raise ValueError("boom")
+
+        assert "failing_stage" in turn.spans
+
+    def test_generation_spans(self):
+        """Test a local generation records its queue and generation stages"""
+        service = LLMService(use_worker=False)
+        service.model = FakeModel()
+        service.is_loaded = True
+        service.scheduler = InferenceScheduler()
+        service.set_cache_enabled(False)
+
+        with trace() as turn:
+            service.generate("hi")
+
+        assert {"llm_queue", "llm_generation"} <= set(turn.spans)
+
+
+class TestTurnTimings:
+    """Test the stage timings of a chat turn"""
+
+    @patch("services.conversation_manager.safety_filter")
+    def test_timings_in_debug_metadata(self, mock_safety_filter, monkeypatch):
+        """Test a turn reports its stages in the metadata when DEBUG is on"""
+        mock_safety_filter.check_message.return_value = {
+            "safe": False, "flags": ["crisis"], "severity": "critical", "notify_parent": False,
+        }
+        db = Mock()
+        db.info = {}
+        manager = ConversationManager()
+        monkeypatch.setattr(settings, "DEBUG", True)
+
+        with patch.object(manager, "_store_message"), patch.object(manager, "_handle_crisis", return_value="Help"):
+            result = manager.process_message("I want to hurt myself", 1, 1, db)
+
+        timings = result["metadata"]["timings_ms"]
+        assert {"total", "safety", "crisis_response"} <= set(timings)
+        assert timings["total"] >= timings["safety"]
+
+        monkeypatch.setattr(settings, "DEBUG", False)
+        with patch.object(manager, "_store_message"), patch.object(manager, "_handle_crisis", return_value="Help"):
+            result = manager.process_message("I want to hurt myself", 1, 1, db)
+
+        assert "timings_ms" not in result["metadata"]
+
+
+class TestMetricsEndpoint:
+    """Test /api/metrics"""
+
+    def test_prometheus_text(self):
+        """Test the endpoint serves stage histograms, tokens/s and cache hit rates"""
+        record_span("safety", 0.002)
+
+        response = TestClient(app).get("/api/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert f'{STAGE_METRIC}_count{{stage="safety"}}' in response.text
+        assert "chatbot_llm_tokens_per_second" in response.text
+        assert 'chatbot_cache_hit_ratio{cache="llm_memory"}' in response.text
@@ -0,0 +1,167 @@
+"""
+Tests for Model Lifecycle Manager
+Tests idle and memory-pressure unloading, and background warm-up with priming
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import services.model_lifecycle as lifecycle_module
+from services.inference_scheduler import InferenceScheduler
+from services.llm_service import LLMService
+from services.model_lifecycle import ModelLifecycleManager
+
+
+class FakeModel:
+    """Model context that records prompts"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return {"choices": [{"text": "ok"}], "usage": {"completion_tokens": 1}}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """LLM service whose load_model installs a fake model"""
+    llm = LLMService(use_worker=False)
+    llm.scheduler = InferenceScheduler()
+    llm.set_cache_enabled(False)
+    llm.loads = 0
+
+    def load_model(blocking=True, use_mmap=True):
+        llm.model = FakeModel()
+        llm.loaded_at = time.monotonic()
+        llm.is_loaded = True
+        llm.loads += 1
+        return True
+
+    monkeypatch.setattr(llm, "load_model", load_model)
+    monkeypatch.setattr(llm, "ensure_loaded", lambda timeout=30.0: load_model())
+    load_model()
+    return llm
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    """Settable system RAM use"""
+    state = SimpleNamespace(percent=50.0)
+    monkeypatch.setattr(lifecycle_module.psutil, "virtual_memory", lambda: state)
+    monkeypatch.setattr(lifecycle_module, "force_gc", lambda: {"memory_freed_mb": 0.0})
+    return state
+
+
+def idle_for(service, seconds: float) -> None:
+    """Pretend the last generation (and the load) ended some seconds ago"""
+    service.last_generation_end = service.loaded_at = time.monotonic() - seconds
+
+
+class TestUnloadPolicy:
+    """Test when the model is unloaded"""
+
+    def test_idle_unload(self, service, memory):
+        """Test the model is unloaded after the idle time and not before"""
+        manager = ModelLifecycleManager(service, idle_minutes=10, pressure_percent=90)
+
+        idle_for(service, 9 * 60)
+        assert manager.check() is None
+        assert service.is_loaded
+
+        idle_for(service, 11 * 60)
+        assert manager.check() == "idle"
+        assert not service.is_loaded
+        assert service.model is None
+        assert manager.get_stats()["idle_unloads"] == 1
+
+    def test_memory_pressure_unloads_sooner(self, service, memory):
+        """Test high RAM use unloads after a short quiet period"""
+        manager = ModelLifecycleManager(service, idle_minutes=30, pressure_percent=90)
+        memory.percent = 95.0
+
+        idle_for(service, 30)
+        assert manager.check() is None
+
+        idle_for(service, manager.PRESSURE_MIN_IDLE_SECONDS + 1)
+        assert manager.check() == "memory_pressure"
+        assert manager.get_stats()["pressure_unloads"] == 1
+
+    def test_fresh_load_not_idle(self, service, memory):
+        """Test a model loaded with no generation since isn't idle since boot"""
+        manager = ModelLifecycleManager(service, idle_minutes=10, pressure_percent=90)
+        service.last_generation_end = 0.0
+
+        assert manager.check() is None
+        assert service.is_loaded
+
+        service.loaded_at = time.monotonic() - 11 * 60
+        assert manager.check() == "idle"
+
+    def test_worker_load_starts_idle_timer(self, service):
+        """Test the worker reporting a loaded model stamps the load time"""
+        service.loaded_at = 0.0
+        service._on_worker_status(True, None)
+
+        assert time.monotonic() - service.loaded_at < 1
+        assert not service.unload_if_idle(60)
+
+    def test_disabled(self, service, memory):
+        """Test idle_minutes=0 keeps the model loaded"""
+        manager = ModelLifecycleManager(service, idle_minutes=0, pressure_percent=0)
+        idle_for(service, 24 * 3600)
+
+        assert manager.check() is None
+        assert service.is_loaded
+
+    def test_not_while_generating(self, service, memory):
+        """Test a running generation keeps the model loaded"""
+        manager = ModelLifecycleManager(service, idle_minutes=1, pressure_percent=0)
+
+        with service._track_generation():
+            service.last_generation_end = 0.0
+            assert manager.check() is None
+        assert service.is_loaded
+
+    def test_focus_counts_as_activity(self, service, memory):
+        """Test a warm-up request resets the idle timer"""
+        manager = ModelLifecycleManager(service, idle_minutes=1, pressure_percent=0)
+        idle_for(service, 120)
+
+        assert manager.warm_up("app focus") is False  # Already loaded
+        assert manager.check() is None
+
+
+class TestWarmUp:
+    """Test reloading after an unload"""
+
+    def wait_warm(self, manager):
+        deadline = time.monotonic() + 5
+        while manager.get_stats()["warming"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_warm_up_loads_and_primes(self, service, memory):
+        """Test warm-up reloads the model and runs the priming prompt"""
+        manager = ModelLifecycleManager(service, idle_minutes=1, pressure_percent=0)
+        idle_for(service, 120)
+        manager.check()
+
+        assert manager.warm_up("conversation start") is True
+        self.wait_warm(manager)
+
+        assert service.is_loaded
+        assert service.loads == 2
+        assert service.model.prompts == [manager.PRIMING_PROMPT]
+        assert manager.get_stats()["warmups"] == 1
+        assert manager.get_stats()["last_warmup_ms"] is not None
+
+    def test_generate_reloads_unloaded_model(self, service, memory):
+        """Test a chat request after an idle unload loads the model again"""
+        manager = ModelLifecycleManager(service, idle_minutes=1, pressure_percent=0)
+        idle_for(service, 120)
+        manager.check()
+
+        assert service.generate("hello") == "ok"
+        assert service.loads == 2
@@ -0,0 +1,183 @@
+"""
+Tests for Notification Pipeline
+Checks that crisis turns commit once and that parent notifications are
+delivered in the background with retry and visible status
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.database import Base
+from models.user import User
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.personality import BotPersonality
+from models.conversation import Conversation, Message
+from models.safety import SafetyFlag
+from models.email_outbox import EmailOutbox
+from services.conversation_manager import ConversationManager
+from services.notification_pipeline import NotificationPipeline
+from services.parent_notification_service import parent_notification_service
+
+
+CRISIS_RESULT = {
+    "safe": False,
+    "flags": ["crisis"],
+    "severity": "critical",
+    "action": "crisis_response",
+    "notify_parent": True,
+    "details": {"crisis": {"detected": True, "keywords": ["hurt myself"]}},
+    "original_message": "I want to hurt myself",
+}
+
+
+@pytest.fixture
+def session_factory():
+    """Create an in-memory database"""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def test_db(session_factory):
+    """Create test database with a user, personality and conversation"""
+    db = session_factory()
+    db.add(User(
+        id=1, name="Test Child", age=10, parent_email="parent@example.com",
+        created_at=datetime.now(),
+    ))
+    db.add(BotPersonality(user_id=1, name="Buddy", mood="happy"))
+    db.add(Conversation(id=1, user_id=1, timestamp=datetime.now(), message_count=0))
+    db.commit()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def pipeline(session_factory):
+    """Pipeline bound to the test database"""
+    return NotificationPipeline(session_factory=session_factory)
+
+
+def log_pending_flag(db, pipeline) -> SafetyFlag:
+    """Log a crisis flag and mark it pending, as a chat turn does"""
+    flag = SafetyFlag(
+        user_id=1, flag_type="crisis", severity="critical",
+        content_snippet="I want to hurt myself", action_taken="crisis_response",
+    )
+    db.add(flag)
+    pipeline.enqueue(flag, CRISIS_RESULT)
+    db.commit()
+    return flag
+
+
+class TestCrisisTurn:
+    """Test the synchronous crisis path"""
+
+    def test_crisis_turn_does_not_notify_inline(self, test_db):
+        """Test the crisis reply is stored and the notification left pending"""
+        manager = ConversationManager()
+
+        with patch("services.conversation_manager.safety_filter.check_message",
+                   return_value=CRISIS_RESULT), \
+             patch.object(parent_notification_service, "notify_for_flag") as mock_notify, \
+             patch("services.conversation_manager.notification_pipeline.wake") as mock_wake:
+            result = manager.process_message("I want to hurt myself", 1, 1, test_db)
+
+        assert result["metadata"]["crisis_response"] is True
+        mock_notify.assert_not_called()
+        mock_wake.assert_called_once()
+
+        flag = test_db.query(SafetyFlag).one()
+        assert flag.notification_status == "pending"
+        assert flag.notification_category is not None
+        assert flag.message_id is not None
+        assert test_db.query(Message).count() == 2
+        assert test_db.query(BotPersonality).one().mood == "concerned"
+
+
+class TestPipeline:
+    """Test background delivery of pending notifications"""
+
+    def test_pending_flag_queued_in_outbox(self, pipeline, test_db):
+        """Test a pending flag is notified and linked to its outbox email"""
+        flag = log_pending_flag(test_db, pipeline)
+
+        with patch("services.email_outbox_service.email_service.check_ready", return_value=None), \
+             patch("services.parent_notification_service.email_service.is_configured",
+                   return_value=True):
+            assert pipeline.process_pending() == 1
+
+        test_db.expire_all()
+        flag = test_db.get(SafetyFlag, flag.id)
+        assert flag.notification_status == "notified"
+        assert flag.parent_notified is True
+        assert flag.notification_outbox.priority == 0
+        assert test_db.query(EmailOutbox).count() == 1
+
+    def test_no_parent_email_is_logged(self, pipeline, test_db):
+        """Test a flag for a user without a parent email ends as 'logged'"""
+        test_db.get(User, 1).parent_email = None
+        flag = log_pending_flag(test_db, pipeline)
+
+        pipeline.process_pending()
+
+        test_db.expire_all()
+        assert test_db.get(SafetyFlag, flag.id).notification_status == "logged"
+
+    def test_failure_retried_then_failed(self, pipeline, test_db):
+        """Test delivery errors are retried with backoff, then marked failed"""
+        pipeline.MAX_ATTEMPTS = 2
+        flag = log_pending_flag(test_db, pipeline)
+
+        with patch.object(parent_notification_service, "notify_for_flag",
+                          side_effect=RuntimeError("database busy")):
+            pipeline.process_pending()
+
+            test_db.expire_all()
+            flag = test_db.get(SafetyFlag, flag.id)
+            assert flag.notification_status == "pending"
+            assert flag.notification_next_attempt_at > datetime.now()
+
+            # Not due yet
+            assert pipeline.process_pending() == 0
+
+            flag.notification_next_attempt_at = datetime.now() - timedelta(seconds=1)
+            test_db.commit()
+            pipeline.process_pending()
+
+        test_db.expire_all()
+        flag = test_db.get(SafetyFlag, flag.id)
+        assert flag.notification_status == "failed"
+        assert flag.notification_attempts == 2
+        assert flag.notification_error == "database busy"
+
+    def test_interrupted_notifications_requeued(self, pipeline, test_db):
+        """Test flags left 'sending' by a crash are requeued on start"""
+        flag = log_pending_flag(test_db, pipeline)
+        flag.notification_status = "sending"
+        test_db.commit()
+
+        assert pipeline.recover_interrupted() == 1
+
+        test_db.expire_all()
+        assert test_db.get(SafetyFlag, flag.id).notification_status == "pending"
+
+    def test_history_includes_pending(self, pipeline, test_db):
+        """Test notification history shows in-flight notifications"""
+        log_pending_flag(test_db, pipeline)
+
+        history = parent_notification_service.get_notification_history(1, test_db)
+
+        assert len(history) == 1
+        assert history[0]["notification_status"] == "pending"
+        assert history[0]["delivery_status"] is None
@@ -0,0 +1,143 @@
+"""
+Tests for the persistent response cache
+Tests the on-disk cache (TTL, LRU size bound, restarts) and its use as the LLM service's second tier
+"""
+
+import time
+
+import pytest
+
+from services.inference_scheduler import InferenceScheduler
+from services.llm_service import LLMService
+from utils.cache import PersistentCache
+from utils.config import settings
+
+
+class TestPersistentCache:
+    """Test the SQLite-backed cache"""
+
+    def test_survives_reopen(self, tmp_path):
+        """Test values written by one instance are read by the next"""
+        path = tmp_path / "cache.db"
+        cache = PersistentCache(str(path))
+        cache.set("key", "value")
+        cache.close()
+
+        reopened = PersistentCache(str(path))
+        assert reopened.get("key") == "value"
+        assert reopened.get("other") is None
+        assert reopened.get_stats()["hits"] == 1
+        assert reopened.get_stats()["misses"] == 1
+
+    def test_ttl_expiry(self, tmp_path):
+        """Test expired entries are misses and get cleaned up"""
+        cache = PersistentCache(str(tmp_path / "cache.db"))
+        cache.set("short", "gone", ttl=-1)
+        cache.set("long", "kept")
+
+        assert cache.get("short") is None
+        cache.set("short2", "gone", ttl=-1)
+        assert cache.cleanup_expired() == 1
+        assert cache.get("long") == "kept"
+
+    def test_lru_eviction_by_size(self, tmp_path):
+        """Test the least recently used entries go when the size limit is passed"""
+        cache = PersistentCache(str(tmp_path / "cache.db"), max_mb=3500 / (1024 * 1024))
+        for key in ("a", "b"):
+            cache.set(key, "x" * 1000)
+            time.sleep(0.02)
+        cache.get("a")  # b is now least recently used
+        time.sleep(0.02)
+        cache.set("c", "x" * 1000)
+        cache.set("d", "x" * 1000)
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get_stats()["bytes"] <= 3500
+        assert cache.get_stats()["evictions"] >= 1
+
+    def test_unreadable_file_is_a_miss(self, tmp_path):
+        """Test a corrupt cache file never raises"""
+        path = tmp_path / "cache.db"
+        path.write_bytes(b"not a database" * 100)
+        cache = PersistentCache(str(path))
+
+        cache.set("key", "value")
+        assert cache.get("key") is None
+
+
+class FakeModel:
+    """Model context that counts calls"""
+
+    def __init__(self, text: str = "reply"):
+        self.text = text
+        self.calls = 0
+
+    def __call__(self, prompt, **kwargs):
+        self.calls += 1
+        return {"choices": [{"text": self.text}]}
+
+
+@pytest.fixture
+def make_service(tmp_path, monkeypatch):
+    """Build LLM services that share a cache file, like restarts of the backend"""
+    model_file = tmp_path / "model.gguf"
+    model_file.write_bytes(b"GGUF" + b"\0" * 4096)
+    monkeypatch.setattr(settings, "ENABLE_PERSISTENT_CACHE", True)
+    monkeypatch.setattr(settings, "PERSISTENT_CACHE_PATH", str(tmp_path / "llm_cache.db"))
+
+    def make(model=None):
+        service = LLMService(use_worker=False)
+        service.model_path = model_file
+        service.model = model or FakeModel()
+        service.is_loaded = True
+        service.scheduler = InferenceScheduler()
+        return service
+
+    make.model_file = model_file
+    return make
+
+
+class TestResponseCacheTier:
+    """Test LLM replies served from disk after a restart"""
+
+    def test_low_temperature_reply_served_after_restart(self, make_service):
+        """Test an extraction-style reply is read back from disk by a new service"""
+        make_service().generate("extract", temperature=0.3)
+
+        model = FakeModel("different")
+        restarted = make_service(model)
+        assert restarted.generate("extract", temperature=0.3) == "reply"
+        assert model.calls == 0
+        assert restarted.get_cache_stats()["persistent"]["hits"] == 1
+
+        # Promoted to the memory tier
+        restarted.generate("extract", temperature=0.3)
+        assert restarted.get_cache_stats()["persistent"]["hits"] == 1
+
+    def test_chat_replies_not_persisted(self, make_service):
+        """Test sampled (high temperature) replies stay in memory only"""
+        make_service().generate("chat", temperature=0.7)
+
+        model = FakeModel()
+        make_service(model).generate("chat", temperature=0.7)
+        assert model.calls == 1
+
+    def test_model_change_invalidates(self, make_service):
+        """Test a different model file doesn't get the old model's replies"""
+        make_service().generate("extract", temperature=0.3)
+
+        make_service.model_file.write_bytes(b"GGUF" + b"\1" * 8192)
+        model = FakeModel()
+        make_service(model).generate("extract", temperature=0.3)
+        assert model.calls == 1
+
+    def test_clear_cache_clears_disk(self, make_service):
+        """Test clearing the cache empties both tiers"""
+        service = make_service()
+        service.generate("extract", temperature=0.3)
+        service.clear_cache()
+
+        model = FakeModel()
+        make_service(model).generate("extract", temperature=0.3)
+        assert model.calls == 1
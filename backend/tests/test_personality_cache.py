@@ -0,0 +1,135 @@
+"""
+Tests for Personality Cache
+Tests snapshot caching and write-through invalidation on commit
+"""
+
+import dataclasses
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base
+from models.user import User
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.personality import BotPersonality
+from services.friendship_progression import add_friendship_points
+from services.personality_cache import PersonalityCache, PersonalitySnapshot, personality_cache
+
+
+@pytest.fixture
+def session_factory():
+    """Session factory bound to a fresh in-memory database with one personality"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add(User(id=1, name="Test User", age=10, created_at=datetime.now()))
+    personality = BotPersonality(user_id=1, name="Buddy", humor=0.5, friendship_points=0)
+    personality.set_quirks(["uses_emojis"])
+    personality.set_interests(["chess", "space"])
+    db.add(personality)
+    db.commit()
+    db.close()
+    return factory
+
+
+@pytest.fixture
+def query_log(session_factory):
+    """Statements run on the engine"""
+    statements = []
+    event.listen(session_factory.kw["bind"], "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+class TestSnapshot:
+    """Test the snapshot type"""
+
+    def test_snapshot_is_immutable(self, session_factory):
+        """Test snapshots cannot be modified and carry parsed lists"""
+        snapshot = PersonalityCache().get(1, session_factory())
+
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            snapshot.humor = 0.9
+        assert not hasattr(snapshot, "__dict__")
+        assert snapshot.get_interests() == ["chess", "space"]
+        assert snapshot.to_dict()["quirks"] == ["uses_emojis"]
+
+    def test_model_parse_returns_copies(self):
+        """Test memoized JSON parsing never hands out the cached list"""
+        personality = BotPersonality(quirks='["tells_puns"]')
+
+        quirks = personality.get_quirks()
+        quirks.append("uses_emojis")
+
+        assert personality.get_quirks() == ["tells_puns"]
+        personality.set_quirks(["shares_facts"])
+        assert personality.get_quirks() == ["shares_facts"]
+
+
+class TestCaching:
+    """Test hits and invalidation"""
+
+    def test_second_read_skips_database(self, session_factory, query_log):
+        """Test a cached snapshot is served without a query"""
+        cache = PersonalityCache()
+        cache.get(1, session_factory())
+        query_log.clear()
+
+        snapshot = cache.get(1, session_factory())
+
+        assert snapshot.name == "Buddy"
+        assert query_log == []
+        assert cache.get_stats()["hits"] == 1
+
+    def test_commit_invalidates(self, session_factory):
+        """Test a committed trait change is visible on the next read"""
+        assert personality_cache.get(1, session_factory()).humor == 0.5
+
+        db = session_factory()
+        db.query(BotPersonality).filter(BotPersonality.user_id == 1).first().humor = 0.8
+        db.commit()
+
+        assert personality_cache.get(1, session_factory()).humor == 0.8
+
+    def test_level_up_invalidates(self, session_factory):
+        """Test friendship points and level-ups refresh the snapshot"""
+        assert personality_cache.get(1, session_factory()).friendship_level == 1
+
+        db = session_factory()
+        personality = db.query(BotPersonality).filter(BotPersonality.user_id == 1).first()
+        personality.friendship_points = 95
+        db.commit()
+        add_friendship_points(personality, "positive_feedback", db)
+
+        snapshot = personality_cache.get(1, session_factory())
+        assert snapshot.friendship_points == personality.friendship_points
+        assert snapshot.friendship_level == 2
+
+    def test_uncommitted_changes_not_cached(self, session_factory):
+        """Test a session's staged or rolled-back writes never reach the cache"""
+        db = session_factory()
+        db.query(BotPersonality).filter(BotPersonality.user_id == 1).first().mood = "sad"
+
+        assert personality_cache.get(1, db).mood == "sad"  # This session sees its own change
+        db.rollback()
+
+        assert personality_cache.get(1, session_factory()).mood == "happy"
+
+    def test_load_racing_commit_not_stored(self, session_factory):
+        """Test a snapshot loaded before a concurrent commit is not cached"""
+        cache = PersonalityCache()
+        engine = session_factory.kw["bind"]
+        original = PersonalitySnapshot.from_model
+
+        def commit_during_load(personality):
+            cache.invalidate(1, engine)  # Another session commits mid-load
+            return original(personality)
+
+        with patch.object(PersonalitySnapshot, "from_model", side_effect=commit_during_load):
+            cache.get(1, session_factory())
+
+        assert cache.get_stats()["cached"] == 0
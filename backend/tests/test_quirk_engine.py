@@ -0,0 +1,143 @@
+"""
+Tests for Quirk Engine
+Tests compiled emoji/pun/fact rendering and seeded determinism
+"""
+
+import pytest
+
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from services.conversation_manager import ConversationManager
+from services.emoji_quirk_service import EmojiQuirkService
+from services.fact_quirk_service import FactQuirkService
+from services.personality_cache import PersonalitySnapshot
+from services.pun_quirk_service import PunQuirkService
+from services.quirk_engine import apply_quirks, quirk_engine, quirk_seed, split_sentences
+
+ALL_QUIRKS = ["uses_emojis", "tells_puns", "shares_facts"]
+
+
+def make_personality(level: int = 5) -> PersonalitySnapshot:
+    """Snapshot of a personality with every quirk"""
+    return PersonalitySnapshot(
+        id=1, user_id=1, name="Buddy", humor=0.5, energy=0.6, curiosity=0.5,
+        formality=0.3, friendship_level=level, friendship_points=0,
+        total_conversations=0, mood="happy", quirks=tuple(ALL_QUIRKS), interests=(),
+        catchphrase="Cool beans!", created_at=None, updated_at=None,
+    )
+
+
+class TestSentences:
+    """Test sentence segmentation"""
+
+    @pytest.mark.parametrize("text", [
+        "Hello there! How are you?  I'm fine.",
+        "No punctuation at all",
+        "Ends with space. ",
+        "",
+        "Line one.\nLine two!",
+    ])
+    def test_split_round_trips(self, text):
+        """Test joining the segments gives the original text back"""
+        assert "".join(sentence + gap for sentence, gap in split_sentences(text)) == text
+
+    def test_split_keeps_gaps(self):
+        """Test whitespace between sentences is kept with the sentence before it"""
+        assert split_sentences("Hi!  Bye.") == [("Hi!", "  "), ("Bye.", "")]
+
+
+class TestMatching:
+    """Test the compiled keyword matcher agrees with the quirk services"""
+
+    @pytest.mark.parametrize("text", [
+        "I played soccer with my friend at school today",
+        "my math homework is so hard",
+        "I love music and my dog and pizza",
+        "nothing to see here",
+        "SPACE rockets and the Ocean",
+    ])
+    def test_match_agrees_with_services(self, text):
+        """Test matches are the substring hits of each table, in table order"""
+        lowered = text.lower()
+        matches = quirk_engine.match(text)
+
+        assert matches["emoji"] == [k for k in EmojiQuirkService.CONTEXT_EMOJIS if k in lowered]
+        assert matches["pun"] == [k for k in PunQuirkService.CONTEXT_KEYWORDS if k in lowered]
+        assert matches["fact"] == [k for k in FactQuirkService.CONTEXT_KEYWORDS if k in lowered]
+
+    def test_emoji_candidates_use_context_table(self):
+        """Test contextual emojis come from the matched keyword"""
+        candidates = quirk_engine._emoji_candidates("We love music.")
+        assert set(EmojiQuirkService.CONTEXT_EMOJIS["music"]) <= set(candidates)
+        assert quirk_engine._emoji_candidates("Nothing here.") == []
+
+
+class TestApply:
+    """Test rendering"""
+
+    def test_no_quirks_returns_response(self):
+        """Test a personality without these quirks leaves the response alone"""
+        response = "Hello there! How are you?"
+        assert apply_quirks(response, ["likes_chess"], seed=1) == response
+
+    def test_seeded_output_is_reproducible(self):
+        """Test the same seed always renders the same response"""
+        outputs = {
+            apply_quirks("That sounds fun! Tell me more.", ALL_QUIRKS,
+                         friendship_level=10, context="I love soccer", seed=7)
+            for _ in range(5)
+        }
+        assert len(outputs) == 1
+
+    def test_different_seeds_vary(self):
+        """Test different seeds give different renderings"""
+        outputs = {
+            apply_quirks("That sounds fun! Tell me more.", ALL_QUIRKS,
+                         friendship_level=10, context="I love soccer", seed=seed)
+            for seed in range(50)
+        }
+        assert len(outputs) > 1
+
+    def test_fact_on_empty_response(self):
+        """Test a fact added to an empty response is the whole response"""
+        class AlwaysAdd:
+            def random(self):
+                return 0.0
+
+            def choice(self, options):
+                return options[0]
+
+        result = quirk_engine.apply("", ["shares_facts"], context="I like space", rng=AlwaysAdd())
+        assert result == FactQuirkService.CONTEXT_KEYWORDS["space"][0]
+
+    def test_contextual_fact_appended(self):
+        """Test an added fact comes from the user's topic"""
+        facts = FactQuirkService.CONTEXT_KEYWORDS["space"]
+        added = 0
+        for seed in range(100):
+            result = apply_quirks("Cool!", ["shares_facts"], friendship_level=10,
+                                  context="tell me about space", seed=seed)
+            if result != "Cool!":
+                added += 1
+                assert any(fact in result for fact in facts)
+        assert added > 0
+
+    def test_quirk_seed_is_stable(self):
+        """Test seeds depend only on their parts"""
+        assert quirk_seed(12, 3) == quirk_seed("12", "3")
+        assert quirk_seed(12, 3) != quirk_seed(12, 4)
+
+
+class TestPersonalityFilter:
+    """Test the conversation manager's filter stage"""
+
+    def test_seeded_filter_is_deterministic(self):
+        """Test quirks and catchphrase render the same for the same turn seed"""
+        manager = ConversationManager()
+        personality = make_personality()
+        seed = quirk_seed(1, 2)
+
+        first = manager._apply_personality_filter("Great job today!", personality, "school", seed=seed)
+        second = manager._apply_personality_filter("Great job today!", personality, "school", seed=seed)
+
+        assert first == second
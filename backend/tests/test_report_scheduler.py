@@ -0,0 +1,240 @@
+"""
+Tests for Report Scheduler
+Tests next_report_at computation, catch-up of missed reports and rescheduling
+"""
+
+import time
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.database import Base
+from models.user import User
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.parent_preferences import ParentNotificationPreferences
+from services.report_scheduler import ReportScheduler
+
+
+@pytest.fixture
+def session_factory():
+    """Create an in-memory database shared across threads"""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def test_db(session_factory):
+    """Create test database session"""
+    db = session_factory()
+    yield db
+    db.close()
+
+
+def make_prefs(**overrides):
+    """Build unsaved preferences with weekly Monday 9:00 defaults"""
+    values = dict(
+        user_id=1,
+        email="parent@example.com",
+        email_notifications_enabled=True,
+        summary_frequency="weekly",
+        summary_day_of_week=0,
+        summary_hour=9,
+        quiet_hours_enabled=False,
+    )
+    values.update(overrides)
+    return ParentNotificationPreferences(**values)
+
+
+def add_user_with_prefs(db, user_id, next_report_at, **overrides):
+    """Persist a user and preferences with a given due time"""
+    db.add(User(id=user_id, name=f"User {user_id}", age=10, created_at=datetime.now()))
+    prefs = make_prefs(user_id=user_id, **overrides)
+    prefs.next_report_at = next_report_at
+    db.add(prefs)
+    db.commit()
+    return prefs
+
+
+class TestComputeNextReportAt:
+    """Test due-time computation from preferences"""
+
+    # Wednesday 2025-01-08 12:30
+    NOW = datetime(2025, 1, 8, 12, 30)
+
+    def test_weekly_next_monday(self):
+        """Test weekly report lands on the configured day and hour"""
+        prefs = make_prefs()
+
+        assert prefs.compute_next_report_at(after=self.NOW) == datetime(2025, 1, 13, 9, 0)
+
+    def test_weekly_same_day_later_hour(self):
+        """Test weekly report due later on the same day"""
+        prefs = make_prefs(summary_day_of_week=2, summary_hour=18)
+
+        assert prefs.compute_next_report_at(after=self.NOW) == datetime(2025, 1, 8, 18, 0)
+
+    def test_daily_tomorrow_when_hour_passed(self):
+        """Test daily report rolls over to the next day"""
+        prefs = make_prefs(summary_frequency="daily", summary_hour=9)
+
+        assert prefs.compute_next_report_at(after=self.NOW) == datetime(2025, 1, 9, 9, 0)
+
+    def test_result_is_strictly_after_reference(self):
+        """Test computing right at the due time returns the following slot"""
+        prefs = make_prefs(summary_frequency="daily", summary_hour=9)
+        due = datetime(2025, 1, 9, 9, 0)
+
+        assert prefs.compute_next_report_at(after=due) == datetime(2025, 1, 10, 9, 0)
+
+    def test_deferred_past_quiet_hours(self):
+        """Test a slot inside quiet hours moves to the end of the quiet period"""
+        prefs = make_prefs(
+            summary_frequency="daily",
+            summary_hour=23,
+            quiet_hours_enabled=True,
+            quiet_hours_start=22,
+            quiet_hours_end=7,
+        )
+
+        assert prefs.compute_next_report_at(after=self.NOW) == datetime(2025, 1, 9, 7, 0)
+
+    def test_deferred_slot_from_previous_period_not_skipped(self):
+        """Test a slot deferred past midnight is still found after midnight"""
+        prefs = make_prefs(
+            summary_frequency="daily",
+            summary_hour=23,
+            quiet_hours_enabled=True,
+            quiet_hours_start=22,
+            quiet_hours_end=7,
+        )
+
+        after = datetime(2025, 1, 9, 3, 0)
+        assert prefs.compute_next_report_at(after=after) == datetime(2025, 1, 9, 7, 0)
+
+    def test_disabled_returns_none(self):
+        """Test no due time when summaries or email are disabled"""
+        assert make_prefs(summary_frequency="none").compute_next_report_at(self.NOW) is None
+        assert make_prefs(email_notifications_enabled=False).compute_next_report_at(self.NOW) is None
+
+
+class TestReportScheduler:
+    """Test the due-time queue"""
+
+    def test_load_queue_computes_missing_due_times(self, session_factory, test_db):
+        """Test rows without next_report_at get one when the queue loads"""
+        add_user_with_prefs(test_db, 1, None)
+        scheduler = ReportScheduler(session_factory=session_factory, max_workers=1)
+
+        assert scheduler.load_queue() == 1
+
+        test_db.expire_all()
+        prefs = test_db.query(ParentNotificationPreferences).first()
+        assert prefs.next_report_at is not None
+        assert scheduler.get_next_due() == prefs.next_report_at
+
+    def test_catch_up_sends_missed_report_once(self, session_factory, test_db):
+        """Test a report missed while the app was closed is sent and advanced"""
+        missed = datetime.now() - timedelta(days=20)
+        add_user_with_prefs(test_db, 1, missed)
+        add_user_with_prefs(test_db, 2, datetime.now() + timedelta(days=1))
+        scheduler = ReportScheduler(session_factory=session_factory, max_workers=1)
+
+        with patch(
+            "services.report_scheduler.weekly_report_service.generate_and_send_report",
+            return_value={"sent": True},
+        ) as mock_send:
+            counts = scheduler.check_and_send_reports()
+
+        assert counts == {"sent": 1, "skipped": 0, "error": 0}
+        assert mock_send.call_count == 1
+        assert mock_send.call_args[0][1] == 1
+
+        test_db.expire_all()
+        prefs = test_db.query(ParentNotificationPreferences).filter_by(user_id=1).first()
+        assert prefs.next_report_at > datetime.now()
+
+    def test_failed_send_retries_later(self, session_factory, test_db):
+        """Test an email failure is retried instead of skipping the period"""
+        add_user_with_prefs(test_db, 1, datetime.now() - timedelta(minutes=5))
+        scheduler = ReportScheduler(session_factory=session_factory, max_workers=1)
+
+        with patch(
+            "services.report_scheduler.weekly_report_service.generate_and_send_report",
+            return_value={"sent": False, "error": "SMTP down"},
+        ):
+            counts = scheduler.check_and_send_reports()
+
+        assert counts["error"] == 1
+
+        test_db.expire_all()
+        prefs = test_db.query(ParentNotificationPreferences).first()
+        assert prefs.next_report_at <= datetime.now() + scheduler.RETRY_DELAY
+
+    def test_schedule_change_during_send_kept(self, session_factory, test_db):
+        """Test a schedule the parent changes while a report is sending isn't overwritten"""
+        add_user_with_prefs(test_db, 1, datetime.now() - timedelta(minutes=5))
+        scheduler = ReportScheduler(session_factory=session_factory, max_workers=1)
+        changed = datetime.now() + timedelta(hours=3)
+
+        def send_while_parent_edits(db, user_id, period, force_send):
+            other = session_factory()
+            prefs = other.query(ParentNotificationPreferences).filter_by(user_id=user_id).first()
+            prefs.summary_frequency = "daily"
+            prefs.next_report_at = changed
+            other.commit()
+            other.close()
+            return {"sent": True}
+
+        with patch(
+            "services.report_scheduler.weekly_report_service.generate_and_send_report",
+            side_effect=send_while_parent_edits,
+        ):
+            assert scheduler.check_and_send_reports()["sent"] == 1
+
+        test_db.expire_all()
+        assert test_db.query(ParentNotificationPreferences).first().next_report_at == changed
+
+    def test_reschedule_supersedes_queued_entry(self, session_factory):
+        """Test rescheduling replaces a user's due time"""
+        scheduler = ReportScheduler(session_factory=session_factory, max_workers=1)
+        scheduler._running = True
+        soon = datetime.now() + timedelta(hours=1)
+        later = datetime.now() + timedelta(days=2)
+
+        scheduler.reschedule(1, soon)
+        scheduler.reschedule(1, later)
+        assert scheduler.get_next_due() == later
+
+        scheduler.reschedule(1, None)
+        assert scheduler.get_next_due() is None
+
+    def test_scheduler_thread_dispatches_due_report(self, session_factory, test_db):
+        """Test the running scheduler sends an overdue report on start"""
+        add_user_with_prefs(test_db, 1, datetime.now() - timedelta(hours=2))
+        scheduler = ReportScheduler(session_factory=session_factory, max_workers=2)
+        scheduler.enabled = True
+
+        with patch(
+            "services.report_scheduler.weekly_report_service.generate_and_send_report",
+            return_value={"sent": True},
+        ) as mock_send:
+            scheduler.start()
+            try:
+                deadline = datetime.now() + timedelta(seconds=5)
+                while mock_send.call_count == 0 and datetime.now() < deadline:
+                    time.sleep(0.01)
+            finally:
+                scheduler.stop()
+
+        assert mock_send.call_count == 1
+        next_due = scheduler.get_next_due()
+        assert next_due is not None and next_due > datetime.now()
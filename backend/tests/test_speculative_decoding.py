@@ -0,0 +1,147 @@
+"""
+Tests for speculative decoding statistics
+Tests draft counting, acceptance estimates and decoding speed in the model info
+"""
+
+import sys
+import types
+
+import pytest
+
+from services.inference_scheduler import InferenceScheduler
+from services.llm_service import DraftCounter, LLMService
+from utils.config import settings
+
+
+class FakeDrafter:
+    """Draft model that always proposes the same number of tokens"""
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+
+    def __call__(self, input_ids, **kwargs):
+        return list(range(self.tokens))
+
+
+class FakeSpeculativeModel:
+    """Model context that generates in steps, drafting after each step as llama.cpp does"""
+
+    def __init__(self, steps: int, tokens: int, draft_tokens: int = 4):
+        self.draft_model = DraftCounter(FakeDrafter(draft_tokens))
+        self.steps = steps
+        self.tokens = tokens
+
+    def __call__(self, prompt, stream=False, **kwargs):
+        for _ in range(self.steps - 1):
+            self.draft_model([1, 2, 3])
+        if stream:
+            return iter([{"choices": [{"text": "x"}]}] * self.tokens)
+        return {
+            "choices": [{"text": "reply"}],
+            "usage": {"completion_tokens": self.tokens},
+        }
+
+
+@pytest.fixture
+def service():
+    """LLM service with a fake speculative context"""
+    llm = LLMService(use_worker=False)
+    llm.is_loaded = True
+    llm.scheduler = InferenceScheduler()
+    llm.set_cache_enabled(False)
+    return llm
+
+
+class TestDecodingStats:
+    """Test decoding statistics"""
+
+    def test_acceptance_estimate(self, service):
+        """Test accepted drafts are the tokens beyond one per step"""
+        # 5 steps draft 4 tokens after each of the first 4 steps; 13 tokens = 5 sampled + 8 accepted
+        service.model = FakeSpeculativeModel(steps=5, tokens=13)
+
+        service.generate("hello")
+        stats = service.get_decoding_stats()
+
+        assert stats["generations"] == 1
+        assert stats["tokens"] == 13
+        assert stats["drafted_tokens"] == 16
+        assert stats["accepted_tokens"] == 8
+        assert stats["acceptance_rate"] == 0.5
+        assert stats["tokens_per_second"] > 0
+
+    def test_counts_are_per_generation(self, service):
+        """Test each generation only counts its own drafts"""
+        service.model = FakeSpeculativeModel(steps=3, tokens=3)
+
+        service.generate("one")
+        service.generate("two")
+
+        stats = service.get_decoding_stats()
+        assert stats["drafted_tokens"] == 16
+        assert stats["accepted_tokens"] == 0
+        assert stats["acceptance_rate"] == 0.0
+
+    def test_stream_is_counted(self, service):
+        """Test streamed chunks count as generated tokens"""
+        service.model = FakeSpeculativeModel(steps=2, tokens=6)
+
+        assert "".join(service.generate_stream("hello")) == "xxxxxx"
+
+        stats = service.get_model_info()["decoding"]
+        assert stats["tokens"] == 6
+        assert stats["accepted_tokens"] == 4
+
+    def test_without_draft_model(self, service):
+        """Test plain decoding records speed but no acceptance rate"""
+        class PlainModel:
+            def __call__(self, prompt, **kwargs):
+                return {"choices": [{"text": "hi"}], "usage": {"completion_tokens": 2}}
+
+        service.model = PlainModel()
+        service.generate("hello")
+
+        stats = service.get_decoding_stats()
+        assert stats["tokens"] == 2
+        assert stats["drafted_tokens"] == 0
+        assert stats["acceptance_rate"] is None
+
+
+class TestDraftModel:
+    """Test draft model selection"""
+
+    def test_off_has_no_draft_model(self, service):
+        """Test speculative decoding is off by default"""
+        assert service.speculative_mode == "off"
+        assert service._make_draft_model() is None
+
+    def test_unknown_mode_falls_back(self, service):
+        """Test an unknown mode decodes normally"""
+        service.speculative_mode = "medusa"
+
+        assert service._make_draft_model() is None
+        assert service.speculative_mode == "off"
+
+    def test_load_without_speculative_support(self, tmp_path, monkeypatch):
+        """Test prompt lookup on a llama-cpp-python without llama_speculative still loads the model"""
+        created = []
+
+        class FakeLlama:
+            def __init__(self, **kwargs):
+                self.metadata = {}
+                created.append(kwargs)
+
+        model_file = tmp_path / "model.gguf"
+        model_file.write_bytes(b"gguf")
+        monkeypatch.setitem(sys.modules, "llama_cpp", types.SimpleNamespace(Llama=FakeLlama))
+        monkeypatch.setitem(sys.modules, "llama_cpp.llama_speculative", None)  # Import raises ImportError
+        monkeypatch.setattr(settings, "MODEL_CONTEXTS", 1)
+
+        llm = LLMService(use_worker=False)
+        llm.model_path = model_file
+        llm.speculative_mode = "prompt_lookup"
+
+        assert llm.load_model(blocking=True)
+        assert llm.is_loaded
+        assert llm.speculative_mode == "off"
+        assert created[-1]["draft_model"] is None
@@ -0,0 +1,148 @@
+"""
+Tests for grammar-constrained JSON generation
+Tests the GBNF grammars, generate_json statistics and the memory extraction JSON path
+"""
+
+import re
+import sys
+
+import pytest
+
+from services import json_grammars
+from services.inference_scheduler import InferenceScheduler
+from services.llm_service import LLMService
+
+
+class FakeJSONModel:
+    """Model context that returns a fixed reply and records the call"""
+
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.calls = []
+
+    def __call__(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return {"choices": [{"text": self.reply}], "usage": {"completion_tokens": len(self.reply.split())}}
+
+    def tokenize(self, text: bytes, add_bos: bool = True):
+        return text.split()
+
+
+@pytest.fixture
+def service():
+    """LLM service with a fake model and grammars compiled to their text"""
+    llm = LLMService(use_worker=False)
+    llm.is_loaded = True
+    llm.scheduler = InferenceScheduler()
+    llm.set_cache_enabled(False)
+    llm._compile_grammar = lambda grammar: f"compiled:{grammar[:10]}"
+    return llm
+
+
+class TestGrammars:
+    """Test the GBNF grammars are complete"""
+
+    @pytest.mark.parametrize("grammar", [
+        json_grammars.MEMORY_EXTRACTION_GRAMMAR,
+        json_grammars.SUMMARY_GRAMMAR,
+    ])
+    def test_every_rule_is_defined(self, grammar):
+        """Test the grammar has a root and defines every rule it references"""
+        defined = set(re.findall(r"^(\w+) ::=", grammar, re.MULTILINE))
+        # Rule references: words left after removing names, literals and character classes
+        bodies = re.sub(r"^\w+ ::=", " ", grammar, flags=re.MULTILINE)
+        bodies = re.sub(r'"(\\.|[^"\\])*"|\[(\\.|[^\]\\])*\]', " ", bodies)
+        referenced = set(re.findall(r"[a-z_]+", bodies))
+
+        assert "root" in defined
+        assert referenced <= defined
+
+    def test_memory_categories_match_extraction(self):
+        """Test the grammar allows exactly the categories memory extraction accepts"""
+        rule = json_grammars.MEMORY_EXTRACTION_GRAMMAR.split("category ::=")[1].splitlines()[0]
+        categories = re.findall(r'\\"(\w+)\\"', rule)
+
+        assert categories == ["favorite", "dislike", "person", "goal", "achievement", "basic"]
+
+
+class TestGenerateJSON:
+    """Test grammar-constrained generation"""
+
+    def test_valid_json(self, service):
+        """Test valid output is parsed, with the grammar passed to the model"""
+        model = FakeJSONModel('[{"category": "basic", "key": "name", "value": "Sam", "confidence": 1.0}]')
+        service.model = model
+
+        value = service.generate_json("prompt", json_grammars.MEMORY_EXTRACTION_GRAMMAR, task="memory_extraction",
+                                      max_tokens=100)
+
+        assert value[0]["value"] == "Sam"
+        assert model.calls[0]["grammar"].startswith("compiled:")
+        assert model.calls[0]["stop"] == []
+
+        stats = service.get_model_info()["structured_output"]["memory_extraction"]
+        assert stats["calls"] == 1
+        assert stats["valid"] == 1
+        assert stats["success_rate"] == 1.0
+        assert stats["output_tokens"] == 8
+        assert stats["tokens_saved"] == 92
+
+    def test_truncated_json(self, service):
+        """Test output cut off at max_tokens counts as a failure"""
+        service.model = FakeJSONModel('{"summary": "Child learned')
+
+        assert service.generate_json("prompt", json_grammars.SUMMARY_GRAMMAR, task="summary", max_tokens=3) is None
+
+        stats = service.get_structured_output_stats()["summary"]
+        assert stats["failed"] == 1
+        assert stats["success_rate"] == 0.0
+        assert stats["tokens_saved"] == 0
+
+    def test_grammar_compiled_once_per_context(self, service):
+        """Test each context reuses its compiled grammar"""
+        compiled = []
+        service._compile_grammar = lambda grammar: compiled.append(grammar) or object()
+        service.model = FakeJSONModel("[]")
+
+        service.generate_json("one", json_grammars.MEMORY_EXTRACTION_GRAMMAR, task="memory_extraction")
+        service.generate_json("two", json_grammars.MEMORY_EXTRACTION_GRAMMAR, task="memory_extraction")
+
+        assert len(compiled) == 1
+
+    def test_grammar_in_cache_key(self, service):
+        """Test constrained and unconstrained replies are cached separately"""
+        plain = service._generate_cache_key("prompt", 10, 0.3, [])
+        constrained = service._generate_cache_key("prompt", 10, 0.3, [], json_grammars.SUMMARY_GRAMMAR)
+
+        assert plain != constrained
+
+
+class TestMemoryExtractionJSON:
+    """Test memory extraction through generate_json"""
+
+    def test_extraction_filters_low_confidence(self, service, monkeypatch):
+        """Test extracted memories are validated as before"""
+        from services.memory_manager import MemoryManager
+
+        service.model = FakeJSONModel(
+            '[{"category": "favorite", "key": "color", "value": "green", "confidence": 0.9},'
+            ' {"category": "goal", "key": "maybe", "value": "something", "confidence": 0.5}]'
+        )
+        monkeypatch.setattr(sys.modules["services.llm_service"], "llm_service", service)
+
+        extracted = MemoryManager()._llm_based_extraction("My favorite color is green")
+
+        assert extracted == [("favorite", "color", "green")]
+        assert service.get_structured_output_stats()["memory_extraction"]["valid"] == 1
+
+    def test_invalid_output_falls_back_to_keywords(self, service, monkeypatch):
+        """Test failed generation uses keyword extraction"""
+        from services.memory_manager import MemoryManager
+
+        service.model = FakeJSONModel("I'm having trouble thinking right now.")
+        monkeypatch.setattr(sys.modules["services.llm_service"], "llm_service", service)
+
+        extracted = MemoryManager()._llm_based_extraction("My name is Robin")
+
+        assert ("basic", "name", "Robin") in extracted
+        assert service.get_structured_output_stats()["memory_extraction"]["failed"] == 1
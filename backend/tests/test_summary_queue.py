@@ -0,0 +1,236 @@
+"""
+Tests for Summary Queue
+Tests background summarization ordering, idle detection, skipping and jobs
+"""
+
+import time
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.database import Base
+from models.user import User
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.conversation import Conversation, Message
+from services.summary_queue import (
+    SummaryQueue,
+    PRIORITY_FLAGGED,
+    PRIORITY_NORMAL,
+)
+from utils.config import settings
+
+
+@pytest.fixture
+def session_factory():
+    """Create an in-memory database"""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def test_db(session_factory):
+    """Create test database with a user and four conversations"""
+    db = session_factory()
+    db.add(User(id=1, name="Test Child", age=10, created_at=datetime.now()))
+    now = datetime.now()
+    for conv_id in range(1, 5):
+        db.add(Conversation(
+            id=conv_id, user_id=1, timestamp=now - timedelta(days=5 - conv_id), message_count=2,
+        ))
+        db.add(Message(conversation_id=conv_id, role="user", content=f"I love chess {conv_id}",
+                       timestamp=now))
+        db.add(Message(conversation_id=conv_id, role="assistant", content="Me too!",
+                       timestamp=now))
+    db.commit()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def queue(session_factory):
+    """Summary queue bound to the test database"""
+    return SummaryQueue(session_factory=session_factory, idle_seconds=0)
+
+
+@pytest.fixture
+def mock_summary():
+    """Stub LLM summary generation that records call order"""
+    calls = []
+
+    def generate_summary(conversation_id, db):
+        calls.append(conversation_id)
+        conversation = db.get(Conversation, conversation_id)
+        conversation.conversation_summary = f"Summary {conversation_id}"
+        db.commit()
+        return {"summary": f"Summary {conversation_id}", "topics": [], "mood": "happy"}
+
+    with patch("services.summary_queue.conversation_summary_service.generate_summary",
+               side_effect=generate_summary):
+        yield calls
+
+
+def drain(queue):
+    """Process until the queue is empty"""
+    while queue.process_next() is not None:
+        pass
+
+
+class TestOrdering:
+    """Test priority ordering"""
+
+    def test_requested_then_flagged_then_newest(self, queue, test_db, mock_summary):
+        """Test parent-viewed and flagged conversations go before newer normal ones"""
+        for conv_id in (1, 2, 3, 4):
+            conversation = test_db.get(Conversation, conv_id)
+            queue.enqueue(conv_id, PRIORITY_NORMAL, timestamp=conversation.timestamp)
+        queue.enqueue(1, PRIORITY_FLAGGED)
+        queue.prioritize([2])
+
+        drain(queue)
+
+        assert mock_summary == [2, 1, 4, 3]
+
+    def test_requeue_keeps_higher_priority(self, queue, test_db, mock_summary):
+        """Test enqueueing at a lower priority doesn't demote a conversation"""
+        queue.enqueue(1, PRIORITY_FLAGGED)
+        queue.enqueue(2, PRIORITY_NORMAL)
+        queue.enqueue(1, PRIORITY_NORMAL)
+
+        drain(queue)
+
+        assert mock_summary == [1, 2]
+
+
+class TestSkipping:
+    """Test already-summarized conversations are skipped"""
+
+    def test_existing_summary_skipped(self, queue, test_db, mock_summary):
+        """Test a conversation with a summary isn't summarized again"""
+        test_db.get(Conversation, 1).conversation_summary = "Already done"
+        test_db.commit()
+
+        queue.enqueue(1)
+        drain(queue)
+
+        assert mock_summary == []
+        assert queue.stats["skipped"] == 1
+
+    def test_force_regenerates(self, queue, test_db, mock_summary):
+        """Test force=True regenerates an existing summary"""
+        test_db.get(Conversation, 1).conversation_summary = "Already done"
+        test_db.commit()
+
+        queue.enqueue(1, force=True)
+        drain(queue)
+
+        assert mock_summary == [1]
+
+    def test_llm_failure_uses_keyword_fallback(self, queue, test_db):
+        """Test a failed LLM summary falls back to a keyword summary"""
+        with patch("services.summary_queue.conversation_summary_service.generate_summary",
+                   side_effect=Exception("LLM service unavailable")), \
+             patch("services.summary_queue.memory_manager.extract_keywords",
+                   return_value=["chess"]):
+            queue.enqueue(1)
+            drain(queue)
+
+        test_db.expire_all()
+        assert test_db.get(Conversation, 1).conversation_summary == "Discussed: chess"
+        assert queue.stats["fallback"] == 1
+
+    def test_backfill_queues_unsummarized(self, queue, test_db):
+        """Test start-up backfill only picks ended conversations without a summary"""
+        test_db.get(Conversation, 1).conversation_summary = "Already done"
+        test_db.commit()
+
+        # 4 is the child's latest conversation and may still be in progress
+        assert queue.backfill() == 2
+        assert sorted(queue._queued) == [2, 3]
+
+        test_db.get(Conversation, 4).duration_seconds = 120  # Ended
+        test_db.commit()
+        assert queue.backfill() == 3
+
+    def test_no_backfill_without_auto_summaries(self, queue, test_db, monkeypatch):
+        """Test start-up doesn't queue anything when automatic summaries are off"""
+        monkeypatch.setattr(settings, "AUTO_GENERATE_SUMMARIES", False)
+
+        with patch.object(queue, "backfill") as backfill:
+            queue.start()
+        queue.stop()
+
+        backfill.assert_not_called()
+
+
+class TestJobs:
+    """Test batch jobs and progress polling"""
+
+    def test_job_progress(self, queue, test_db, mock_summary):
+        """Test job counts update as conversations are processed"""
+        test_db.get(Conversation, 3).conversation_summary = "Already done"
+        test_db.commit()
+
+        job = queue.submit_job([1, 2, 3])
+        assert job["status"] == "queued"
+        assert job["total"] == 3
+
+        queue.process_next()
+        progress = queue.get_job(job["job_id"])
+        assert progress["status"] == "running"
+        assert progress["completed"] == 1
+
+        drain(queue)
+        progress = queue.get_job(job["job_id"])
+        assert progress["status"] == "completed"
+        assert progress["summarized"] == 2
+        assert progress["skipped"] == 1
+        assert progress["results"][1]["summary"] == "Summary 1"
+
+    def test_unknown_job(self, queue):
+        """Test polling an unknown job returns None"""
+        assert queue.get_job("missing") is None
+
+
+class TestIdle:
+    """Test idle detection"""
+
+    def test_not_idle_while_chat_generating(self, queue):
+        """Test the queue waits while a chat generation is running"""
+        with patch("services.summary_queue.llm_service") as mock_llm:
+            mock_llm.is_generating = True
+            assert queue.is_idle() is False
+
+    def test_not_idle_right_after_chat(self, queue):
+        """Test the queue waits for the idle threshold after chat generation"""
+        queue.idle_seconds = 60
+        with patch("services.summary_queue.llm_service") as mock_llm:
+            mock_llm.is_generating = False
+            mock_llm.last_generation_end = time.monotonic()
+            assert queue.is_idle() is False
+
+            # Only the queue's own generations since then
+            queue._last_own_generation_end = time.monotonic()
+            assert queue.is_idle() is True
+
+    def test_worker_processes_in_background(self, queue, test_db, mock_summary):
+        """Test the worker thread summarizes queued conversations"""
+        with patch.object(queue, "backfill", return_value=0):
+            queue.start()
+        try:
+            queue.enqueue(1)
+            deadline = time.monotonic() + 5
+            while not mock_summary and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            queue.stop()
+
+        assert mock_summary == [1]
@@ -6,7 +6,13 @@ Comprehensive test coverage for template personalization with user data
 import pytest
 from unittest.mock import Mock, MagicMock
 import json
+import random
+import re
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
 
+from database.database import Base
 from services.template_personalization_service import (
     TemplatePersonalizationService,
     template_personalization_service,
@@ -14,8 +20,22 @@ from services.template_personalization_service import (
     get_placeholder_requirements,
     can_fill_template,
     get_stats,
+    compile_template,
+    user_profile_cache,
 )
+from models.level_up_event import LevelUpEvent  # Import to resolve SQLAlchemy relationship
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.personality import BotPersonality
 from models.safety import AdviceTemplate
+from models.user import User
+
+
+def mock_session():
+    """Mock database session without pending writes"""
+    db = Mock()
+    db.info = {}
+    db.new = db.dirty = db.deleted = ()
+    return db
 
 
 class TestTemplatePersonalizationServiceInitialization:
@@ -38,7 +58,7 @@ class TestUserContextExtraction:
     def setup_method(self):
         """Set up test fixtures"""
         self.service = TemplatePersonalizationService()
-        self.mock_db = Mock()
+        self.mock_db = mock_session()
 
     def test_extract_user_context_with_user(self):
         """Test extracting context when user exists"""
@@ -145,7 +165,7 @@ class TestPersonalizeTemplate:
     def setup_method(self):
         """Set up test fixtures"""
         self.service = TemplatePersonalizationService()
-        self.mock_db = Mock()
+        self.mock_db = mock_session()
 
         # Create mock template
         self.mock_template = Mock(spec=AdviceTemplate)
@@ -376,7 +396,7 @@ class TestConvenienceFunctions:
 
     def setup_method(self):
         """Set up test fixtures"""
-        self.mock_db = Mock()
+        self.mock_db = mock_session()
         self.mock_template = Mock(spec=AdviceTemplate)
         self.mock_template.id = 1
         self.mock_template.template = "Hi {name}!"
@@ -430,7 +450,7 @@ class TestEdgeCases:
     def setup_method(self):
         """Set up test fixtures"""
         self.service = TemplatePersonalizationService()
-        self.mock_db = Mock()
+        self.mock_db = mock_session()
 
     def test_extract_friend_names_filters_non_names(self):
         """Test that common non-name words are filtered"""
@@ -505,7 +525,7 @@ class TestRealWorldScenarios:
     def setup_method(self):
         """Set up test fixtures"""
         self.service = TemplatePersonalizationService()
-        self.mock_db = Mock()
+        self.mock_db = mock_session()
 
     def test_friendship_advice_personalization(self):
         """Test personalization for friendship advice"""
@@ -576,3 +596,176 @@ class TestRealWorldScenarios:
 
         assert "Sam" in result
         assert "fractions" in result or "topic" not in result.lower()
+
+
+class TestCompiledTemplates:
+    """Test compiled template rendering"""
+
+    def setup_method(self):
+        """Set up test fixtures"""
+        self.service = TemplatePersonalizationService()
+
+    def test_compile_splits_literals_and_slots(self):
+        """Test templates compile into literal text and placeholder slots"""
+        compiled = compile_template("Hi {name}! {{Braces}} and {name} again")
+
+        assert compiled.placeholders == ("name",)
+        assert [name for _, name, _ in compiled.segments] == ["name", "name", None]
+        assert self.service._render(compiled, {"name": "Alex"}) == "Hi Alex! {Braces} and Alex again"
+
+    def test_known_placeholders_filled_when_others_missing(self):
+        """Test one missing placeholder does not leave the others unfilled"""
+        compiled = compile_template("Hi {name}, how is {friend_name} doing with {hobby}?")
+
+        result = self.service._render(compiled, {"name": "Alex"})
+
+        assert result == "Hi Alex, how is your friend doing?"
+
+    def test_removal_cleans_grammar(self):
+        """Test placeholders without a value or default are removed with their conjunction"""
+        compiled = compile_template("Try {hobby} and reading. Ask with {helper} , maybe.")
+
+        assert self.service._render(compiled, {}) == "Try reading. Ask, maybe."
+
+    def test_malformed_template_kept_as_text(self):
+        """Test unbalanced braces render the text unchanged"""
+        compiled = compile_template("Hi {name")
+        assert self.service._render(compiled, {"name": "Alex"}) == "Hi {name"
+
+
+def old_message_fields(message):
+    """Message fields as extracted before the combined pass (one re.findall per pattern)"""
+    names = []
+    for pattern in (
+        r"(?:my friend|with|and)\s+([A-Z][a-z]+)",
+        r"(?:named|called)\s+([A-Z][a-z]+)",
+        r"([A-Z][a-z]+)\s+(?:is|was|said|told)",
+    ):
+        names.extend(re.findall(pattern, message))
+    names = [n for n in names if n not in {"He", "She", "They", "My", "The", "This", "That", "We", "I"}]
+
+    activities = []
+    for pattern in (
+        r"(?:playing|doing|practicing|studying|watching|reading|making)\s+(\w+)",
+        r"(?:play|do|practice|study|watch|read|make)\s+(\w+)",
+    ):
+        activities.extend(re.findall(pattern, message.lower()))
+    activities = [a for a in activities if a not in {"the", "a", "an", "my", "your", "about", "with", "for", "to", "on"}]
+
+    topics = []
+    for pattern in (
+        r"about\s+(\w+)",
+        r"(?:homework|test|project|assignment|essay)(?:\s+in|\s+for)?\s+(\w+)",
+    ):
+        topics.extend(re.findall(pattern, message.lower()))
+    topics = [t for t in topics if t not in {"the", "a", "an", "my", "your", "this", "that", "it"} and len(t) > 2]
+
+    situation = None
+    match = re.search(r"(?:problem with|trouble with|issue with)\s+(.+?)(?:\.|$|\?)", message.lower())
+    if match and 5 < len(match.group(1).strip()) < 50:
+        situation = match.group(1).strip()
+
+    return {
+        "friend_names": list(dict.fromkeys(names))[:2],
+        "activities": activities[:2],
+        "topics": topics[:2],
+        "situation": situation,
+    }
+
+
+class TestMessageScan:
+    """Test the combined message extraction pass"""
+
+    def setup_method(self):
+        """Set up test fixtures"""
+        self.service = TemplatePersonalizationService()
+
+    def test_keywords_do_not_hide_each_other(self):
+        """Test a captured word can still start another match"""
+        fields = self.service._scan_message("I was playing with Sam and Jo today")
+
+        assert fields["friend_names"] == ["Sam", "Jo"]
+        assert fields["activities"] == []  # "with" is a stopword
+
+    def test_all_fields_from_one_message(self):
+        """Test names, activities, topics and situation come from one scan"""
+        fields = self.service._scan_message(
+            "Jordan said my homework in science is hard. I have trouble with fractions"
+        )
+
+        assert fields["friend_names"] == ["Jordan"]
+        assert fields["topics"] == ["science"]
+        assert fields["situation"] == "fractions"
+
+    def test_name_keywords_are_case_sensitive(self):
+        """Test friend-name keywords only match as written in lowercase"""
+        assert self.service._extract_friend_names("With Sam today") == []
+        assert self.service._extract_friend_names("with Sam today") == ["Sam"]
+
+    @pytest.mark.parametrize("message, field, expected", [
+        ("Big issue with Sam", "friend_names", ["Sam", "Big"]),
+        ("Sam issued a warning", "friend_names", ["Sam"]),
+        ("do do island", "activities", ["do"]),
+        ("homework test playing", "topics", ["test"]),
+    ])
+    def test_keywords_inside_words_and_captures(self, message, field, expected):
+        """Test keywords inside longer words and captured words match as the old patterns did"""
+        assert self.service._scan_message(message)[field] == expected
+
+    def test_same_fields_as_old_patterns(self):
+        """Test generated messages give the same fields as the old per-pattern extraction"""
+        words = [
+            "Sam", "Big", "Jo", "The", "I", "my friend", "with", "and", "named", "called",
+            "is", "was", "said", "told", "issue", "issued", "island", "do", "doing", "play",
+            "playing", "reading", "read", "about", "homework", "test", "testing", "in", "for",
+            "math", "problem", "trouble", "a", "the", "it", "soccer", "Ünal", ".", "?",
+        ]
+        rng = random.Random(0)
+
+        for _ in range(3000):
+            message = " ".join(rng.choice(words) for _ in range(rng.randint(1, 10)))
+            assert self.service._scan_message(message) == old_message_fields(message), message
+
+
+class TestUserProfileCache:
+    """Test cached user context"""
+
+    @pytest.fixture
+    def session_factory(self):
+        """Session factory bound to a fresh in-memory database with one user"""
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        factory = sessionmaker(bind=engine)
+        db = factory()
+        db.add(User(id=1, name="Alex", age=10, created_at=datetime.now()))
+        personality = BotPersonality(user_id=1, name="Buddy")
+        personality.set_interests(["chess"])
+        db.add(personality)
+        db.commit()
+        db.close()
+        return factory
+
+    def test_second_personalization_skips_database(self, session_factory):
+        """Test user context is served from the cache after the first load"""
+        statements = []
+        event.listen(session_factory.kw["bind"], "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        template = AdviceTemplate(id=1, template="Hi {name}! Want to play {interest}?")
+        service = TemplatePersonalizationService()
+
+        service.personalize_template(template, session_factory(), user_id=1)
+        statements.clear()
+        result = service.personalize_template(template, session_factory(), user_id=1)
+
+        assert result == "Hi Alex! Want to play chess?"
+        assert statements == []
+
+    def test_commit_refreshes_profile(self, session_factory):
+        """Test a committed name change is used on the next personalization"""
+        assert user_profile_cache.get(session_factory(), 1)["name"] == "Alex"
+
+        db = session_factory()
+        db.query(User).filter(User.id == 1).first().name = "Sam"
+        db.commit()
+
+        assert user_profile_cache.get(session_factory(), 1)["name"] == "Sam"
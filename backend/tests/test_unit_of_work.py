@@ -0,0 +1,139 @@
+"""
+Tests for Chat Turn Unit of Work
+Tests that a chat turn commits once and stores nothing if it fails
+"""
+
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, commit_or_stage, in_unit_of_work, unit_of_work
+from models.user import User
+from models.level_up_event import LevelUpEvent
+from models.personality_drift import PersonalityDrift  # Import to resolve SQLAlchemy relationship
+from models.personality import BotPersonality
+from models.conversation import Conversation, Message
+from models.memory import UserProfile
+from services.conversation_manager import ConversationManager
+from services.inference_scheduler import InferenceCancelled, InferenceRequest
+from services.quirk_engine import quirk_seed
+
+
+@pytest.fixture
+def db_engine():
+    """Create an in-memory database engine"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def test_db(db_engine):
+    """Create test database with a user, personality and conversation"""
+    db = sessionmaker(bind=db_engine, autoflush=False)()
+    db.add(User(id=1, name="Test Child", age=10, created_at=datetime.now()))
+    db.add(BotPersonality(user_id=1, name="Buddy", friendship_points=0, friendship_level=1))
+    db.add(Conversation(id=1, user_id=1, timestamp=datetime.now(), message_count=0))
+    db.commit()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def commit_counter(db_engine):
+    """Count transactions committed on the engine"""
+    commits = []
+    event.listen(db_engine, "commit", lambda conn: commits.append(1))
+    return commits
+
+
+@pytest.fixture
+def manager():
+    """ConversationManager with the LLM unavailable (fallback responses)"""
+    with patch("services.conversation_manager.llm_service.ensure_loaded", return_value=False), \
+         patch("services.memory_manager.memory_manager.use_llm_extraction", False):
+        yield ConversationManager()
+
+
+class TestUnitOfWork:
+    """Test the unit_of_work helpers"""
+
+    def test_commit_or_stage_outside_unit_of_work(self, test_db, commit_counter):
+        """Test services still commit immediately outside a unit of work"""
+        test_db.add(Message(conversation_id=1, role="user", content="hi", timestamp=datetime.now()))
+
+        assert commit_or_stage(test_db) is True
+        assert len(commit_counter) == 1
+
+    def test_nested_unit_of_work_commits_once(self, test_db, commit_counter):
+        """Test nested blocks join the outer transaction"""
+        with unit_of_work(test_db):
+            with unit_of_work(test_db):
+                test_db.add(Message(conversation_id=1, role="user", content="hi",
+                                    timestamp=datetime.now()))
+                assert commit_or_stage(test_db) is False
+            assert len(commit_counter) == 0
+
+        assert len(commit_counter) == 1
+        assert not in_unit_of_work(test_db)
+
+
+class TestChatTurn:
+    """Test process_message runs as one unit of work"""
+
+    def test_turn_commits_once(self, manager, test_db, commit_counter):
+        """Test a turn with points, activities and memories commits once"""
+        manager.process_message(
+            "Thanks! My favorite color is blue and I feel happy haha", 1, 1, test_db
+        )
+
+        assert len(commit_counter) == 1
+        assert test_db.query(Message).count() == 2
+        assert test_db.query(UserProfile).count() >= 1
+        assert test_db.get(BotPersonality, 1).friendship_points > 0
+        assert test_db.get(Conversation, 1).message_count == 1
+
+    def test_failed_turn_stores_nothing(self, manager, test_db, commit_counter):
+        """Test a turn that fails after staging writes is rolled back"""
+        with patch.object(manager, "_apply_personality_filter",
+                          side_effect=RuntimeError("filter crashed")):
+            with pytest.raises(RuntimeError):
+                manager.process_message("Thanks! I feel happy", 1, 1, test_db)
+
+        assert len(commit_counter) == 0
+        assert test_db.query(Message).count() == 0
+        assert test_db.get(BotPersonality, 1).friendship_points == 0
+
+    def test_cancelled_turn_not_counted(self, manager, test_db):
+        """Test a turn rolled back by a disconnect leaves the message count and quirk seed alone"""
+        request = InferenceRequest()
+        request.cancel()
+        seeds = []
+
+        def apply_filter(response, personality, message, seed):
+            seeds.append(seed)
+            return response
+
+        with patch("services.conversation_manager.llm_service.ensure_loaded", return_value=True), \
+             patch("services.conversation_manager.llm_service.generate", side_effect=InferenceCancelled("gone")):
+            with pytest.raises(InferenceCancelled):
+                manager.process_message("Hello", 1, 1, test_db, request=request)
+
+        with patch.object(manager, "_apply_personality_filter", side_effect=apply_filter):
+            manager.process_message("Hello again", 1, 1, test_db)
+            manager.process_message("And again", 1, 1, test_db)
+
+        assert test_db.get(Conversation, 1).message_count == 2
+        assert seeds == [quirk_seed(1, 1), quirk_seed(1, 2)]
+
+    def test_level_up_event_saved_with_turn(self, manager, test_db):
+        """Test a level-up during the turn is committed with it"""
+        test_db.get(BotPersonality, 1).friendship_points = 99
+        test_db.commit()
+
+        manager.process_message("Thank you so much!", 1, 1, test_db)
+
+        assert test_db.query(LevelUpEvent).count() == 1
+        assert test_db.get(BotPersonality, 1).friendship_level == 2
@@ -4,37 +4,85 @@ Provides caching mechanisms for expensive operations like LLM generation
 """
 
 import hashlib
+import heapq
+import itertools
 import json
 import logging
+import sqlite3
+import sys
+import threading
 import time
-from typing import Optional, Dict, Any, Callable
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, Hashable, List, Tuple
 from functools import wraps
 from collections import OrderedDict
 
 logger = logging.getLogger("chatbot.cache")
 
 
+class _Entry:
+    """One TTLCache entry"""
+
+    __slots__ = ("value", "expires_at", "created_at", "size")
+
+    def __init__(self, value: Any, expires_at: float, created_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.created_at = created_at
+        self.size = size
+
+
+def _value_size(value: Any) -> int:
+    """Approximate size of a cached value in bytes"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
 class TTLCache:
     """
     Time-To-Live Cache - stores items with expiration times
-    Thread-safe cache with automatic cleanup of expired entries
+    Thread-safe (one lock around every operation), least recently used
+    entries are evicted when full
+
+    Expiry times are kept in a min-heap, so cleanup_expired only touches
+    the entries that expired instead of scanning the whole cache.
     """
 
-    def __init__(self, default_ttl: int = 300, max_size: int = 1000):
+    def __init__(
+        self,
+        default_ttl: int = 300,
+        max_size: int = 1000,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = _value_size,
+    ):
         """
         Initialize TTL cache
 
         Args:
             default_ttl: Default time-to-live in seconds (default: 5 minutes)
             max_size: Maximum number of items to cache (default: 1000)
+            max_bytes: Maximum total size of the values in bytes (None = no limit)
+            sizeof: Function that sizes a value for max_bytes
         """
         self.default_ttl = default_ttl
         self.max_size = max_size
-        self._cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._cache: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._expiry: List[Tuple[float, int, Hashable]] = []  # (expires_at, seq, key) min-heap
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._bytes = 0
         self._hits = 0
         self._misses = 0
 
-    def get(self, key: str) -> Optional[Any]:
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key: Hashable) -> Optional[Any]:
         """
         Get value from cache if not expired
 
@@ -44,27 +92,25 @@ class TTLCache:
         Returns:
             Cached value if exists and not expired, None otherwise
         """
-        if key not in self._cache:
-            self._misses += 1
-            return None
-
-        entry = self._cache[key]
-
-        # Check if expired
-        if time.time() > entry['expires_at']:
-            # Remove expired entry
-            del self._cache[key]
-            self._misses += 1
-            logger.debug(f"Cache MISS (expired): {key[:50]}...")
-            return None
-
-        # Move to end (LRU)
-        self._cache.move_to_end(key)
-        self._hits += 1
-        logger.debug(f"Cache HIT: {key[:50]}...")
-        return entry['value']
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            # Check if expired
+            if time.time() > entry.expires_at:
+                self._remove(key)
+                self._misses += 1
+                logger.debug(f"Cache MISS (expired): {str(key)[:50]}...")
+                return None
+
+            # Move to end (LRU)
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return entry.value
 
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None) -> None:
         """
         Set value in cache with TTL
 
@@ -76,20 +122,47 @@ class TTLCache:
         if ttl is None:
             ttl = self.default_ttl
 
-        # Evict oldest if at max size
-        if len(self._cache) >= self.max_size:
-            oldest_key = next(iter(self._cache))
-            del self._cache[oldest_key]
-            logger.debug(f"Cache eviction (max size): {oldest_key[:50]}...")
-
-        self._cache[key] = {
-            'value': value,
-            'expires_at': time.time() + ttl,
-            'created_at': time.time(),
-        }
-        logger.debug(f"Cache SET: {key[:50]}... (TTL: {ttl}s)")
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.debug(f"Cache SKIP (value larger than max_bytes): {str(key)[:50]}...")
+            self.delete(key)  # Don't keep serving an older value
+            return
 
-    def delete(self, key: str) -> bool:
+        now = time.time()
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+
+            # Evict least recently used while at max size or over max_bytes
+            while self._cache and (
+                len(self._cache) >= self.max_size
+                or (self.max_bytes is not None and self._bytes + size > self.max_bytes)
+            ):
+                oldest_key = next(iter(self._cache))
+                self._remove(oldest_key)
+                logger.debug(f"Cache eviction (max size): {str(oldest_key)[:50]}...")
+
+            entry = _Entry(value, now + ttl, now, size)
+            self._cache[key] = entry
+            self._bytes += size
+            heapq.heappush(self._expiry, (entry.expires_at, next(self._seq), key))
+            self._compact_expiry()
+
+    def _remove(self, key: Hashable) -> None:
+        """Remove an entry (caller holds the lock; its heap item goes stale)"""
+        entry = self._cache.pop(key)
+        self._bytes -= entry.size
+
+    def _compact_expiry(self) -> None:
+        """Rebuild the expiry heap once stale items (from overwrites and evictions) dominate"""
+        if len(self._expiry) > 2 * len(self._cache) + 64:
+            self._expiry = [
+                item for item in self._expiry
+                if (entry := self._cache.get(item[2])) is not None and entry.expires_at == item[0]
+            ]
+            heapq.heapify(self._expiry)
+
+    def delete(self, key: Hashable) -> bool:
         """
         Delete entry from cache
 
@@ -99,39 +172,48 @@ class TTLCache:
         Returns:
             True if deleted, False if not found
         """
-        if key in self._cache:
-            del self._cache[key]
-            logger.debug(f"Cache DELETE: {key[:50]}...")
-            return True
-        return False
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+                logger.debug(f"Cache DELETE: {str(key)[:50]}...")
+                return True
+            return False
 
     def clear(self) -> None:
         """Clear all cache entries"""
-        self._cache.clear()
-        self._hits = 0
-        self._misses = 0
+        with self._lock:
+            self._cache.clear()
+            self._expiry.clear()
+            self._bytes = 0
+            self._hits = 0
+            self._misses = 0
         logger.info("Cache cleared")
 
     def cleanup_expired(self) -> int:
         """
         Remove all expired entries
 
+        Pops expired items off the expiry heap, so the cost is proportional
+        to the number of expired (and stale) items, not the cache size.
+
         Returns:
             Number of entries removed
         """
-        current_time = time.time()
-        expired_keys = [
-            key for key, entry in self._cache.items()
-            if current_time > entry['expires_at']
-        ]
-
-        for key in expired_keys:
-            del self._cache[key]
-
-        if expired_keys:
-            logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
-
-        return len(expired_keys)
+        removed = 0
+        now = time.time()
+        with self._lock:
+            while self._expiry and self._expiry[0][0] < now:
+                expires_at, _, key = heapq.heappop(self._expiry)
+                entry = self._cache.get(key)
+                # Skip items for entries that were overwritten or evicted since
+                if entry is not None and entry.expires_at == expires_at:
+                    self._remove(key)
+                    removed += 1
+
+        if removed:
+            logger.debug(f"Cleaned up {removed} expired cache entries")
+
+        return removed
 
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -140,17 +222,20 @@ class TTLCache:
         Returns:
             Dictionary with cache stats
         """
-        total_requests = self._hits + self._misses
-        hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
-
-        return {
-            'size': len(self._cache),
-            'max_size': self.max_size,
-            'hits': self._hits,
-            'misses': self._misses,
-            'hit_rate': f"{hit_rate:.1f}%",
-            'total_requests': total_requests,
-        }
+        with self._lock:
+            total_requests = self._hits + self._misses
+            hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
+
+            return {
+                'size': len(self._cache),
+                'max_size': self.max_size,
+                'bytes': self._bytes if self.max_bytes is not None else None,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': f"{hit_rate:.1f}%",
+                'total_requests': total_requests,
+            }
 
 
 class LRUCache:
@@ -192,10 +277,240 @@ class LRUCache:
         self._cache.clear()
 
 
+class PersistentCache:
+    """
+    On-disk cache of string values in a SQLite file
+    Survives restarts; entries expire after a TTL and the least recently
+    used are evicted when the total size passes max_mb
+
+    The file is opened on first use. Storage errors are logged and treated
+    as misses, so a broken cache file never fails the caller.
+    """
+
+    # Evict down to this share of max_mb, so eviction doesn't run on every set
+    EVICT_TO = 0.9
+
+    def __init__(self, path: str, default_ttl: int = 604800, max_mb: float = 50.0):
+        """
+        Initialize persistent cache
+
+        Args:
+            path: SQLite file (created with its directory if missing)
+            default_ttl: Default time-to-live in seconds (default: 7 days)
+            max_mb: Maximum total size of the cached values in megabytes
+        """
+        self.path = Path(path)
+        self.default_ttl = default_ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the cache file and create the table (caller holds the lock)"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_last_used ON entries (last_used)")
+            conn.commit()
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get value from cache if not expired
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value if exists and not expired, None otherwise
+        """
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, size, expires_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row is None:
+                    self._misses += 1
+                    return None
+
+                value, size, expires_at = row
+                now = time.time()
+                if now > expires_at:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    conn.commit()
+                    self._total_bytes -= size
+                    self._misses += 1
+                    return None
+
+                conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self._hits += 1
+                logger.debug(f"Persistent cache HIT: {key[:50]}...")
+                return value
+
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent cache read failed: {e}")
+                self._misses += 1
+                return None
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        """
+        Set value in cache with TTL, evicting least recently used entries if full
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Time-to-live in seconds (uses default if None)
+        """
+        if ttl is None:
+            ttl = self.default_ttl
+
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, expires_at, last_used)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now + ttl, now),
+                )
+                self._total_bytes += size - (old[0] if old else 0)
+
+                if self._total_bytes > self.max_bytes:
+                    self._evict(conn)
+                conn.commit()
+
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete least recently used entries until under EVICT_TO of the limit (caller holds the lock)"""
+        target = self.max_bytes * self.EVICT_TO
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if self._total_bytes <= target:
+                break
+            keys.append((key,))
+            self._total_bytes -= size
+
+        conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+        self._evictions += len(keys)
+        logger.debug(f"Persistent cache eviction (max size): {len(keys)} entries")
+
+    def cleanup_expired(self) -> int:
+        """
+        Remove all expired entries
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            if self._conn is None:
+                return 0  # Not opened yet, nothing loaded
+            try:
+                now = time.time()
+                freed = self._conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries WHERE expires_at < ?", (now,)
+                ).fetchone()[0]
+                removed = self._conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,)).rowcount
+                self._conn.commit()
+                self._total_bytes -= freed
+                return removed
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent cache cleanup failed: {e}")
+                return 0
+
+    def clear(self) -> None:
+        """Clear all cache entries"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM entries")
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent cache clear failed: {e}")
+            self._total_bytes = 0
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+        logger.info("Persistent cache cleared")
+
+    def close(self) -> None:
+        """Close the cache file (it is reopened on next use)"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with cache stats
+        """
+        with self._lock:
+            size = None
+            if self._conn is not None:
+                try:
+                    size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            total_requests = self._hits + self._misses
+            hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
+
+            return {
+                'path': str(self.path),
+                'size': size,
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': f"{hit_rate:.1f}%",
+                'total_requests': total_requests,
+            }
+
+
+# Argument types whose repr() is exact and stable across processes
+_PLAIN_TYPES = frozenset({str, int, float, bool, bytes, type(None)})
+
+
+def _plain_args(args: tuple, kwargs: Dict[str, Any]) -> bool:
+    """Check whether every argument is of a plain scalar type (subclasses excluded)"""
+    return all(type(arg) in _PLAIN_TYPES for arg in args) and all(
+        type(value) in _PLAIN_TYPES for value in kwargs.values()
+    )
+
+
 def generate_cache_key(*args, **kwargs) -> str:
     """
     Generate a cache key from function arguments
 
+    Plain scalar arguments (str, int, float, bool, bytes, None) are hashed
+    from their repr, which skips the JSON encoding; anything else goes
+    through json.dumps. Keys are stable across processes either way.
+
     Args:
         *args: Positional arguments
         **kwargs: Keyword arguments
@@ -203,6 +518,10 @@ def generate_cache_key(*args, **kwargs) -> str:
     Returns:
         Hash string for use as cache key
     """
+    if _plain_args(args, kwargs):
+        key_str = repr((args, sorted(kwargs.items())))
+        return hashlib.sha256(key_str.encode()).hexdigest()
+
     # Create stable representation of arguments
     key_dict = {
         'args': args,
@@ -229,10 +548,24 @@ def cached(ttl: int = 300, cache_instance: Optional[TTLCache] = None):
         cache_instance = TTLCache(default_ttl=ttl)
 
     def decorator(func: Callable) -> Callable:
+        def make_key(*args, **kwargs) -> Hashable:
+            if _plain_args(args, kwargs):
+                # Hashable arguments key the cache directly; types are part of
+                # the key so f(1), f(1.0) and f(True) stay separate
+                items = tuple(sorted(kwargs.items()))
+                return (
+                    func.__qualname__,
+                    args,
+                    tuple(map(type, args)),
+                    items,
+                    tuple(type(value) for _, value in items),
+                )
+            return f"{func.__name__}:{generate_cache_key(*args, **kwargs)}"
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Generate cache key
-            cache_key = f"{func.__name__}:{generate_cache_key(*args, **kwargs)}"
+            cache_key = make_key(*args, **kwargs)
 
             # Try to get from cache
             cached_result = cache_instance.get(cache_key)
@@ -247,7 +580,7 @@ def cached(ttl: int = 300, cache_instance: Optional[TTLCache] = None):
 
         # Expose cache for manual control
         wrapper._cache = cache_instance
-        wrapper._cache_key = lambda *args, **kwargs: f"{func.__name__}:{generate_cache_key(*args, **kwargs)}"
+        wrapper._cache_key = make_key
 
         return wrapper
 
@@ -19,6 +19,16 @@ class Settings(BaseSettings):
     # Database Configuration
     DATABASE_URL: str = "sqlite:///./data/chatbot.db"
 
+    # SQLite Tuning (applied to every connection)
+    SQLITE_PROFILE: str = "performance"  # "performance", "safe" or "default" (SQLite defaults)
+    SQLITE_JOURNAL_MODE: Optional[str] = None  # Overrides the profile, e.g. "WAL", "DELETE"
+    SQLITE_SYNCHRONOUS: Optional[str] = None  # e.g. "NORMAL", "FULL"
+    SQLITE_MMAP_SIZE: Optional[int] = None  # Bytes of the database file to memory-map
+    SQLITE_CACHE_SIZE: Optional[int] = None  # Pages if positive, KiB if negative
+    SQLITE_TEMP_STORE: Optional[str] = None  # "MEMORY", "FILE" or "DEFAULT"
+    SQLITE_BUSY_TIMEOUT_MS: Optional[int] = None  # Wait this long for locks instead of failing
+    SQLITE_MAINTENANCE_INTERVAL_SECONDS: int = 900  # WAL checkpoint + PRAGMA optimize
+
     # LLM Configuration
     MODEL_PATH: str = "./models/llama-3.2-3b-instruct.gguf"
     MODEL_CONTEXT_LENGTH: int = 2048
@@ -30,11 +40,28 @@ class Settings(BaseSettings):
     MODEL_USE_MMAP: bool = True  # Memory-mapped files for faster loading
     MODEL_LAZY_LOAD: bool = True  # Load on first request instead of blocking startup
     MODEL_BACKGROUND_LOAD: bool = True  # Load in background thread
+    MODEL_CONTEXTS: int = 0  # Parallel model contexts (0 = size from CPU cores and RAM)
+    MODEL_MAX_CONTEXTS: int = 4  # Upper bound when sizing automatically
+    MODEL_MIN_THREADS_PER_CONTEXT: int = 4  # CPU threads each context needs to be worth adding
+    MODEL_RAM_RESERVE_MB: int = 1024  # RAM left free when sizing the context pool
+    MODEL_OUT_OF_PROCESS: bool = False  # Run the model in a supervised worker process
+    MODEL_SPECULATIVE_DECODING: str = "off"  # "off" or "prompt_lookup" (drafts from n-grams in the prompt)
+    MODEL_DRAFT_TOKENS: int = 10  # Tokens drafted per decoding step
+    MODEL_DRAFT_NGRAM_SIZE: int = 2  # Longest prompt n-gram matched when drafting
+    MODEL_IDLE_UNLOAD_MINUTES: int = 30  # Unload after this long without chat (0 = keep loaded)
+    MODEL_MEMORY_PRESSURE_PERCENT: float = 90.0  # Unload while idle if system RAM use is above this (0 = off)
+    MODEL_LIFECYCLE_CHECK_SECONDS: int = 30  # How often the idle/memory policy runs
+    MODEL_REPLY_DEADLINE_SECONDS: float = 45.0  # Chat reply wall-clock limit, cut at a sentence (0 = none)
 
     # Response Caching
     ENABLE_RESPONSE_CACHE: bool = True  # Cache LLM responses for identical prompts
     CACHE_TTL_SECONDS: int = 3600  # Cache time-to-live (1 hour)
     CACHE_MAX_SIZE: int = 500  # Maximum cached responses
+    ENABLE_PERSISTENT_CACHE: bool = False  # Keep low-temperature responses on disk across restarts
+    PERSISTENT_CACHE_PATH: str = "./data/llm_cache.db"
+    PERSISTENT_CACHE_TTL_SECONDS: int = 604800  # 7 days
+    PERSISTENT_CACHE_MAX_MB: float = 50.0  # Least recently used entries are evicted above this
+    PERSISTENT_CACHE_MAX_TEMPERATURE: float = 0.3  # Only near-deterministic generations are persisted
 
     # Safety Configuration
     ENABLE_SAFETY_FILTER: bool = True
@@ -49,6 +76,13 @@ class Settings(BaseSettings):
     SMTP_FROM_EMAIL: Optional[str] = None
     SMTP_USE_TLS: bool = True
 
+    # Email Outbox (background delivery with retry)
+    EMAIL_OUTBOX_ENABLED: bool = True  # Queue emails in the outbox instead of sending inline
+    EMAIL_OUTBOX_BATCH_SIZE: int = 20  # Emails sent per SMTP connection
+    EMAIL_OUTBOX_POLL_SECONDS: int = 30  # How often the sender checks for due retries
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5  # Attempts before an email is marked failed
+    EMAIL_OUTBOX_DEDUP_WINDOW_SECONDS: int = 3600  # Identical emails within this window are sent once
+
     # Logging Configuration
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "./logs/chatbot.log"
@@ -56,7 +90,10 @@ class Settings(BaseSettings):
     # Feature Flags
     ENABLE_VECTOR_MEMORY: bool = False  # ChromaDB for semantic search
     ENABLE_WEEKLY_REPORTS: bool = True
-    AUTO_GENERATE_SUMMARIES: bool = True  # Auto-generate LLM summaries on conversation end
+    AUTO_GENERATE_SUMMARIES: bool = True  # Queue LLM summaries when a conversation ends
+    SUMMARY_IDLE_SECONDS: int = 5  # Chat must be quiet this long before background summaries run
+    REPORT_SCHEDULER_WORKERS: int = 2  # Worker threads for sending due reports
+    ADVICE_USAGE_FLUSH_SECONDS: int = 60  # How often buffered advice template usage counts are written
 
     # Memory Optimization
     MAX_CONVERSATION_HISTORY: int = 50  # Maximum messages to include in context
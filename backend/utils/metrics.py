@@ -0,0 +1,274 @@
+"""
+Latency Metrics
+In-process histograms and per-request stage spans, exported in Prometheus text format
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency buckets: from a keyword check to a slow CPU reply
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Histogram that every span is recorded in, labelled by stage
+STAGE_METRIC = "chatbot_stage_duration_seconds"
+STAGE_HELP = "Time spent in each stage of processing a chat message"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (thread-safe)
+    Keeps per-bucket counts, the sum and the count, like a Prometheus histogram
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize histogram
+
+        Args:
+            buckets: Sorted bucket upper bounds (+Inf is implied)
+        """
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Last one is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Record one observation
+
+        Args:
+            value: Observed value (seconds for latencies)
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """
+        Get the cumulative bucket counts, sum and count
+
+        Returns:
+            (cumulative counts per bucket ending with +Inf, sum, count)
+        """
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+
+        cumulative, running = [], 0
+        for bucket_count in counts:
+            running += bucket_count
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+class Trace:
+    """Stage timings of one request (stages that run more than once add up)"""
+
+    def __init__(self):
+        self.spans: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add time spent in a stage"""
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def as_ms(self) -> Dict[str, float]:
+        """Stage timings in milliseconds"""
+        return {stage: round(seconds * 1000, 2) for stage, seconds in self.spans.items()}
+
+
+class MetricsRegistry:
+    """
+    Metrics Registry - histograms and gauges rendered as Prometheus text
+
+    Histograms accumulate for the life of the process. Gauges hold the
+    last value set, so values owned by other services (tokens/s, cache hit
+    rates) are set right before rendering.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+        return tuple(sorted((labels or {}).items()))
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        labels: Optional[Dict[str, str]] = None,
+        help_text: str = "",
+    ) -> None:
+        """
+        Record an observation in a histogram (created on first use)
+
+        Args:
+            name: Metric name
+            value: Observed value
+            labels: Label names and values
+            help_text: Description for the HELP line
+        """
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+                if help_text:
+                    self._help.setdefault(name, help_text)
+        histogram.observe(value)
+
+    def set_gauge(
+        self,
+        name: str,
+        value: float,
+        labels: Optional[Dict[str, str]] = None,
+        help_text: str = "",
+    ) -> None:
+        """
+        Set a gauge to a value
+
+        Args:
+            name: Metric name
+            value: Current value
+            labels: Label names and values
+            help_text: Description for the HELP line
+        """
+        with self._lock:
+            self._gauges.setdefault(name, {})[self._labels(labels)] = float(value)
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def get_histogram(self, name: str, labels: Optional[Dict[str, str]] = None) -> Optional[Histogram]:
+        """Get a histogram series, or None if nothing was observed"""
+        with self._lock:
+            return self._histograms.get(name, {}).get(self._labels(labels))
+
+    def reset(self) -> None:
+        """Drop all metrics"""
+        with self._lock:
+            self._histograms.clear()
+            self._gauges.clear()
+            self._help.clear()
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format
+
+        Returns:
+            Metrics text (version 0.0.4)
+        """
+        with self._lock:
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+            gauges = {name: dict(series) for name, series in self._gauges.items()}
+            help_texts = dict(self._help)
+
+        lines = []
+        for name in sorted(histograms):
+            self._header(lines, name, "histogram", help_texts)
+            for labels, histogram in sorted(histograms[name].items()):
+                cumulative, total, count = histogram.snapshot()
+                bounds = [_format_value(bound) for bound in histogram.buckets] + ["+Inf"]
+                for bound, bucket_count in zip(bounds, cumulative):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {bucket_count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for name in sorted(gauges):
+            self._header(lines, name, "gauge", help_texts)
+            for labels, value in sorted(gauges[name].items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _header(lines: List[str], name: str, metric_type: str, help_texts: Dict[str, str]) -> None:
+        if name in help_texts:
+            lines.append(f"# HELP {name} {help_texts[name]}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+
+def _format_labels(labels: Labels) -> str:
+    """Render labels as {name="value",...} (empty string without labels)"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value (backslash, double quote and newline)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    """Render a number as a Prometheus sample value"""
+    return repr(float(value))
+
+
+# Global instance
+metrics_registry = MetricsRegistry()
+
+# Trace of the request being processed on this thread (or task)
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("chatbot_trace", default=None)
+
+
+# Convenience functions
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """
+    Collect the spans recorded while the block runs
+
+    Yields:
+        Trace that receives every span recorded in the block on this thread
+    """
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    """Get the trace being collected, or None outside trace()"""
+    return _current_trace.get()
+
+
+def record_span(stage: str, seconds: float) -> None:
+    """
+    Record time spent in a stage (histogram and the current trace)
+
+    Args:
+        stage: Stage name (the "stage" label)
+        seconds: Time spent
+    """
+    metrics_registry.observe(STAGE_METRIC, seconds, {"stage": stage}, STAGE_HELP)
+    active = _current_trace.get()
+    if active is not None:
+        active.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time a block as one stage (recorded even if the block raises)
+
+    Args:
+        stage: Stage name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - start)
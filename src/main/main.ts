@@ -57,6 +57,15 @@ function createMainWindow(): void {
     mainWindow = null;
   });
 
+  // Pre-warm the model when the app regains focus (the backend unloads it while idle)
+  mainWindow.on('focus', () => {
+    if (backendManager.isBackendRunning()) {
+      backendManager.request('POST', '/api/model/warm').catch((error) => {
+        console.error('Failed to warm up model:', error);
+      });
+    }
+  });
+
   // Prevent navigation away from the app
   mainWindow.webContents.on('will-navigate', (event, url) => {
     // Only allow navigation within the app